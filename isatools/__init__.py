@@ -14,55 +14,59 @@ Example:
     We can import the same module without specifying the .convert package::
 
         $ from isatools import isatab2json
+
+The submodules are only imported the first time they are used, so that
+importing isatools itself stays cheap.
 """
 from __future__ import absolute_import
+import importlib
+
+
+_LAZY_SUBMODULES = {
+    # isatools modules, which importing the packages below used to load
+    'isajson': 'isatools.isajson',
+    'isatab': 'isatools.isatab',
+    'magetab': 'isatools.magetab',
+    'model': 'isatools.model',
+    'sampletab': 'isatools.sampletab',
+    'sra': 'isatools.sra',
+    'utils': 'isatools.utils',
+    # isatools.convert packages
+    'isatab2cedar': 'isatools.convert.isatab2cedar',
+    'isatab2json': 'isatools.convert.isatab2json',
+    'isatab2sampletab': 'isatools.convert.isatab2sampletab',
+    'isatab2sra': 'isatools.convert.isatab2sra',
+    'isatab2w4m': 'isatools.convert.isatab2w4m',
+    'json2isatab': 'isatools.convert.json2isatab',
+    'json2magetab': 'isatools.convert.json2magetab',
+    'json2sampletab': 'isatools.convert.json2sampletab',
+    'json2sra': 'isatools.convert.json2sra',
+    'magetab2isatab': 'isatools.convert.magetab2isatab',
+    'magetab2json': 'isatools.convert.magetab2json',
+    'mzml2isa': 'isatools.convert.mzml2isa',
+    'sampletab2isatab': 'isatools.convert.sampletab2isatab',
+    'sampletab2json': 'isatools.convert.sampletab2json',
+    # isatools.net packages
+    'biocrates2isatab': 'isatools.net.biocrates2isatab',
+    'mtbls': 'isatools.net.mtbls',
+    'mw2isa': 'isatools.net.mw2isa',
+    'ols': 'isatools.net.ols',
+    'pubmed': 'isatools.net.pubmed',
+    'sra2isatab': 'isatools.net.sra2isatab',
+}
 
-from isatools.convert import (
-    isatab2cedar as isatab2cedar_module,
-    isatab2json as isatab2json_module,
-    isatab2sampletab as isatab2sampletab_module,
-    isatab2sra as isatab2sra_module,
-    isatab2w4m as isatab2w4m_module,
-    json2isatab as json2isatab_module,
-    json2magetab as json2magetab_module,
-    json2sampletab as json2sampletab_module,
-    json2sra as json2sra_module,
-    magetab2isatab as magetab2isatab_module,
-    magetab2json as magetab2json_module,
-    mzml2isa as mzml2isa_module,
-    sampletab2isatab as sampletab2isatab_module,
-    sampletab2json as sampletab2json_module,
-)
-from isatools.net import (
-    biocrates2isatab as biocrates2isatab_module,
-    mtbls as mtbls_module,
-    mw2isa as mw2isa_module,
-    ols as ols_module,
-    pubmed as pubmed_module,
-    sra2isatab as sra2isatab_module,
-)
 
+def __getattr__(name):
+    module_name = _LAZY_SUBMODULES.get(name)
+    if module_name is None and name.endswith('_module'):
+        module_name = _LAZY_SUBMODULES.get(name[:-len('_module')])
+    if module_name is None:
+        raise AttributeError(
+            "module {!r} has no attribute {!r}".format(__name__, name))
+    module = importlib.import_module(module_name)
+    globals()[name] = module
+    return module
 
-# isatools.convert packages
-isatab2cedar = isatab2cedar_module
-isatab2json = isatab2json_module
-isatab2sampletab = isatab2sampletab_module
-isatab2sra = isatab2sra_module
-isatab2w4m = isatab2w4m_module
-json2isatab = json2isatab_module
-json2magetab = json2magetab_module
-json2sampletab = json2sampletab_module
-json2sra = json2sra_module
-magetab2isatab = magetab2isatab_module
-magetab2json = magetab2json_module
-mzml2isa = mzml2isa_module
-sampletab2isatab = sampletab2isatab_module
-sampletab2json = sampletab2json_module
 
-# isatools.net packages
-biocrates2isatab = biocrates2isatab_module
-mtbls = mtbls_module
-mw2isa = mw2isa_module
-ols = ols_module
-pubmed = pubmed_module
-sra2isatab = sra2isatab_module
+def __dir__():
+    return sorted(set(globals()) | set(_LAZY_SUBMODULES))
@@ -74,18 +74,16 @@ class ISATab2ISAjson_v1:
     ARRAY_DESIGN_REF = "Array Design REF"
 
     def __init__(self, identifier_type):
-        self.identifiers = list()  # list of dictionaries
+        self.identifiers = dict()  # (type, name) -> identifier
         self.counters = dict()
         self.identifier_type = identifier_type
 
     def setIdentifier(self, type, name, identifier):
-        self.identifiers.append(dict([("type", type), ("name", name),
-                                      ("identifier", identifier)]))
+        # the first identifier generated for a name is the one referenced
+        self.identifiers.setdefault((type, name), identifier)
 
     def getIdentifier(self, type, name):
-        for subVal in self.identifiers:
-            if subVal["type"] == type and subVal["name"] == name:
-                return subVal["identifier"]
+        return self.identifiers.get((type, name))
 
     def generateIdentifier(self, type, name):
         try:
@@ -27,7 +27,19 @@ BASE_DIR = os.path.dirname(__file__)
 default_config_dir = os.path.join(BASE_DIR, '..', 'config', 'xml')
 
 
-def convert(source_path, dest_path, sra_settings=None, validate_first=True):
+def convert(source_path, dest_path, sra_settings=None, validate_first=True,
+            datafiles_path=None):
+    """Converts an ISA-Tab to SRA-XML files and returns them zipped
+
+    :param source_path: Path to the ISA-Tab directory
+    :param dest_path: Directory to write the SRA-XML files to
+    :param sra_settings: SRA settings dict
+    :param validate_first: Whether to validate the ISA-Tab first
+    :param datafiles_path: Path to the data files, e.g. the ISA-Tab
+    directory, to compute their checksums from. The checksums are left
+    blank if it is None
+    :return: A BytesIO of the zipped SRA-XML files
+    """
     log.info("Converting ISA-Tab to JSON for %s", source_path)
     isa_json = isatab2json.convert(source_path, validate_first=validate_first)
     log.debug("Writing JSON to memory file")
@@ -36,7 +48,7 @@ def convert(source_path, dest_path, sra_settings=None, validate_first=True):
     log.info("Converting JSON to SRA, writing to %s", dest_path)
     log.info("Using SRA settings %s", sra_settings)
     json2sra.convert(isa_json_fp, dest_path, sra_settings=sra_settings,
-                     validate_first=False)
+                     validate_first=False, datafiles_path=datafiles_path)
     log.info("Conversion from ISA-Tab to SRA complete")
     buffer = BytesIO()
     if os.path.isdir(dest_path):
@@ -9,7 +9,7 @@ log = logging.getLogger('isatools')
 
 
 def convert(json_fp, path, config_dir=None, sra_settings=None,
-            datafilehashes=None, validate_first=True):
+            datafilehashes=None, validate_first=True, datafiles_path=None):
     """ Converter for ISA-JSON to SRA.
     :param json_fp: File pointer to ISA JSON input
     :param path: Directory for output SRA XMLs to be written
@@ -17,6 +17,8 @@ def convert(json_fp, path, config_dir=None, sra_settings=None,
         embedded in API
     :param sra_settings: SRA settings dict
     :param datafilehashes: Data files with hashes, in a dict
+    :param datafiles_path: Path to the data files to hash, if datafilehashes
+        is not given
     """
     if validate_first:
         log.info("Validating input JSON before conversion")
@@ -31,7 +33,7 @@ def convert(json_fp, path, config_dir=None, sra_settings=None,
     log.info("Exporting SRA to {}".format(path))
     log.debug("Using SRA settings ".format(sra_settings))
     sra.export(isa, path, sra_settings=sra_settings,
-               datafilehashes=datafilehashes)
+               datafilehashes=datafilehashes, datafiles_path=datafiles_path)
 
 
 """
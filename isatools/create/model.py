@@ -14,8 +14,6 @@ import logging
 from numbers import Number
 from abc import ABC
 from math import factorial
-import os
-import yaml
 import uuid
 import networkx as nx
 from isatools.create import errors
@@ -24,7 +22,7 @@ from isatools.create.constants import (
     DURATION_FACTOR, BASE_FACTORS, SOURCE, SAMPLE, EXTRACT, LABELED_EXTRACT,
     DATA_FILE, GROUP_PREFIX, SUBJECT_PREFIX, SAMPLE_PREFIX,
     ASSAY_GRAPH_PREFIX,
-    RUN_ORDER, STUDY_CELL, assays_opts,
+    RUN_ORDER, STUDY_CELL, assays_opts, yaml_config,
     DEFAULT_SOURCE_TYPE, SOURCE_QC_SOURCE_NAME, QC_SAMPLE_NAME,
     QC_SAMPLE_TYPE_PRE_RUN, QC_SAMPLE_TYPE_POST_RUN,
     QC_SAMPLE_TYPE_INTERSPERSED, ZFILL_WIDTH, DEFAULT_PERFORMER,
@@ -1016,6 +1014,8 @@ class AssayGraph(object):
     (e.g sample derivatives extraction, labelling, and the instrument analysis itself)
     This information is stored in a graph (a directed tree, more correctly) of ProductNodes and
     ProcessNodes. Each ProcessNode has ProductNodes as outputs and potentially as inputs.
+    The graph keeps both the next and the previous nodes of each node, and caches the start, end and
+    topological orders of its nodes until a node or a link is added.
     """
 
     def __init__(self, measurement_type, technology_type, id_=str(uuid.uuid4()), nodes=None, links=None,
@@ -1029,6 +1029,11 @@ class AssayGraph(object):
         self.__measurement_type = None
         self.__technology_type = None
         self.__graph_dict = {}
+        self.__reverse_graph_dict = {}
+        self.__start_nodes = None
+        self.__end_nodes = None
+        self.__topological_order = None
+        self.__previous_protocol_nodes = {}
         self.__quality_control = None
         self.measurement_type = measurement_type
         self.technology_type = technology_type
@@ -1183,6 +1188,8 @@ class AssayGraph(object):
         if node in self.__graph_dict.keys():
             raise ValueError(errors.NODE_ALREADY_PRESENT.format(node))
         self.__graph_dict[node] = []
+        self.__reverse_graph_dict[node] = []
+        self.__invalidate_caches()
 
     def add_nodes(self, nodes):
         for node in nodes:
@@ -1207,6 +1214,8 @@ class AssayGraph(object):
         if start_node not in self.__graph_dict.keys() or target_node not in self.__graph_dict.keys():
             raise ValueError(errors.MISSING_NODE_ERROR)
         self.__graph_dict[start_node].append(target_node)
+        self.__reverse_graph_dict[target_node].append(start_node)
+        self.__invalidate_caches()
 
     def add_links(self, links):
         """
@@ -1217,10 +1226,36 @@ class AssayGraph(object):
         for link in links:
             self.add_link(*link)
 
+    def __invalidate_caches(self):
+        self.__start_nodes = None
+        self.__end_nodes = None
+        self.__topological_order = None
+        self.__previous_protocol_nodes = {}
+
     @property
     def start_nodes(self):
-        return set(self.__graph_dict.keys()) - set(target_node for target_nodes in self.__graph_dict.values()
-                                                   for target_node in target_nodes)
+        if self.__start_nodes is None:
+            self.__start_nodes = {node for node, source_nodes in self.__reverse_graph_dict.items()
+                                  if not source_nodes}
+        return set(self.__start_nodes)
+
+    @property
+    def topological_order(self):
+        """
+        The nodes of the graph sorted so that each node comes after all its previous nodes. The order only
+        depends on the order in which the nodes and links have been added to the graph
+        :return: list of SequenceNodes
+        """
+        if self.__topological_order is None:
+            in_degrees = {node: len(source_nodes) for node, source_nodes in self.__reverse_graph_dict.items()}
+            order = [node for node, in_degree in in_degrees.items() if not in_degree]
+            for node in order:
+                for target_node in self.__graph_dict[node]:
+                    in_degrees[target_node] -= 1
+                    if not in_degrees[target_node]:
+                        order.append(target_node)
+            self.__topological_order = order
+        return list(self.__topological_order)
 
     def next_nodes(self, node):
         if not isinstance(node, SequenceNode):
@@ -1234,7 +1269,7 @@ class AssayGraph(object):
             raise TypeError(errors.INVALID_NODE_ERROR)
         if node not in self.__graph_dict:
             raise ValueError(errors.MISSING_NODE_ERROR)
-        return {n for n in self.__graph_dict if node in self.__graph_dict[n]}
+        return set(self.__reverse_graph_dict[node])
 
     def previous_protocol_nodes(self, protocol_node):
         """
@@ -1246,6 +1281,14 @@ class AssayGraph(object):
         """
         if not isinstance(protocol_node, ProtocolNode):
             raise TypeError(errors.INVALID_NODE_ERROR)
+        try:
+            previous_protocol_nodes = self.__previous_protocol_nodes[protocol_node]
+        except KeyError:
+            previous_protocol_nodes = self.__previous_protocol_nodes[protocol_node] = \
+                self.__find_previous_protocol_nodes(protocol_node)
+        return set(previous_protocol_nodes) if previous_protocol_nodes is not None else None
+
+    def __find_previous_protocol_nodes(self, protocol_node):
         # previous_protocol_nodes = set()
         current_nodes = {protocol_node}
         previous_nodes = set()
@@ -1275,7 +1318,9 @@ class AssayGraph(object):
 
     @property
     def end_nodes(self):
-        return set(node for node in self.__graph_dict.keys() if not self.__graph_dict[node])
+        if self.__end_nodes is None:
+            self.__end_nodes = {node for node, target_nodes in self.__graph_dict.items() if not target_nodes}
+        return set(self.__end_nodes)
 
     @property
     def quality_control(self):
@@ -1287,19 +1332,28 @@ class AssayGraph(object):
             raise AttributeError(errors.QUALITY_CONTROL_ERROR.format(type(quality_control)))
         self.__quality_control = quality_control
 
-    def find_paths(self, start_node, end_node, path=[]):
-        if start_node not in self.nodes or end_node not in self.nodes:
+    def find_paths(self, start_node, end_node, path=None):
+        """
+        Find all the paths going from start_node to end_node
+        :param start_node: SequenceNode
+        :param end_node: SequenceNode
+        :param path: list - the nodes already visited before start_node, to prepend to each path
+        :return: list of paths, each a list of SequenceNodes
+        """
+        if start_node not in self.__graph_dict or end_node not in self.__graph_dict:
             raise ValueError(errors.MISSING_NODE_ERROR)
-        path += [start_node]
-        if start_node == end_node:
-            return [path]
         paths = []
-        for node in self.__graph_dict[start_node]:
-            if node not in path:
-                extended_paths = self.find_paths(node, end_node, path)
-
-                for p in extended_paths:
-                    paths.append(p)
+        stack = [(path or []) + [start_node]]
+        while stack:
+            current_path = stack.pop()
+            node = current_path[-1]
+            if node == end_node:
+                paths.append(current_path)
+                continue
+            # pushed in reverse so that the paths come out depth-first in the order of the links
+            for next_node in reversed(self.__graph_dict[node]):
+                if next_node not in current_path:
+                    stack.append(current_path + [next_node])
         return paths
 
     def find_all_paths(self):
@@ -1961,6 +2015,108 @@ class StudyArmDecoder(object):
         return self.loads_arm(json_dict)
 
 
+class AssayTemplate(object):
+    """
+    An AssayTemplate is the subtree of an AssayGraph that starts from one of its start nodes, expanded once
+    into the ordered list of the ISA elements that each input sample goes through.
+    Instantiating it for a sample generates the same Processes, Materials and DataFiles as walking the graph
+    with StudyDesign._generate_isa_elements_from_node would, in time proportional to the template size.
+    """
+
+    def __init__(self, assay_graph, start_node):
+        """
+        AssayTemplate constructor method
+        :param assay_graph: AssayGraph
+        :param start_node: SequenceNode - the node of assay_graph to expand the template from
+        """
+        if not isinstance(assay_graph, AssayGraph):
+            raise TypeError()
+        measurement_type, technology_type = assay_graph.measurement_type, assay_graph.technology_type
+        # each step is the ISA element maker of a node, the index of the step it follows (None for the first
+        # one), whether the element is an output of the process of that step, the node itself and the kind
+        # of element it generates
+        self.__steps = []
+        # the pairs of steps whose processes are linked, in the order they are linked
+        self.__process_links = []
+        process_steps = []
+        counter = {}
+
+        def expand(node, previous_step):
+            StudyDesign._increment_counter_by_node_type(counter, node)
+            step = len(self.__steps)
+            self.__steps.append((
+                StudyDesign._isa_object_maker(node, assay_graph.id, counter, measurement_type=measurement_type,
+                                              technology_type=technology_type),
+                previous_step,
+                previous_step is not None and isinstance(self.__steps[previous_step][3], ProtocolNode),
+                node,
+                self.__element_kind(node)
+            ))
+            if isinstance(node, ProtocolNode):
+                process_steps.append(step)
+            for next_node in assay_graph.next_nodes(node):
+                size = next_node.size if isinstance(next_node, ProductNode) \
+                    else next_node.replicates if isinstance(next_node, ProtocolNode) \
+                    else 1
+                for _ in range(size):
+                    expand(next_node, step)
+                    if isinstance(node, ProtocolNode):
+                        # the hypothesis here is that there is only one previous protocol node. Hence popping it
+                        previous_protocol_nodes = assay_graph.previous_protocol_nodes(node)
+                        previous_protocol_node = previous_protocol_nodes.pop() \
+                            if previous_protocol_nodes and len(previous_protocol_nodes) == 1 \
+                            else None
+                        if previous_protocol_node:
+                            previous_process_step = next(
+                                process_step for process_step in process_steps[::-1]
+                                if self.__steps[process_step][3] == previous_protocol_node
+                            )
+                            self.__process_links.append((previous_process_step, step))
+
+        expand(start_node, None)
+
+    @staticmethod
+    def __element_kind(node):
+        if isinstance(node, ProtocolNode):
+            return Process
+        if isinstance(node, ProductNode):
+            if node.type in (EXTRACT, LABELED_EXTRACT):
+                return Material
+            if node.type == DATA_FILE:
+                return DataFile
+        # samples are neither collected as other materials nor as data files
+        return None
+
+    def __len__(self):
+        return len(self.__steps)
+
+    def instantiate(self, sample, start_node_index):
+        """
+        Generate the ISA elements of the template for a sample
+        :param sample: Sample - the input of the first step of the template
+        :param start_node_index: int - the index of the starting node, used to name the elements
+        :return: the lists of the Processes, other Materials and DataFiles generated
+        """
+        processes, other_materials, data_files = [], [], []
+        items = []
+        for make_item, previous_step, is_output, _, kind in self.__steps:
+            item = make_item(start_node_index)
+            previous_item = items[previous_step] if previous_step is not None else sample
+            if kind is Process:
+                item.inputs = [previous_item]
+                processes.append(item)
+            elif kind is Material:
+                other_materials.append(item)
+            elif kind is DataFile:
+                data_files.append(item)
+            if is_output:
+                previous_item.outputs.append(item)
+            items.append(item)
+        for previous_process_step, process_step in self.__process_links:
+            plink(items[previous_process_step], items[process_step])
+        return processes, other_materials, data_files
+
+
 class StudyDesign(object):
 
     """
@@ -2166,11 +2322,12 @@ class StudyDesign(object):
         process_sequence = []
         assays = []
         protocols = set()
-        unique_assay_types = {
+        # the assay graphs in the order they first appear in the arms, which is the order of the assays
+        unique_assay_types = list(OrderedDict.fromkeys(
             assay_graph for arm in self.study_arms
             for sample_assay_plan in arm.arm_map.values() if sample_assay_plan is not None
             for assay_graph in sample_assay_plan.assay_plan if assay_graph is not None
-        }
+        ))
         samples_grouped_by_assay_graph = {
             assay_graph: [] for assay_graph in unique_assay_types
         }
@@ -2361,21 +2518,16 @@ class StudyDesign(object):
             size = node.size if isinstance(node, ProductNode) \
                 else node.replicates if isinstance(node, ProtocolNode) \
                 else 1
-            log.debug('Size: {0}'.format(size))
+            # the graph is walked once per start node, then its elements are stamped out for each sample
+            template = AssayTemplate(assay_graph, node)
+            log.debug('Start node: {0} - size: {1} - template size: {2}'.format(node.id, size, len(template)))
             for j, sample in enumerate(assay_samples):
-                log.debug('Iteration: {0} - Sample: {1}'.format(i, sample.name))
                 for k in range(size):
                     ix = i * len(assay_samples) * size + j * size + k
-                    log.debug('i = {0}, j = {1}, k={2}, ix={3}'.format(i, j, k, ix))
-                    processes, other_materials, data_files, _, __ = StudyDesign._generate_isa_elements_from_node(
-                        node, assay_graph, assay_graph.id, start_node_index=ix + 1, counter=None, processes=[],
-                        other_materials=[], data_files=[], previous_items=[sample]
-                    )
+                    processes, other_materials, data_files = template.instantiate(sample, ix + 1)
                     assay.other_material.extend(other_materials)
                     assay.process_sequence.extend(processes)
                     assay.data_files.extend(data_files)
-                    log.debug('i={0}, i={1}, num_processes={2}, num_assay_files={3}'.format(i, j, len(processes),
-                                                                                            len(data_files)))
         return assay
 
     @staticmethod
@@ -2399,41 +2551,66 @@ class StudyDesign(object):
         :param performer: str/Person
         :return: either a Sample or a Material or a DataFile. So far only RawDataFile is supported among files
         """
+        return StudyDesign._isa_object_maker(
+            node, assay_file_prefix, counter, measurement_type=measurement_type, technology_type=technology_type,
+            performer=performer
+        )(start_node_index)
+
+    @staticmethod
+    def _isa_object_maker(
+            node,
+            assay_file_prefix,
+            counter,
+            measurement_type=None,
+            technology_type=None,
+            performer=DEFAULT_PERFORMER
+    ):
+        """
+        This method prepares the generation of ISA elements from an ISA node, so that the elements of any
+        starting node index can then be generated without looking the node up again
+        :param technology_type:
+        :param measurement_type:
+        :param node: SequenceNode - can be either a ProductNode or a ProtocolNode
+        :param assay_file_prefix: str
+        :param counter: dict containing the counts for this specific subgraph
+        :param performer: str/Person
+        :return: a function that takes the index of the starting node in the graph (int) and returns either a
+                 Sample or a Material or a DataFile, or None if the node does not generate any ISA element
+        """
         if isinstance(node, ProtocolNode):
-            return Process(
-                name='{}-S{}-{}-Acquisition-R{}'.format(
-                    assay_file_prefix,
-                    start_node_index,
-                    # NB: if node.name has special characters (e.g. whitespace)
-                    # these are replaced with  dashes by urlify()
-                    urlify(node.name),
-                    counter[node.name]
-                ),
-                executes_protocol=node,
-                performer=performer,
-                parameter_values=node.parameter_values,
-                inputs=[],
-                outputs=[],
-            )
-        if isinstance(node, ProductNode):
-            if node.type == SAMPLE:
-                return Sample(
-                    name='{}-S{}-Sample-R{}'.format(assay_file_prefix, start_node_index, counter[SAMPLE]),
-                    characteristics=node.characteristics
-                )
-            if node.type == EXTRACT:
-                return Extract(
-                    name='{}-S{}-Extract-R{}'.format(assay_file_prefix, start_node_index, counter[EXTRACT]),
-                    characteristics=node.characteristics
-                )
-            if node.type == LABELED_EXTRACT:
-                return LabeledExtract(
-                    name='{}-S{}-LE-R{}'.format(assay_file_prefix, start_node_index, counter[LABELED_EXTRACT]),
-                    characteristics=node.characteristics
+            # NB: if node.name has special characters (e.g. whitespace)
+            # these are replaced with  dashes by urlify()
+            process_name_suffix = '-{}-Acquisition-R{}'.format(urlify(node.name), counter[node.name])
+
+            def make_process(start_node_index):
+                return Process(
+                    name='{}-S{}{}'.format(assay_file_prefix, start_node_index, process_name_suffix),
+                    executes_protocol=node,
+                    performer=performer,
+                    parameter_values=node.parameter_values,
+                    inputs=[],
+                    outputs=[],
                 )
+            return make_process
+        if isinstance(node, ProductNode):
+            if node.type in (SAMPLE, EXTRACT, LABELED_EXTRACT):
+                material_class, label = {
+                    SAMPLE: (Sample, 'Sample'),
+                    EXTRACT: (Extract, 'Extract'),
+                    LABELED_EXTRACT: (LabeledExtract, 'LE')
+                }[node.type]
+                material_name_suffix = '-{}-R{}'.format(label, counter[node.type])
+
+                def make_material(start_node_index):
+                    return material_class(
+                        name='{}-S{}{}'.format(assay_file_prefix, start_node_index, material_name_suffix),
+                        characteristics=node.characteristics
+                    )
+                return make_material
             # under the hypothesis that we deal only with raw data files
             # derived data file would require a completely separate approach
             if node.type == DATA_FILE:
+                file_extension = '.{}'.format(node.extension) if node.extension else ''
                 try:
                     log.debug('Assay conf. found: {}; {};'.format(
                         measurement_type, technology_type)
@@ -2457,37 +2634,24 @@ class StudyDesign(object):
                         ProteinAssignmentFile, PeptideAssignmentFile, DerivedArrayDataMatrixFile,
                         PostTranslationalModificationAssignmentFile, AcquisitionParameterDataFile
                     }
-                    file_extension = '.{}'.format(node.extension) if node.extension else ''
-                    return isa_class(
-                        filename='{}-S{}-{}-R{}{}'.format(
-                            assay_file_prefix,
-                            start_node_index,
-                            urlify(node.name),
-                            counter[node.name],
-                            file_extension
-                        )
-                    )
+                    file_name_suffix = '-{}-R{}{}'.format(urlify(node.name), counter[node.name], file_extension)
                 except StopIteration:
-                    file_extension = '.{}'.format(node.extension) if node.extension else ''
-                    return RawDataFile(
-                        filename='{}-S{}-{}-R{}-{}'.format(
-                            assay_file_prefix,
-                            start_node_index,
-                            urlify(node.name),
-                            counter[node.name],
-                            file_extension
-                        )
+                    isa_class = RawDataFile
+                    file_name_suffix = '-{}-R{}-{}'.format(urlify(node.name), counter[node.name], file_extension)
+
+                def make_data_file(start_node_index):
+                    return isa_class(
+                        filename='{}-S{}{}'.format(assay_file_prefix, start_node_index, file_name_suffix)
                     )
+                return make_data_file
+        return lambda start_node_index: None
 
     def generate_isa_study(self, identifier=None):
         """
         this is the core method to return the fully populated ISA Study object from the StudyDesign
         :return: isatools.model.Study
         """
-        with open(os.path.join(os.path.dirname(__file__), '..', 'resources', 'config', 'yaml',
-                               'study-creator-config.yml')) as yaml_file:
-            config = yaml.load(yaml_file, Loader=yaml.FullLoader)
-        study_config = config['study']
+        study_config = yaml_config['study']
         study = Study(
             identifier=self.identifier or identifier or DEFAULT_STUDY_IDENTIFIER,
             title=self.name,
@@ -2553,20 +2717,29 @@ class QualityControlService(object):
         pass
 
     @classmethod
-    def augment_study(cls, study, study_design, in_place=False):
+    def augment_study(cls, study, study_design, in_place=False, share=False):
         """
         Augment a study with QualityControl samples and modifies the assay
         :param study: Study
         :param study_design: StudyDesign
         :param in_place: boolean
+        :param share: boolean - if True (and not in_place) the new Study shares the sources, samples, processes
+                      and assays that the augmentation leaves untouched with the original study, instead of
+                      deep-copying them. Only the QC samples and the augmented assays are new objects
         :return:
         """
         assert isinstance(in_place, bool)
+        assert isinstance(share, bool)
         if not isinstance(study, Study):
             raise TypeError('study must be a valid Study object')
         if not isinstance(study_design, StudyDesign):
             raise TypeError('study must be a valid StudyDesign object')
-        qc_study = deepcopy(study) if in_place is False else study
+        if in_place:
+            qc_study = study
+        elif share:
+            qc_study = cls._share_study(study)
+        else:
+            qc_study = deepcopy(study)
         for arm in study_design.study_arms:
             for cell, study_assay_plan in arm.arm_map.items():
                 if study_assay_plan:
@@ -2614,6 +2787,41 @@ class QualityControlService(object):
                             qc_study.assays[index] = StudyDesign.generate_assay(assay_graph, augmented_samples)
         return qc_study
 
+    @staticmethod
+    def _share_study(study):
+        """
+        Copy a Study into a new one with lists of its own, which hold the very same sources, samples,
+        processes, assays and other elements of the original study
+        :param study: Study
+        :return: Study
+        """
+        shared_study = Study(
+            id_=study.id,
+            filename=study.filename,
+            identifier=study.identifier,
+            title=study.title,
+            description=study.description,
+            submission_date=study.submission_date,
+            public_release_date=study.public_release_date,
+            contacts=list(study.contacts),
+            design_descriptors=list(study.design_descriptors),
+            publications=list(study.publications),
+            factors=list(study.factors),
+            protocols=list(study.protocols),
+            assays=list(study.assays),
+            sources=list(study.sources),
+            samples=list(study.samples),
+            process_sequence=list(study.process_sequence),
+            other_material=list(study.other_material),
+            characteristic_categories=list(study.characteristic_categories),
+            comments=list(study.comments),
+            units=list(study.units)
+        )
+        # set by StudyDesign.generate_isa_study, though it is not a Study attribute
+        if hasattr(study, 'ontology_source_references'):
+            shared_study.ontology_source_references = copy.copy(study.ontology_source_references)
+        return shared_study
+
     @staticmethod
     def _augment_sample_batch_with_qc_samples(samples, pre_run_samples=None, post_run_samples=None,
                                               interspersed_samples=None):
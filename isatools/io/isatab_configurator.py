@@ -10,6 +10,8 @@
 import base64
 import datetime as datetime_
 import glob
+import hashlib
+import json
 import logging
 import os
 import re as re_
@@ -22,32 +24,180 @@ from lxml import etree as etree_
 log = logging.getLogger('isatools')
 
 
-def load(config_dir):
+def _user_cache_dir():
+    if sys.platform == 'win32':
+        cache_home = os.environ.get('LOCALAPPDATA') or os.path.expanduser(os.path.join('~', 'AppData', 'Local'))
+    elif sys.platform == 'darwin':
+        cache_home = os.path.expanduser(os.path.join('~', 'Library', 'Caches'))
+    else:
+        cache_home = os.environ.get('XDG_CACHE_HOME') or os.path.expanduser(os.path.join('~', '.cache'))
+    return os.path.join(cache_home, 'isatools', 'isatab_configurator')
+
+
+# per-user directory of the compiled configurations, one JSON file per configuration directory
+CACHE_DIR = _user_cache_dir()
+_COMPILED_CONFIGS_VERSION = 2
+_compiled_configs = dict()
+
+
+def _sort_fields(config):
+    fields = dict()
+    for field in config.field:
+        fields[field.pos] = field
+    for protocol_field in config.protocol_field:
+        fields[protocol_field.pos] = protocol_field
+    for structured_field in config.structured_field:
+        fields[structured_field.pos] = structured_field
+    return [fields[pos] for pos in sorted(fields)]
+
+
+def _parse_configs(config_files):
     config_dict = dict()
-    for file in glob.iglob(os.path.join(config_dir, '*.xml')):
+    for file in config_files:
         try:
             config_obj = parse(inFileName=file, silence=True)
             measurement_type = config_obj.get_isatab_configuration()[0].get_measurement().get_term_label()
             technology_type = config_obj.get_isatab_configuration()[0].get_technology().get_term_label()
+            for config in config_obj.isatab_configuration:
+                config.sorted_fields = _sort_fields(config)
             config_dict[(measurement_type.lower(), technology_type.lower())] = config_obj
         except GDSParseError as parse_error:
             log.error(parse_error)
     return config_dict
 
 
+def _stat_configs(config_files):
+    stats = dict()
+    for file in config_files:
+        stat = os.stat(file)
+        stats[os.path.basename(file)] = [stat.st_mtime_ns, stat.st_size]
+    return stats
+
+
+def _hash_configs(config_files):
+    hashes = dict()
+    for file in config_files:
+        with open(file, 'rb') as config_fp:
+            hashes[os.path.basename(file)] = hashlib.sha1(config_fp.read()).hexdigest()
+    return hashes
+
+
+def _config_to_data(obj):
+    """Turn a parsed configuration into plain data that JSON can store"""
+    if isinstance(obj, GeneratedsSuper):
+        return {
+            'type': type(obj).__name__,
+            'attributes': {name: _config_to_data(value) for name, value in vars(obj).items()
+                           if name != 'sorted_fields'}
+        }
+    if isinstance(obj, list):
+        return [_config_to_data(value) for value in obj]
+    if obj is None or isinstance(obj, (str, bool, int, float)):
+        return obj
+    raise TypeError('Cannot compile a {} in a configuration'.format(type(obj).__name__))
+
+
+def _config_from_data(data):
+    """Rebuild a parsed configuration from the plain data of _config_to_data.
+    Only the configuration classes of this module can be built
+    """
+    if isinstance(data, dict):
+        if data['type'] not in __all__:
+            raise ValueError('Unknown configuration type {}'.format(data['type']))
+        cls = globals()[data['type']]
+        obj = cls.__new__(cls)
+        for name, value in data['attributes'].items():
+            setattr(obj, name, _config_from_data(value))
+        if isinstance(obj, IsaTabConfigurationType):
+            obj.sorted_fields = _sort_fields(obj)
+        return obj
+    if isinstance(data, list):
+        return [_config_from_data(value) for value in data]
+    return data
+
+
+def _compiled_configs_file(config_dir):
+    return os.path.join(CACHE_DIR, '{}.json'.format(hashlib.sha1(config_dir.encode('utf-8')).hexdigest()))
+
+
+def _read_compiled_configs(config_dir):
+    try:
+        with open(_compiled_configs_file(config_dir), encoding='utf-8') as cache_fp:
+            compiled = json.load(cache_fp)
+        if compiled.get('version') == _COMPILED_CONFIGS_VERSION and compiled.get('config_dir') == config_dir:
+            compiled['configs'] = {
+                (measurement_type, technology_type): _config_from_data(config)
+                for measurement_type, technology_type, config in compiled['configs']
+            }
+            return compiled
+    except Exception as e:
+        log.debug("Could not read the compiled configurations of {}: {}".format(config_dir, e))
+    return None
+
+
+def _write_compiled_configs(config_dir, compiled):
+    cache_file = _compiled_configs_file(config_dir)
+    tmp_file = '{}.{}'.format(cache_file, os.getpid())
+    try:
+        data = dict(compiled, configs=[
+            [measurement_type, technology_type, _config_to_data(config)]
+            for (measurement_type, technology_type), config in compiled['configs'].items()
+        ])
+        os.makedirs(CACHE_DIR, exist_ok=True)
+        with open(tmp_file, 'w', encoding='utf-8') as cache_fp:
+            json.dump(data, cache_fp)
+        os.replace(tmp_file, cache_file)
+    except Exception as e:
+        log.debug("Could not write the compiled configurations of {}: {}".format(config_dir, e))
+        if os.path.exists(tmp_file):
+            os.remove(tmp_file)
+
+
+def load(config_dir, use_cache=True):
+    """Load the ISA configuration XMLs in a directory
+
+    Unless use_cache is False, the parsed configurations are kept in memory
+    and compiled to a JSON file in the per-user CACHE_DIR, named after the
+    path of the directory, so that they are only parsed again when any of
+    the XML files changes. A file counts as changed when its modification
+    time or size differ and so does its SHA-1 hash.
+
+    :param config_dir: Path to a directory containing ISA Configuration XMLs
+    :param use_cache: Whether to use the compiled configurations
+    :return: A dictionary of the configurations keyed on their lower-cased
+    (measurement type, technology type)
+    """
+    config_files = sorted(glob.glob(os.path.join(config_dir, '*.xml')))
+    if not use_cache:
+        return _parse_configs(config_files)
+    config_dir = os.path.abspath(config_dir)
+    stats = _stat_configs(config_files)
+    compiled = _compiled_configs.get(config_dir)
+    if compiled is None or compiled['stats'] != stats:
+        compiled = _read_compiled_configs(config_dir)
+        if compiled is None or compiled['stats'] != stats:
+            hashes = _hash_configs(config_files)
+            if compiled is None or compiled['hashes'] != hashes:
+                log.debug("Compiling the configurations in {}".format(config_dir))
+                compiled = {
+                    'version': _COMPILED_CONFIGS_VERSION,
+                    'config_dir': config_dir,
+                    'hashes': hashes,
+                    'configs': _parse_configs(config_files)
+                }
+            compiled['stats'] = stats
+            _write_compiled_configs(config_dir, compiled)
+        _compiled_configs[config_dir] = compiled
+    return dict(compiled['configs'])
+
+
 def get_config(config_dict, measurement_type=None, technology_type=None):
     try:
         config = config_dict[(measurement_type, technology_type)].isatab_configuration[0]
-        from collections import OrderedDict
-        fields = dict()
-        for field in config.field:
-            fields[field.pos] = field
-        for protocol_field in config.protocol_field:
-            fields[protocol_field.pos] = protocol_field
-        for structured_field in config.structured_field:
-            fields[structured_field.pos] = structured_field
-        sorted_fields = OrderedDict(sorted(fields.items(), key=lambda x: x[0]))
-        sorted_config = list(sorted_fields.values())
+        sorted_config = getattr(config, 'sorted_fields', None)
+        if sorted_config is None:
+            sorted_config = _sort_fields(config)
+        sorted_config = list(sorted_config)
     except KeyError:
         sorted_config = None
     return sorted_config
@@ -36,6 +36,7 @@ import re
 from io import StringIO
 
 from isatools import isatab
+from isatools.isatab import strip_comments
 
 
 __author__ = 'brad chapman, agbeltran, djcomlab'
@@ -951,16 +952,3 @@ class ProcessNodeRecord:
                 self.parameters).replace(
                 "\n", "\n" + " " * 9)
         )
-
-
-def strip_comments(in_fp):
-    out_fp = StringIO()
-    if not isinstance(in_fp, StringIO):
-        out_fp.name = in_fp.name
-    for line in in_fp.readlines():
-        if line.lstrip().startswith('#'):
-            pass
-        else:
-            out_fp.write(line)
-    out_fp.seek(0)
-    return out_fp
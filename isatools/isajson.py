@@ -4,37 +4,50 @@ Don't forget to read the ISA-JSON spec:
 http://isa-specs.readthedocs.io/en/latest/isajson.html
 """
 from __future__ import absolute_import
+import functools
 import glob
 import json
 import logging
 import os
 import re
+from collections import ChainMap
 from io import StringIO
 from json import JSONEncoder
 from jsonschema import Draft4Validator, RefResolver, ValidationError
 
 from isatools.model import (
-    Investigation, OntologyAnnotation, Comment, OntologySource, Publication, Person, Study, Protocol, ProtocolParameter,
-    ProtocolComponent, StudyFactor, Source, Characteristic, Sample, FactorValue, Process, ParameterValue, Assay,
-    DataFile, Material,
+    Investigation, OntologyAnnotation, OntologyAnnotationTable, Comment, OntologySource, Publication, Person, Study,
+    Protocol, ProtocolParameter, ProtocolComponent, StudyFactor, Source, Characteristic, Sample, FactorValue, Process,
+    ParameterValue, Assay, DataFile, Material,
 )
+from isatools.validation import ValidationMessages, map_validate
 
 __author__ = 'djcomlab@gmail.com (David Johnson)'
 
 
 log = logging.getLogger('isatools')
 
-errors = []
-warnings = []
-info = []
+errors = ValidationMessages('errors')
+warnings = ValidationMessages('warnings')
+info = ValidationMessages('info')
 
 # REGEXES
 _RX_DOI = re.compile("(10[.][0-9]{4,}(?:[.][0-9]+)*/(?:(?![%'#? ])\\S)+)")
 _RX_PMID = re.compile("[0-9]{8}")
 _RX_PMCID = re.compile("PMC[0-9]{8}")
 
+_ANNOTATION_KEYS = frozenset(("annotationValue", "termAccession", "termSource"))
+_IDENTIFIED_ANNOTATION_KEYS = frozenset(("@id", "annotationValue", "termAccession", "termSource"))
+
 
 def load(fp):
+    return _load_investigation(json.load(fp))
+
+
+def _load_investigation(investigation_json):
+
+    # identical annotations, e.g. of the same organism in every sample, share one OntologyAnnotation object
+    ontology_annotations = OntologyAnnotationTable()
 
     def get_comments(commentable_dict):
         comments = [
@@ -53,7 +66,7 @@ def load(fp):
                 term = role_json["annotationValue"]
                 term_accession = role_json["termAccession"]
                 term_source = term_source_dict[role_json["termSource"]]
-                role = OntologyAnnotation(term, term_source, term_accession)
+                role = ontology_annotations.get(term, term_source, term_accession)
                 roles.append(role)
         return roles
 
@@ -70,18 +83,25 @@ def load(fp):
             pass
         return res
 
+    def get_annotation_value(annotation_json, term=None):
+        """Gets the OntologyAnnotation of a value, shared with the identical ones unless it has comments of its own"""
+        if term is None:
+            term = annotation_json["annotationValue"]
+        term_source = term_source_dict[annotation_json["termSource"]]
+        term_accession = annotation_json["termAccession"]
+        comments = get_comments(annotation_json)
+        if comments:
+            return OntologyAnnotation(term=term, term_source=term_source, term_accession=term_accession,
+                                      comments=comments)
+        return ontology_annotations.get(term, term_source, term_accession)
+
     def get_parameter_value(p_val_dict):
         res = ParameterValue(
             category=parameters_dict[p_val_dict["category"]["@id"]],
             comments=get_comments(p_val_dict)
         )
         try:
-            res.value = OntologyAnnotation(
-                term=p_val_dict["value"]["annotationValue"],
-                term_accession=p_val_dict["value"]["termAccession"],
-                term_source=term_source_dict[p_val_dict["value"]["termSource"]],
-                comments=get_comments(p_val_dict["value"])
-            )
+            res.value = get_annotation_value(p_val_dict["value"])
         except TypeError:
             res.value = p_val_dict["value"]
         return res
@@ -92,7 +112,27 @@ def load(fp):
         else:
             return None
 
-    investigation_json = json.load(fp)
+    def link_processes(process_sequence_json, processes, nodes_dict, nodes_description):
+        # 2nd pass, once the processes and the nodes they link are indexed by @id
+        process_dict = {process.id: process for process in processes}
+        for process_json, process in zip(process_sequence_json, processes):
+            for input_json in process_json["inputs"]:
+                input_ = nodes_dict.get(input_json["@id"])
+                if input_ is None:
+                    raise IOError("Could not find input node in {}: {}".format(nodes_description, input_json["@id"]))
+                process.inputs.append(input_)
+            for output_json in process_json["outputs"]:
+                output = nodes_dict.get(output_json["@id"])
+                if output is None:
+                    raise IOError("Could not find output node in {}: {}".format(nodes_description, output_json["@id"]))
+                process.outputs.append(output)
+            prev_process = process_dict.get(process_json.get("previousProcess", {}).get("@id"))
+            if prev_process is not None:
+                process.prev_process = prev_process
+            next_process = process_dict.get(process_json.get("nextProcess", {}).get("@id"))
+            if next_process is not None:
+                process.next_process = next_process
+
     investigation = Investigation(
         identifier=investigation_json["identifier"],
         title=investigation_json["title"],
@@ -167,7 +207,6 @@ def load(fp):
                 # study.characteristic_categories.append(characteristic_category)
                 categories_dict[characteristic_category.id] = characteristic_category
     for study_json in investigation_json["studies"]:
-        process_dict = dict()
         study = Study(
             identifier=study_json["identifier"],
             title=study_json["title"],
@@ -301,12 +340,7 @@ def load(fp):
                         term = characteristic_json["value"]["annotationValue"]
                         if isinstance(term, (int, float)):
                             term = str(term)
-                        value = OntologyAnnotation(
-                            term=term,
-                            term_source=term_source_dict[characteristic_json["value"]["termSource"]],
-                            term_accession=characteristic_json["value"]["termAccession"],
-                            comments=get_comments(characteristic_json["value"])
-                        )
+                        value = get_annotation_value(characteristic_json["value"], term)
                     except KeyError as ke:
                         raise IOError("Can't create value as annotation: " + str(ke) + " \n object: " + str(characteristic_json))
                 elif isinstance(value, (int, float)):
@@ -336,12 +370,7 @@ def load(fp):
                 )
                 if isinstance(value, dict):
                     try:
-                        value = OntologyAnnotation(
-                            term=characteristic_json["value"]["annotationValue"],
-                            term_source=term_source_dict[characteristic_json["value"]["termSource"]],
-                            term_accession=characteristic_json["value"]["termAccession"],
-                            comments=get_comments(characteristic_json["value"])
-                        )
+                        value = get_annotation_value(characteristic_json["value"])
                     except KeyError as ke:
                         raise IOError("Can't create value as annotation: " + str(ke) + "\n object: " + str(characteristic_json))
                 elif isinstance(value, int) or isinstance(value, float):
@@ -364,12 +393,7 @@ def load(fp):
                 )
                 if isinstance(value, dict):
                     try:
-                        value = OntologyAnnotation(
-                            term=factor_value_json["value"]["annotationValue"],
-                            term_accession=factor_value_json["value"]["termAccession"],
-                            term_source=term_source_dict[factor_value_json["value"]["termSource"]],
-                            comments=get_comments(factor_value_json["value"])
-                        )
+                        value = get_annotation_value(factor_value_json["value"])
                     except KeyError as ke:
                         raise IOError("Can't create value as annotation: " + str(ke) + "\n object: " + str(factor_value_json))
                 elif isinstance(value, (int, float)):
@@ -390,6 +414,7 @@ def load(fp):
                     sample.derives_from.append(sources_dict[source_id_ref_json["@id"]])
             except KeyError:
                 sample.derives_from = []
+        study_processes = []
         for study_process_json in study_json["processSequence"]:
             process = Process(
                 id_=study_process_json["@id"],
@@ -419,51 +444,12 @@ def load(fp):
                 else:
                     parameter_value = get_parameter_value(parameter_value_json)
                     process.parameter_values.append(parameter_value)
-            for input_json in study_process_json["inputs"]:
-                input_ = None
-                try:
-                    input_ = sources_dict[input_json["@id"]]
-                except KeyError:
-                    pass
-                finally:
-                    try:
-                        input_ = samples_dict[input_json["@id"]]
-                    except KeyError:
-                        pass
-                if input_ is None:
-                    raise IOError("Could not find input node in sources or samples dicts: " + input_json["@id"])
-                process.inputs.append(input_)
-            for output_json in study_process_json["outputs"]:
-                output = None
-                try:
-                    output = sources_dict[output_json["@id"]]
-                except KeyError:
-                    pass
-                finally:
-                    try:
-                        output = samples_dict[output_json["@id"]]
-                    except KeyError:
-                        pass
-                if output is None:
-                    raise IOError("Could not find output node in sources or samples dicts: " + output_json["@id"])
-                process.outputs.append(output)
-            study.process_sequence.append(process)
-            process_dict[process.id] = process
-        for study_process_json in study_json["processSequence"]:  # 2nd pass
-            try:
-                prev_proc = study_process_json["previousProcess"]["@id"]
-                process_dict[study_process_json["@id"]].prev_process = process_dict[prev_proc]
-            except KeyError:
-                pass
-
-            try:
-                next_proc = study_process_json["nextProcess"]["@id"]
-                process_dict[study_process_json["@id"]].next_process = process_dict[next_proc]
-            except KeyError:
-                pass
+            study_processes.append(process)
+        link_processes(study_json["processSequence"], study_processes, ChainMap(samples_dict, sources_dict),
+                       "sources or samples dicts")
+        study.process_sequence.extend(study_processes)
 
         for assay_json in study_json["assays"]:
-            process_dict = dict()
             assay = Assay(
                 measurement_type=OntologyAnnotation(
                     term=assay_json["measurementType"]["annotationValue"],
@@ -532,17 +518,13 @@ def load(fp):
                 for characteristic_json in other_material_json["characteristics"]:
                     characteristic = Characteristic(
                         category=categories_dict[characteristic_json["category"]["@id"]],
-                        value=OntologyAnnotation(
-                            term=characteristic_json["value"]["annotationValue"],
-                            term_source=term_source_dict[characteristic_json["value"]["termSource"]],
-                            term_accession=characteristic_json["value"]["termAccession"],
-                            comments=get_comments(characteristic_json["value"])
-                        ),
+                        value=get_annotation_value(characteristic_json["value"]),
                         comments=get_comments(characteristic_json)
                     )
                     material.characteristics.append(characteristic)
                 assay.other_material.append(material)
                 other_materials_dict[material.id] = material
+            assay_processes = []
             for assay_process_json in assay_json["processSequence"]:
                 process = Process(
                     id_=assay_process_json["@id"],
@@ -560,46 +542,6 @@ def load(fp):
                     process.name = assay_process_json["name"]
                 elif process.executes_protocol.protocol_type.term == "data normalization":
                     process.name = assay_process_json["name"]
-                for input_json in assay_process_json["inputs"]:
-                    input_ = None
-                    try:
-                        input_ = samples_dict[input_json["@id"]]
-                    except KeyError:
-                        pass
-                    finally:
-                        try:
-                            input_ = other_materials_dict[input_json["@id"]]
-                        except KeyError:
-                            pass
-                        finally:
-                            try:
-                                input_ = data_dict[input_json["@id"]]
-                            except KeyError:
-                                pass
-                    if input_ is None:
-                        raise IOError("Could not find input node in samples or materials or data dicts: " +
-                                      input_json["@id"])
-                    process.inputs.append(input_)
-                for output_json in assay_process_json["outputs"]:
-                    output = None
-                    try:
-                        output = samples_dict[output_json["@id"]]
-                    except KeyError:
-                        pass
-                    finally:
-                        try:
-                            output = other_materials_dict[output_json["@id"]]
-                        except KeyError:
-                            pass
-                        finally:
-                                try:
-                                    output = data_dict[output_json["@id"]]
-                                except KeyError:
-                                    pass
-                    if output is None:
-                        raise IOError("Could not find output node in samples or materials or data dicts: " +
-                                      output_json["@id"])
-                    process.outputs.append(output)
                 for parameter_value_json in assay_process_json["parameterValues"]:
                     if "category" in parameter_value_json.keys():
                         if parameter_value_json["category"]["@id"] == "#parameter/Array_Design_REF":  # Special case
@@ -619,21 +561,11 @@ def load(fp):
                             process.parameter_values.append(parameter_value)
                     else:
                         log.warning("warning: parameter category not found for instance {}".format(parameter_json))
-                assay.process_sequence.append(process)
-                process_dict[process.id] = process
-
-                for assay_process_json in assay_json["processSequence"]:  # 2nd pass
-                    try:
-                        prev_proc = assay_process_json["previousProcess"]["@id"]
-                        process_dict[assay_process_json["@id"]].prev_process = process_dict[prev_proc]
-                    except KeyError:
-                        pass
-
-                    try:
-                        next_proc = assay_process_json["nextProcess"]["@id"]
-                        process_dict[assay_process_json["@id"]].next_process = process_dict[next_proc]
-                    except KeyError:
-                        pass
+                assay_processes.append(process)
+            link_processes(assay_json["processSequence"], assay_processes,
+                           ChainMap(data_dict, other_materials_dict, samples_dict),
+                           "samples or materials or data dicts")
+            assay.process_sequence.extend(assay_processes)
 
             study.assays.append(assay)
         investigation.studies.append(study)
@@ -678,10 +610,140 @@ def get_io_ids_in_process_sequence(study_json):
                                  all_process_sequences] for elem in iterabl]
 
 
-def check_material_ids_declared_used(study_json, id_collector_func):
+class ISAJSONStudyIndex(object):
+    """Holds the @ids declared and used in a study of an ISA-JSON document,
+    collected in a single pass over its materials, protocols, factors and
+    process sequences, so that the rules comparing them run in linear time.
+
+    The lists keep the order in which the get_*_ids functions return the
+    same @ids.
+    """
+
+    def __init__(self, study_json):
+        self.study_json = study_json
+        # sources, samples, other materials and data files by @id
+        self.nodes = dict()
+        self.source_ids = list()
+        self.sample_ids = list()
+        self.material_ids = list()
+        self.data_file_ids = list()
+        self.io_ids = list()
+        self.protocol_ids = list()
+        self.protocol_ids_used = list()
+        self.parameter_ids = list()
+        self.parameter_ids_used = list()
+        self.factor_ids = list()
+        self.factor_ids_used = list()
+        self.unit_ids = list()
+        self.unit_ids_used = list()
+        self.characteristic_category_ids = list()
+        self.characteristic_category_ids_used = list()
+        # the processes of the study and of each assay by @id, which the
+        # previousProcess and nextProcess links of the sequence refer to
+        self.study_processes = dict()
+        self.assay_processes = list()
+
+        factor_value_unit_ids = list()
+        for material_json in study_json["materials"]["sources"] + study_json["materials"]["samples"]:
+            for characteristic_json in material_json["characteristics"]:
+                self.characteristic_category_ids_used.append(characteristic_json["category"]["@id"])
+                if "unit" in characteristic_json.keys():
+                    self.unit_ids_used.append(characteristic_json["unit"]["@id"])
+        for source_json in study_json["materials"]["sources"]:
+            self.source_ids.append(source_json["@id"])
+            self.nodes[source_json["@id"]] = source_json
+        for sample_json in study_json["materials"]["samples"]:
+            self.sample_ids.append(sample_json["@id"])
+            self.nodes[sample_json["@id"]] = sample_json
+            for factor_value_json in sample_json["factorValues"]:
+                self.factor_ids_used.append(factor_value_json["category"]["@id"])
+                if "unit" in factor_value_json.keys():
+                    factor_value_unit_ids.append(factor_value_json["unit"]["@id"])
+        self.unit_ids_used.extend(factor_value_unit_ids)
+        for protocol_json in study_json["protocols"]:
+            self.protocol_ids.append(protocol_json["@id"])
+            self.parameter_ids.extend(parameter_json["@id"] for parameter_json in protocol_json["parameters"])
+        self.factor_ids.extend(factor_json["@id"] for factor_json in study_json["factors"])
+        self.unit_ids.extend(get_unit_category_ids(study_json))
+        self.characteristic_category_ids.extend(get_characteristic_category_ids(study_json))
+        self.study_processes = self._add_process_sequence(study_json["processSequence"])
+
+        for assay_json in study_json["assays"]:
+            self.unit_ids.extend(get_unit_category_ids(assay_json))
+            self.characteristic_category_ids.extend(get_characteristic_category_ids(assay_json))
+            for material_json in assay_json["materials"]["samples"]:
+                if "characteristics" in material_json.keys():
+                    self.characteristic_category_ids_used.extend(
+                        characteristic_json["category"]["@id"] for characteristic_json in
+                        material_json["characteristics"])
+            for material_json in assay_json["materials"]["otherMaterials"]:
+                self.material_ids.append(material_json["@id"])
+                self.nodes[material_json["@id"]] = material_json
+                if "characteristics" in material_json.keys():
+                    for characteristic_json in material_json["characteristics"]:
+                        self.characteristic_category_ids_used.append(characteristic_json["category"]["@id"])
+                        if "unit" in characteristic_json.keys():
+                            self.unit_ids_used.append(characteristic_json["unit"]["@id"])
+            for data_file_json in assay_json["dataFiles"]:
+                self.data_file_ids.append(data_file_json["@id"])
+                self.nodes[data_file_json["@id"]] = data_file_json
+            self.assay_processes.append(self._add_process_sequence(assay_json["processSequence"]))
+
+        self._declared_ids = {
+            get_source_ids: self.source_ids,
+            get_sample_ids: self.sample_ids,
+            get_material_ids: self.material_ids,
+            get_data_file_ids: self.data_file_ids
+        }
+
+    def _add_process_sequence(self, process_sequence_json):
+        processes = dict()
+        for process_json in process_sequence_json:
+            # the first process with an @id is the one a link refers to
+            processes.setdefault(process_json["@id"], process_json)
+            self.io_ids.extend(input_json["@id"] for input_json in process_json["inputs"])
+            self.io_ids.extend(output_json["@id"] for output_json in process_json["outputs"])
+            try:
+                self.protocol_ids_used.append(process_json["executesProtocol"]["@id"])
+            except KeyError:
+                pass
+            for parameter_value_json in process_json["parameterValues"]:
+                self.parameter_ids_used.append(parameter_value_json["category"]["@id"])
+                if "unit" in parameter_value_json.keys():
+                    self.unit_ids_used.append(parameter_value_json["unit"]["@id"])
+        return processes
+
+    def declared_ids(self, id_collector_func):
+        """Gets the @ids that one of get_source_ids, get_sample_ids,
+        get_material_ids or get_data_file_ids collects from the study
+
+        :param id_collector_func: The function collecting the @ids
+        :return: List of @ids
+        """
+        try:
+            return self._declared_ids[id_collector_func]
+        except KeyError:
+            return id_collector_func(self.study_json)
+
+
+class ISAJSONIndex(object):
+    """Indexes an ISA-JSON document for the validation rules: the @ids of
+    each of its studies in an ISAJSONStudyIndex, and all of its ontology
+    annotations, walked once for rules 3007, 3009 and 3010.
+    """
+
+    def __init__(self, isa_json):
+        self.studies = [ISAJSONStudyIndex(study_json) for study_json in isa_json["studies"]]
+        self.annotations = list()
+        walk_and_get_annotations(isa_json, self.annotations)
+
+
+def check_material_ids_declared_used(study_json, id_collector_func, index=None):
     """Used for rules 1015-1018"""
-    node_ids = id_collector_func(study_json)
-    io_ids_in_process_sequence = get_io_ids_in_process_sequence(study_json)
+    if index is None:
+        index = ISAJSONStudyIndex(study_json)
+    node_ids = index.declared_ids(id_collector_func)
+    io_ids_in_process_sequence = index.io_ids
     is_node_ids_used = set(node_ids).issubset(set(io_ids_in_process_sequence))
     if not is_node_ids_used:
         warnings.append({
@@ -693,13 +755,13 @@ def check_material_ids_declared_used(study_json, id_collector_func):
                                                                                   io_ids_in_process_sequence))
 
 
-def check_material_ids_not_declared_used(study_json):
+def check_material_ids_not_declared_used(study_json, index=None):
     """Used for rules 1002-1005"""
-    node_ids = get_source_ids(study_json) + get_sample_ids(study_json) + get_material_ids(study_json) + \
-               get_data_file_ids(study_json)
-    io_ids_in_process_sequence = get_io_ids_in_process_sequence(study_json)
-    if len(set(io_ids_in_process_sequence)) - len(set(node_ids)) > 0:
-        diff = set(io_ids_in_process_sequence) - set(node_ids)
+    if index is None:
+        index = ISAJSONStudyIndex(study_json)
+    io_ids_in_process_sequence = set(index.io_ids)
+    if len(io_ids_in_process_sequence) - len(index.nodes) > 0:
+        diff = io_ids_in_process_sequence - index.nodes.keys()
         errors.append({
             "message": "Missing Material",
             "supplemental": "Inputs/outputs in {}  not found in sources, samples, materials or datafiles "
@@ -710,9 +772,14 @@ def check_material_ids_not_declared_used(study_json):
                      "declared".format(list(diff)))
 
 
-def check_process_sequence_links(process_sequence_json):
-    """Used for rule 1006"""
-    process_ids = [process["@id"] for process in process_sequence_json]
+def check_process_sequence_links(process_sequence_json, processes=None):
+    """Used for rule 1006
+
+    :param process_sequence_json: The processSequence of a study or assay
+    :param processes: The processes of the sequence by @id, as indexed by
+    ISAJSONStudyIndex
+    """
+    process_ids = processes if processes is not None else {process["@id"] for process in process_sequence_json}
     for process in process_sequence_json:
         try:
             if process["previousProcess"]["@id"] not in process_ids:
@@ -745,23 +812,12 @@ def get_study_protocol_ids(study_json):
     return [protocol["@id"] for protocol in study_json["protocols"]]
 
 
-def check_process_protocol_ids_usage(study_json):
+def check_process_protocol_ids_usage(study_json, index=None):
     """Used for rules 1007 and 1019"""
-    protocol_ids_declared = get_study_protocol_ids(study_json)
-    process_sequence = study_json["processSequence"]
-    protocol_ids_used = list()
-    for process in process_sequence:
-        try:
-            protocol_ids_used.append(process["executesProtocol"]["@id"])
-        except KeyError:
-            pass
-    for assay in study_json["assays"]:
-        process_sequence = assay["processSequence"]
-        for process in process_sequence:
-            try:
-                protocol_ids_used.append(process["executesProtocol"]["@id"])
-            except KeyError:
-                pass
+    if index is None:
+        index = ISAJSONStudyIndex(study_json)
+    protocol_ids_declared = index.protocol_ids
+    protocol_ids_used = index.protocol_ids_used
     if len(set(protocol_ids_used) - set(protocol_ids_declared)) > 0:
         diff = set(protocol_ids_used) - set(protocol_ids_declared)
         errors.append({
@@ -802,10 +858,12 @@ def get_parameter_value_parameter_ids(study_json):
     return study_pv_parameter_ids
 
 
-def check_protocol_parameter_ids_usage(study_json):
+def check_protocol_parameter_ids_usage(study_json, index=None):
     """Used for rule 1009 and 1020"""
-    protocols_declared = get_study_protocols_parameter_ids(study_json) + ["#parameter/Array_Design_REF"] # + special case
-    protocols_used = get_parameter_value_parameter_ids(study_json)
+    if index is None:
+        index = ISAJSONStudyIndex(study_json)
+    protocols_declared = index.parameter_ids + ["#parameter/Array_Design_REF"]  # + special case
+    protocols_used = index.parameter_ids_used
     if len(set(protocols_used) - set(protocols_declared)) > 0:
         diff = set(protocols_used) - set(protocols_declared)
         errors.append({
@@ -845,19 +903,18 @@ def get_characteristic_category_ids_in_assay_materials(assay_json):
               assay_json["materials"]["samples"] + assay_json["materials"]["otherMaterials"]] for elem in iterabl]
 
 
-def check_characteristic_category_ids_usage(studies_json):
-    """Used for rule 1013"""
+def check_characteristic_category_ids_usage(studies_json, index=None):
+    """Used for rule 1013
+
+    :param studies_json: The studies of an ISA-JSON document
+    :param index: The ISAJSONIndex of the document
+    """
+    study_indexes = index.studies if index is not None else [ISAJSONStudyIndex(x) for x in studies_json]
     characteristic_categories_declared = list()
     characteristic_categories_used = list()
-    for study_json in studies_json:
-        characteristic_categories_declared += get_characteristic_category_ids(study_json)
-        for assay in study_json["assays"]:
-            characteristic_categories_declared_in_assay = get_characteristic_category_ids(assay)
-            characteristic_categories_declared += characteristic_categories_declared_in_assay
-        characteristic_categories_used += get_characteristic_category_ids_in_study_materials(study_json)
-        for assay in study_json["assays"]:
-            characteristic_categories_used_in_assay = get_characteristic_category_ids_in_assay_materials(assay)
-            characteristic_categories_used += characteristic_categories_used_in_assay
+    for study_index in study_indexes:
+        characteristic_categories_declared += study_index.characteristic_category_ids
+        characteristic_categories_used += study_index.characteristic_category_ids_used
     if len(set(characteristic_categories_used) - set(characteristic_categories_declared)) > 0:
         diff = set(characteristic_categories_used) - set(characteristic_categories_declared)
         errors.append({
@@ -889,10 +946,12 @@ def get_study_factor_ids_in_sample_factor_values(study_json):
                                  study_json["materials"]["samples"]] for elem in iterabl]
 
 
-def check_study_factor_usage(study_json):
+def check_study_factor_usage(study_json, index=None):
     """Used for rules 1008 and 1021"""
-    factors_declared = get_study_factor_ids(study_json)
-    factors_used = get_study_factor_ids_in_sample_factor_values(study_json)
+    if index is None:
+        index = ISAJSONStudyIndex(study_json)
+    factors_declared = index.factor_ids
+    factors_used = index.factor_ids_used
     if len(set(factors_used) - set(factors_declared)) > 0:
         diff = set(factors_used) - set(factors_declared)
         errors.append({
@@ -954,17 +1013,12 @@ def get_assay_unit_category_ids_in_materials_and_processes(assay_json):
     return [x for x in assay_characteristics_units_used + parameter_value_units_used if x is not None]
 
 
-def check_unit_category_ids_usage(study_json):
+def check_unit_category_ids_usage(study_json, index=None):
     """Used for rules 1014 and 1022"""
-    log.info("Getting units declared...")
-    units_declared = get_unit_category_ids(study_json)
-    for assay in study_json["assays"]:
-        units_declared.extend(get_unit_category_ids(assay))
-    log.info("Getting units used (study)...")
-    units_used = get_study_unit_category_ids_in_materials_and_processes(study_json)
-    log.info("Getting units used (assay)...")
-    for assay in study_json["assays"]:
-        units_used.extend(get_assay_unit_category_ids_in_materials_and_processes(assay))
+    if index is None:
+        index = ISAJSONStudyIndex(study_json)
+    units_declared = index.unit_ids
+    units_used = index.unit_ids_used
     log.info("Comparing units declared vs units used...")
     if len(set(units_used) - set(units_declared)) > 0:
         diff = set(units_used) - set(units_declared)
@@ -997,22 +1051,54 @@ def check_utf8(fp):
             raise SystemError()
 
 
+@functools.lru_cache(maxsize=None)
+def _compile_schema(schema_path):
+    """Load a schema together with the schemas next to it that it refers to,
+    once per process
+
+    :param schema_path: Absolute path to the schema
+    :return: A tuple of the schema and a store of all the schemas in its
+    directory by URI, to resolve its $refs from
+    """
+    store = dict()
+    for path in glob.glob(os.path.join(os.path.dirname(schema_path), "*.json")):
+        with open(path) as fp:
+            store["file://" + path] = json.load(fp)
+    schema_uri = "file://" + schema_path
+    if schema_uri not in store:
+        with open(schema_path) as fp:
+            store[schema_uri] = json.load(fp)
+    return store[schema_uri], store
+
+
+def get_schema_validator(schema_path):
+    """Get a Draft4Validator for a schema, whose schemas are only read from
+    disk the first time
+
+    :param schema_path: Path to the schema
+    :return: A Draft4Validator
+    """
+    schema_path = os.path.abspath(schema_path)
+    schema, store = _compile_schema(schema_path)
+    # a resolver keeps the scope of the $ref being resolved, so each
+    # validation gets its own
+    resolver = RefResolver("file://" + schema_path, schema, store=store)
+    return Draft4Validator(schema, resolver=resolver)
+
+
 def check_isa_schemas(isa_json, investigation_schema_path):
     """Used for rule 0003 and 4003"""
-    try:
-        with open(investigation_schema_path) as fp:
-            investigation_schema = json.load(fp)
-            resolver = RefResolver("file://" + investigation_schema_path, investigation_schema)
-            validator = Draft4Validator(investigation_schema, resolver=resolver)
-            validator.validate(isa_json)
-    except ValidationError as ve:
+    valid = True
+    for ve in get_schema_validator(investigation_schema_path).iter_errors(isa_json):
+        valid = False
         errors.append({
             "message": "Invalid JSON against ISA-JSON schemas",
             "supplemental": str(ve),
             "code": 3
         })
-        log.fatal("(F) The JSON does not validate against the provided ISA-JSON schemas!")
         log.fatal("Fatal error: " + str(ve))
+    if not valid:
+        log.fatal("(F) The JSON does not validate against the provided ISA-JSON schemas!")
         raise SystemError("(F) The JSON does not validate against the provided ISA-JSON schemas!")
 
 
@@ -1186,21 +1272,23 @@ def walk_and_get_annotations(isa_json, collector):
     """
     #  Walk JSON tree looking for ontology annotation structures in the JSON
     if isinstance(isa_json, dict):
-        if set(isa_json.keys()) == {"annotationValue", "termAccession", "termSource"} or \
-                        set(isa_json.keys()) == {"@id", "annotationValue", "termAccession", "termSource"}:
+        if isa_json.keys() == _ANNOTATION_KEYS or isa_json.keys() == _IDENTIFIED_ANNOTATION_KEYS:
             collector.append(isa_json)
-        for i in isa_json.keys():
-            walk_and_get_annotations(isa_json[i], collector)
+        for i in isa_json.values():
+            if isinstance(i, (dict, list)):
+                walk_and_get_annotations(i, collector)
     elif isinstance(isa_json, list):
         for j in isa_json:
-            walk_and_get_annotations(j, collector)
+            if isinstance(j, (dict, list)):
+                walk_and_get_annotations(j, collector)
 
 
-def check_term_source_refs(isa_json):
+def check_term_source_refs(isa_json, index=None):
     """Used for rules 3007 and 3009"""
+    if index is None:
+        index = ISAJSONIndex(isa_json)
     term_sources_declared = get_ontology_source_refs(isa_json)
-    collector = list()
-    walk_and_get_annotations(isa_json, collector)
+    collector = index.annotations
     term_sources_used = [annotation["termSource"] for annotation in collector if annotation["termSource"] != ""]
     if len(set(term_sources_used) - set(term_sources_declared)) > 0:
         diff = set(term_sources_used) - set(term_sources_declared)
@@ -1222,10 +1310,11 @@ def check_term_source_refs(isa_json):
                     .format(list(diff)))
 
 
-def check_term_accession_used_no_source_ref(isa_json):
+def check_term_accession_used_no_source_ref(isa_json, index=None):
     """Used for rule 3010"""
-    collector = list()
-    walk_and_get_annotations(isa_json, collector)
+    if index is None:
+        index = ISAJSONIndex(isa_json)
+    collector = index.annotations
     terms_using_accession_no_source_ref = [
         annotation for annotation in collector if annotation["termAccession"] != "" and annotation["termSource"] == ""
     ]
@@ -1279,16 +1368,19 @@ def check_measurement_technology_types(assay_json, configs):
                   .format(measurement_type, technology_type))
 
 
-def check_study_and_assay_graphs(study_json, configs):
+def check_study_and_assay_graphs(study_json, configs, index=None):
+    """Used for rule 4004"""
 
-    def check_assay_graph(process_sequence_json, config):
+    def check_assay_graph(process_sequence_json, processes, config):
         list_of_last_processes_in_sequence = [i for i in process_sequence_json if "nextProcess" not in i.keys()]
         log.info("Checking against assay protocol sequence configuration {}".format(config["description"]))
         config_protocol_sequence = [i["protocol"] for i in config["protocols"]]
         for process in list_of_last_processes_in_sequence:  # build graphs backwards
             assay_graph = list()
+            visited = set()
             try:
-                while True:
+                while id(process) not in visited:
+                    visited.add(id(process))
                     process_graph = list()
                     if "outputs" in process.keys():
                         outputs = process["outputs"]
@@ -1306,7 +1398,7 @@ def check_study_and_assay_graphs(study_json, configs):
                                 process_graph.append(input_id)
                     process_graph.reverse()
                     assay_graph.append(process_graph)
-                    process = [i for i in process_sequence_json if i["@id"] == process["previousProcess"]["@id"]][0]
+                    process = processes[process["previousProcess"]["@id"]]
                     if process['@id'] == process["previousProcess"]["@id"]:
                         log.fatal("Previous process is same as current process, which forms a loop!!!!! Cannot find start node!!!!!!!")
                         break
@@ -1334,17 +1426,19 @@ def check_study_and_assay_graphs(study_json, configs):
                 log.warning("Configuration protocol sequence {} does not match study graph found in {}"
                             .format(config_protocol_sequence, assay_protocol_sequence))
 
+    if index is None:
+        index = ISAJSONStudyIndex(study_json)
     protocols_and_types = dict([(i["@id"], i["protocolType"]["annotationValue"]) for i in study_json["protocols"]])
     # first check study graph
     log.info("Loading configuration (study)")
     config = configs["study"]
-    check_assay_graph(study_json["processSequence"], config)
-    for assay_json in study_json["assays"]:
+    check_assay_graph(study_json["processSequence"], index.study_processes, config)
+    for assay_json, assay_processes in zip(study_json["assays"], index.assay_processes):
         m = assay_json["measurementType"]["annotationValue"]
         t = assay_json["technologyType"]["annotationValue"]
         log.info("Loading configuration ({}, {})".format(m, t))
         config = configs[(m, t)]
-        check_assay_graph(assay_json["processSequence"], config)
+        check_assay_graph(assay_json["processSequence"], assay_processes, config)
 
 
 def check_study_groups(study_or_assay):
@@ -1408,46 +1502,48 @@ def validate(
     handler = logging.StreamHandler(stream)
     log.addHandler(handler)
     try:
-        global errors
-        errors = list()
-        global warnings
-        warnings = list()
+        errors.reset()
+        warnings.reset()
+        info.reset()
         log.info("Checking if encoding is UTF8")
         check_utf8(fp=fp)  # Rule 0010
         log.info("Loading json from " + fp.name)
         isa_json = json.load(fp=fp)  # Rule 0002
         log.info("Validating JSON against schemas using Draft4Validator")
-        check_isa_schemas(isa_json=isa_json,
-                          investigation_schema_path=os.path.join(BASE_DIR, "resources", "schemas", base_schemas_dir,
-                                                                 "core", "investigation_schema.json"))  # Rule 0003
+        investigation_schema_path = os.path.join(BASE_DIR, "resources", "schemas", base_schemas_dir, "core",
+                                                 "investigation_schema.json")
+        check_isa_schemas(isa_json=isa_json, investigation_schema_path=investigation_schema_path)  # Rule 0003
+        log.info("Indexing the JSON...")
+        index = ISAJSONIndex(isa_json)
+        studies = list(zip(isa_json["studies"], index.studies))
         log.info("Checking if material IDs used are declared...")
-        for study_json in isa_json["studies"]:
-            check_material_ids_not_declared_used(study_json)  # Rules 1002-1005
-        for study_json in isa_json["studies"]:
-            check_material_ids_declared_used(study_json, get_source_ids)  # Rule 1015
-            check_material_ids_declared_used(study_json, get_sample_ids)  # Rule 1016
-            check_material_ids_declared_used(study_json, get_material_ids)  # Rule 1017
-            check_material_ids_declared_used(study_json, get_data_file_ids)  # Rule 1018
+        for study_json, study_index in studies:
+            check_material_ids_not_declared_used(study_json, index=study_index)  # Rules 1002-1005
+        for study_json, study_index in studies:
+            check_material_ids_declared_used(study_json, get_source_ids, index=study_index)  # Rule 1015
+            check_material_ids_declared_used(study_json, get_sample_ids, index=study_index)  # Rule 1016
+            check_material_ids_declared_used(study_json, get_material_ids, index=study_index)  # Rule 1017
+            check_material_ids_declared_used(study_json, get_data_file_ids, index=study_index)  # Rule 1018
         log.info("Checking characteristic categories usage...")
-        check_characteristic_category_ids_usage(isa_json["studies"])  # Rules 1013 and 1022
+        check_characteristic_category_ids_usage(isa_json["studies"], index=index)  # Rules 1013 and 1022
         log.info("Checking study factor usage...")
-        for study_json in isa_json["studies"]:
-            check_study_factor_usage(study_json)  # Rules 1008 and 1021
+        for study_json, study_index in studies:
+            check_study_factor_usage(study_json, index=study_index)  # Rules 1008 and 1021
         log.info("Checking protocol parameter usage...")
-        for study_json in isa_json["studies"]:
-            check_protocol_parameter_ids_usage(study_json)  # Rules 1009 and 1020
+        for study_json, study_index in studies:
+            check_protocol_parameter_ids_usage(study_json, index=study_index)  # Rules 1009 and 1020
         log.info("Checking unit category usage...")
-        for study_json in isa_json["studies"]:
-            check_unit_category_ids_usage(study_json)  # Rules 1014 and 1022
+        for study_json, study_index in studies:
+            check_unit_category_ids_usage(study_json, index=study_index)  # Rules 1014 and 1022
         log.info("Checking process sequences (study)...")
-        for study_json in isa_json["studies"]:
-            check_process_sequence_links(study_json["processSequence"])  # Rule 1006
+        for study_json, study_index in studies:
+            check_process_sequence_links(study_json["processSequence"], study_index.study_processes)  # Rule 1006
             log.info("Checking process sequences (assay)...")
-            for assay_json in study_json["assays"]:
-                check_process_sequence_links(assay_json["processSequence"])  # Rule 1006
+            for assay_json, assay_processes in zip(study_json["assays"], study_index.assay_processes):
+                check_process_sequence_links(assay_json["processSequence"], assay_processes)  # Rule 1006
         log.info("Checking process protocol usage...")
-        for study_json in isa_json["studies"]:
-            check_process_protocol_ids_usage(study_json)  # Rules 1007 and 1019
+        for study_json, study_index in studies:
+            check_process_protocol_ids_usage(study_json, index=study_index)  # Rules 1007 and 1019
         log.info("Checking date formats...")
         check_date_formats(isa_json)  # Rule 3001
         log.info("Checking DOI formats...")
@@ -1465,9 +1561,9 @@ def validate(
         log.info("Checking ontology sources...")
         check_ontology_sources(isa_json)  # Rule 3008
         log.info("Checking term source REFs...")
-        check_term_source_refs(isa_json)  # Rules 3007 and 3009
+        check_term_source_refs(isa_json, index=index)  # Rules 3007 and 3009
         log.info("Checking missing term source REFs...")
-        check_term_accession_used_no_source_ref(isa_json)  # Rule 3010
+        check_term_accession_used_no_source_ref(isa_json, index=index)  # Rule 3010
         log.info("Loading configurations from " + config_dir)
         configs = load_config(config_dir)  # Rule 4001
         log.info("Checking measurement and technology types...")
@@ -1475,26 +1571,21 @@ def validate(
             for assay_json in study_json["assays"]:
                 check_measurement_technology_types(assay_json, configs)  # Rule 4002
         log.info("Checking against configuration schemas...")
-        check_isa_schemas(
-            isa_json=isa_json,
-            investigation_schema_path=os.path.join(
-                default_isa_json_schemas_dir,
-                "investigation_schema.json"
-            )
-        )  # Rule 4003
+        configuration_schema_path = os.path.join(default_isa_json_schemas_dir, "investigation_schema.json")
+        # the JSON is already valid against the schemas if they are the same
+        if os.path.abspath(configuration_schema_path) != os.path.abspath(investigation_schema_path):
+            check_isa_schemas(isa_json=isa_json, investigation_schema_path=configuration_schema_path)  # Rule 4003
         # if all ERRORS are resolved, then try and validate against configuration
         handler.flush()
         if "(E)" in stream.getvalue():
             log.fatal("(F) There are some errors that mean validation against configurations cannot proceed.")
             return stream
-        fp.seek(0)  # reset file pointer
         log.info("Checking study and assay graphs...")
-        for study_json in isa_json["studies"]:
-            check_study_and_assay_graphs(study_json, configs)  # Rule 4004
-        fp.seek(0)
+        for study_json, study_index in studies:
+            check_study_and_assay_graphs(study_json, configs, index=study_index)  # Rule 4004
         # try load and do study groups check
         log.info("Checking study groups...")
-        isa = load(fp)
+        isa = _load_investigation(isa_json)
         for study in isa.studies:
             check_study_groups(study)
             for assay in study.assays:
@@ -1526,16 +1617,31 @@ def validate(
     finally:
         handler.flush()
         return {
-            "errors": errors,
-            "warnings": warnings,
+            "errors": errors.get(),
+            "warnings": warnings.get(),
             "validation_finished": True
         }
 
 
-def batch_validate(json_file_list):
+def _validate_json_file(json_file):
+    """ Validate an ISA-JSON file, as done by batch_validate
+        :param json_file: File path to the ISA-JSON file to validate
+        :return: Tuple of the file name and the report, or None if the file is not found
+        """
+    log.info("***Validating {}***\n".format(json_file))
+    if not os.path.isfile(json_file):
+        log.warning("Could not find ISA-JSON file, skipping {}".format(json_file))
+        return None
+    with open(json_file) as fp:
+        return fp.name, validate(fp)
+
+
+def batch_validate(json_file_list, workers=None):
     """ Validate a batch of ISA-JSON files
         :param json_file_list: List of file paths to the ISA-JSON files to validate
-        :return: Dict of reports
+        :param workers: Number of worker processes to validate the files with. The files are validated one after
+        another if it is None or 1
+        :return: Dict of reports, in the order of json_file_list
 
         Example:
             from isatools import isajson
@@ -1543,23 +1649,18 @@ def batch_validate(json_file_list):
                 "/path/to/study1.json",
                 "/path/to/study2.json"
             ]
-            my_reports = isajson.batch_validate(my_jsons)
+            my_reports = isajson.batch_validate(my_jsons, workers=4)
         """
     batch_report = {
         "batch_report": []
     }
-    for json_file in json_file_list:
-        log.info("***Validating {}***\n".format(json_file))
-        if not os.path.isfile(json_file):
-            log.warning("Could not find ISA-JSON file, skipping {}".format(json_file))
-        else:
-            with open(json_file) as fp:
-                batch_report["batch_report"].append(
-                    {
-                        "filename": fp.name,
-                        "report": validate(fp)
-                    }
-                )
+    for filename, report in map_validate(_validate_json_file, json_file_list, workers=workers):
+        batch_report["batch_report"].append(
+            {
+                "filename": filename,
+                "report": report
+            }
+        )
     return batch_report
 
 
@@ -7,6 +7,7 @@ isatools.model package.
 """
 from __future__ import absolute_import
 import csv
+import functools
 import glob
 import io
 import json
@@ -18,6 +19,8 @@ import re
 import shutil
 import tempfile
 from bisect import bisect_left, bisect_right
+from collections import defaultdict
+from hashlib import md5
 from io import StringIO
 from itertools import tee, zip_longest
 
@@ -30,6 +33,7 @@ from progressbar import ETA, Bar, ProgressBar, SimpleProgress
 
 from isatools import logging as isa_logging
 from isatools.io import isatab_configurator
+from isatools.validation import ValidationMessages, map_validate
 from isatools.model import (
     Assay,
     Characteristic,
@@ -39,6 +43,7 @@ from isatools.model import (
     Investigation,
     Material,
     OntologyAnnotation,
+    OntologyAnnotationTable,
     OntologySource,
     ParameterValue,
     Person,
@@ -54,7 +59,7 @@ from isatools.model import (
     load_protocol_types_info
 )
 from isatools.constants import SYNONYMS
-from isatools.utils import utf8_text_file_open
+from isatools import utils
 
 log = logging.getLogger('isatools')
 
@@ -190,7 +195,7 @@ class TransposedTabParser(object):
         corresponding to the column headers
         """
         try:
-            with utf8_text_file_open(filename) as unicode_file:
+            with utils.utf8_text_file_open(filename) as unicode_file:
                 ttable_reader = csv.reader(
                     filter(lambda r: r[0] != '#', unicode_file),
                     dialect='excel-tab')
@@ -213,9 +218,9 @@ class TransposedTabParser(object):
         return self._ttable_dict
 
 
-validator_errors = []
-validator_warnings = []
-validator_info = []
+validator_errors = ValidationMessages('errors')
+validator_warnings = ValidationMessages('warnings')
+validator_info = ValidationMessages('info')
 
 # REGEXES
 _RX_I_FILE_NAME = re.compile(r'i_(.*?)\.txt')
@@ -245,9 +250,20 @@ _LABELS_ASSAY_NODES = ['Assay Name', 'MS Assay Name', "NMR Assay Name",
                        'Hybridization Assay Name', 'Scan Name',
                        'Data Transformation Name', 'Normalization Name']
 
+# values of the investigation file read as missing or boolean, as pandas
+# read_csv does by default
+_INVESTIGATION_NA_VALUES = frozenset([
+    '', '#N/A', '#N/A N/A', '#NA', '-1.#IND', '-1.#QNAN', '-NaN', '-nan',
+    '1.#IND', '1.#QNAN', '<NA>', 'N/A', 'NA', 'NULL', 'NaN', 'n/a', 'nan',
+    'null'])
+_INVESTIGATION_BOOL_VALUES = {
+    'True': True, 'TRUE': True, 'true': True,
+    'False': False, 'FALSE': False, 'false': False}
+
 
 def dump(isa_obj, output_path, i_file_name='i_investigation.txt',
-         skip_dump_tables=False, write_factor_values_in_assay_table=False):
+         skip_dump_tables=False, write_factor_values_in_assay_table=False,
+         stream_tables=False):
     """Serializes ISA objects to ISA-Tab
 
     :param isa_obj: An ISA Investigation object
@@ -257,6 +273,8 @@ def dump(isa_obj, output_path, i_file_name='i_investigation.txt',
     study sample table files and assay table files
     :param write_factor_values_in_assay_table: Boolean flag indicating whether
     or not to write Factor Values in the assay table files
+    :param stream_tables: Boolean flag on whether to write the study and assay
+    table files row by row as the paths are found, for very large tables
     :return: None
     """
 
@@ -1046,9 +1064,11 @@ def dump(isa_obj, output_path, i_file_name='i_investigation.txt',
     if skip_dump_tables:
         pass
     else:
-        write_study_table_files(investigation, output_path)
+        write_study_table_files(
+            investigation, output_path, stream=stream_tables)
         write_assay_table_files(
-            investigation, output_path, write_factor_values_in_assay_table)
+            investigation, output_path, write_factor_values_in_assay_table,
+            stream=stream_tables)
 
     fp.close()
     return investigation
@@ -1115,16 +1135,70 @@ def _longest_path_and_attrs(paths, indexes):
     return longest[1]
 
 
+def _path_suffixes(G, start, is_end, memo):
+    """Collect the paths from a node to every end node below it, sharing the
+    result with any other start node that reaches the same part of the graph
+
+    Each path is held as a linked chain of (node, next_link, end) tuples so
+    that a suffix is built only once however many paths go through it.
+
+    :param G: A DiGraph of all the assay graphs from the process sequences
+    :param start: The node to collect the paths from
+    :param is_end: A function telling whether a node ends a path
+    :param memo: A dict of node to already collected links
+    :return: The list of links from start in depth-first order, or None if
+    a cycle is reached from start
+    """
+    successors = G.succ
+    stack = [start]
+    entered = set()
+    while stack:
+        node = stack[-1]
+        if node in memo:
+            stack.pop()
+            continue
+        children = successors[node]
+        pending = [x for x in children if x not in memo]
+        if pending:
+            if node in entered or not entered.isdisjoint(pending):
+                return None
+            entered.add(node)
+            stack.extend(pending)
+            continue
+        stack.pop()
+        links = [(node, None, node)] if is_end(node) else []
+        for child in children:
+            links += [(node, link, link[2]) for link in memo[child]]
+        memo[node] = links
+    return memo[start]
+
+
+def _unwind_path(link):
+    """Turn a linked chain built by _path_suffixes into a list of nodes
+
+    :param link: The first link of the path
+    :return: A list of nodes
+    """
+    path = []
+    while link is not None:
+        path.append(link[0])
+        link = link[1]
+    return path
+
+
 def _all_end_to_end_paths(G, start_nodes):
-    """Find all the end-to-end complete paths using a networkx algorithm that
-    uses a modified depth-first search to generate the paths
+    """Find all the end-to-end complete paths using a single depth-first
+    search in which the paths below each node are worked out only once
+
+    The paths are returned in the same order as _all_end_to_end_paths_nx so
+    that the table files written from them do not change. Graphs with cycles
+    are handed over to _all_end_to_end_paths_nx.
 
     :param G: A DiGraph of all the assay graphs from the process sequences
     :param start_nodes: A list of start nodes
     :return: A list of paths from the start nodes
     """
     # we know graphs start with Source or Sample and end with Process
-    paths = []
     num_start_nodes = len(start_nodes)
     message = 'Calculating for paths for {} start nodes: '.format(
         num_start_nodes)
@@ -1143,6 +1217,82 @@ def _all_end_to_end_paths(G, start_nodes):
                 ETA()]).start()
     else:
         def pbar(x): return x"""
+    try:
+        paths = list(_iter_end_to_end_paths(G, start_nodes))
+    except nx.NetworkXUnfeasible:
+        return _all_end_to_end_paths_nx(G, start_nodes)
+    if len(paths) == 0:
+        log.debug([G.indexes[x].name for x in start_nodes])
+    return paths
+
+
+def _iter_end_to_end_paths(G, start_nodes):
+    """Generate the end-to-end complete paths one start node at a time, in
+    the same order as _all_end_to_end_paths
+
+    :param G: A DiGraph of all the assay graphs from the process sequences
+    :param start_nodes: A list of start nodes
+    :return: A generator of paths from the start nodes
+    :raises NetworkXUnfeasible: if a cycle is reached from a start node
+    """
+    def is_sample_end(x):
+        return isinstance(G.indexes[x], Sample) and len(G.out_edges(x)) == 0
+
+    def is_process_end(x):
+        return isinstance(G.indexes[x], Process) and G.indexes[x].next_process is None
+
+    sample_end_suffixes = dict()
+    process_end_suffixes = dict()
+    for start in start_nodes:
+        node = G.indexes[start]
+        if isinstance(node, Source):
+            # only look for Sample ends if start is a Source
+            is_end, memo = is_sample_end, sample_end_suffixes
+        elif isinstance(node, Sample):
+            # only look for Process ends if start is a Sample
+            is_end, memo = is_process_end, process_end_suffixes
+        else:
+            continue
+        links = _path_suffixes(G, start, is_end, memo)
+        if links is None:
+            raise nx.NetworkXUnfeasible(
+                'Graph contains a cycle reachable from {}'.format(node.name))
+        links_by_end = defaultdict(list)
+        for link in links:
+            if link[2] != start:
+                links_by_end[link[2]].append(link)
+        ends = list(links_by_end)
+        if len(ends) > 1:
+            # visit the ends in the same order as the networkx search would
+            ends = [x for x in nx.algorithms.descendants(G, start) if x in links_by_end]
+        for end in ends:
+            for link in links_by_end[end]:
+                yield _unwind_path(link)
+
+
+def _end_to_end_path_iterator(G, start_nodes):
+    """Get a function that iterates over the end-to-end complete paths from
+    the start nodes anew each time it is called, without holding them all
+
+    :param G: A DiGraph of all the assay graphs from the process sequences
+    :param start_nodes: A list of start nodes
+    :return: A function returning an iterator over the paths
+    """
+    if nx.is_directed_acyclic_graph(G):
+        return lambda: _iter_end_to_end_paths(G, start_nodes)
+    paths = _all_end_to_end_paths_nx(G, start_nodes)
+    return lambda: iter(paths)
+
+
+def _all_end_to_end_paths_nx(G, start_nodes):
+    """Find all the end-to-end complete paths using a networkx algorithm that
+    uses a modified depth-first search to generate the paths
+
+    :param G: A DiGraph of all the assay graphs from the process sequences
+    :param start_nodes: A list of start nodes
+    :return: A list of paths from the start nodes
+    """
+    paths = []
     for start in start_nodes:
         # Find ends
         node = G.indexes[start]
@@ -1162,7 +1312,7 @@ def _all_end_to_end_paths(G, start_nodes):
     return paths
 
 
-def write_study_table_files(inv_obj, output_dir):
+def write_study_table_files(inv_obj, output_dir, stream=False):
     """Writes out study table files according to pattern defined by
 
     Source Name, [ Characteristics[], ... ],
@@ -1174,6 +1324,9 @@ def write_study_table_files(inv_obj, output_dir):
 
     :param inv_obj: An Investigation object containing ISA content
     :param output_dir: A path to a directory to write the ISA-Tab study files
+    :param stream: Boolean flag on whether to write the rows to the files as
+    the paths are found instead of building each table in a DataFrame first,
+    which keeps memory use down on very large tables
     :return: None
     """
     if not isinstance(inv_obj, Investigation):
@@ -1189,9 +1342,16 @@ def write_study_table_files(inv_obj, output_dir):
         columns = []
 
         # start_nodes, end_nodes = _get_start_end_nodes(s_graph)
-        paths = _all_end_to_end_paths(
-            s_graph,
-            [x for x in s_graph.nodes() if isinstance(s_graph.indexes[x], Source)])
+        start_nodes = [x for x in s_graph.nodes() if isinstance(s_graph.indexes[x], Source)]
+        if stream:
+            # the header comes from the paths in the same order as when
+            # writing from a DataFrame, while the rows are written sorted on
+            # the start node names
+            paths = _end_to_end_path_iterator(s_graph, start_nodes)()
+            iter_paths = _end_to_end_path_iterator(s_graph, sorted(
+                start_nodes, key=lambda x: s_graph.indexes[x].name))
+        else:
+            paths = _all_end_to_end_paths(s_graph, start_nodes)
         log.warning(s_graph.nodes())
         sample_in_path_count = 0
         longest_path = _longest_path_and_attrs(paths, s_graph.indexes)
@@ -1236,6 +1396,17 @@ def write_study_table_files(inv_obj, output_dir):
                                        node.factor_values))
 
         omap = get_object_column_map(columns, columns)
+
+        def write_path(df_dict, path):
+            _write_study_path(df_dict, path, s_graph.indexes)
+
+        if stream:
+            _write_table_file_rows(
+                os.path.join(output_dir, study_obj.filename), iter_paths,
+                flatten(omap), columns, _study_table_header(columns),
+                write_path)
+            continue
+
         # load into dictionary
         df_dict = dict(map(lambda k: (k, []), flatten(omap)))
         """if isa_logging.show_pbars:
@@ -1250,52 +1421,7 @@ def write_study_table_files(inv_obj, output_dir):
         for path in paths:
             for k in df_dict.keys():  # add a row per path
                 df_dict[k].extend([""])
-
-            sample_in_path_count = 0
-            for node_index in path:
-                node = s_graph.indexes[node_index]
-                if isinstance(node, Source):
-                    olabel = "Source Name"
-                    df_dict[olabel][-1] = node.name
-                    for c in node.characteristics:
-                        clabel = "{0}.Characteristics[{1}]".format(
-                            olabel, c.category.term)
-                        write_value_columns(df_dict, clabel, c)
-                    for co in node.comments:
-                        colabel = "{0}.Comment[{1}]".format(olabel, co.name)
-                        df_dict[colabel][-1] = co.value
-
-                elif isinstance(node, Process):
-                    olabel = "Protocol REF.{}".format(
-                        node.executes_protocol.name)
-                    df_dict[olabel][-1] = node.executes_protocol.name
-                    for pv in node.parameter_values:
-                        pvlabel = "{0}.Parameter Value[{1}]".format(
-                            olabel, pv.category.parameter_name.term)
-                        write_value_columns(df_dict, pvlabel, pv)
-                    if node.date is not None:
-                        df_dict[olabel + ".Date"][-1] = node.date
-                    if node.performer is not None:
-                        df_dict[olabel + ".Performer"][-1] = node.performer
-                    for co in node.comments:
-                        colabel = "{0}.Comment[{1}]".format(olabel, co.name)
-                        df_dict[colabel][-1] = co.value
-
-                elif isinstance(node, Sample):
-                    olabel = "Sample Name.{}".format(sample_in_path_count)
-                    sample_in_path_count += 1
-                    df_dict[olabel][-1] = node.name
-                    for c in node.characteristics:
-                        clabel = "{0}.Characteristics[{1}]".format(
-                            olabel, c.category.term)
-                        write_value_columns(df_dict, clabel, c)
-                    for co in node.comments:
-                        colabel = "{0}.Comment[{1}]".format(olabel, co.name)
-                        df_dict[colabel][-1] = co.value
-                    for fv in node.factor_values:
-                        fvlabel = "{0}.Factor Value[{1}]".format(
-                            olabel, fv.factor_name.name)
-                        write_value_columns(df_dict, fvlabel, fv)
+            write_path(df_dict, path)
         """if isinstance(pbar, ProgressBar):
             pbar.finish()"""
 
@@ -1305,39 +1431,7 @@ def write_study_table_files(inv_obj, output_dir):
         DF = DF.sort_values(by=DF.columns[0], ascending=True)
         # arbitrary sort on column 0
 
-        for dup_item in set([x for x in columns if columns.count(x) > 1]):
-            for j, each in enumerate(
-                    [i for i, x in enumerate(columns) if x == dup_item]):
-                columns[each] = dup_item + str(j)
-
-        DF.columns = columns  # reset columns after checking for dups
-
-        for i, col in enumerate(columns):
-            if "Comment[" in col:
-                columns[i] = col[col.rindex(".") + 1:]
-            elif col.endswith("Term Source REF"):
-                columns[i] = "Term Source REF"
-            elif col.endswith("Term Accession Number"):
-                columns[i] = "Term Accession Number"
-            elif col.endswith("Unit"):
-                columns[i] = "Unit"
-            elif "Characteristics[" in col:
-                if "material type" in col.lower():
-                    columns[i] = "Material Type"
-                else:
-                    columns[i] = col[col.rindex(".") + 1:]
-            elif "Factor Value[" in col:
-                columns[i] = col[col.rindex(".") + 1:]
-            elif "Parameter Value[" in col:
-                columns[i] = col[col.rindex(".") + 1:]
-            elif col.endswith("Date"):
-                columns[i] = "Date"
-            elif col.endswith("Performer"):
-                columns[i] = "Performer"
-            elif "Protocol REF" in col:
-                columns[i] = "Protocol REF"
-            elif col.startswith("Sample Name."):
-                columns[i] = "Sample Name"
+        columns = _study_table_header(columns)
 
         log.debug("Rendered {} paths".format(len(DF.index)))
 
@@ -1357,7 +1451,8 @@ def write_study_table_files(inv_obj, output_dir):
                 path_or_buf=out_fp, index=False, sep='\t', encoding='utf-8')
 
 
-def write_assay_table_files(inv_obj, output_dir, write_factor_values=False):
+def write_assay_table_files(inv_obj, output_dir, write_factor_values=False,
+                            stream=False):
     """Writes out assay table files according to pattern defined by
 
     Sample Name,
@@ -1369,6 +1464,9 @@ def write_assay_table_files(inv_obj, output_dir, write_factor_values=False):
     :param output_dir: A path to a directory to write the ISA-Tab assay files
     :param write_factor_values: Flag to indicate whether or not to write out
     the Factor Value columns in the assay tables
+    :param stream: Boolean flag on whether to write the rows to the files as
+    the paths are found instead of building each table in a DataFrame first,
+    which keeps memory use down on very large tables
     :return: None
     """
 
@@ -1387,16 +1485,27 @@ def write_assay_table_files(inv_obj, output_dir, write_factor_values=False):
             columns = []
 
             # start_nodes, end_nodes = _get_start_end_nodes(a_graph)
-            paths = _all_end_to_end_paths(
-                a_graph, [x for x in a_graph.nodes()
-                                  if isinstance(a_graph.indexes[x], Sample)])
-            if len(paths) == 0:
-                log.info("No paths found, skipping writing assay file")
-                continue
-            if _longest_path_and_attrs(paths, a_graph.indexes) is None:
+            start_nodes = [x for x in a_graph.nodes()
+                           if isinstance(a_graph.indexes[x], Sample)]
+            if stream:
+                longest_path = _longest_path_and_attrs(
+                    _end_to_end_path_iterator(a_graph, start_nodes)(),
+                    a_graph.indexes)
+                iter_paths = _end_to_end_path_iterator(a_graph, sorted(
+                    start_nodes, key=lambda x: a_graph.indexes[x].name))
+                if longest_path is None:
+                    log.info("No paths found, skipping writing assay file")
+                    continue
+            else:
+                paths = _all_end_to_end_paths(a_graph, start_nodes)
+                if len(paths) == 0:
+                    log.info("No paths found, skipping writing assay file")
+                    continue
+                longest_path = _longest_path_and_attrs(paths, a_graph.indexes)
+            if longest_path is None:
                 raise IOError(
                     "Could not find any valid end-to-end paths in assay graph")
-            for node_index in _longest_path_and_attrs(paths, a_graph.indexes):
+            for node_index in longest_path:
                 node = a_graph.indexes[node_index]
                 if isinstance(node, Sample):
                     olabel = "Sample Name"
@@ -1459,6 +1568,17 @@ def write_assay_table_files(inv_obj, output_dir, write_factor_values=False):
 
             omap = get_object_column_map(columns, columns)
 
+            def write_path(df_dict, path):
+                _write_assay_path(df_dict, path, a_graph.indexes,
+                                  protocol_types_dict, write_factor_values)
+
+            if stream:
+                _write_table_file_rows(
+                    os.path.join(output_dir, assay_obj.filename), iter_paths,
+                    flatten(omap), columns, _assay_table_header(columns),
+                    write_path)
+                continue
+
             # load into dictionary
             df_dict = dict(map(lambda k: (k, []), flatten(omap)))
 
@@ -1474,75 +1594,7 @@ def write_assay_table_files(inv_obj, output_dir, write_factor_values=False):
             for path in pbar(paths):
                 for k in df_dict.keys():  # add a row per path
                     df_dict[k].extend([""])
-
-                for node_index in path:
-                    node = a_graph.indexes[node_index]
-                    if isinstance(node, Process):
-                        olabel = "Protocol REF.{}".format(
-                            node.executes_protocol.name
-                        )
-                        df_dict[olabel][-1] = node.executes_protocol.name
-                        if node.executes_protocol.protocol_type:
-                            oname_label = get_column_header(
-                                node.executes_protocol.protocol_type.term,
-                                protocol_types_dict
-                            )
-                            if oname_label is not None:
-                                df_dict[oname_label][-1] = node.name
-                            elif node.executes_protocol.protocol_type.term.lower() in \
-                                    protocol_types_dict["nucleic acid hybridization"][SYNONYMS]:
-                                df_dict["Hybridization Assay Name"][-1] = \
-                                    node.name
-                                df_dict["Array Design REF"][-1] = \
-                                    node.array_design_ref
-                        if node.date is not None:
-                            df_dict[olabel + ".Date"][-1] = node.date
-                        if node.performer is not None:
-                            df_dict[olabel + ".Performer"][-1] = node.performer
-                        for pv in node.parameter_values:
-                            pvlabel = "{0}.Parameter Value[{1}]".format(
-                                olabel, pv.category.parameter_name.term)
-                            write_value_columns(df_dict, pvlabel, pv)
-                        for co in node.comments:
-                            colabel = "{0}.Comment[{1}]".format(
-                                olabel, co.name)
-                            df_dict[colabel][-1] = co.value
-                        for output in [x for x in node.outputs if
-                                       isinstance(x, DataFile)]:
-                            olabel = output.label
-                            df_dict[olabel][-1] = output.filename
-                            for co in output.comments:
-                                colabel = "{0}.Comment[{1}]".format(
-                                    olabel, co.name)
-                                df_dict[colabel][-1] = co.value
-
-                    elif isinstance(node, Sample):
-                        olabel = "Sample Name"
-                        df_dict[olabel][-1] = node.name
-                        for co in node.comments:
-                            colabel = "{0}.Comment[{1}]".format(
-                                olabel, co.name)
-                            df_dict[colabel][-1] = co.value
-                        if write_factor_values:
-                            for fv in node.factor_values:
-                                fvlabel = "{0}.Factor Value[{1}]".format(
-                                    olabel, fv.factor_name.name)
-                                write_value_columns(df_dict, fvlabel, fv)
-
-                    elif isinstance(node, Material):
-                        olabel = node.type
-                        df_dict[olabel][-1] = node.name
-                        for c in node.characteristics:
-                            clabel = "{0}.Characteristics[{1}]".format(
-                                olabel, c.category.term)
-                            write_value_columns(df_dict, clabel, c)
-                        for co in node.comments:
-                            colabel = "{0}.Comment[{1}]".format(
-                                olabel, co.name)
-                            df_dict[colabel][-1] = co.value
-
-                    elif isinstance(node, DataFile):
-                        pass  # handled in process
+                write_path(df_dict, path)
 
             if isinstance(pbar, ProgressBar):
                 pbar.finish()
@@ -1558,41 +1610,7 @@ def write_assay_table_files(inv_obj, output_dir, write_factor_values=False):
                 raise e
             # arbitrary sort on column 0
 
-            for dup_item in set([x for x in columns if columns.count(x) > 1]):
-                for j, each in enumerate(
-                        [i for i, x in enumerate(columns) if x == dup_item]):
-                    columns[each] = ".".join([dup_item, str(j)])
-
-            DF.columns = columns
-
-            for i, col in enumerate(columns):
-                if col.endswith("Term Source REF"):
-                    columns[i] = "Term Source REF"
-                elif col.endswith("Term Accession Number"):
-                    columns[i] = "Term Accession Number"
-                elif col.endswith("Unit"):
-                    columns[i] = "Unit"
-                elif "Characteristics[" in col:
-                    if "material type" in col.lower():
-                        columns[i] = "Material Type"
-                    elif "label" in col.lower():
-                        columns[i] = "Label"
-                    else:
-                        columns[i] = col[col.rindex(".") + 1:]
-                elif "Factor Value[" in col:
-                    columns[i] = col[col.rindex(".") + 1:]
-                elif "Parameter Value[" in col:
-                    columns[i] = col[col.rindex(".") + 1:]
-                elif col.endswith("Date"):
-                    columns[i] = "Date"
-                elif col.endswith("Performer"):
-                    columns[i] = "Performer"
-                elif "Comment[" in col:
-                    columns[i] = col[col.rindex(".") + 1:]
-                elif "Protocol REF" in col:
-                    columns[i] = "Protocol REF"
-                elif "." in col:
-                    columns[i] = col[:col.rindex(".")]
+            columns = _assay_table_header(columns)
 
             log.debug("Rendered {} paths".format(len(DF.index)))
             if len(DF.index) > 1:
@@ -1612,6 +1630,288 @@ def write_assay_table_files(inv_obj, output_dir, write_factor_values=False):
                           encoding='utf-8')
 
 
+def _write_study_path(df_dict, path, indexes):
+    """Fills in the last row of the DataFrame dictionary of a study table
+    with the nodes of a path
+
+    :param df_dict: The DataFrame dictionary of the study table
+    :param path: A path of node indexes, starting from a Source
+    :param indexes: The graph's mapping of node indexes to ISA objects
+    :return: None
+    """
+    sample_in_path_count = 0
+    for node_index in path:
+        node = indexes[node_index]
+        if isinstance(node, Source):
+            olabel = "Source Name"
+            df_dict[olabel][-1] = node.name
+            for c in node.characteristics:
+                clabel = "{0}.Characteristics[{1}]".format(
+                    olabel, c.category.term)
+                write_value_columns(df_dict, clabel, c)
+            for co in node.comments:
+                colabel = "{0}.Comment[{1}]".format(olabel, co.name)
+                df_dict[colabel][-1] = co.value
+
+        elif isinstance(node, Process):
+            olabel = "Protocol REF.{}".format(
+                node.executes_protocol.name)
+            df_dict[olabel][-1] = node.executes_protocol.name
+            for pv in node.parameter_values:
+                pvlabel = "{0}.Parameter Value[{1}]".format(
+                    olabel, pv.category.parameter_name.term)
+                write_value_columns(df_dict, pvlabel, pv)
+            if node.date is not None:
+                df_dict[olabel + ".Date"][-1] = node.date
+            if node.performer is not None:
+                df_dict[olabel + ".Performer"][-1] = node.performer
+            for co in node.comments:
+                colabel = "{0}.Comment[{1}]".format(olabel, co.name)
+                df_dict[colabel][-1] = co.value
+
+        elif isinstance(node, Sample):
+            olabel = "Sample Name.{}".format(sample_in_path_count)
+            sample_in_path_count += 1
+            df_dict[olabel][-1] = node.name
+            for c in node.characteristics:
+                clabel = "{0}.Characteristics[{1}]".format(
+                    olabel, c.category.term)
+                write_value_columns(df_dict, clabel, c)
+            for co in node.comments:
+                colabel = "{0}.Comment[{1}]".format(olabel, co.name)
+                df_dict[colabel][-1] = co.value
+            for fv in node.factor_values:
+                fvlabel = "{0}.Factor Value[{1}]".format(
+                    olabel, fv.factor_name.name)
+                write_value_columns(df_dict, fvlabel, fv)
+
+
+def _study_table_header(columns):
+    """Turns the column labels used to build a study table into its ISA-Tab
+    header
+
+    :param columns: The list of column labels
+    :return: The list of ISA-Tab column headers
+    """
+    columns = list(columns)
+    for dup_item in set([x for x in columns if columns.count(x) > 1]):
+        for j, each in enumerate(
+                [i for i, x in enumerate(columns) if x == dup_item]):
+            columns[each] = dup_item + str(j)
+
+    for i, col in enumerate(columns):
+        if "Comment[" in col:
+            columns[i] = col[col.rindex(".") + 1:]
+        elif col.endswith("Term Source REF"):
+            columns[i] = "Term Source REF"
+        elif col.endswith("Term Accession Number"):
+            columns[i] = "Term Accession Number"
+        elif col.endswith("Unit"):
+            columns[i] = "Unit"
+        elif "Characteristics[" in col:
+            if "material type" in col.lower():
+                columns[i] = "Material Type"
+            else:
+                columns[i] = col[col.rindex(".") + 1:]
+        elif "Factor Value[" in col:
+            columns[i] = col[col.rindex(".") + 1:]
+        elif "Parameter Value[" in col:
+            columns[i] = col[col.rindex(".") + 1:]
+        elif col.endswith("Date"):
+            columns[i] = "Date"
+        elif col.endswith("Performer"):
+            columns[i] = "Performer"
+        elif "Protocol REF" in col:
+            columns[i] = "Protocol REF"
+        elif col.startswith("Sample Name."):
+            columns[i] = "Sample Name"
+    return columns
+
+
+def _write_assay_path(df_dict, path, indexes, protocol_types_dict,
+                      write_factor_values):
+    """Fills in the last row of the DataFrame dictionary of an assay table
+    with the nodes of a path
+
+    :param df_dict: The DataFrame dictionary of the assay table
+    :param path: A path of node indexes, starting from a Sample
+    :param indexes: The graph's mapping of node indexes to ISA objects
+    :param protocol_types_dict: The protocol types info to name processes
+    :param write_factor_values: Flag to indicate whether or not to write out
+    the Factor Value columns
+    :return: None
+    """
+    for node_index in path:
+        node = indexes[node_index]
+        if isinstance(node, Process):
+            olabel = "Protocol REF.{}".format(
+                node.executes_protocol.name
+            )
+            df_dict[olabel][-1] = node.executes_protocol.name
+            if node.executes_protocol.protocol_type:
+                oname_label = get_column_header(
+                    node.executes_protocol.protocol_type.term,
+                    protocol_types_dict
+                )
+                if oname_label is not None:
+                    df_dict[oname_label][-1] = node.name
+                elif node.executes_protocol.protocol_type.term.lower() in \
+                        protocol_types_dict["nucleic acid hybridization"][SYNONYMS]:
+                    df_dict["Hybridization Assay Name"][-1] = \
+                        node.name
+                    df_dict["Array Design REF"][-1] = \
+                        node.array_design_ref
+            if node.date is not None:
+                df_dict[olabel + ".Date"][-1] = node.date
+            if node.performer is not None:
+                df_dict[olabel + ".Performer"][-1] = node.performer
+            for pv in node.parameter_values:
+                pvlabel = "{0}.Parameter Value[{1}]".format(
+                    olabel, pv.category.parameter_name.term)
+                write_value_columns(df_dict, pvlabel, pv)
+            for co in node.comments:
+                colabel = "{0}.Comment[{1}]".format(
+                    olabel, co.name)
+                df_dict[colabel][-1] = co.value
+            for output in [x for x in node.outputs if
+                           isinstance(x, DataFile)]:
+                olabel = output.label
+                df_dict[olabel][-1] = output.filename
+                for co in output.comments:
+                    colabel = "{0}.Comment[{1}]".format(
+                        olabel, co.name)
+                    df_dict[colabel][-1] = co.value
+
+        elif isinstance(node, Sample):
+            olabel = "Sample Name"
+            df_dict[olabel][-1] = node.name
+            for co in node.comments:
+                colabel = "{0}.Comment[{1}]".format(
+                    olabel, co.name)
+                df_dict[colabel][-1] = co.value
+            if write_factor_values:
+                for fv in node.factor_values:
+                    fvlabel = "{0}.Factor Value[{1}]".format(
+                        olabel, fv.factor_name.name)
+                    write_value_columns(df_dict, fvlabel, fv)
+
+        elif isinstance(node, Material):
+            olabel = node.type
+            df_dict[olabel][-1] = node.name
+            for c in node.characteristics:
+                clabel = "{0}.Characteristics[{1}]".format(
+                    olabel, c.category.term)
+                write_value_columns(df_dict, clabel, c)
+            for co in node.comments:
+                colabel = "{0}.Comment[{1}]".format(
+                    olabel, co.name)
+                df_dict[colabel][-1] = co.value
+
+        elif isinstance(node, DataFile):
+            pass  # handled in process
+
+
+def _assay_table_header(columns):
+    """Turns the column labels used to build an assay table into its ISA-Tab
+    header
+
+    :param columns: The list of column labels
+    :return: The list of ISA-Tab column headers
+    """
+    columns = list(columns)
+    for dup_item in set([x for x in columns if columns.count(x) > 1]):
+        for j, each in enumerate(
+                [i for i, x in enumerate(columns) if x == dup_item]):
+            columns[each] = ".".join([dup_item, str(j)])
+
+    for i, col in enumerate(columns):
+        if col.endswith("Term Source REF"):
+            columns[i] = "Term Source REF"
+        elif col.endswith("Term Accession Number"):
+            columns[i] = "Term Accession Number"
+        elif col.endswith("Unit"):
+            columns[i] = "Unit"
+        elif "Characteristics[" in col:
+            if "material type" in col.lower():
+                columns[i] = "Material Type"
+            elif "label" in col.lower():
+                columns[i] = "Label"
+            else:
+                columns[i] = col[col.rindex(".") + 1:]
+        elif "Factor Value[" in col:
+            columns[i] = col[col.rindex(".") + 1:]
+        elif "Parameter Value[" in col:
+            columns[i] = col[col.rindex(".") + 1:]
+        elif col.endswith("Date"):
+            columns[i] = "Date"
+        elif col.endswith("Performer"):
+            columns[i] = "Performer"
+        elif "Comment[" in col:
+            columns[i] = col[col.rindex(".") + 1:]
+        elif "Protocol REF" in col:
+            columns[i] = "Protocol REF"
+        elif "." in col:
+            columns[i] = col[:col.rindex(".")]
+    return columns
+
+
+def _is_empty_cell(value):
+    """Tells whether a table value is left empty, as '' and NaN are when
+    a table is written from a DataFrame"""
+    return value is None or (isinstance(value, str) and value == '') or \
+        (isinstance(value, float) and math.isnan(value))
+
+
+def _write_table_file_rows(file_path, iter_paths, keys, columns, header,
+                           write_path):
+    """Writes a study or assay table file one row at a time as the paths are
+    produced, without holding the table in memory
+
+    The rows come in the order of the paths. A first pass over the paths
+    finds the columns that have a value in any row, so that empty columns are
+    left out as they are in the DataFrame writer, and repeated rows are
+    skipped by keeping the MD5 digest of each row written.
+
+    :param file_path: Path of the table file to write
+    :param iter_paths: A function returning a new iterator over the paths
+    :param keys: The keys of the DataFrame dictionary that write_path fills
+    :param columns: The column labels, in order, from the keys
+    :param header: The ISA-Tab header of each of the columns
+    :param write_path: A function filling in the last row of a DataFrame
+    dictionary with the nodes of a path
+    :return: The number of rows written
+    """
+    def iter_rows():
+        for path in iter_paths():
+            df_dict = dict((k, [""]) for k in keys)
+            write_path(df_dict, path)
+            yield [df_dict[k][0] for k in columns]
+
+    empty_columns = set(range(len(columns)))
+    for row in iter_rows():
+        empty_columns = set(
+            i for i in empty_columns if _is_empty_cell(row[i]))
+        if not empty_columns:
+            break
+    kept_columns = [i for i in range(len(columns)) if i not in empty_columns]
+
+    num_rows = 0
+    row_digests = set()
+    with open(file_path, 'w') as out_fp:
+        writer = csv.writer(out_fp, delimiter='\t', lineterminator='\n')
+        writer.writerow([header[i] for i in kept_columns])
+        for row in iter_rows():
+            row = ['' if _is_empty_cell(row[i]) else row[i]
+                   for i in kept_columns]
+            row_digest = md5(repr(row).encode('utf-8')).digest()
+            if row_digest not in row_digests:
+                row_digests.add(row_digest)
+                writer.writerow(row)
+                num_rows += 1
+    log.debug("Wrote {} rows to {}".format(num_rows, file_path))
+    return num_rows
+
+
 def get_column_header(protocol_type_term, protocol_types_dict):
     column_header = None
     if protocol_type_term.lower() in \
@@ -1762,28 +2062,17 @@ def read_investigation_file(fp):
     investigation file. See below implementation for detail
     """
 
-    def _peek(f):
-        """Peek at the next line without moving to the next line. This function
-        get the position of the next line, reads the next line, then resets the
-        file pointer to the original position
-
-        :param f: A file-like buffer object
-        :return: The next line past the current line
-        """
-        position = f.tell()
-        line = f.readline()
-        f.seek(position)
-        return line
-
-    def _read_tab_section(f, sec_key, next_sec_key=None):
-        """Slices a file by section delimited by section keys
+    def _read_tab_section(lines, start, sec_key, next_sec_key=None):
+        """Slices the lines of a file by section delimited by section keys
 
-        :param f: A file-like buffer object
+        :param lines: The list of lines of the file
+        :param start: Position of the line of the beginning of the section
         :param sec_key: Delimiter key of beginning of section
         :param next_sec_key: Delimiter key of end of section
-        :return: A memory file of the section slice, as a string buffer object
+        :return: A tuple of the list of lines in the section slice and the
+        position of the line after it
         """
-        line = f.readline()
+        line = lines[start] if start < len(lines) else ''
         normed_line = line.rstrip()
         if normed_line[0] == '"':
             normed_line = normed_line[1:]
@@ -1792,66 +2081,100 @@ def read_investigation_file(fp):
         if not normed_line == sec_key:
             raise IOError("Expected: " + sec_key + " section, but got: "
                           + normed_line)
-        memf = io.StringIO()
-        while not _peek(f=f).rstrip() == next_sec_key:
-            line = f.readline()
-            if not line:
-                break
-            memf.write(line.rstrip() + '\n')
-        memf.seek(0)
-        return memf
+        end = start + 1
+        while end < len(lines) and not lines[end].rstrip() == next_sec_key:
+            end += 1
+        return [x.rstrip() + '\n' for x in lines[start + 1:end]], end
+
+    def _infer_values(values):
+        """Converts the values of a section column to numbers or booleans if
+        they all are, as pandas read_csv does
 
-    def _build_section_df(f):
+        :param values: The list of values, None where a row is too short
+        :return: An array of the converted values
+        """
+        raw_values = np.array(values, dtype=object)
+        values = np.array([np.nan if x in _INVESTIGATION_NA_VALUES else x
+                           for x in values], dtype=object)
+        try:
+            numbers = pd.to_numeric(values)
+        except (ValueError, TypeError):
+            pass
+        else:
+            if numbers.dtype != object:
+                return numbers
+            # e.g. missing values among unsigned 64-bit integers, which
+            # read_csv leaves as they were
+            values = raw_values
+        if not all(isinstance(x, float) or x in _INVESTIGATION_BOOL_VALUES
+                   for x in values):
+            return values
+        if any(isinstance(x, float) for x in values):
+            return np.array([_INVESTIGATION_BOOL_VALUES.get(x, x)
+                             for x in values], dtype=object)
+        return np.array([_INVESTIGATION_BOOL_VALUES[x] for x in values],
+                        dtype=bool)
+
+    def _build_section_df(lines):
         """Reads a file section into a DataFrame
 
-        :param f: A file-like buffer object
+        :param lines: The list of lines in the file section
         :return: A DataFrame corresponding to the file section
         """
-        df = pd.read_csv(f, names=range(0, 128), sep='\t', engine='python',
-                         encoding='utf-8').dropna(axis=1, how='all')
-        df = df.T
-        df.replace(np.nan, '', regex=True, inplace=True)
-        #  Strip out the nan entries
-        df.reset_index(inplace=True)
-        #  Reset index so it is accessible as column
-        df.columns = df.iloc[0]
-        #  If all was OK, promote this row to the column headers
-        df = df.reindex(df.index.drop(0))
-        #  Reindex the DataFrame
+        try:
+            rows = [row for row in csv.reader(
+                lines, delimiter='\t', strict=True)
+                if len(row) > 1 or row and row[0].strip()]
+        except csv.Error as e:
+            raise ParserError(e)
+        width = max((len(row) for row in rows), default=0)
+        # the columns of the file that hold any value, i.e. the labels and
+        # then the values of each entry of the section
+        columns = []
+        for i in range(width):
+            values = _infer_values(
+                [row[i] if i < len(row) else None for row in rows])
+            if not pd.isna(values).all():
+                columns.append((i, ['' if pd.isna(x) else x
+                                    for x in values.tolist()]))
+        if not columns:
+            raise IndexError("Section has no labels")
+        # one row per entry, in the first column the position of the entry
+        # in the file and then a column per label
+        (label_position, labels), entries = columns[0], columns[1:]
+        df = pd.DataFrame({
+            j + 1: np.array([x[1][j] for x in entries], dtype=object)
+            for j in range(len(labels))}, index=range(1, len(columns)))
+        df.insert(0, 0, np.array([x[0] for x in entries], dtype=np.int64))
+        df.columns = pd.Index([label_position] + labels, name=0)
         return df
 
-    memf = io.StringIO()
-    while True:
-        line = fp.readline()
-        if not line:
-            break
-        if not line.lstrip().startswith('#'):
-            memf.write(line)
-    memf.seek(0)
+    lines = [line for line in iter(fp.readline, '')
+             if not line.lstrip().startswith('#')]
+    position = 0
+
+    def _read_section(sec_key, next_sec_key):
+        """Reads the next section of the file into a DataFrame
+
+        :param sec_key: Delimiter key of beginning of section
+        :param next_sec_key: Delimiter key of end of section
+        :return: A DataFrame corresponding to the file section
+        """
+        nonlocal position
+        section_lines, position = _read_tab_section(
+            lines, position, sec_key, next_sec_key)
+        return _build_section_df(section_lines)
 
     df_dict = dict()
 
     # Read in investigation file into DataFrames first
-    df_dict['ontology_sources'] = _build_section_df(_read_tab_section(
-        f=memf,
-        sec_key='ONTOLOGY SOURCE REFERENCE',
-        next_sec_key='INVESTIGATION'
-    ))
-    df_dict['investigation'] = _build_section_df(_read_tab_section(
-        f=memf,
-        sec_key='INVESTIGATION',
-        next_sec_key='INVESTIGATION PUBLICATIONS'
-    ))
-    df_dict['i_publications'] = _build_section_df(_read_tab_section(
-        f=memf,
-        sec_key='INVESTIGATION PUBLICATIONS',
-        next_sec_key='INVESTIGATION CONTACTS'
-    ))
-    df_dict['i_contacts'] = _build_section_df(_read_tab_section(
-        f=memf,
-        sec_key='INVESTIGATION CONTACTS',
-        next_sec_key='STUDY'
-    ))
+    df_dict['ontology_sources'] = _read_section(
+        'ONTOLOGY SOURCE REFERENCE', 'INVESTIGATION')
+    df_dict['investigation'] = _read_section(
+        'INVESTIGATION', 'INVESTIGATION PUBLICATIONS')
+    df_dict['i_publications'] = _read_section(
+        'INVESTIGATION PUBLICATIONS', 'INVESTIGATION CONTACTS')
+    df_dict['i_contacts'] = _read_section('INVESTIGATION CONTACTS', 'STUDY')
     df_dict['studies'] = list()
     df_dict['s_design_descriptors'] = list()
     df_dict['s_publications'] = list()
@@ -1859,43 +2182,21 @@ def read_investigation_file(fp):
     df_dict['s_assays'] = list()
     df_dict['s_protocols'] = list()
     df_dict['s_contacts'] = list()
-    while _peek(memf):  # Iterate through STUDY blocks until end of file
-        df_dict['studies'].append(_build_section_df(_read_tab_section(
-            f=memf,
-            sec_key='STUDY',
-            next_sec_key='STUDY DESIGN DESCRIPTORS'
-        )))
-        df_dict['s_design_descriptors'] .append(
-            _build_section_df(_read_tab_section(
-                f=memf,
-                sec_key='STUDY DESIGN DESCRIPTORS',
-                next_sec_key='STUDY PUBLICATIONS'
-            )))
-        df_dict['s_publications'].append(_build_section_df(_read_tab_section(
-            f=memf,
-            sec_key='STUDY PUBLICATIONS',
-            next_sec_key='STUDY FACTORS'
-        )))
-        df_dict['s_factors'].append(_build_section_df(_read_tab_section(
-            f=memf,
-            sec_key='STUDY FACTORS',
-            next_sec_key='STUDY ASSAYS'
-        )))
-        df_dict['s_assays'].append(_build_section_df(_read_tab_section(
-            f=memf,
-            sec_key='STUDY ASSAYS',
-            next_sec_key='STUDY PROTOCOLS'
-        )))
-        df_dict['s_protocols'].append(_build_section_df(_read_tab_section(
-            f=memf,
-            sec_key='STUDY PROTOCOLS',
-            next_sec_key='STUDY CONTACTS'
-        )))
-        df_dict['s_contacts'].append(_build_section_df(_read_tab_section(
-            f=memf,
-            sec_key='STUDY CONTACTS',
-            next_sec_key='STUDY'
-        )))
+    while position < len(lines):  # Iterate through STUDY blocks until EOF
+        df_dict['studies'].append(_read_section(
+            'STUDY', 'STUDY DESIGN DESCRIPTORS'))
+        df_dict['s_design_descriptors'].append(_read_section(
+            'STUDY DESIGN DESCRIPTORS', 'STUDY PUBLICATIONS'))
+        df_dict['s_publications'].append(_read_section(
+            'STUDY PUBLICATIONS', 'STUDY FACTORS'))
+        df_dict['s_factors'].append(_read_section(
+            'STUDY FACTORS', 'STUDY ASSAYS'))
+        df_dict['s_assays'].append(_read_section(
+            'STUDY ASSAYS', 'STUDY PROTOCOLS'))
+        df_dict['s_protocols'].append(_read_section(
+            'STUDY PROTOCOLS', 'STUDY CONTACTS'))
+        df_dict['s_contacts'].append(_read_section(
+            'STUDY CONTACTS', 'STUDY'))
     return df_dict
 
 
@@ -1906,7 +2207,7 @@ def check_utf8(fp):
     :return: None
     """
     import chardet
-    with utf8_text_file_open(fp.name) as fp:
+    with utils.utf8_text_file_open(fp.name) as fp:
         charset = chardet.detect(fp.read())
         if charset['encoding'] != 'UTF-8' \
                 and charset['encoding'] != 'ascii':
@@ -2317,7 +2618,7 @@ def check_table_files_read(i_df, dir_context):
         study_filename = study_df.iloc[0]['Study File Name']
         if study_filename != '':
             try:
-                with utf8_text_file_open(os.path.join(
+                with utils.utf8_text_file_open(os.path.join(
                         dir_context, study_filename)):
                     pass
             except FileNotFoundError:
@@ -2334,7 +2635,7 @@ def check_table_files_read(i_df, dir_context):
                 .tolist()):
             if assay_filename != '':
                 try:
-                    with utf8_text_file_open(os.path.join(
+                    with utils.utf8_text_file_open(os.path.join(
                             dir_context, assay_filename)):
                         pass
                 except FileNotFoundError:
@@ -2359,7 +2660,7 @@ def check_table_files_load(i_df, dir_context):
         study_filename = study_df.iloc[0]['Study File Name']
         if study_filename != '':
             try:
-                with utf8_text_file_open(os.path.join(
+                with utils.utf8_text_file_open(os.path.join(
                         dir_context, study_filename)) as fp:
                     load_table_checks(fp)
             except FileNotFoundError:
@@ -2368,57 +2669,62 @@ def check_table_files_load(i_df, dir_context):
                 i_df['s_assays'][i]['Study Assay File Name'].tolist()):
             if assay_filename != '':
                 try:
-                    with utf8_text_file_open(os.path.join(
+                    with utils.utf8_text_file_open(os.path.join(
                             dir_context, assay_filename)) as fp:
                         load_table_checks(fp)
                 except FileNotFoundError:
                     pass
 
 
-def check_samples_not_declared_in_study_used_in_assay(i_df, dir_context):
+def check_samples_not_declared_in_study_used_in_assay(
+        i_df, dir_context, table_cache=None):
     """Checks if samples found in assay tables are found in the study-sample
     table
 
     :param i_df: An investigation DataFrame
     :param dir_context: Path to where the investigation file is found
+    :param table_cache: A TableCache to share parsed tables between checks
     :return: None
     """
+    if table_cache is None:
+        table_cache = TableCache()
     for i, study_df in enumerate(i_df['studies']):
         study_filename = study_df.iloc[0]['Study File Name']
         if study_filename != '':
             try:
-                with utf8_text_file_open(os.path.join(
-                        dir_context, study_filename)) as s_fp:
-                    study_df = load_table(s_fp)
-                    study_samples = set(study_df['Sample Name'])
+                study_df = table_cache.load(
+                    os.path.join(dir_context, study_filename))
+                study_samples = set(study_df['Sample Name'])
             except FileNotFoundError:
                 pass
         for j, assay_filename in enumerate(
                 i_df['s_assays'][i]['Study Assay File Name'].tolist()):
             if assay_filename != '':
                 try:
-                    with utf8_text_file_open(os.path.join(
-                            dir_context, assay_filename)) as a_fp:
-                        assay_df = load_table(a_fp)
-                        assay_samples = set(assay_df['Sample Name'])
-                        if not assay_samples.issubset(study_samples):
-                            log.error("(E) Some samples in an assay file {} "
-                                      "are not declared in the study file {}: "
-                                      "{}".format(assay_filename,
-                                                  study_filename,
-                                                  list(assay_samples -
-                                                       study_samples)))
+                    assay_df = table_cache.load(
+                        os.path.join(dir_context, assay_filename))
+                    assay_samples = set(assay_df['Sample Name'])
+                    if not assay_samples.issubset(study_samples):
+                        log.error("(E) Some samples in an assay file {} "
+                                  "are not declared in the study file {}: "
+                                  "{}".format(assay_filename,
+                                              study_filename,
+                                              list(assay_samples -
+                                                   study_samples)))
                 except FileNotFoundError:
                     pass
 
 
-def check_protocol_usage(i_df, dir_context):
+def check_protocol_usage(i_df, dir_context, table_cache=None):
     """Used for rules 1007 and 1019
 
     :param i_df: An investigation DataFrame
     :param dir_context: Path to where the investigation file is found
+    :param table_cache: A TableCache to share parsed tables between checks
     :return: None
     """
+    if table_cache is None:
+        table_cache = TableCache()
     for i, study_df in enumerate(i_df['studies']):
         protocols_declared = set(i_df['s_protocols'][i][
             'Study Protocol Name'].tolist())
@@ -2427,30 +2733,29 @@ def check_protocol_usage(i_df, dir_context):
         if study_filename != '':
             try:
                 protocol_refs_used = set()
-                with utf8_text_file_open(os.path.join(
-                        dir_context, study_filename)) as s_fp:
-                    study_df = load_table(s_fp)
-                    for protocol_ref_col in [i for i in study_df.columns
-                                             if i.startswith('Protocol REF')]:
-                        protocol_refs_used = \
-                            protocol_refs_used.union(
-                                study_df[protocol_ref_col])
-                    protocol_refs_used = set([r for r in protocol_refs_used
-                                              if pd.notnull(r)])
-                    diff = list(protocol_refs_used - protocols_declared)
-                    if len(diff) > 0:
-                        validator_errors.append({
-                            "message": "Missing Protocol declaration",
-                            "supplemental": "protocols in study file {} are "
-                                            "not declared in the "
-                                            "investigation file: {}".format(
-                                                study_filename, diff),
-                            "code": 1007
-                        })
-                        log.error(
-                            "(E) Some protocols used in a study file {} are "
-                            "not declared in the investigation file: {}"
-                            .format(study_filename, diff))
+                study_df = table_cache.load(
+                    os.path.join(dir_context, study_filename))
+                for protocol_ref_col in [i for i in study_df.columns
+                                         if i.startswith('Protocol REF')]:
+                    protocol_refs_used = \
+                        protocol_refs_used.union(
+                            study_df[protocol_ref_col])
+                protocol_refs_used = set([r for r in protocol_refs_used
+                                          if pd.notnull(r)])
+                diff = list(protocol_refs_used - protocols_declared)
+                if len(diff) > 0:
+                    validator_errors.append({
+                        "message": "Missing Protocol declaration",
+                        "supplemental": "protocols in study file {} are "
+                                        "not declared in the "
+                                        "investigation file: {}".format(
+                                            study_filename, diff),
+                        "code": 1007
+                    })
+                    log.error(
+                        "(E) Some protocols used in a study file {} are "
+                        "not declared in the investigation file: {}"
+                        .format(study_filename, diff))
             except FileNotFoundError:
                 pass
         for j, assay_filename in enumerate(
@@ -2458,30 +2763,29 @@ def check_protocol_usage(i_df, dir_context):
             if assay_filename != '':
                 try:
                     protocol_refs_used = set()
-                    with utf8_text_file_open(
-                            os.path.join(dir_context, assay_filename)) as a_fp:
-                        assay_df = load_table(a_fp)
-                        for protocol_ref_col in [
-                                i for i in assay_df.columns
-                                if i.startswith('Protocol REF')]:
-                            protocol_refs_used = protocol_refs_used.union(
-                                assay_df[protocol_ref_col])
-                        protocol_refs_used = set(
-                            [r for r in protocol_refs_used if pd.notnull(r)])
-                        diff = list(protocol_refs_used - protocols_declared)
-                        if len(diff) > 0:
-                            validator_errors.append({
-                                "message": "Missing Protocol declaration",
-                                "supplemental": "protocols in study file {} "
-                                                "are not declared in the "
-                                                "investigation file: {}"
-                                                .format(study_filename, diff),
-                                "code": 1007
-                            })
-                            log.error("(E) Some protocols used in an assay "
-                                      "file {} are not declared in the "
-                                      "investigation file: {}"
-                                      .format(assay_filename, diff))
+                    assay_df = table_cache.load(
+                        os.path.join(dir_context, assay_filename))
+                    for protocol_ref_col in [
+                            i for i in assay_df.columns
+                            if i.startswith('Protocol REF')]:
+                        protocol_refs_used = protocol_refs_used.union(
+                            assay_df[protocol_ref_col])
+                    protocol_refs_used = set(
+                        [r for r in protocol_refs_used if pd.notnull(r)])
+                    diff = list(protocol_refs_used - protocols_declared)
+                    if len(diff) > 0:
+                        validator_errors.append({
+                            "message": "Missing Protocol declaration",
+                            "supplemental": "protocols in study file {} "
+                                            "are not declared in the "
+                                            "investigation file: {}"
+                                            .format(study_filename, diff),
+                            "code": 1007
+                        })
+                        log.error("(E) Some protocols used in an assay "
+                                  "file {} are not declared in the "
+                                  "investigation file: {}"
+                                  .format(assay_filename, diff))
                 except FileNotFoundError:
                     pass
         # now collect all protocols in all assays to compare to
@@ -2489,28 +2793,26 @@ def check_protocol_usage(i_df, dir_context):
         protocol_refs_used = set()
         if study_filename != '':
             try:
-                with utf8_text_file_open(
-                        os.path.join(dir_context, study_filename)) as s_fp:
-                    study_df = load_table(s_fp)
-                    for protocol_ref_col in [
-                            i for i in study_df.columns
-                            if i.startswith('Protocol REF')]:
-                        protocol_refs_used = protocol_refs_used.union(
-                            study_df[protocol_ref_col])
+                study_df = table_cache.load(
+                    os.path.join(dir_context, study_filename))
+                for protocol_ref_col in [
+                        i for i in study_df.columns
+                        if i.startswith('Protocol REF')]:
+                    protocol_refs_used = protocol_refs_used.union(
+                        study_df[protocol_ref_col])
             except FileNotFoundError:
                 pass
         for j, assay_filename in enumerate(
                 i_df['s_assays'][i]['Study Assay File Name'].tolist()):
             if assay_filename != '':
                 try:
-                    with utf8_text_file_open(os.path.join(
-                            dir_context, assay_filename)) as a_fp:
-                        assay_df = load_table(a_fp)
-                        for protocol_ref_col in [
-                                i for i in assay_df.columns
-                                if i.startswith('Protocol REF')]:
-                            protocol_refs_used = protocol_refs_used.union(
-                                assay_df[protocol_ref_col])
+                    assay_df = table_cache.load(
+                        os.path.join(dir_context, assay_filename))
+                    for protocol_ref_col in [
+                            i for i in assay_df.columns
+                            if i.startswith('Protocol REF')]:
+                        protocol_refs_used = protocol_refs_used.union(
+                            assay_df[protocol_ref_col])
                 except FileNotFoundError:
                     pass
         diff = protocols_declared - protocol_refs_used - {''}
@@ -2535,14 +2837,12 @@ def load_table(fp):
     :return: DataFrame of the study or assay table
     """
     try:
-        fp = strip_comments(fp)
-        df = pd.read_csv(
-            fp, dtype=str, sep='\t', encoding='utf-8').replace(np.nan, '')
+        df = pd.read_csv(strip_comments(fp), dtype=str, sep='\t',
+                         encoding='utf-8').replace(np.nan, '')
     except UnicodeDecodeError:
         log.warning("Could not load file with UTF-8, trying ISO-8859-1")
-        fp = strip_comments(fp)
-        df = pd.read_csv(
-            fp, dtype=str, sep='\t', encoding='latin1').replace(np.nan, '')
+        df = pd.read_csv(strip_comments(fp), dtype=str, sep='\t',
+                         encoding='latin1').replace(np.nan, '')
     labels = df.columns
     new_labels = []
     for label in labels:
@@ -2565,6 +2865,41 @@ def load_table(fp):
     return df
 
 
+class TableCache(object):
+    """Holds the study and assay tables parsed during a validation run, so
+    that each table file is only read once with load_table and the same
+    DataFrame is handed to every rule that inspects it.
+
+    Tables are keyed on their absolute path along with the modification time
+    they were parsed at, so a file that changes on disk between two lookups
+    is parsed again and replaces its earlier version.
+    """
+
+    def __init__(self):
+        self._tables = dict()
+        self.parses = 0
+        self.hits = 0
+
+    def load(self, path):
+        """Gets the table file at the given path as a DataFrame, parsing it
+        only if it has not been loaded before
+
+        :param path: Path to a study or assay table file
+        :return: DataFrame of the study or assay table
+        """
+        mtime = os.stat(path).st_mtime_ns
+        path = os.path.abspath(path)
+        cached = self._tables.get(path)
+        if cached is not None and cached[0] == mtime:
+            self.hits += 1
+            return cached[1]
+        with utils.utf8_text_file_open(path) as fp:
+            df = load_table(fp)
+        self._tables[path] = (mtime, df)
+        self.parses += 1
+        return df
+
+
 def load_table_checks(fp):
     """Checks that a table can be loaded and returns the loaded table, if
     successful
@@ -2735,13 +3070,16 @@ def load_table_checks(fp):
     return df
 
 
-def check_study_factor_usage(i_df, dir_context):
+def check_study_factor_usage(i_df, dir_context, table_cache=None):
     """Used for rules 1008 and 1021
 
     :param i_df: An investigation DataFrame
     :param dir_context: Path to where the investigation file is found
+    :param table_cache: A TableCache to share parsed tables between checks
     :return: None
     """
+    if table_cache is None:
+        table_cache = TableCache()
     for i, study_df in enumerate(i_df['studies']):
         study_factors_declared = set(
             i_df['s_factors'][i]['Study Factor Name'].tolist())
@@ -2749,20 +3087,19 @@ def check_study_factor_usage(i_df, dir_context):
         if study_filename != '':
             try:
                 study_factors_used = set()
-                with utf8_text_file_open(os.path.join(
-                        dir_context, study_filename)) as s_fp:
-                    study_df = load_table(s_fp)
-                    study_factor_ref_cols = [i for i in study_df.columns
-                                             if _RX_FACTOR_VALUE.match(i)]
-                    for col in study_factor_ref_cols:
-                        fv = _RX_FACTOR_VALUE.findall(col)
-                        study_factors_used = study_factors_used.union(set(fv))
-                    if not study_factors_used.issubset(study_factors_declared):
-                        log.error(
-                            "(E) Some factors used in an study file {} are "
-                            "not declared in the investigation file: {}"
-                            .format(study_filename, list(
-                                study_factors_used - study_factors_declared)))
+                study_df = table_cache.load(
+                    os.path.join(dir_context, study_filename))
+                study_factor_ref_cols = [i for i in study_df.columns
+                                         if _RX_FACTOR_VALUE.match(i)]
+                for col in study_factor_ref_cols:
+                    fv = _RX_FACTOR_VALUE.findall(col)
+                    study_factors_used = study_factors_used.union(set(fv))
+                if not study_factors_used.issubset(study_factors_declared):
+                    log.error(
+                        "(E) Some factors used in an study file {} are "
+                        "not declared in the investigation file: {}"
+                        .format(study_filename, list(
+                            study_factors_used - study_factors_declared)))
             except FileNotFoundError:
                 pass
         for j, assay_filename in enumerate(
@@ -2770,53 +3107,50 @@ def check_study_factor_usage(i_df, dir_context):
             if assay_filename != '':
                 try:
                     study_factors_used = set()
-                    with utf8_text_file_open(os.path.join(
-                            dir_context, assay_filename)) as a_fp:
-                        assay_df = load_table(a_fp)
-                        study_factor_ref_cols = set([
-                            i for i in assay_df.columns
-                            if _RX_FACTOR_VALUE.match(i)])
-                        for col in study_factor_ref_cols:
-                            fv = _RX_FACTOR_VALUE.findall(col)
-                            study_factors_used = study_factors_used.union(
-                                set(fv))
-                        if not study_factors_used.issubset(
-                                study_factors_declared):
-                            log.error("(E) Some factors used in an assay file "
-                                      "{} are not declared in the "
-                                      "investigation file: {}".format(
-                                          assay_filename, list(
-                                              study_factors_used -
-                                              study_factors_declared)))
+                    assay_df = table_cache.load(
+                        os.path.join(dir_context, assay_filename))
+                    study_factor_ref_cols = set([
+                        i for i in assay_df.columns
+                        if _RX_FACTOR_VALUE.match(i)])
+                    for col in study_factor_ref_cols:
+                        fv = _RX_FACTOR_VALUE.findall(col)
+                        study_factors_used = study_factors_used.union(
+                            set(fv))
+                    if not study_factors_used.issubset(
+                            study_factors_declared):
+                        log.error("(E) Some factors used in an assay file "
+                                  "{} are not declared in the "
+                                  "investigation file: {}".format(
+                                      assay_filename, list(
+                                          study_factors_used -
+                                          study_factors_declared)))
                 except FileNotFoundError:
                     pass
         study_factors_used = set()
         if study_filename != '':
             try:
-                with utf8_text_file_open(
-                        os.path.join(dir_context, study_filename)) as s_fp:
-                    study_df = load_table(s_fp)
-                    study_factor_ref_cols = [i for i in study_df.columns
-                                             if _RX_FACTOR_VALUE.match(i)]
-                    for col in study_factor_ref_cols:
-                        fv = _RX_FACTOR_VALUE.findall(col)
-                        study_factors_used = study_factors_used.union(set(fv))
+                study_df = table_cache.load(
+                    os.path.join(dir_context, study_filename))
+                study_factor_ref_cols = [i for i in study_df.columns
+                                         if _RX_FACTOR_VALUE.match(i)]
+                for col in study_factor_ref_cols:
+                    fv = _RX_FACTOR_VALUE.findall(col)
+                    study_factors_used = study_factors_used.union(set(fv))
             except FileNotFoundError:
                 pass
         for j, assay_filename in enumerate(
                 i_df['s_assays'][i]['Study Assay File Name'].tolist()):
             if assay_filename != '':
                 try:
-                    with utf8_text_file_open(os.path.join(
-                            dir_context, assay_filename)) as a_fp:
-                        assay_df = load_table(a_fp)
-                        study_factor_ref_cols = set([
-                            i for i in assay_df.columns
-                            if _RX_FACTOR_VALUE.match(i)])
-                        for col in study_factor_ref_cols:
-                            fv = _RX_FACTOR_VALUE.findall(col)
-                            study_factors_used = \
-                                study_factors_used.union(set(fv))
+                    assay_df = table_cache.load(
+                        os.path.join(dir_context, assay_filename))
+                    study_factor_ref_cols = set([
+                        i for i in assay_df.columns
+                        if _RX_FACTOR_VALUE.match(i)])
+                    for col in study_factor_ref_cols:
+                        fv = _RX_FACTOR_VALUE.findall(col)
+                        study_factors_used = \
+                            study_factors_used.union(set(fv))
                 except FileNotFoundError:
                     pass
         if len(study_factors_declared - study_factors_used) > 0:
@@ -2826,13 +3160,16 @@ def check_study_factor_usage(i_df, dir_context):
                     list(study_factors_declared - study_factors_used)))
 
 
-def check_protocol_parameter_usage(i_df, dir_context):
+def check_protocol_parameter_usage(i_df, dir_context, table_cache=None):
     """Used for rules 1009 and 1020
 
     :param i_df: An investigation DataFrame
     :param dir_context: Path to where the investigation file is found
+    :param table_cache: A TableCache to share parsed tables between checks
     :return: None
     """
+    if table_cache is None:
+        table_cache = TableCache()
     for i, study_df in enumerate(i_df['studies']):
         protocol_parameters_declared = set()
         protocol_parameters_per_protocol = set(
@@ -2847,51 +3184,49 @@ def check_protocol_parameter_usage(i_df, dir_context):
         if study_filename != '':
             try:
                 protocol_parameters_used = set()
-                with utf8_text_file_open(os.path.join(
-                        dir_context, study_filename)) as s_fp:
-                    study_df = load_table(s_fp)
+                study_df = table_cache.load(
+                    os.path.join(dir_context, study_filename))
+                parameter_value_cols = [
+                    i for i in study_df.columns
+                    if _RX_PARAMETER_VALUE.match(i)]
+                for col in parameter_value_cols:
+                    pv = _RX_PARAMETER_VALUE.findall(col)
+                    protocol_parameters_used = \
+                        protocol_parameters_used.union(
+                            set(pv))
+                if not protocol_parameters_used.issubset(
+                        protocol_parameters_declared):
+                    log.error("(E) Some protocol parameters referenced in "
+                              "an study file {} are not declared in the "
+                              "investigation file: {}".format(
+                                  study_filename, list(
+                                      protocol_parameters_used
+                                      - protocol_parameters_declared)))
+            except FileNotFoundError:
+                pass
+        for j, assay_filename in enumerate(
+                i_df['s_assays'][i]['Study Assay File Name'].tolist()):
+            if assay_filename != '':
+                try:
+                    protocol_parameters_used = set()
+                    assay_df = table_cache.load(
+                        os.path.join(dir_context, assay_filename))
                     parameter_value_cols = [
-                        i for i in study_df.columns
+                        i for i in assay_df.columns
                         if _RX_PARAMETER_VALUE.match(i)]
                     for col in parameter_value_cols:
                         pv = _RX_PARAMETER_VALUE.findall(col)
                         protocol_parameters_used = \
-                            protocol_parameters_used.union(
-                                set(pv))
+                            protocol_parameters_used.union(set(pv))
                     if not protocol_parameters_used.issubset(
                             protocol_parameters_declared):
-                        log.error("(E) Some protocol parameters referenced in "
-                                  "an study file {} are not declared in the "
-                                  "investigation file: {}".format(
-                                      study_filename, list(
+                        log.error("(E) Some protocol parameters "
+                                  "referenced in an assay file {} are "
+                                  "not declared in the investigation "
+                                  "file: {}".format(
+                                      assay_filename, list(
                                           protocol_parameters_used
                                           - protocol_parameters_declared)))
-            except FileNotFoundError:
-                pass
-        for j, assay_filename in enumerate(
-                i_df['s_assays'][i]['Study Assay File Name'].tolist()):
-            if assay_filename != '':
-                try:
-                    protocol_parameters_used = set()
-                    with utf8_text_file_open(os.path.join(
-                            dir_context, assay_filename)) as a_fp:
-                        assay_df = load_table(a_fp)
-                        parameter_value_cols = [
-                            i for i in assay_df.columns
-                            if _RX_PARAMETER_VALUE.match(i)]
-                        for col in parameter_value_cols:
-                            pv = _RX_PARAMETER_VALUE.findall(col)
-                            protocol_parameters_used = \
-                                protocol_parameters_used.union(set(pv))
-                        if not protocol_parameters_used.issubset(
-                                protocol_parameters_declared):
-                            log.error("(E) Some protocol parameters "
-                                      "referenced in an assay file {} are "
-                                      "not declared in the investigation "
-                                      "file: {}".format(
-                                          assay_filename, list(
-                                              protocol_parameters_used
-                                              - protocol_parameters_declared)))
                 except FileNotFoundError:
                     pass
         # now collect all protocol parameters in all assays to compare to
@@ -2899,32 +3234,30 @@ def check_protocol_parameter_usage(i_df, dir_context):
         protocol_parameters_used = set()
         if study_filename != '':
             try:
-                with utf8_text_file_open(
-                        os.path.join(dir_context, study_filename)) as s_fp:
-                    study_df = load_table(s_fp)
-                    parameter_value_cols = [
-                        i for i in study_df.columns
-                        if _RX_PARAMETER_VALUE.match(i)]
-                    for col in parameter_value_cols:
-                        pv = _RX_PARAMETER_VALUE.findall(col)
-                        protocol_parameters_used = \
-                            protocol_parameters_used.union(set(pv))
+                study_df = table_cache.load(
+                    os.path.join(dir_context, study_filename))
+                parameter_value_cols = [
+                    i for i in study_df.columns
+                    if _RX_PARAMETER_VALUE.match(i)]
+                for col in parameter_value_cols:
+                    pv = _RX_PARAMETER_VALUE.findall(col)
+                    protocol_parameters_used = \
+                        protocol_parameters_used.union(set(pv))
             except FileNotFoundError:
                 pass
         for j, assay_filename in enumerate(
                 i_df['s_assays'][i]['Study Assay File Name'].tolist()):
             if assay_filename != '':
                 try:
-                    with utf8_text_file_open(os.path.join(
-                            dir_context, assay_filename)) as a_fp:
-                        assay_df = load_table(a_fp)
-                        parameter_value_cols = [
-                            i for i in assay_df.columns if
-                            _RX_PARAMETER_VALUE.match(i)]
-                        for col in parameter_value_cols:
-                            pv = _RX_PARAMETER_VALUE.findall(col)
-                            protocol_parameters_used = \
-                                protocol_parameters_used.union(set(pv))
+                    assay_df = table_cache.load(
+                        os.path.join(dir_context, assay_filename))
+                    parameter_value_cols = [
+                        i for i in assay_df.columns if
+                        _RX_PARAMETER_VALUE.match(i)]
+                    for col in parameter_value_cols:
+                        pv = _RX_PARAMETER_VALUE.findall(col)
+                        protocol_parameters_used = \
+                            protocol_parameters_used.union(set(pv))
                 except FileNotFoundError:
                     pass
         if len(protocol_parameters_declared - protocol_parameters_used) > 0:
@@ -3032,161 +3365,133 @@ def check_term_source_refs_in_investigation(i_df):
             's_contacts', i, 'Study Person Roles Term Source REF')
 
 
-def check_term_source_refs_in_assay_tables(i_df, dir_context):
+def check_term_source_refs_in_assay_tables(
+        i_df, dir_context, table_cache=None):
     """Used for rules 3007 and 3009
 
     :param i_df: An investigation DataFrame
+    :param dir_context: Path to where the investigation file is found
+    :param table_cache: A TableCache to share parsed tables between checks
     :return: None
     """
 
     import math
+    if table_cache is None:
+        table_cache = TableCache()
     ontology_sources_list = set(get_ontology_source_refs(i_df))
     for i, study_df in enumerate(i_df['studies']):
         study_filename = study_df.iloc[0]['Study File Name']
         if study_filename != '':
             try:
-                with utf8_text_file_open(os.path.join(dir_context,
-                                                      study_filename)) as s_fp:
-                    df = load_table(s_fp)
-                    columns = df.columns
-                    object_index = [i for i, x in enumerate(
-                        columns) if x.startswith('Term Source REF')]
-                    prev_i = object_index[0]
-                    object_columns_list = [columns[prev_i]]
-                    for curr_i in object_index:
-                        if prev_i == curr_i:
-                            pass
-                        else:
-                            object_columns_list.append(columns[curr_i])
-                        prev_i = curr_i
-                    for x, col in enumerate(object_columns_list):
-                        for y, row in enumerate(df[col]):
-                            if row not in ontology_sources_list:
-                                if isinstance(row, float):
-                                    if not math.isnan(row):
-                                        sup_msg = \
-                                            "Ontology sources missing {} at " \
-                                            "column position {} and row {} " \
-                                            "in {} not declared in ontology " \
-                                            "sources {}".format(
-                                                row + 1,
-                                                object_index[x],
-                                                y + 1,
-                                                study_filename,
-                                                list(ontology_sources_list))
-                                        validator_warnings.append({
-                                            "message": "Missing Term Source",
-                                            "supplemental": sup_msg,
-                                            "code": 3009
-                                        })
-                                        oslist = ontology_sources_list
-                                        log.warning("(W) Term Source REF {} "
-                                                    "at column position {} "
-                                                    "and row {} in {} not "
-                                                    "declared in ontology "
-                                                    "sources {}".format(
-                                                        row + 1,
-                                                        object_index[x],
-                                                        y + 1,
-                                                        study_filename,
-                                                        list(oslist)))
-                                else:
-                                    oslist = ontology_sources_list
+                df = table_cache.load(
+                    os.path.join(dir_context, study_filename))
+                columns = df.columns
+                object_index = [i for i, x in enumerate(
+                    columns) if x.startswith('Term Source REF')]
+                prev_i = object_index[0]
+                object_columns_list = [columns[prev_i]]
+                for curr_i in object_index:
+                    if prev_i == curr_i:
+                        pass
+                    else:
+                        object_columns_list.append(columns[curr_i])
+                    prev_i = curr_i
+                for x, col in enumerate(object_columns_list):
+                    for y, row in enumerate(df[col]):
+                        if row not in ontology_sources_list:
+                            if isinstance(row, float):
+                                if not math.isnan(row):
+                                    sup_msg = \
+                                        "Ontology sources missing {} at " \
+                                        "column position {} and row {} " \
+                                        "in {} not declared in ontology " \
+                                        "sources {}".format(
+                                            row + 1,
+                                            object_index[x],
+                                            y + 1,
+                                            study_filename,
+                                            list(ontology_sources_list))
                                     validator_warnings.append({
                                         "message": "Missing Term Source",
-                                        "supplemental": "Ontology sources "
-                                                        "missing {} at column "
-                                                        "position {} and "
-                                                        "row {} in {} not "
-                                                        "declared in ontology "
-                                                        "sources {}".format(
-                                                            row + 1,
-                                                            object_index[x],
-                                                            y + 1,
-                                                            study_filename,
-                                                            list(oslist)),
+                                        "supplemental": sup_msg,
                                         "code": 3009
                                     })
-                                    log.warning("(W) Term Source REF {} at "
-                                                "column position {} and row "
-                                                "{} in {} not in declared "
-                                                "ontology sources {}"
-                                                .format(
+                                    oslist = ontology_sources_list
+                                    log.warning("(W) Term Source REF {} "
+                                                "at column position {} "
+                                                "and row {} in {} not "
+                                                "declared in ontology "
+                                                "sources {}".format(
                                                     row + 1,
                                                     object_index[x],
                                                     y + 1,
                                                     study_filename,
                                                     list(oslist)))
-            except FileNotFoundError:
-                pass
-            for j, assay_filename in enumerate(
-                    i_df['s_assays'][i]['Study Assay File Name'].tolist()):
-                if assay_filename != '':
-                    try:
-                        with utf8_text_file_open(
-                                os.path.join(
-                                    dir_context, assay_filename)) as a_fp:
-                            df = load_table(a_fp)
-                            columns = df.columns
-                            object_index = [i for i, x in enumerate(
-                                columns) if x.startswith('Term Source REF')]
-                            prev_i = object_index[0]
-                            object_columns_list = [columns[prev_i]]
-                            for curr_i in object_index:
-                                if prev_i == curr_i:
-                                    pass
-                                else:
-                                    object_columns_list.append(
-                                        columns[curr_i])
-                                prev_i = curr_i
-                            for x, col in enumerate(object_columns_list):
-                                for y, row in enumerate(df[col]):
-                                    if row not in ontology_sources_list:
-                                        if isinstance(row, float):
-                                            if not math.isnan(row):
-                                                oslist = ontology_sources_list
-                                                sup_msg = \
-                                                    "Ontology sources " \
-                                                    "missing {} at column " \
-                                                    "position {} and " \
-                                                    "row {} in {} not " \
-                                                    "declared in ontology " \
-                                                    "sources {}".format(
-                                                        row + 1,
-                                                        object_index[x],
-                                                        y + 1,
-                                                        study_filename,
-                                                        list(oslist))
-                                                validator_warnings.append({
-                                                    "message": "Missing "
-                                                               "Term Source",
-                                                    "supplemental": sup_msg,
-                                                    "code": 3009
-                                                })
-                                                log.warning(
-                                                    "(W) Term Source REF {} "
-                                                    "at column position {} "
-                                                    "and row {} in {} not "
+                            else:
+                                oslist = ontology_sources_list
+                                validator_warnings.append({
+                                    "message": "Missing Term Source",
+                                    "supplemental": "Ontology sources "
+                                                    "missing {} at column "
+                                                    "position {} and "
+                                                    "row {} in {} not "
                                                     "declared in ontology "
                                                     "sources {}".format(
                                                         row + 1,
                                                         object_index[x],
                                                         y + 1,
                                                         study_filename,
-                                                        list(oslist)))
-                                        else:
+                                                        list(oslist)),
+                                    "code": 3009
+                                })
+                                log.warning("(W) Term Source REF {} at "
+                                            "column position {} and row "
+                                            "{} in {} not in declared "
+                                            "ontology sources {}"
+                                            .format(
+                                                row + 1,
+                                                object_index[x],
+                                                y + 1,
+                                                study_filename,
+                                                list(oslist)))
+            except FileNotFoundError:
+                pass
+            for j, assay_filename in enumerate(
+                    i_df['s_assays'][i]['Study Assay File Name'].tolist()):
+                if assay_filename != '':
+                    try:
+                        df = table_cache.load(
+                            os.path.join(dir_context, assay_filename))
+                        columns = df.columns
+                        object_index = [i for i, x in enumerate(
+                            columns) if x.startswith('Term Source REF')]
+                        prev_i = object_index[0]
+                        object_columns_list = [columns[prev_i]]
+                        for curr_i in object_index:
+                            if prev_i == curr_i:
+                                pass
+                            else:
+                                object_columns_list.append(
+                                    columns[curr_i])
+                            prev_i = curr_i
+                        for x, col in enumerate(object_columns_list):
+                            for y, row in enumerate(df[col]):
+                                if row not in ontology_sources_list:
+                                    if isinstance(row, float):
+                                        if not math.isnan(row):
+                                            oslist = ontology_sources_list
                                             sup_msg = \
-                                                "Ontology sources missing " \
-                                                "{} at column position {} " \
-                                                "and row {} in {} not " \
+                                                "Ontology sources " \
+                                                "missing {} at column " \
+                                                "position {} and " \
+                                                "row {} in {} not " \
                                                 "declared in ontology " \
-                                                "sources {}"\
-                                                .format(
+                                                "sources {}".format(
                                                     row + 1,
                                                     object_index[x],
-                                                    y + 1, study_filename,
-                                                    list(
-                                                        ontology_sources_list))
+                                                    y + 1,
+                                                    study_filename,
+                                                    list(oslist))
                                             validator_warnings.append({
                                                 "message": "Missing "
                                                            "Term Source",
@@ -3194,29 +3499,60 @@ def check_term_source_refs_in_assay_tables(i_df, dir_context):
                                                 "code": 3009
                                             })
                                             log.warning(
-                                                "(W) Term Source REF {} at "
-                                                "column position {} and row "
-                                                "{} in {} not in declared "
-                                                "ontology sources {}"
-                                                .format(
+                                                "(W) Term Source REF {} "
+                                                "at column position {} "
+                                                "and row {} in {} not "
+                                                "declared in ontology "
+                                                "sources {}".format(
                                                     row + 1,
                                                     object_index[x],
-                                                    y + 1, study_filename,
-                                                    list(ontology_sources_list
-                                                         )))
+                                                    y + 1,
+                                                    study_filename,
+                                                    list(oslist)))
+                                    else:
+                                        sup_msg = \
+                                            "Ontology sources missing " \
+                                            "{} at column position {} " \
+                                            "and row {} in {} not " \
+                                            "declared in ontology " \
+                                            "sources {}"\
+                                            .format(
+                                                row + 1,
+                                                object_index[x],
+                                                y + 1, study_filename,
+                                                list(
+                                                    ontology_sources_list))
+                                        validator_warnings.append({
+                                            "message": "Missing "
+                                                       "Term Source",
+                                            "supplemental": sup_msg,
+                                            "code": 3009
+                                        })
+                                        log.warning(
+                                            "(W) Term Source REF {} at "
+                                            "column position {} and row "
+                                            "{} in {} not in declared "
+                                            "ontology sources {}"
+                                            .format(
+                                                row + 1,
+                                                object_index[x],
+                                                y + 1, study_filename,
+                                                list(ontology_sources_list
+                                                     )))
                     except FileNotFoundError:
                         pass
 
 
-def check_term_source_refs_usage(i_df, dir_context):
+def check_term_source_refs_usage(i_df, dir_context, table_cache=None):
     """Checks Term Source REF linkages in investigation, study and assay files
 
     :param i_df: An investigation DataFrame
     :param dir_context: Path to where the investigation file is found
+    :param table_cache: A TableCache to share parsed tables between checks
     :return: None
     """
     check_term_source_refs_in_investigation(i_df)
-    check_term_source_refs_in_assay_tables(i_df, dir_context)
+    check_term_source_refs_in_assay_tables(i_df, dir_context, table_cache)
 
 
 def load_config(config_dir):
@@ -3588,7 +3924,8 @@ def check_assay_table_with_config(
                 "Protocol REF column.")
 
 
-def check_study_assay_tables_against_config(i_df, dir_context, configs):
+def check_study_assay_tables_against_config(
+        i_df, dir_context, configs, table_cache=None):
     """Used for rules 4003-4008. Checks all study and assay tables against
     the configurations, for a given ISA-Tab. It looks first at the
     study and assay tables that are referenced by the investigation.
@@ -3596,8 +3933,11 @@ def check_study_assay_tables_against_config(i_df, dir_context, configs):
     :param i_df: An investigation DataFrame dictionary
     :param dir_context: The path in which the ISA-Tab files are sourced
     :param configs: The loaded set of ISA Configuration XMLs as config objects
+    :param table_cache: A TableCache to share parsed tables between checks
     :return: None
     """
+    if table_cache is None:
+        table_cache = TableCache()
     for i, study_df in enumerate(i_df['studies']):
         study_filename = study_df.iloc[0]['Study File Name']
         protocol_names = i_df['s_protocols'][i]['Study Protocol Name'].tolist()
@@ -3605,14 +3945,13 @@ def check_study_assay_tables_against_config(i_df, dir_context, configs):
         protocol_names_and_types = dict(zip(protocol_names, protocol_types))
         if study_filename != '':
             try:
-                with utf8_text_file_open(os.path.join(
-                        dir_context, study_filename)) as s_fp:
-                    df = load_table(s_fp)
-                    config = configs[('[sample]', '')]
-                    log.debug("Checking study file {} against default study "
-                             "table configuration...".format(study_filename))
-                    check_assay_table_with_config(
-                        df, config, study_filename, protocol_names_and_types)
+                df = table_cache.load(
+                    os.path.join(dir_context, study_filename))
+                config = configs[('[sample]', '')]
+                log.debug("Checking study file {} against default study "
+                         "table configuration...".format(study_filename))
+                check_assay_table_with_config(
+                    df, config, study_filename, protocol_names_and_types)
             except FileNotFoundError:
                 pass
         for j, assay_df in enumerate(i_df['s_assays']):
@@ -3625,21 +3964,20 @@ def check_study_assay_tables_against_config(i_df, dir_context, configs):
                 0]
             if assay_filename != '':
                 try:
-                    with utf8_text_file_open(os.path.join(
-                            dir_context, assay_filename)) as a_fp:
-                        df = load_table(a_fp)
-                        lowered_mt = measurement_type.lower()
-                        lowered_tt = technology_type.lower()
-                        config = configs[(lowered_mt, lowered_tt)]
-                        log.debug("Checking assay file {} against default "
-                                 "table configuration ({}, {})...".format(
-                                     assay_filename, measurement_type,
-                                     technology_type))
-                        check_assay_table_with_config(
-                            df, config, assay_filename,
-                            protocol_names_and_types)
-                        # check_assay_table_with_config(df, protocols, config,
-                        # assay_filename)
+                    df = table_cache.load(
+                        os.path.join(dir_context, assay_filename))
+                    lowered_mt = measurement_type.lower()
+                    lowered_tt = technology_type.lower()
+                    config = configs[(lowered_mt, lowered_tt)]
+                    log.debug("Checking assay file {} against default "
+                             "table configuration ({}, {})...".format(
+                                 assay_filename, measurement_type,
+                                 technology_type))
+                    check_assay_table_with_config(
+                        df, config, assay_filename,
+                        protocol_names_and_types)
+                    # check_assay_table_with_config(df, protocols, config,
+                    # assay_filename)
                 except FileNotFoundError:
                     pass
         # TODO: Check protocol usage - Rule 4009
@@ -4178,8 +4516,9 @@ def check_study_groups(table, filename, study_group_size_in_comment):
 
 
 def validate(fp, config_dir=default_config_dir, log_level=None):
-    """Runs the ISA-Tab validator and builds a validation report. Note that
-    this function uses global variables to collect validation messages
+    """Runs the ISA-Tab validator and builds a validation report. The
+    validation messages are collected apart for each call, so that several
+    validations can run at the same time in different threads
 
     :param fp: A file-like buffer object pointing to the investigation file
     :param config_dir: Full path to the ISA XML configuration directory
@@ -4188,12 +4527,10 @@ def validate(fp, config_dir=default_config_dir, log_level=None):
     :return: A JSON report containing validation messages of different levels,
     e.g. errors, warnings, info.
     """
-    global validator_errors
-    global validator_warnings
-    global validator_info
-    validator_errors = []
-    validator_warnings = []
-    validator_info = []
+    validator_errors.reset()
+    validator_warnings.reset()
+    validator_info.reset()
+    table_cache = TableCache()
     if log_level in (
             logging.NOTSET, logging.DEBUG, logging.INFO, logging.WARNING,
             logging.ERROR, logging.CRITICAL):
@@ -4214,13 +4551,13 @@ def validate(fp, config_dir=default_config_dir, log_level=None):
         # check_table_files_load(i_df, os.path.dirname(fp.name))  # Rules 0007
         # and 0009, covered by later validation?
         check_samples_not_declared_in_study_used_in_assay(
-            i_df, os.path.dirname(fp.name))  # Rule 1003
+            i_df, os.path.dirname(fp.name), table_cache)  # Rule 1003
         check_study_factor_usage(i_df, os.path.dirname(
-            fp.name))  # Rules 1008 and 1021
+            fp.name), table_cache)  # Rules 1008 and 1021
         check_protocol_usage(i_df, os.path.dirname(
-            fp.name))  # Rules 1007 and 1019
+            fp.name), table_cache)  # Rules 1007 and 1019
         check_protocol_parameter_usage(
-            i_df, os.path.dirname(fp.name))  # Rules 1009 and 1020
+            i_df, os.path.dirname(fp.name), table_cache)  # Rules 1009 and 1020
         check_date_formats(i_df)  # Rule 3001
         check_dois(i_df)  # Rule 3002
         check_pubmed_ids_format(i_df)  # Rule 3003
@@ -4259,60 +4596,62 @@ def validate(fp, config_dir=default_config_dir, log_level=None):
                     zip(protocol_names, protocol_types))
                 try:
                     log.info("Loading... {}".format(study_filename))
-                    with utf8_text_file_open(os.path.join(os.path.dirname(
-                            fp.name), study_filename)) as s_fp:
-                        study_sample_table = load_table(s_fp)
-                        study_sample_table.filename = study_filename
-                        config = configs[('[sample]', '')]
-                        log.info("Validating {} against default study table "
-                                 "configuration".format(study_filename))
-                        log.info("Checking Factor Value presence...")
-                        check_factor_value_presence(
-                            study_sample_table)  # Rule 4007
-                        log.info("Checking required fields...")
-                        # Rule 4003-8, 4010
-                        check_required_fields(study_sample_table, config)
-                        log.info("Checking generic fields...")
-                        if not check_field_values(
-                                study_sample_table, config):  # Rule 4011
-                            log.warning("(W) There are some field value "
-                                        "inconsistencies in {} against {} "
-                                        "configuration".format(
-                                            study_sample_table.filename,
-                                            'Study Sample'))
-                        log.info("Checking unit fields...")
-                        if not check_unit_field(study_sample_table, config):
-                            log.warning("(W) There are some unit value "
-                                        "inconsistencies in {} against {} "
-                                        "configuration".format(
-                                            study_sample_table.filename,
-                                            'Study Sample'))
-                        log.info("Checking protocol fields...")
-                        # Rule 4009
-                        if not check_protocol_fields(
-                                study_sample_table, config,
-                                protocol_names_and_types):
-                            log.warning("(W) There are some protocol "
-                                        "inconsistencies in {} against {} "
-                                        "configuration".format(
-                                            study_sample_table.filename,
-                                            'Study Sample'))
-                        log.info("Checking ontology fields...")
-                        # Rule 3010
-                        if not check_ontology_fields(
-                                study_sample_table, config, term_source_refs):
-                            log.warning("(W) There are some ontology "
-                                        "annotation inconsistencies in {} "
-                                        "against {} "
-                                        "configuration".format(
-                                            study_sample_table.filename,
-                                            'Study Sample'))
-                        log.info("Checking study group size...")
-                        check_study_groups(
-                            study_sample_table, study_filename,
-                            study_group_size_in_comment)
-                        log.info("Finished validation on {}".format(
-                            study_filename))
+                    # shallow copy, so that the filename is not set on the
+                    # DataFrame shared through the table cache
+                    study_sample_table = table_cache.load(os.path.join(
+                        os.path.dirname(fp.name), study_filename)).copy(
+                        deep=False)
+                    study_sample_table.filename = study_filename
+                    config = configs[('[sample]', '')]
+                    log.info("Validating {} against default study table "
+                             "configuration".format(study_filename))
+                    log.info("Checking Factor Value presence...")
+                    check_factor_value_presence(
+                        study_sample_table)  # Rule 4007
+                    log.info("Checking required fields...")
+                    # Rule 4003-8, 4010
+                    check_required_fields(study_sample_table, config)
+                    log.info("Checking generic fields...")
+                    if not check_field_values(
+                            study_sample_table, config):  # Rule 4011
+                        log.warning("(W) There are some field value "
+                                    "inconsistencies in {} against {} "
+                                    "configuration".format(
+                                        study_sample_table.filename,
+                                        'Study Sample'))
+                    log.info("Checking unit fields...")
+                    if not check_unit_field(study_sample_table, config):
+                        log.warning("(W) There are some unit value "
+                                    "inconsistencies in {} against {} "
+                                    "configuration".format(
+                                        study_sample_table.filename,
+                                        'Study Sample'))
+                    log.info("Checking protocol fields...")
+                    # Rule 4009
+                    if not check_protocol_fields(
+                            study_sample_table, config,
+                            protocol_names_and_types):
+                        log.warning("(W) There are some protocol "
+                                    "inconsistencies in {} against {} "
+                                    "configuration".format(
+                                        study_sample_table.filename,
+                                        'Study Sample'))
+                    log.info("Checking ontology fields...")
+                    # Rule 3010
+                    if not check_ontology_fields(
+                            study_sample_table, config, term_source_refs):
+                        log.warning("(W) There are some ontology "
+                                    "annotation inconsistencies in {} "
+                                    "against {} "
+                                    "configuration".format(
+                                        study_sample_table.filename,
+                                        'Study Sample'))
+                    log.info("Checking study group size...")
+                    check_study_groups(
+                        study_sample_table, study_filename,
+                        study_group_size_in_comment)
+                    log.info("Finished validation on {}".format(
+                        study_filename))
                 except FileNotFoundError:
                     pass
                 assay_df = i_df['s_assays'][i]
@@ -4350,78 +4689,77 @@ def validate(fp, config_dir=default_config_dir, log_level=None):
                             try:
                                 log.info("Loading... {}".format(
                                     assay_filename))
-                                with utf8_text_file_open(os.path.join(
-                                        os.path.dirname(fp.name),
-                                        assay_filename)) as a_fp:
-                                    assay_table = load_table(a_fp)
-                                    assay_table.filename = assay_filename
-                                    assay_tables.append(assay_table)
-                                    log.info("Validating {} against assay "
-                                             "table configuration ({}, {})..."
-                                             .format(
-                                                 assay_filename,
-                                                 measurement_type,
-                                                 technology_type))
-                                    log.info(
-                                        "Checking Factor Value presence...")
-                                    check_factor_value_presence(
-                                        assay_table)  # Rule 4007
-                                    log.info("Checking required fields...")
-                                    # Rule 4003-8, 4010
-                                    check_required_fields(assay_table, config)
-                                    log.info("Checking generic fields...")
-                                    # Rule 4011
-                                    if not check_field_values(
-                                            assay_table, config):
-                                        log.warning(
-                                            "(W) There are some field value "
-                                            "inconsistencies in {} against {} "
-                                            "configuration".format(
-                                                assay_table.filename,
-                                                (measurement_type,
-                                                 technology_type)))
-                                    log.info("Checking unit fields...")
-                                    if not check_unit_field(
-                                            assay_table, config):
-                                        log.warning("(W) There are some unit "
-                                                    "value inconsistencies in "
-                                                    "{} against {} "
-                                                    "configuration".format(
-                                                        assay_table.filename,
-                                                        (measurement_type,
-                                                         technology_type)))
-                                    log.info("Checking protocol fields...")
-                                    # Rule 4009
-                                    if not check_protocol_fields(
-                                            assay_table, config,
-                                            protocol_names_and_types):
-                                        log.warning("(W) There are some "
-                                                    "protocol inconsistencies "
-                                                    "in {} against {} "
-                                                    "configuration".format(
-                                                        assay_table.filename, (
-                                                            measurement_type,
-                                                            technology_type)))
-                                    log.info("Checking ontology fields...")
-                                    # Rule 3010
-                                    if not check_ontology_fields(
-                                            assay_table, config,
-                                            term_source_refs):
-                                        log.warning("(W) There are some "
-                                                    "ontology annotation "
-                                                    "inconsistencies in {} "
-                                                    "against {} "
-                                                    "configuration".format(
-                                                        assay_table.filename, (
-                                                            measurement_type,
-                                                            technology_type)))
-                                    log.info("Checking study group size...")
-                                    check_study_groups(
-                                        assay_table, assay_filename,
-                                        study_group_size_in_comment)
-                                    log.info("Finished validation on {}"
-                                             .format(
-                                                 assay_filename))
+                                assay_table = table_cache.load(os.path.join(
+                                    os.path.dirname(fp.name),
+                                    assay_filename)).copy(deep=False)
+                                assay_table.filename = assay_filename
+                                assay_tables.append(assay_table)
+                                log.info("Validating {} against assay "
+                                         "table configuration ({}, {})..."
+                                         .format(
+                                             assay_filename,
+                                             measurement_type,
+                                             technology_type))
+                                log.info(
+                                    "Checking Factor Value presence...")
+                                check_factor_value_presence(
+                                    assay_table)  # Rule 4007
+                                log.info("Checking required fields...")
+                                # Rule 4003-8, 4010
+                                check_required_fields(assay_table, config)
+                                log.info("Checking generic fields...")
+                                # Rule 4011
+                                if not check_field_values(
+                                        assay_table, config):
+                                    log.warning(
+                                        "(W) There are some field value "
+                                        "inconsistencies in {} against {} "
+                                        "configuration".format(
+                                            assay_table.filename,
+                                            (measurement_type,
+                                             technology_type)))
+                                log.info("Checking unit fields...")
+                                if not check_unit_field(
+                                        assay_table, config):
+                                    log.warning("(W) There are some unit "
+                                                "value inconsistencies in "
+                                                "{} against {} "
+                                                "configuration".format(
+                                                    assay_table.filename,
+                                                    (measurement_type,
+                                                     technology_type)))
+                                log.info("Checking protocol fields...")
+                                # Rule 4009
+                                if not check_protocol_fields(
+                                        assay_table, config,
+                                        protocol_names_and_types):
+                                    log.warning("(W) There are some "
+                                                "protocol inconsistencies "
+                                                "in {} against {} "
+                                                "configuration".format(
+                                                    assay_table.filename, (
+                                                        measurement_type,
+                                                        technology_type)))
+                                log.info("Checking ontology fields...")
+                                # Rule 3010
+                                if not check_ontology_fields(
+                                        assay_table, config,
+                                        term_source_refs):
+                                    log.warning("(W) There are some "
+                                                "ontology annotation "
+                                                "inconsistencies in {} "
+                                                "against {} "
+                                                "configuration".format(
+                                                    assay_table.filename, (
+                                                        measurement_type,
+                                                        technology_type)))
+                                log.info("Checking study group size...")
+                                check_study_groups(
+                                    assay_table, assay_filename,
+                                    study_group_size_in_comment)
+                                log.info("Finished validation on {}"
+                                         .format(
+                                             assay_filename))
                             except FileNotFoundError:
                                 pass
                         if study_sample_table is not None:
@@ -4437,13 +4775,14 @@ def validate(fp, config_dir=default_config_dir, log_level=None):
                 log.info("Skipping pooling test as there are outstanding "
                          "errors")
             else:
-                from isatools import utils
                 try:
                     fp.seek(0)
                     utils.detect_isatab_process_pooling(fp)
                 except BaseException:
                     pass
         log.info("Finished validation...")
+        log.info("Parsed {} table files and reused them for {} further "
+                 "table loads".format(table_cache.parses, table_cache.hits))
         validation_finished = True
     except ParserError as cpe:
         validator_errors.append({
@@ -4488,17 +4827,38 @@ def validate(fp, config_dir=default_config_dir, log_level=None):
     finally:
         handler.flush()
         return {
-            "errors": validator_errors,
-            "warnings": validator_warnings,
-            "info": validator_info,
+            "errors": validator_errors.get(),
+            "warnings": validator_warnings.get(),
+            "info": validator_info.get(),
             "validation_finished": validation_finished
         }
 
 
-def batch_validate(tab_dir_list):
+def _validate_tab_dir(tab_dir):
+    """Validate the ISA-Tab archive in a directory, as done by batch_validate
+
+    :param tab_dir: File path to the ISA-Tab archive to validate
+    :return: A tuple of the investigation file name and the validation
+    report, or None if the archive has no investigation file
+    """
+    log.info("***Validating {}***\n".format(tab_dir))
+    i_files = glob.glob(os.path.join(tab_dir, 'i_*.txt'))
+    if len(i_files) != 1:
+        log.warning(
+            "Could not find an investigation file, skipping {}".format(
+                tab_dir))
+        return None
+    with utils.utf8_text_file_open(i_files[0]) as fp:
+        return fp.name, validate(fp)
+
+
+def batch_validate(tab_dir_list, workers=None):
     """Validate a batch of ISA-Tab archives
     :param tab_dir_list: List of file paths to the ISA-Tab archives to validate
-    :return: batch report as JSON
+    :param workers: Number of worker processes to validate the archives with.
+    The archives are validated one after another if it is None or 1
+    :return: batch report as JSON, with the reports in the order of
+    tab_dir_list
 
     Example:
         from isatools import isatab
@@ -4506,26 +4866,19 @@ def batch_validate(tab_dir_list):
             '/path/to/study1/',
             '/path/to/study2/'
         ]
-        batch_report = isatab.batch_validate(my_tabs, '/path/to/report.txt')
+        batch_report = isatab.batch_validate(my_tabs, workers=4)
     """
     batch_report = {
         "batch_report": []
     }
-    for tab_dir in tab_dir_list:
-        log.info("***Validating {}***\n".format(tab_dir))
-        i_files = glob.glob(os.path.join(tab_dir, 'i_*.txt'))
-        if len(i_files) != 1:
-            log.warning(
-                "Could not find an investigation file, skipping {}".format(
-                    tab_dir))
-        else:
-            with utf8_text_file_open(i_files[0]) as fp:
-                batch_report['batch_report'].append(
-                    {
-                        "filename": fp.name,
-                        "report": validate(fp)
-                    }
-                )
+    for filename, report in map_validate(
+            _validate_tab_dir, tab_dir_list, workers=workers):
+        batch_report['batch_report'].append(
+            {
+                "filename": filename,
+                "report": report
+            }
+        )
     return batch_report
 
 
@@ -4546,17 +4899,17 @@ def dumps(isa_obj, skip_dump_tables=False,
         dump(isa_obj=isa_obj, output_path=tmp,
              skip_dump_tables=skip_dump_tables,
              write_factor_values_in_assay_table=write_fvs_in_assay_table)
-        with utf8_text_file_open(os.path.join(
+        with utils.utf8_text_file_open(os.path.join(
                 tmp, 'i_investigation.txt')) as i_fp:
             output += os.path.join(tmp, 'i_investigation.txt') + '\n'
             output += i_fp.read()
         for s_file in glob.iglob(os.path.join(tmp, 's_*')):
-            with utf8_text_file_open(s_file) as s_fp:
+            with utils.utf8_text_file_open(s_file) as s_fp:
                 output += "--------\n"
                 output += s_file + '\n'
                 output += s_fp.read()
         for a_file in glob.iglob(os.path.join(tmp, 'a_*')):
-            with utf8_text_file_open(a_file) as a_fp:
+            with utils.utf8_text_file_open(a_file) as a_fp:
                 output += "--------\n"
                 output += a_file + '\n'
                 output += a_fp.read()
@@ -4598,6 +4951,10 @@ def load(isatab_path_or_ifile, skip_load_tables=False):
     """
     # from DF of investigation file
 
+    # identical annotations, e.g. of the same organism in every sample, share
+    # one OntologyAnnotation object
+    ontology_annotations = OntologyAnnotationTable()
+
     def get_ontology_source(term_source_ref):
         try:
             os = ontology_source_map[term_source_ref]
@@ -4605,17 +4962,22 @@ def load(isatab_path_or_ifile, skip_load_tables=False):
             os = None
         return os
 
-    def get_oa(val, accession, ts_ref):
+    def get_oa(val, accession, ts_ref, shared=True):
         """Gets a OntologyAnnotation for a give value, accession and
         term source REF
 
         :param val: Value of the OA
         :param accession: Term Accession Number of the OA
         :param ts_ref: Term Source REF of the OA
+        :param shared: Whether the OA may be shared with the identical ones,
+        i.e. whether it is left as it is once loaded
         :return: An OntologyAnnotation object
         """
         if val == '' and accession == '':
             return None
+        elif shared:
+            return ontology_annotations.get(
+                val, get_ontology_source(ts_ref), accession)
         else:
             return OntologyAnnotation(
                 term=val,
@@ -4637,7 +4999,7 @@ def load(isatab_path_or_ifile, skip_load_tables=False):
         # if no acc or ts_refs
         if accession_split == [''] and ts_refs_split == ['']:
             for val in vals.split(';'):
-                oa_list.append(OntologyAnnotation(term=val, ))
+                oa_list.append(ontology_annotations.get(val))
         else:  # try parse all three sections
             for _, val in enumerate(vals.split(';')):
                 oa = get_oa(val, accessions.split(
@@ -4748,7 +5110,7 @@ def load(isatab_path_or_ifile, skip_load_tables=False):
         if os.path.isdir(isatab_path_or_ifile):
             fnames = glob.glob(os.path.join(isatab_path_or_ifile, "i_*.txt"))
             assert len(fnames) == 1
-            FP = utf8_text_file_open(fnames[0])
+            FP = utils.utf8_text_file_open(fnames[0])
     elif hasattr(isatab_path_or_ifile, 'read'):
         FP = isatab_path_or_ifile
     else:
@@ -4803,7 +5165,8 @@ def load(isatab_path_or_ifile, skip_load_tables=False):
                 design_descriptor = get_oa(
                     row['Study Design Type'],
                     row['Study Design Type Term Accession Number'],
-                    row['Study Design Type Term Source REF'])
+                    row['Study Design Type Term Source REF'],
+                    shared=False)
                 these_comments = get_comments_row(
                     df_dict['s_design_descriptors'][i].columns, row)
                 design_descriptor.comments = these_comments
@@ -4854,8 +5217,9 @@ def load(isatab_path_or_ifile, skip_load_tables=False):
                     ProcessSequenceFactory(
                         ontology_sources=iosrs,
                         study_protocols=study.protocols,
-                        study_factors=study.factors).create_from_df(
-                        study_tfile_df)
+                        study_factors=study.factors,
+                        ontology_annotations=ontology_annotations
+                    ).create_from_df(study_tfile_df)
                 study.sources = sorted(
                     list(sources.values()), key=lambda x: x.name,
                     reverse=False)
@@ -4915,8 +5279,9 @@ def load(isatab_path_or_ifile, skip_load_tables=False):
                             ontology_sources=iosrs,
                             study_samples=study.samples,
                             study_protocols=study.protocols,
-                            study_factors=study.factors).create_from_df(
-                            assay_tfile_df)
+                            study_factors=study.factors,
+                            ontology_annotations=ontology_annotations
+                        ).create_from_df(assay_tfile_df)
                     assay.samples = sorted(
                         list(samples.values()), key=lambda x: x.name,
                         reverse=False)
@@ -5043,8 +5408,70 @@ def process_keygen(protocol_ref, column_group,
     return process_key
 
 
+def process_keys(column_group, object_label_index, all_columns, DF):
+    """Generate the process keys of every row of a table in one go.
+
+    The keys are the same as calling process_keygen on each row in turn, but
+    are worked out on whole columns of the table rather than row by row.
+
+    :param column_group: List of column headers for the Protocol REF in
+    context, e.g. [Protocol REF, Parameter Value[Instrument], Date]
+    :param object_label_index: Index of the main object label, e.g. Sample Name
+    :param all_columns: List of all column headers
+    :param DF: The whole table's DataFrame
+    :return: A list of process keys, one for each row of DF
+    """
+    name_column_hits = [n for n in column_group if n in _LABELS_ASSAY_NODES]
+    if len(name_column_hits) == 1:
+        return list(DF[name_column_hits[0]])
+
+    protocol_refs = DF[column_group[0]].astype(str)
+    node_cols = [i for i, c in enumerate(
+        all_columns) if c in _LABELS_MATERIAL_NODES + _LABELS_DATA_NODES]
+    input_node_values = ''
+    output_node_values = ''
+    output_node_index = find_gt(node_cols, object_label_index)
+    if output_node_index > -1:
+        output_node_values = DF[all_columns[output_node_index]].astype(str)
+
+    input_node_index = find_lt(node_cols, object_label_index)
+    if input_node_index > -1:
+        input_node_values = DF[all_columns[input_node_index]].astype(str)
+
+    input_nodes_with_prot_keys = DF[[
+        all_columns[object_label_index],
+        all_columns[input_node_index]]].drop_duplicates()
+    output_nodes_with_prot_keys = DF[[
+        all_columns[object_label_index],
+        all_columns[output_node_index]]].drop_duplicates()
+
+    if len(input_nodes_with_prot_keys) > len(output_nodes_with_prot_keys):
+        node_keys = output_node_values
+    else:
+        node_keys = input_node_values
+
+    pv_cols = [c for c in column_group if c.startswith('Parameter Value[')]
+    if len(pv_cols) > 0:
+        pv_values = DF[pv_cols[0]].astype(str)
+        for pv_col in pv_cols[1:]:
+            pv_values = pv_values + '/' + DF[pv_col].astype(str)
+        keys = node_keys + ':' + protocol_refs + ':' + pv_values
+    else:
+        keys = node_keys + '/' + protocol_refs
+
+    date_col_hits = [c for c in column_group if c.startswith('Date')]
+    if len(date_col_hits) == 1:
+        keys = keys + ':' + DF[date_col_hits[0]]
+
+    performer_col_hits = [c for c in column_group if c.startswith('Performer')]
+    if len(performer_col_hits) == 1:
+        keys = keys + ':' + DF[performer_col_hits[0]]
+
+    return list(keys)
+
+
 def get_value(object_column, column_group, object_series,
-              ontology_source_map, unit_categories):
+              ontology_source_map, unit_categories, ontology_annotations=None):
     """Gets the appropriate value for a give column group
 
     :param object_column: The object's column header name, e.g. Sample Name
@@ -5053,6 +5480,8 @@ def get_value(object_column, column_group, object_series,
     :param ontology_source_map: A mapping to the OntologySource objects
     created after parsing the investigation file
     :param unit_categories: A map of unit categories to reference
+    :param ontology_annotations: An OntologyAnnotationTable to share the
+    OntologyAnnotation values with the identical ones, if any
     :return: The appropriate value and unit according to the columns parsed,
     e.g. (str, None) (float, Unit), (OntologyAnnotation, None)
     """
@@ -5072,21 +5501,31 @@ def get_value(object_column, column_group, object_series,
     if offset_1r_col.startswith('Term Source REF') \
             and offset_2r_col.startswith('Term Accession Number'):
 
-        value = OntologyAnnotation(term=str(cell_value))
+        term_source = None
 
         term_source_value = object_series[offset_1r_col]
 
         if term_source_value != '':
 
             try:
-                value.term_source = ontology_source_map[term_source_value]
+                term_source = ontology_source_map[term_source_value]
             except KeyError:
                 log.debug('term source: ', term_source_value, ' not found')
 
+        term_accession = ''
+
         term_accession_value = object_series[offset_2r_col]
 
         if term_accession_value != '':
-            value.term_accession = str(term_accession_value)
+            term_accession = str(term_accession_value)
+
+        if ontology_annotations is None:
+            value = OntologyAnnotation(term=str(cell_value),
+                                       term_source=term_source,
+                                       term_accession=term_accession)
+        else:
+            value = ontology_annotations.get(
+                str(cell_value), term_source, term_accession)
 
         return value, None
 
@@ -5226,7 +5665,7 @@ def read_tfile(tfile_path, index_col=None, factor_filter=None):
     :return: A table file DataFrame
     """
     log.debug("Opening %s", tfile_path)
-    with utf8_text_file_open(tfile_path) as tfile_fp:
+    with utils.utf8_text_file_open(tfile_path) as tfile_fp:
         log.debug("Reading file header")
         tfile_fp.seek(0)
         log.debug("Reading file into DataFrame")
@@ -5384,11 +5823,15 @@ class ProcessSequenceFactory:
     process sequences representing the experimental graphs"""
 
     def __init__(self, ontology_sources=None, study_samples=None,
-                 study_protocols=None, study_factors=None):
+                 study_protocols=None, study_factors=None,
+                 ontology_annotations=None):
         self.ontology_sources = ontology_sources
         self.samples = study_samples
         self.protocols = study_protocols
         self.factors = study_factors
+        if ontology_annotations is None:
+            ontology_annotations = OntologyAnnotationTable()
+        self.ontology_annotations = ontology_annotations
 
     def create_from_df(self, DF):
         """Create the process sequences from the table DataFrame
@@ -5475,8 +5918,8 @@ class ProcessSequenceFactory:
                         lextract.characteristics = [
                             Characteristic(
                                 category=category,
-                                value=OntologyAnnotation(
-                                    term=DF.loc[_, 'Label'])
+                                value=self.ontology_annotations.get(
+                                    DF.loc[_, 'Label'])
                             )
                         ]
                         other_material[
@@ -5519,6 +5962,21 @@ class ProcessSequenceFactory:
                 n = data[lk]
             return n
 
+        def iterrecords(columns, positions=None):
+            # rows as plain dicts of column label to value, which is all that
+            # get_value needs and much cheaper to build than a Series
+            values = DF[columns].values
+            if positions is None:
+                positions = range(len(values))
+            return (dict(zip(columns, values[i])) for i in positions)
+
+        def first_positions(frame):
+            # positions of the first occurrence of each distinct row
+            return np.flatnonzero(~frame.duplicated().values)
+
+        # process keys of every row, per Protocol REF column group
+        process_key_columns = []
+
         for _cg, column_group in enumerate(object_column_map):
             # for each object, parse column group
 
@@ -5535,8 +5993,13 @@ class ProcessSequenceFactory:
                 else:
                     def pbar(x): return x
 
-                for _, object_series in pbar(
-                        DF[column_group].drop_duplicates().iterrows()):
+                charac_columns = [
+                    c for c in column_group if c.startswith('Characteristics[')]
+                comment_columns = [
+                    c for c in column_group if c.startswith('Comment[')]
+
+                for object_series in pbar(iterrecords(
+                        column_group, first_positions(DF[column_group]))):
                     node_name = str(object_series[object_label])
                     node_key = ":".join([object_label, node_name])
                     material = None
@@ -5558,9 +6021,7 @@ class ProcessSequenceFactory:
 
                     if material is not None:
 
-                        for charac_column in [
-                            c for c in column_group if c.startswith(
-                                'Characteristics[')]:
+                        for charac_column in charac_columns:
 
                             category_key = next(iter(
                                 _RX_CHARACTERISTICS.findall(charac_column)))
@@ -5578,7 +6039,8 @@ class ProcessSequenceFactory:
 
                             v, u = get_value(
                                 charac_column, column_group, object_series,
-                                ontology_source_map, unit_categories)
+                                ontology_source_map, unit_categories,
+                                self.ontology_annotations)
 
                             characteristic.value = v
                             characteristic.unit = u
@@ -5593,9 +6055,7 @@ class ProcessSequenceFactory:
                             else:
                                 material.characteristics.append(characteristic)
 
-                        for comment_column in [
-                            c for c in column_group if c.startswith(
-                                'Comment[')]:
+                        for comment_column in comment_columns:
                             comment_key = next(iter(
                                 _RX_COMMENT.findall(comment_column)))
                             if comment_key not in [
@@ -5606,46 +6066,6 @@ class ProcessSequenceFactory:
                                         value=str(
                                             object_series[comment_column])))
 
-                for _, object_series in pbar(DF.drop_duplicates().iterrows()):
-                    node_name = str(object_series['Sample Name'])
-                    node_key = ":".join(['Sample Name', node_name])
-                    material = None
-                    try:
-                        material = samples[node_key]
-                    except KeyError:
-                        pass  # skip if object not found
-                    if isinstance(
-                            material, Sample) and self.factors is not None:
-
-                        for fv_column in [
-                            c for c in DF.columns if c.startswith(
-                                'Factor Value[')]:
-
-                            category_key = next(iter(
-                                _RX_FACTOR_VALUE.findall(fv_column)))
-
-                            factor_hits = [
-                                f for f in self.factors if
-                                f.name == category_key]
-
-                            if len(factor_hits) == 1:
-                                factor = factor_hits[0]
-                            else:
-                                raise ValueError(
-                                    'Could not resolve Study Factor from '
-                                    'Factor Value ', category_key)
-                            fv = FactorValue(factor_name=factor)
-
-                            v, u = get_value(
-                                fv_column, DF.columns, object_series,
-                                ontology_source_map, unit_categories)
-
-                            fv.value = v
-                            fv.unit = u
-                            fv_set = set(material.factor_values)
-                            fv_set.add(fv)
-                            material.factor_values = list(fv_set)
-
             elif object_label in _LABELS_DATA_NODES:
                 if isa_logging.show_pbars:
                     pbar = ProgressBar(
@@ -5654,14 +6074,16 @@ class ProcessSequenceFactory:
                             Bar(left=" |", right="| "), ETA()]).start()
                 else:
                     def pbar(x): return x
-                for _, object_series in pbar(
-                        DF[column_group].drop_duplicates().iterrows()):
+
+                comment_columns = [
+                    c for c in column_group if c.startswith('Comment[')]
+
+                for object_series in pbar(iterrecords(
+                        column_group, first_positions(DF[column_group]))):
                     try:
                         data_file = get_node_by_label_and_key(
                             object_label, str(object_series[object_label]))
-                        for comment_column in [
-                            c for c in column_group if c.startswith(
-                                'Comment[')]:
+                        for comment_column in comment_columns:
                             comment_key = next(iter(
                                 _RX_COMMENT.findall(comment_column)))
                             if comment_key not in [
@@ -5685,16 +6107,56 @@ class ProcessSequenceFactory:
                 else:
                     def pbar(x): return x
 
-                # don't drop duplicates
-                for _, object_series in pbar(DF.iterrows()):
-                    # if _ == 0:
-                    protocol_ref = str(object_series[object_label])
-                    process_key = process_keygen(
-                        protocol_ref, column_group, _cg, DF.columns,
-                        object_series, _, DF)
+                process_key_column = process_keys(
+                    column_group, _cg, DF.columns, DF)
+                process_key_columns.append(process_key_column)
+
+                # the nodes linked to the processes only depend on the header
+                output_node_index = find_gt(node_cols, object_label_index)
+                output_proc_index = find_gt(proc_cols, object_label_index)
+
+                post_chained_protocol = any(
+                    col_name for col_name in DF.columns[(object_label_index + 1): output_node_index].values
+                    if col_name.startswith('Protocol REF')
+                )
+
+                link_outputs = (output_proc_index < output_node_index > -1 and not post_chained_protocol) \
+                    or (output_proc_index > output_node_index)
+
+                input_node_index = find_lt(node_cols, object_label_index)
+                input_proc_index = find_lt(proc_cols, object_label_index)
+
+                previous_chained_protocol = any(
+                    col_name for col_name in DF.columns[input_node_index: (object_label_index - 1)].values
+                    if col_name.startswith('Protocol REF')
+                )
 
-                    # TODO: Keep process key sequence here to reduce number of
-                    # passes on Protocol REF columns?
+                link_inputs = input_proc_index < input_node_index > -1 and not previous_chained_protocol
+
+                name_column_hits = [n for n in column_group
+                                    if n in _LABELS_ASSAY_NODES]
+                pv_columns = [c for c in column_group
+                              if c.startswith('Parameter Value[')]
+                comment_columns = [c for c in column_group
+                                   if c.startswith('Comment[')]
+
+                # rows repeating a process key with the same input and output
+                # nodes as an earlier row do not change anything
+                node_frame = pd.DataFrame({'process key': process_key_column})
+                if link_outputs:
+                    output_node_label = DF.columns[output_node_index]
+                    output_node_values = DF[output_node_label].values
+                    node_frame['output'] = output_node_values
+                if link_inputs:
+                    input_node_label = DF.columns[input_node_index]
+                    input_node_values = DF[input_node_label].values
+                    node_frame['input'] = input_node_values
+                positions = first_positions(node_frame)
+
+                for position, object_series in zip(positions, pbar(
+                        iterrecords(column_group, positions))):
+                    protocol_ref = str(object_series[object_label])
+                    process_key = process_key_column[position]
 
                     try:
                         process = processes[process_key]
@@ -5702,21 +6164,9 @@ class ProcessSequenceFactory:
                         process = Process(executes_protocol=protocol_ref)
                         processes.update(dict([(process_key, process)]))
 
-                    output_node_index = find_gt(node_cols, object_label_index)
-                    output_proc_index = find_gt(proc_cols, object_label_index)
-
-                    post_chained_protocol = any(
-                        col_name for col_name in DF.columns[(object_label_index + 1): output_node_index].values
-                        if col_name.startswith('Protocol REF')
-                    )
-
-                    if (output_proc_index < output_node_index > -1 and not post_chained_protocol) or (output_proc_index > output_node_index):
-
-                        output_node_label = DF.columns[output_node_index]
-                        output_node_value = str(
-                            object_series[output_node_label])
+                    if link_outputs:
 
-                        node_key = output_node_value
+                        node_key = str(output_node_values[position])
 
                         output_node = None
 
@@ -5731,20 +6181,9 @@ class ProcessSequenceFactory:
 
                             process.outputs.append(output_node)
 
-                    input_node_index = find_lt(node_cols, object_label_index)
-                    input_proc_index = find_lt(proc_cols, object_label_index)
-
-                    previous_chained_protocol = any(
-                        col_name for col_name in DF.columns[input_node_index: (object_label_index - 1)].values
-                        if col_name.startswith('Protocol REF')
-                    )
+                    if link_inputs:
 
-                    if input_proc_index < input_node_index > -1 and not previous_chained_protocol:
-
-                        input_node_label = DF.columns[input_node_index]
-                        input_node_value = str(object_series[input_node_label])
-
-                        node_key = input_node_value
+                        node_key = str(input_node_values[position])
 
                         input_node = None
 
@@ -5759,14 +6198,10 @@ class ProcessSequenceFactory:
 
                             process.inputs.append(input_node)
 
-                    name_column_hits = [n for n in column_group
-                                        if n in _LABELS_ASSAY_NODES]
-
                     if len(name_column_hits) == 1:
                         process.name = str(object_series[name_column_hits[0]])
 
-                    for pv_column in [c for c in column_group if c.startswith(
-                            'Parameter Value[')]:
+                    for pv_column in pv_columns:
 
                         category_key = next(iter(
                             _RX_PARAMETER_VALUE.findall(pv_column)))
@@ -5796,16 +6231,15 @@ class ProcessSequenceFactory:
                             parameter_value = ParameterValue(category=category)
                             v, u = get_value(
                                 pv_column, column_group, object_series,
-                                ontology_source_map, unit_categories)
+                                ontology_source_map, unit_categories,
+                                self.ontology_annotations)
 
                             parameter_value.value = v
                             parameter_value.unit = u
 
                             process.parameter_values.append(parameter_value)
 
-                    for comment_column in \
-                            [c for c in column_group
-                             if c.startswith('Comment[')]:
+                    for comment_column in comment_columns:
                         comment_key = next(iter(
                             _RX_COMMENT.findall(comment_column)))
                         if comment_key not in \
@@ -5815,6 +6249,56 @@ class ProcessSequenceFactory:
                                         value=str(
                                             object_series[comment_column])))
 
+        fv_columns = [c for c in DF.columns if c.startswith('Factor Value[')]
+        if self.factors is not None and fv_columns and any(
+                column_group[0] in _LABELS_MATERIAL_NODES
+                for column_group in object_column_map):
+            # a Factor Value may be qualified by up to three columns to its
+            # right, the unit or term source and accession
+            fv_context = ['Sample Name']
+            for fv_column in fv_columns:
+                fv_index = list(DF.columns).index(fv_column)
+                fv_context += [c for c in DF.columns[fv_index:fv_index + 4]
+                               if c not in fv_context]
+
+            for object_series in iterrecords(
+                    fv_context, first_positions(DF[fv_context])):
+                node_name = str(object_series['Sample Name'])
+                node_key = ":".join(['Sample Name', node_name])
+                material = None
+                try:
+                    material = samples[node_key]
+                except KeyError:
+                    pass  # skip if object not found
+                if isinstance(material, Sample):
+
+                    for fv_column in fv_columns:
+
+                        category_key = next(iter(
+                            _RX_FACTOR_VALUE.findall(fv_column)))
+
+                        factor_hits = [
+                            f for f in self.factors if
+                            f.name == category_key]
+
+                        if len(factor_hits) == 1:
+                            factor = factor_hits[0]
+                        else:
+                            raise ValueError(
+                                'Could not resolve Study Factor from '
+                                'Factor Value ', category_key)
+                        fv = FactorValue(factor_name=factor)
+
+                        v, u = get_value(
+                            fv_column, DF.columns, object_series,
+                            ontology_source_map, unit_categories,
+                            self.ontology_annotations)
+
+                        fv.value = v
+                        fv.unit = u
+                        if fv not in material.factor_values:
+                            material.factor_values.append(fv)
+
         # now go row by row pulling out processes and linking them accordingly
         if isa_logging.show_pbars:
             pbar = ProgressBar(
@@ -5824,54 +6308,60 @@ class ProcessSequenceFactory:
                          ETA()]).start()
         else:
             def pbar(x): return x
-        for _, object_series in pbar(DF.iterrows()):  # don't drop duplicates
-            process_key_sequence = list()
-            source_node_context = None
-            sample_node_context = None
-            for _cg, column_group in enumerate(object_column_map):
-                # for each object, parse column group
-                object_label = column_group[0]
-
-                if object_label.startswith('Source Name'):
-                    try:
-                        source_node_context = get_node_by_label_and_key(
-                            object_label, str(object_series[object_label]))
-                    except KeyError:
-                        pass  # skip if object not found
 
-                if object_label.startswith('Sample Name'):
-                    try:
-                        sample_node_context = get_node_by_label_and_key(
-                            object_label, str(object_series[object_label]))
-                    except KeyError:
-                        pass  # skip if object not found
-                    if source_node_context is not None:
-                        if source_node_context not in \
-                                sample_node_context.derives_from:
-                            sample_node_context.derives_from.append(
-                                source_node_context)
-
-                if object_label.startswith('Protocol REF'):
-                    protocol_ref = str(object_series[object_label])
-                    process_key = process_keygen(
-                        protocol_ref, column_group, _cg, DF.columns,
-                        object_series, _, DF)
-                    process_key_sequence.append(process_key)
-
-                if object_label.endswith(' File'):
-                    data_node = None
-                    try:
-                        data_node = get_node_by_label_and_key(
-                            object_label, str(object_series[object_label]))
-                    except KeyError:
-                        pass  # skip if object not found
-                    if sample_node_context is not None and \
-                            data_node is not None:
-                        if sample_node_context not in data_node.generated_from:
-                            data_node.generated_from.append(
-                                sample_node_context)
+        # the Source, Sample and data file columns give the derives_from and
+        # generated_from links, so only distinct combinations of them matter
+        context_labels = [
+            column_group[0] for column_group in object_column_map
+            if column_group[0].startswith(('Source Name', 'Sample Name'))
+            or column_group[0].endswith(' File')]
+        if context_labels:
+            for object_series in pbar(iterrecords(
+                    context_labels, first_positions(DF[context_labels]))):
+                source_node_context = None
+                sample_node_context = None
+                for object_label in context_labels:
+
+                    if object_label.startswith('Source Name'):
+                        try:
+                            source_node_context = get_node_by_label_and_key(
+                                object_label, str(object_series[object_label]))
+                        except KeyError:
+                            pass  # skip if object not found
 
-            # Link the processes in each sequence
+                    if object_label.startswith('Sample Name'):
+                        try:
+                            sample_node_context = get_node_by_label_and_key(
+                                object_label, str(object_series[object_label]))
+                        except KeyError:
+                            pass  # skip if object not found
+                        if source_node_context is not None:
+                            if source_node_context not in \
+                                    sample_node_context.derives_from:
+                                sample_node_context.derives_from.append(
+                                    source_node_context)
+
+                    if object_label.endswith(' File'):
+                        data_node = None
+                        try:
+                            data_node = get_node_by_label_and_key(
+                                object_label, str(object_series[object_label]))
+                        except KeyError:
+                            pass  # skip if object not found
+                        if sample_node_context is not None and \
+                                data_node is not None:
+                            if sample_node_context not in data_node.generated_from:
+                                data_node.generated_from.append(
+                                    sample_node_context)
+
+        # Link the processes in each sequence. A later link of a process
+        # replaces an earlier one, so each distinct sequence of process keys
+        # is linked in the order of its last occurrence in the table
+        process_key_sequences = dict()
+        for process_key_sequence in zip(*process_key_columns):
+            process_key_sequences.pop(process_key_sequence, None)
+            process_key_sequences[process_key_sequence] = None
+        for process_key_sequence in process_key_sequences:
             for pair in pairwise(process_key_sequence):
                 left = processes[pair[0]]  # get process on left of pair
                 r = processes[pair[1]]  # get process on right of pair
@@ -5987,7 +6477,7 @@ class IsaTabParser(object):
                         'studycontacts')
         isecdict = {}
         ssecdicts = []
-        with utf8_text_file_open(in_filename) as in_file:
+        with utils.utf8_text_file_open(in_filename) as in_file:
             tabreader = csv.reader(
                 filter(lambda r: r[0] != '#', in_file), dialect='excel-tab')
             current_section = ''
@@ -6219,24 +6709,85 @@ def parse_in(in_filename, in_format='isa-tab'):
     parser.parse_investigation(in_filename)
 
 
+class CommentStrippedReader(io.TextIOBase):
+    """A read-only text file that reads another one without its comment lines,
+    indicated by a # at start of line, and without its blank lines
+
+    The underlying file is read only as it is needed, so that pandas can read
+    a table through it without a copy of the file being made first. Whole
+    lines are read at a time, so tell and seek work as on the underlying file
+    except after a partial read.
+    """
+
+    _RX_STRIPPED_LINES = re.compile(r'^\s*(?:#.*)?(?:\n|$)', re.MULTILINE)
+
+    def __init__(self, in_fp):
+        self._in_fp = in_fp
+        self._pending = ''
+        if not isinstance(in_fp, StringIO):
+            self.name = in_fp.name
+
+    def _next_line(self):
+        for line in iter(self._in_fp.readline, ''):
+            if line.strip() and not line.lstrip().startswith('#'):
+                return line
+        return ''
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return self._in_fp.seekable()
+
+    def readline(self, size=-1):
+        if self._pending:
+            line, self._pending = self._pending, ''
+        else:
+            line = self._next_line()
+        if size is not None and 0 <= size < len(line):
+            line, self._pending = line[:size], line[size:]
+        return line
+
+    def read(self, size=-1):
+        if size is None or size < 0:
+            data = self._pending + self._RX_STRIPPED_LINES.sub(
+                '', self._in_fp.read())
+            self._pending = ''
+            return data
+        chunks = [self._pending]
+        length = len(self._pending)
+        while length < size:
+            block = self._in_fp.read(size)
+            if not block:
+                break
+            if not block.endswith('\n'):
+                block += self._in_fp.readline()
+            block = self._RX_STRIPPED_LINES.sub('', block)
+            chunks.append(block)
+            length += len(block)
+        data = ''.join(chunks)
+        data, self._pending = data[:size], data[size:]
+        return data
+
+    def tell(self):
+        if self._pending:
+            raise io.UnsupportedOperation(
+                'cannot tell the position in the middle of a line')
+        return self._in_fp.tell()
+
+    def seek(self, offset, whence=io.SEEK_SET):
+        self._pending = ''
+        return self._in_fp.seek(offset, whence)
+
+
 def strip_comments(in_fp):
     """Strip out comment lines indicated by a # at start of line from a given
     file
 
     :param in_fp: A file-like buffer object
-    :return: A memory file buffer object with comments stripped out
+    :return: A file-like buffer object reading in_fp with comments stripped out
     """
-    out_fp = StringIO()
-    if not isinstance(in_fp, StringIO):
-        out_fp.name = in_fp.name
-    for line in in_fp.readlines():
-        log.debug('processing line: {}'.format(line))
-        if line.lstrip().startswith('#'):
-            log.debug('stripping line:'.format(line))
-        elif len(line.strip()) > 0:
-            out_fp.write(line)
-    out_fp.seek(0)
-    return out_fp
+    return CommentStrippedReader(in_fp)
 
 
 # isaslicer commands
@@ -6325,93 +6876,214 @@ def isatab_get_data_files_collection_command(
     log.info("Finished writing data files to {}".format(output_path))
 
 
-def slice_data_files(dir, factor_selection=None):
+_DATA_NODE_LABELS = [
+    'Raw Data File', 'Raw Spectral Data File', 'Derived Spectral Data File',
+    'Derived Array Data File', 'Array Data File', 'Protein Assignment File',
+    'Peptide Assignment File',
+    'Post Translational Modification Assignment File',
+    'Acquisition Parameter Data File', 'Free Induction Decay Data File',
+    'Derived Array Data Matrix File', 'Image File', 'Derived Data File',
+    'Metabolite Assignment File']
+
+
+class SliceTable(object):
+    """A study or assay table indexed by sample, with the row positions of
+    each sample name and the samples of each factor value.
+    """
+
+    def __init__(self, df):
+        self.df = df
+        self.sample_rows = dict()
+        if 'Sample Name' in df.columns:
+            for i, sample_name in enumerate(df['Sample Name'].tolist()):
+                self.sample_rows.setdefault(sample_name, []).append(i)
+        self._columns = dict()
+        self._factor_samples = dict()
+
+    def column(self, label):
+        """Gets the values of a column of the table
+
+        :param label: The column label
+        :return: List of the values of the column, by row position
+        """
+        try:
+            return self._columns[label]
+        except KeyError:
+            values = self._columns[label] = self.df[label].tolist()
+            return values
+
+    def factor_samples(self, factor_name):
+        """Gets the samples of each value of a factor
+
+        :param factor_name: The factor name
+        :return: Dict of the sample names of each factor value, in the order
+        of the table, or None if the table has no such factor
+        """
+        label = 'Factor Value[{}]'.format(factor_name)
+        if label not in self.df.columns:
+            return None
+        try:
+            return self._factor_samples[label]
+        except KeyError:
+            samples = self._factor_samples[label] = dict()
+            for factor_value, sample_name in zip(
+                    self.column(label), self.column('Sample Name')):
+                samples.setdefault(factor_value, []).append(sample_name)
+            return samples
+
+    def data_files(self, rows):
+        """Gets the data files of rows of the table
+
+        :param rows: List of row positions
+        :return: List of the data files of each data node column, in the
+        order of rows
+        """
+        data_files = []
+        for node_label in _DATA_NODE_LABELS:
+            if node_label in self.df.columns:
+                values = self.column(node_label)
+                data_files.extend(values[i] for i in rows)
+        return data_files
+
+
+class SliceIndex(object):
+    """Indexes the tables of an ISA-Tab by sample for the slicer queries, so
+    that each table file is parsed once and the samples, their factor values
+    and their data files are looked up instead of scanning the tables again
+    for each sample.
+
+    The tables are held in a TableCache and indexed again once their file
+    changes on disk, as is the investigation once any of the ISA-Tab files
+    changes. get_slice_index keeps the index of an ISA-Tab between queries.
+    """
+
+    def __init__(self, dir):
+        self.dir = dir
+        self.table_cache = TableCache()
+        self._tables = dict()
+        self._investigation = None
+        self._investigation_key = None
+        self._sample_data_files = None
+
+    def table(self, path):
+        """Gets a table file of the ISA-Tab indexed by sample
+
+        :param path: Path to a study or assay table file
+        :return: A SliceTable
+        """
+        df = self.table_cache.load(path)
+        path = os.path.abspath(path)
+        table = self._tables.get(path)
+        if table is None or table.df is not df:
+            table = self._tables[path] = SliceTable(df)
+        return table
+
+    def investigation(self):
+        """Gets the ISA-Tab loaded with load, loading it again if any of its
+        files changed since. The objects are shared between the queries
+        using the index.
+
+        :return: An Investigation object
+        """
+        key = sorted(
+            (path, os.stat(path).st_mtime_ns) for path in
+            glob.iglob(os.path.join(self.dir, '[isa]_*')))
+        if key != self._investigation_key:
+            self._investigation = load(self.dir)
+            self._investigation_key = key
+            self._sample_data_files = None
+        return self._investigation
+
+    def sample_data_files(self, sample_name):
+        """Gets the data files generated from a sample
+
+        :param sample_name: A sample name
+        :return: A list of DataFile objects
+        """
+        investigation = self.investigation()
+        if self._sample_data_files is None:
+            self._sample_data_files = defaultdict(list)
+            for study in investigation.studies:
+                for assay in study.assays:
+                    for data in assay.data_files:
+                        for name in {x.name for x in data.generated_from}:
+                            self._sample_data_files[name].append(data)
+        return list(self._sample_data_files.get(sample_name, []))
+
+
+@functools.lru_cache(maxsize=1)
+def _get_slice_index(dir):
+    return SliceIndex(dir)
+
+
+def get_slice_index(dir):
+    """Gets the SliceIndex of an ISA-Tab, kept between calls as long as
+    the same ISA-Tab is queried. Only the most recently queried one is
+    kept, as its index may hold the whole loaded Investigation
+
+    :param dir: Path to an ISA-Tab directory
+    :return: A SliceIndex
+    """
+    return _get_slice_index(os.path.abspath(dir))
+
+
+def slice_data_files(dir, factor_selection=None, index=None):
     """Slices ISA-Tab tables based on a factor selection
 
     :param dir: Path to the ISA-Tab table files (study-sample and assay files)
     :param factor_selection: Factor selection as JSON, given by k:v as
     factor name as keys and factor values as values
+    :param index: A SliceIndex of the ISA-Tab, or None to use the one
+    returned by get_slice_index
     :return: Slice results as a JSON
     """
+    if index is None:
+        index = get_slice_index(dir)
     results = []
+    sample_names = set()
     # first collect matching samples
     for table_file in glob.iglob(os.path.join(dir, '[a|s]_*')):
         log.info('Loading {table_file}'.format(table_file=table_file))
+        table = index.table(table_file)
+
+        if factor_selection is None:
+            for sample_name in table.column('Sample Name'):
+                if sample_name not in sample_names:
+                    sample_names.add(sample_name)
+                    results.append(
+                        {
+                            'sample': sample_name,
+                            'data_files': []
+                        }
+                    )
 
-        with open(os.path.join(dir, table_file)) as fp:
-            df = load_table(fp)
-
-            if factor_selection is None:
-                matches = df['Sample Name'].items()
-
-                for indx, match in matches:
-                    sample_name = match
-                    if len([r for r in results if r['sample'] ==
-                            sample_name]) == 1:
-                        continue
-                    else:
+        else:
+            for factor_name, factor_value in factor_selection.items():
+                factor_samples = table.factor_samples(factor_name)
+                if factor_samples is None:
+                    continue
+                for sample_name in factor_samples.get(factor_value, []):
+                    if sample_name not in sample_names:
+                        sample_names.add(sample_name)
                         results.append(
                             {
                                 'sample': sample_name,
-                                'data_files': []
+                                'data_files': [],
+                                'query_used': factor_selection
                             }
                         )
 
-            else:
-                for factor_name, factor_value in factor_selection.items():
-                    if 'Factor Value[{}]'.format(factor_name) in list(
-                            df.columns.values):
-                        matches = df.loc[df['Factor Value[{factor}]'.format(
-                            factor=factor_name)] == factor_value][
-                            'Sample Name'].items()
-
-                        for indx, match in matches:
-                            sample_name = match
-                            if len([r for r in results if r['sample'] ==
-                                    sample_name]) == 1:
-                                continue
-                            else:
-                                results.append(
-                                    {
-                                        'sample': sample_name,
-                                        'data_files': [],
-                                        'query_used': factor_selection
-                                    }
-                                )
-
     # now collect the data files relating to the samples
+    assay_tables = [index.table(table_file) for table_file in
+                    glob.iglob(os.path.join(dir, 'a_*'))]
     for result in results:
         sample_name = result['sample']
 
-        for table_file in glob.iglob(os.path.join(dir, 'a_*')):
-            with open(table_file) as fp:
-                df = load_table(fp)
-
-                data_files = []
-
-                table_headers = list(df.columns.values)
-                sample_rows = df.loc[df['Sample Name'] == sample_name]
-
-                data_node_labels = ['Raw Data File', 'Raw Spectral Data File',
-                                    'Derived Spectral Data File',
-                                    'Derived Array Data File',
-                                    'Array Data File',
-                                    'Protein Assignment File',
-                                    'Peptide Assignment File',
-                                    'Post Translational Modification '
-                                    'Assignment File',
-                                    'Acquisition Parameter Data File',
-                                    'Free Induction Decay Data File',
-                                    'Derived Array Data Matrix File',
-                                    'Image File',
-                                    'Derived Data File',
-                                    'Metabolite Assignment File']
-                for node_label in data_node_labels:
-                    if node_label in table_headers:
-                        data_files.extend(list(sample_rows[node_label]))
-
-                result['data_files'] = [i for i in list(data_files) if
-                                        str(i) != 'nan']
+        for table in assay_tables:
+            data_files = table.data_files(
+                table.sample_rows.get(sample_name, []))
+            result['data_files'] = [i for i in data_files if
+                                    str(i) != 'nan']
     return results
 
 
@@ -6584,6 +7256,11 @@ def get_data_for_sample(input_path, sample_name):
     :param sample_name: A sample name
     :return: A list of data filenames
     """
+    if isinstance(input_path, str) and os.path.isdir(input_path):
+        hits = get_slice_index(input_path).sample_data_files(sample_name)
+        for data in hits:
+            log.info('found a hit: {filename}'.format(filename=data.filename))
+        return hits
     ISA = load(input_path)
     hits = []
     for study in ISA.studies:
@@ -6816,7 +7493,7 @@ def filter_data(input_path, output_path, slice, filename_filter):
     slice_json = slice
     for result in json.load(slice_json)['results']:
         data_files.extend(result.get('data_files', []))
-    reduced_data_files = list(set(data_files))
+    reduced_data_files = set(data_files)
     filtered_files = glob.glob(os.path.join(source_dir, filename_filter))
     to_copy = []
     for filepath in filtered_files:
@@ -6867,7 +7544,8 @@ def query_isatab(source_dir, output, galaxy_parameters_file=None):
         log.debug('Query is:')
         log.debug(json.dumps(query, indent=4))  # for debugging only
     if source_dir:
-        investigation = load(source_dir)
+        index = get_slice_index(source_dir)
+        investigation = index.investigation()
     else:
         raise IOError("No source dir supplied")
     # filter assays by mt/tt
@@ -6999,39 +7677,23 @@ def query_isatab(source_dir, output, galaxy_parameters_file=None):
         else:
             raise IOError("No source dir supplied")
         for table_file in table_files:
-            with open(table_file) as fp:
-                df = load_table(fp)
-                data_files = []
-                table_headers = list(df.columns.values)
-                sample_rows = df.loc[df['Sample Name'] == sample_name]
-                data_node_labels = [
-                    'Raw Data File', 'Raw Spectral Data File',
-                    'Derived Spectral Data File',
-                    'Derived Array Data File', 'Array Data File',
-                    'Protein Assignment File', 'Peptide Assignment File',
-                    'Post Translational Modification Assignment File',
-                    'Acquisition Parameter Data File',
-                    'Free Induction Decay Data File',
-                    'Derived Array Data Matrix File', 'Image File',
-                    'Derived Data File', 'Metabolite Assignment File']
-                if parameters_selection:
-                    for p, v in parameters_selection.items():
-                        sample_pv_rows = sample_rows.loc[
-                            sample_rows['Parameter Value[{}]'.format(p)] == v]
-                        for node_label in data_node_labels:
-                            if node_label in table_headers:
-                                data_files.extend(
-                                    list(sample_pv_rows[node_label]))
-                    result['data_files'].extend(list(set(
-                        i for i in list(data_files) if
-                        str(i) not in ('nan', ''))))
-                else:
-                    for node_label in data_node_labels:
-                        if node_label in table_headers:
-                            data_files.extend(list(sample_rows[node_label]))
-                    result['data_files'].extend(
-                        list(set(i for i in list(data_files) if
-                                 str(i) not in ('nan', ''))))
+            table = index.table(table_file)
+            data_files = []
+            sample_rows = table.sample_rows.get(sample_name, [])
+            if parameters_selection:
+                for p, v in parameters_selection.items():
+                    parameter_values = table.column(
+                        'Parameter Value[{}]'.format(p))
+                    data_files.extend(table.data_files(
+                        [i for i in sample_rows if parameter_values[i] == v]))
+                result['data_files'].extend(list(set(
+                    i for i in list(data_files) if
+                    str(i) not in ('nan', ''))))
+            else:
+                data_files.extend(table.data_files(sample_rows))
+                result['data_files'].extend(
+                    list(set(i for i in list(data_files) if
+                             str(i) not in ('nan', ''))))
     results_json = {
         'query': query,
         'results': results
@@ -16,6 +16,7 @@ from itertools import zip_longest
 import numpy as np
 import pandas as pd
 from isatools import isatab
+from isatools.isatab import strip_comments
 from isatools.model import (
     Assay,
     Comment,
@@ -1148,22 +1149,3 @@ class MageTabParser(object):
             a_fp.seek(0)
             assay_files.append(a_fp)
         return assay_files
-
-
-def strip_comments(in_fp):
-    """Strip out comment lines indicated by a # at start of line from a given
-    file
-
-    :param in_fp: A file-like buffer object
-    :return: A memory file buffer object with comments stripped out
-    """
-    out_fp = StringIO()
-    if not isinstance(in_fp, StringIO):
-        out_fp.name = in_fp.name
-    for line in in_fp.readlines():
-        if line.lstrip().startswith('#'):
-            pass
-        else:
-            out_fp.write(line)
-    out_fp.seek(0)
-    return out_fp
@@ -14,10 +14,16 @@ Todo:
 """
 from __future__ import absolute_import
 import abc
+import contextvars
+import itertools
 import logging
 import os
+import threading
 import warnings
 import uuid
+import weakref
+from collections import Counter
+from contextlib import contextmanager
 from numbers import Number
 from collections.abc import Iterable
 import pprint
@@ -39,6 +45,40 @@ def load_protocol_types_info():
         return protocol_types_dict
 
 
+def _process_graph_links(process):
+    """Gets the links that a single process contributes to an assay graph.
+
+    :param process: A Process in a process sequence
+    :return: A list of (source identifier, target identifier, node) tuples,
+        where node is the endpoint of the edge that is not the process itself
+    """
+    links = []
+    if process.next_process is not None or len(process.outputs) > 0:
+        if len([n for n in process.outputs if
+                not isinstance(n, DataFile)]) > 0:
+            for output in [n for n in process.outputs if
+                           not isinstance(n, DataFile)]:
+                links.append((process.sequence_identifier,
+                              output.sequence_identifier, output))
+        else:
+            next_process_identifier = getattr(process.next_process, "sequence_identifier", None)
+            if next_process_identifier is not None:
+                links.append((process.sequence_identifier,
+                              next_process_identifier, process.next_process))
+
+    if process.prev_process is not None or len(process.inputs) > 0:
+        if len(process.inputs) > 0:
+            for input_ in process.inputs:
+                links.append((input_.sequence_identifier,
+                              process.sequence_identifier, input_))
+        else:
+            previous_process_identifier = getattr(process.prev_process, "sequence_identifier", None)
+            if previous_process_identifier is not None:
+                links.append((previous_process_identifier,
+                              process.sequence_identifier, process.prev_process))
+    return links
+
+
 def _build_assay_graph(process_sequence=None):
     """:obj:`networkx.DiGraph` Returns a directed graph object based on a
     given ISA process sequence."""
@@ -48,48 +88,276 @@ def _build_assay_graph(process_sequence=None):
         return g
     for process in process_sequence:
         g.indexes[process.sequence_identifier] = process
-        # log.debug('Current process is: {0}'.format(process.identifier))
-        # log.debug('Next process for current process is: {0}'.format(getattr(process.next_process_identifier, 'id', None)))
-        # log.debug('Previous process for current process is: {0}'.format(getattr(process.prev_process, 'id', None)))
-        # log.debug('Inputs for current process are: {0}'.format(
-        #    [getattr(input_, 'id', None) for input_ in process.inputs]
-        # ))
-        # log.debug('Outputs for current process are: {0}'.format(
-        #     [getattr(output, 'id', None) for output in process.outputs]
-        # ))
-        if process.next_process is not None or len(process.outputs) > 0:
-            if len([n for n in process.outputs if
-                    not isinstance(n, DataFile)]) > 0:
-                for output in [n for n in process.outputs if
-                               not isinstance(n, DataFile)]:
-                    g.add_edge(process.sequence_identifier, output.sequence_identifier)
-                    g.indexes[output.sequence_identifier] = output
-                    # log.debug('linking process {0} to output {1}'.format(process.id, getattr(output, 'id', None)))
-            else:
-                next_process_identifier = getattr(process.next_process, "sequence_identifier", None)
-                if next_process_identifier is not None:
-                    g.add_edge(process.sequence_identifier, next_process_identifier)
-                    g.indexes[next_process_identifier] = process.next_process
-                # log.debug('linking process {1} to prev_process {0}'.format(
-                #    getattr(process.next_process_identifier, 'id', None), process.id))
-
-        if process.prev_process is not None or len(process.inputs) > 0:
-            if len(process.inputs) > 0:
-                for input_ in process.inputs:
-                    g.add_edge(input_.sequence_identifier, process.sequence_identifier)
-                    g.indexes[input_.sequence_identifier] = input_
-                    # log.debug('linking input {1} to process {0}'.format(process.id, getattr(input_, 'id', None)))
-            else:
-                previous_process_identifier = getattr(process.prev_process, "sequence_identifier", None)
-                if previous_process_identifier is not None:
-                    g.add_edge(previous_process_identifier, process.sequence_identifier)
-                    g.indexes[previous_process_identifier] = process.prev_process
-                # log.debug('linking prev_process {0} to process {1}'.format(
-                #     getattr(process.prev_process, 'id', None), process.id))
+        for source, target, node in _process_graph_links(process):
+            g.add_edge(source, target)
+            g.indexes[node.sequence_identifier] = node
     return g
 
 
-class Comment(object):
+class _ObservedList(list):
+    """A list that tells an observer when its contents change, so that
+    structures derived from it (such as an assay graph) can be kept up to date
+    without rescanning the whole list.
+
+    The observer must implement ``_list_changed(lst, added, removed)``. A
+    reordering of the list is reported with both ``added`` and ``removed`` set
+    to None.
+    """
+
+    __slots__ = ('_observer',)
+
+    def __init__(self, iterable=(), observer=None):
+        super().__init__(iterable)
+        self._observer = observer
+
+    def _notify(self, added, removed):
+        if self._observer is not None:
+            self._observer._list_changed(self, added, removed)
+
+    def __reduce_ex__(self, protocol):
+        return self.__class__, (list(self), self._observer)
+
+    def append(self, item):
+        super().append(item)
+        self._notify([item], [])
+
+    def extend(self, iterable):
+        items = list(iterable)
+        super().extend(items)
+        self._notify(items, [])
+
+    def insert(self, index, item):
+        super().insert(index, item)
+        self._notify([item], [])
+
+    def remove(self, item):
+        index = self.index(item)
+        item = self[index]
+        super().__delitem__(index)
+        self._notify([], [item])
+
+    def pop(self, index=-1):
+        item = super().pop(index)
+        self._notify([], [item])
+        return item
+
+    def clear(self):
+        removed = list(self)
+        super().clear()
+        self._notify([], removed)
+
+    def __setitem__(self, index, value):
+        if isinstance(index, slice):
+            removed = self[index]
+            value = list(value)
+            added = value
+        else:
+            removed = [self[index]]
+            added = [value]
+        super().__setitem__(index, value)
+        self._notify(added, removed)
+
+    def __delitem__(self, index):
+        removed = self[index] if isinstance(index, slice) else [self[index]]
+        super().__delitem__(index)
+        self._notify([], removed)
+
+    def __iadd__(self, iterable):
+        self.extend(iterable)
+        return self
+
+    def __imul__(self, n):
+        items = list(self)
+        super().__imul__(n)
+        if n < 1:
+            self._notify([], items)
+        else:
+            self._notify(items * (n - 1), [])
+        return self
+
+    def sort(self, *args, **kwargs):
+        super().sort(*args, **kwargs)
+        self._notify(None, None)
+
+    def reverse(self):
+        super().reverse()
+        self._notify(None, None)
+
+
+def _take_links(links, counts):
+    """Picks links out of a list, as many times as given in a Counter keyed
+    on (source identifier, target identifier, id(node))"""
+    taken = []
+    for link in links:
+        key = (link[0], link[1], id(link[2]))
+        if counts[key] > 0:
+            counts[key] -= 1
+            taken.append(link)
+    return taken
+
+
+class _AssayGraphCache(object):
+    """Keeps the assay graph of a process sequence between accesses.
+
+    The graph is built in full on first use. Afterwards the cache is told
+    which processes were added to, removed from or relinked in the sequence
+    (through _ObservedList and the Process link setters) and only the links
+    of those processes are recomputed. Edges and index entries are reference
+    counted, as the same edge may be contributed by two processes (e.g. by
+    both ``next_process`` and ``prev_process``).
+
+    A patched graph has the same nodes, edges and indexes as a freshly built
+    one, although the iteration order of its nodes may differ.
+    """
+
+    def __init__(self, process_sequence):
+        self.process_sequence = process_sequence
+        self.graph = None
+        self._links = {}
+        self._members = Counter()
+        self._edge_refs = Counter()
+        self._index_refs = Counter()
+        self._dirty = {}
+
+    def invalidate(self):
+        self.graph = None
+        self._links = {}
+        self._members = Counter()
+        self._edge_refs = Counter()
+        self._index_refs = Counter()
+        self._dirty = {}
+
+    def mark_dirty(self, process):
+        if self.graph is not None:
+            self._dirty[id(process)] = process
+
+    def _list_changed(self, lst, added, removed):
+        if self.graph is None:
+            return
+        if added is None:
+            self.invalidate()
+            return
+        for process in removed:
+            self._members[id(process)] -= 1
+            self.mark_dirty(process)
+        for process in added:
+            self._members[id(process)] += 1
+            self.mark_dirty(process)
+
+    def get(self):
+        if self.graph is None:
+            self._build()
+        elif self._dirty:
+            self._patch()
+        return self.graph
+
+    def _build(self):
+        g = self.graph = nx.DiGraph()
+        indexes = g.indexes = {}
+        edge_refs = self._edge_refs
+        index_refs = self._index_refs
+        for process in self.process_sequence:
+            key = id(process)
+            self._members[key] += 1
+            if key in self._links:
+                continue
+            links = _process_graph_links(process)
+            self._links[key] = (process, links)
+            indexes[process.sequence_identifier] = process
+            index_refs[process.sequence_identifier] += 1
+            for source, target, node in links:
+                g.add_edge(source, target)
+                edge_refs[(source, target)] += 1
+                indexes[node.sequence_identifier] = node
+                index_refs[node.sequence_identifier] += 1
+            process._watch_graph(self)
+
+    def _patch(self):
+        dirty = self._dirty
+        self._dirty = {}
+        for key, process in dirty.items():
+            old_links = self._links.pop(key, (None, None))[1]
+            if self._members[key] > 0:
+                new_links = _process_graph_links(process)
+                self._links[key] = (process, new_links)
+                process._watch_graph(self)
+                if old_links is None:
+                    self._add_index(process)
+                    self._add_links(new_links)
+                else:
+                    old_keys = Counter((s, t, id(n)) for s, t, n in old_links)
+                    new_keys = Counter((s, t, id(n)) for s, t, n in new_links)
+                    self._remove_links(
+                        _take_links(old_links, old_keys - new_keys))
+                    self._add_links(
+                        _take_links(new_links, new_keys - old_keys))
+            else:
+                del self._members[key]
+                process._unwatch_graph(self)
+                if old_links is not None:
+                    self._remove_links(old_links)
+                    self._remove_index(process.sequence_identifier)
+
+    def _add_links(self, links):
+        for source, target, node in links:
+            if self._edge_refs[(source, target)] == 0:
+                self.graph.add_edge(source, target)
+            self._edge_refs[(source, target)] += 1
+            self._add_index(node)
+
+    def _remove_links(self, links):
+        g = self.graph
+        for source, target, node in links:
+            self._edge_refs[(source, target)] -= 1
+            if self._edge_refs[(source, target)] == 0:
+                del self._edge_refs[(source, target)]
+                g.remove_edge(source, target)
+                for n in (source, target):
+                    if n in g and g.degree(n) == 0:
+                        g.remove_node(n)
+            self._remove_index(node.sequence_identifier)
+
+    def _add_index(self, node):
+        self.graph.indexes[node.sequence_identifier] = node
+        self._index_refs[node.sequence_identifier] += 1
+
+    def _remove_index(self, identifier):
+        self._index_refs[identifier] -= 1
+        if self._index_refs[identifier] == 0:
+            del self._index_refs[identifier]
+            del self.graph.indexes[identifier]
+
+
+class _KeyHashable(object):
+    """Hashes an ISA object on the tuple of its own plain attributes given
+    by _hash_key, e.g. its name
+
+    The hash is computed once and kept until one of the property setters
+    of those attributes resets it. Nested objects and lists are left out of
+    the key, so that changing them in place cannot leave a stale hash
+    behind; objects that are equal still hash the same.
+    """
+
+    _hash_cache = None
+
+    def _hash_key(self):
+        return ()
+
+    def __hash__(self):
+        h = self._hash_cache
+        if h is None:
+            h = self._hash_cache = hash(self._hash_key())
+        return h
+
+    def __getstate__(self):
+        # hashes of str differ between interpreters, so never pickle them
+        parent = getattr(super(), '__getstate__', None)
+        state = dict(parent()) if parent is not None else self.__dict__.copy()
+        state.pop('_hash_cache', None)
+        return state
+
+
+class Comment(_KeyHashable):
     """A Comment allows arbitrary annotation of all Commentable ISA classes
 
     Attributes:
@@ -110,6 +378,7 @@ class Comment(object):
     def name(self, val):
         if val is not None and isinstance(val, str):
             self.__name = val
+            self._hash_cache = None
         else:
             raise AttributeError('Comment.name must be a string')
 
@@ -122,6 +391,7 @@ class Comment(object):
     def value(self, val):
         if isinstance(val, str):
             self.__value = val
+            self._hash_cache = None
         else:
             raise AttributeError('Comment.value must be a string')
 
@@ -135,8 +405,10 @@ class Comment(object):
     value={comment.value}
 )""".format(comment=self)
 
-    def __hash__(self):
-        return hash(repr(self))
+    def _hash_key(self):
+        return self.name, self.value
+
+    __hash__ = _KeyHashable.__hash__
 
     def __eq__(self, other):
         return isinstance(other, Comment) \
@@ -147,7 +419,7 @@ class Comment(object):
         return not self == other
 
 
-class Commentable(metaclass=abc.ABCMeta):
+class Commentable(_KeyHashable, metaclass=abc.ABCMeta):
     """Abstract class to enable containment of Comments
 
     Attributes:
@@ -286,6 +558,7 @@ class MetadataMixin(metaclass=abc.ABCMeta):
     def filename(self, val):
         if val is not None and isinstance(val, str):
             self.__filename = val
+            self._hash_cache = None
         else:
             raise AttributeError('{0}.filename must be a string'
                                  .format(type(self).__name__))
@@ -299,6 +572,7 @@ class MetadataMixin(metaclass=abc.ABCMeta):
     def identifier(self, val):
         if val is not None and isinstance(val, str):
             self.__identifier = val
+            self._hash_cache = None
         else:
             raise AttributeError('{0}.identifier must be a string'
                                  .format(type(self).__name__))
@@ -312,6 +586,7 @@ class MetadataMixin(metaclass=abc.ABCMeta):
     def title(self, val):
         if val is not None and isinstance(val, str):
             self.__title = val
+            self._hash_cache = None
         else:
             raise AttributeError('{0}.title must be a string'
                                  .format(type(self).__name__))
@@ -325,6 +600,7 @@ class MetadataMixin(metaclass=abc.ABCMeta):
     def description(self, val):
         if val is not None and isinstance(val, str):
             self.__description = val
+            self._hash_cache = None
         else:
             raise AttributeError('{0}.description must be a string'
                                  .format(type(self).__name__))
@@ -338,6 +614,7 @@ class MetadataMixin(metaclass=abc.ABCMeta):
     def submission_date(self, val):
         if val is not None and isinstance(val, str):
             self.__submission_date = val
+            self._hash_cache = None
         else:
             raise AttributeError('{0}.submission_date must be a string'
                                  .format(type(self).__name__))
@@ -351,6 +628,7 @@ class MetadataMixin(metaclass=abc.ABCMeta):
     def public_release_date(self, val):
         if val is not None and isinstance(val, str):
             self.__public_release_date = val
+            self._hash_cache = None
         else:
             raise AttributeError('{0}.public_release_date must be a '
                                          'string'.format(type(self).__name__))
@@ -567,8 +845,11 @@ class Investigation(Commentable, MetadataMixin, object):
             num_studies=len(self.studies),
             num_comments=len(self.comments))
 
-    def __hash__(self):
-        return hash(repr(self))
+    def _hash_key(self):
+        return self.filename, self.identifier, self.title, \
+            self.submission_date, self.public_release_date
+
+    __hash__ = _KeyHashable.__hash__
 
     def __eq__(self, other):
         return isinstance(other, Investigation) \
@@ -624,6 +905,7 @@ class OntologySource(Commentable):
                 .format(val, type(val)))
         else:
             self.__name = val
+            self._hash_cache = None
 
     @property
     def file(self):
@@ -638,6 +920,7 @@ class OntologySource(Commentable):
                 .format(val, type(val)))
         else:
             self.__file = val
+            self._hash_cache = None
 
     @property
     def version(self):
@@ -652,6 +935,7 @@ class OntologySource(Commentable):
                 .format(val, type(val)))
         else:
             self.__version = val
+            self._hash_cache = None
 
     @property
     def description(self):
@@ -666,6 +950,7 @@ class OntologySource(Commentable):
                 .format(val, type(val)))
         else:
             self.__description = val
+            self._hash_cache = None
 
     def __repr__(self):
         return "isatools.model.OntologySource(name='{ontology_source.name}'," \
@@ -684,8 +969,10 @@ class OntologySource(Commentable):
     comments={num_comments} Comment objects
 )""".format(ontology_source=self, num_comments=len(self.comments))
 
-    def __hash__(self):
-        return hash(repr(self))
+    def _hash_key(self):
+        return self.name, self.file, self.version, self.description
+
+    __hash__ = _KeyHashable.__hash__
 
     def __eq__(self, other):
         return isinstance(other, OntologySource) \
@@ -732,6 +1019,7 @@ class OntologyAnnotation(Commentable):
                 .format(val, type(val)))
         else:
             self.__term = val
+            self._hash_cache = None
 
     @property
     def term_source(self):
@@ -760,6 +1048,7 @@ class OntologyAnnotation(Commentable):
                 'OntologyAnnotation.term_accession must be a str or None')
         else:
             self.__term_accession = val
+            self._hash_cache = None
 
     def __repr__(self):
         return "isatools.model.OntologyAnnotation(" \
@@ -780,8 +1069,10 @@ class OntologyAnnotation(Commentable):
             term_source_ref=self.term_source.name if self.term_source else '',
             num_comments=len(self.comments))
 
-    def __hash__(self):
-        return hash(repr(self))
+    def _hash_key(self):
+        return self.term, self.term_accession
+
+    __hash__ = _KeyHashable.__hash__
 
     def __eq__(self, other):
         return isinstance(other, OntologyAnnotation) \
@@ -794,6 +1085,50 @@ class OntologyAnnotation(Commentable):
         return not self == other
 
 
+class OntologyAnnotationTable(object):
+    """Interns the OntologyAnnotation objects created while loading an
+    Investigation, so that identical annotations share one object rather
+    than each cell of a table getting its own.
+
+    The annotations are keyed on their term, the name of their term source
+    and their term accession. Only annotations without comments should be
+    interned, and an interned annotation should not be modified afterwards,
+    as the change would show everywhere it is shared.
+    """
+
+    def __init__(self):
+        self._annotations = {}
+
+    def __len__(self):
+        return len(self._annotations)
+
+    def get(self, term, term_source=None, term_accession=''):
+        """Get the OntologyAnnotation of a term, creating it the first time.
+
+        Args:
+            term: The term of the annotation.
+            term_source: The OntologySource of the term, if any.
+            term_accession: The term accession of the annotation.
+
+        Returns:
+            The OntologyAnnotation shared by the identical annotations.
+        """
+        key = (term, term_source.name if term_source is not None else None,
+               term_accession)
+        try:
+            return self._annotations[key]
+        except KeyError:
+            annotation = self._annotations[key] = OntologyAnnotation(
+                term=term, term_source=term_source,
+                term_accession=term_accession)
+            return annotation
+        except TypeError:
+            # e.g. a term that is not a str cannot be keyed on
+            return OntologyAnnotation(
+                term=term, term_source=term_source,
+                term_accession=term_accession)
+
+
 class Publication(Commentable):
     """A publication associated with an investigation or study.
 
@@ -832,6 +1167,7 @@ class Publication(Commentable):
                 .format(val, type(val)))
         else:
             self.__pubmed_id = val
+            self._hash_cache = None
 
     @property
     def doi(self):
@@ -846,6 +1182,7 @@ class Publication(Commentable):
                 .format(val, type(val)))
         else:
             self.__doi = val
+            self._hash_cache = None
 
     @property
     def author_list(self):
@@ -860,6 +1197,7 @@ class Publication(Commentable):
                 .format(val, type(val)))
         else:
             self.__author_list = val
+            self._hash_cache = None
 
     @property
     def title(self):
@@ -874,6 +1212,7 @@ class Publication(Commentable):
                 .format(val, type(val)))
         else:
             self.__title = val
+            self._hash_cache = None
 
     @property
     def status(self):
@@ -911,8 +1250,10 @@ class Publication(Commentable):
             status=self.status.term if self.status else '',
             num_comments=len(self.comments))
 
-    def __hash__(self):
-        return hash(repr(self))
+    def _hash_key(self):
+        return self.pubmed_id, self.doi, self.author_list, self.title
+
+    __hash__ = _KeyHashable.__hash__
 
     def __eq__(self, other):
         return isinstance(other, Publication) \
@@ -978,6 +1319,7 @@ class Person(Commentable):
                 .format(val, type(val)))
         else:
             self.__last_name = val
+            self._hash_cache = None
 
     @property
     def first_name(self):
@@ -992,6 +1334,7 @@ class Person(Commentable):
                 .format(val, type(val)))
         else:
             self.__first_name = val
+            self._hash_cache = None
 
     @property
     def mid_initials(self):
@@ -1006,6 +1349,7 @@ class Person(Commentable):
                 .format(val, type(val)))
         else:
             self.__mid_initials = val
+            self._hash_cache = None
 
     @property
     def email(self):
@@ -1020,6 +1364,7 @@ class Person(Commentable):
                 .format(val, type(val)))
         else:
             self.__email = val
+            self._hash_cache = None
 
     @property
     def phone(self):
@@ -1034,6 +1379,7 @@ class Person(Commentable):
                 .format(val, type(val)))
         else:
             self.__phone = val
+            self._hash_cache = None
 
     @property
     def fax(self):
@@ -1048,6 +1394,7 @@ class Person(Commentable):
                 .format(val, type(val)))
         else:
             self.__fax = val
+            self._hash_cache = None
 
     @property
     def address(self):
@@ -1062,6 +1409,7 @@ class Person(Commentable):
                 .format(val, type(val)))
         else:
             self.__address = val
+            self._hash_cache = None
 
     @property
     def affiliation(self):
@@ -1076,6 +1424,7 @@ class Person(Commentable):
                 .format(val, type(val)))
         else:
             self.__affiliation = val
+            self._hash_cache = None
 
     @property
     def roles(self):
@@ -1119,8 +1468,11 @@ class Person(Commentable):
             num_roles=len(self.roles),
             num_comments=len(self.comments))
 
-    def __hash__(self):
-        return hash(repr(self))
+    def _hash_key(self):
+        return self.last_name, self.first_name, self.mid_initials, \
+            self.email, self.phone, self.fax, self.address, self.affiliation
+
+    __hash__ = _KeyHashable.__hash__
 
     def __eq__(self, other):
         return isinstance(other, Person) \
@@ -1182,9 +1534,11 @@ class StudyAssayMixin(metaclass=abc.ABCMeta):
             self.__units = units
 
         if process_sequence is None:
-            self.__process_sequence = []
+            self.__process_sequence = _ObservedList(observer=self)
         else:
-            self.__process_sequence = process_sequence
+            self.__process_sequence = _ObservedList(
+                process_sequence, observer=self)
+        self.__graph_cache = None
 
         if characteristic_categories is None:
             self.__characteristic_categories = []
@@ -1204,6 +1558,7 @@ class StudyAssayMixin(metaclass=abc.ABCMeta):
                 .format(type(self).__name__, val, type(val)))
         else:
             self.__filename = val
+            self._hash_cache = None
 
     @property
     def units(self):
@@ -1535,7 +1890,8 @@ class StudyAssayMixin(metaclass=abc.ABCMeta):
     def process_sequence(self, val):
         if val is not None and hasattr(val, '__iter__'):
             if val == [] or all(isinstance(x, Process) for x in val):
-                self.__process_sequence = list(val)
+                self.__process_sequence = _ObservedList(val, observer=self)
+                self.__graph_cache = None
         else:
             raise AttributeError(
                 '{}.process_sequence must be iterable containing Processes'
@@ -1561,9 +1917,12 @@ class StudyAssayMixin(metaclass=abc.ABCMeta):
     @property
     def graph(self):
         """:obj:`networkx.DiGraph` A graph representation of the study's
-        process sequence"""
+        process sequence. The graph is cached and kept up to date as the
+        process sequence changes, so it must not be modified by callers."""
         if len(self.process_sequence) > 0:
-            return _build_assay_graph(self.process_sequence)
+            if self.__graph_cache is None:
+                self.__graph_cache = _AssayGraphCache(self.__process_sequence)
+            return self.__graph_cache.get()
         else:
             return None
 
@@ -1572,6 +1931,15 @@ class StudyAssayMixin(metaclass=abc.ABCMeta):
         raise AttributeError('{}.graph is not settable'
                              .format(type(self).__name__))
 
+    def _list_changed(self, lst, added, removed):
+        if self.__graph_cache is not None:
+            self.__graph_cache._list_changed(lst, added, removed)
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state['_StudyAssayMixin__graph_cache'] = None
+        return state
+
 
 class Study(Commentable, StudyAssayMixin, MetadataMixin, object):
     """Study is the central unit, containing information on the subject under
@@ -1867,8 +2235,11 @@ class Study(Commentable, StudyAssayMixin, MetadataMixin, object):
             num_comments=len(self.comments),
             num_units=len(self.units))
 
-    def __hash__(self):
-        return hash(repr(self))
+    def _hash_key(self):
+        return self.filename, self.identifier, self.title, self.description, \
+            self.submission_date, self.public_release_date
+
+    __hash__ = _KeyHashable.__hash__
 
     def __eq__(self, other):
         return isinstance(other, Study) \
@@ -1932,6 +2303,7 @@ class StudyFactor(Commentable):
                 .format(val, type(val)))
         else:
             self.__name = val
+            self._hash_cache = None
 
     @property
     def factor_type(self):
@@ -1962,8 +2334,10 @@ class StudyFactor(Commentable):
             factor_type=self.factor_type.term if self.factor_type else '',
             num_comments=len(self.comments))
 
-    def __hash__(self):
-        return hash(repr(self))
+    def _hash_key(self):
+        return self.name,
+
+    __hash__ = _KeyHashable.__hash__
 
     def __eq__(self, other):
         return isinstance(other, StudyFactor) \
@@ -2077,6 +2451,7 @@ class Assay(Commentable, StudyAssayMixin, object):
                 .format(val, type(val)))
         else:
             self.__technology_platform = val
+            self._hash_cache = None
 
     @property
     def data_files(self):
@@ -2132,8 +2507,10 @@ class Assay(Commentable, StudyAssayMixin, object):
             num_characteristic_categories=len(self.characteristic_categories),
             num_comments=len(self.comments), num_units=len(self.units))
 
-    def __hash__(self):
-        return hash(repr(self))
+    def _hash_key(self):
+        return self.filename, self.technology_platform
+
+    __hash__ = _KeyHashable.__hash__
 
     def __eq__(self, other):
         return isinstance(other, Assay) \
@@ -2223,6 +2600,7 @@ class Protocol(Commentable):
                 .format(val, type(val)))
         else:
             self.__name = val
+            self._hash_cache = None
 
     @property
     def protocol_type(self):
@@ -2268,6 +2646,7 @@ class Protocol(Commentable):
                 .format(val, type(val)))
         else:
             self.__uri = val
+            self._hash_cache = None
 
     @property
     def version(self):
@@ -2282,6 +2661,7 @@ class Protocol(Commentable):
                 .format(val, type(val)))
         else:
             self.__version = val
+            self._hash_cache = None
 
     @property
     def parameters(self):
@@ -2362,8 +2742,10 @@ class Protocol(Commentable):
             num_components=len(self.components) if self.components else 0,
             num_comments=len(self.comments) if self.comments else 0)
 
-    def __hash__(self):
-        return hash(repr(self))
+    def _hash_key(self):
+        return self.name, self.uri, self.version
+
+    __hash__ = _KeyHashable.__hash__
 
     def __eq__(self, other):
         return isinstance(other, Protocol) \
@@ -2425,7 +2807,7 @@ class ProtocolParameter(Commentable):
             self.parameter_name else '', num_comments=len(self.comments))
 
     def __hash__(self):
-        return hash(repr(self))
+        return hash(self.parameter_name)
 
     def __eq__(self, other):
         return isinstance(other, ProtocolParameter) \
@@ -2527,7 +2909,7 @@ class ParameterValue(Commentable):
             num_comments=len(self.comments))
 
     def __hash__(self):
-        return hash(repr(self))
+        return hash((self.category, self.value, self.unit))
 
     def __eq__(self, other):
         return isinstance(other, ParameterValue) \
@@ -2573,6 +2955,7 @@ class ProtocolComponent(Commentable):
                 .format(val, type(val)))
         else:
             self.__name = val
+            self._hash_cache = None
 
     @property
     def component_type(self):
@@ -2604,8 +2987,10 @@ class ProtocolComponent(Commentable):
 )""".format(component=self, component_type=self.component_type.term if
             self.component_type else '', num_comments=len(self.comments))
 
-    def __hash__(self):
-        return hash(repr(self))
+    def _hash_key(self):
+        return self.name,
+
+    __hash__ = _KeyHashable.__hash__
 
     def __eq__(self, other):
         return isinstance(other, ProtocolComponent) \
@@ -2617,17 +3002,82 @@ class ProtocolComponent(Commentable):
         return not self == other
 
 
+class SequenceIdentifierAllocator(object):
+    """Allocates the sequence identifiers that the experimental graphs key
+    the ProcessSequenceNode objects on.
+
+    The identifiers are taken in blocks from a counter shared by all the
+    allocators, so no two allocators ever hand out the same identifier and
+    the graphs of investigations built with different allocators can be
+    merged. An allocator can be used by several threads at once.
+
+    Attributes:
+        block_size: The number of identifiers taken at a time.
+    """
+
+    _blocks = itertools.count()
+
+    def __init__(self, block_size=1024):
+        self.block_size = block_size
+        self._lock = threading.Lock()
+        self._next = 0
+        self._end = 0
+
+    def allocate(self):
+        """Allocate a new sequence identifier.
+
+        Returns:
+            An int that no allocator has handed out before.
+        """
+        with self._lock:
+            if self._next == self._end:
+                # next() on an itertools.count is atomic
+                self._next = next(self._blocks) * self.block_size
+                self._end = self._next + self.block_size
+            identifier = self._next
+            self._next += 1
+        return identifier
+
+
+_sequence_identifiers = contextvars.ContextVar(
+    'sequence_identifiers', default=SequenceIdentifierAllocator())
+
+
+@contextmanager
+def sequence_identifier_scope(allocator=None):
+    """Allocate the sequence identifiers of the ProcessSequenceNode objects
+    created within the scope, e.g. while building or loading one
+    Investigation, with an allocator of their own.
+
+    Scopes entered in different threads do not share their allocator, so
+    each thread builds its investigations without waiting on the others.
+
+    Example:
+        with sequence_identifier_scope():
+            investigation = isatab.load(fp)
+
+    Args:
+        allocator: The SequenceIdentifierAllocator to use, a new one if None.
+
+    Yields:
+        The SequenceIdentifierAllocator of the scope.
+    """
+    if allocator is None:
+        allocator = SequenceIdentifierAllocator()
+    token = _sequence_identifiers.set(allocator)
+    try:
+        yield allocator
+    finally:
+        _sequence_identifiers.reset(token)
+
+
 class ProcessSequenceNode(metaclass=abc.ABCMeta):
-    sequence_identifier = 0
 
     def __init__(self):
-        self.sequence_identifier = ProcessSequenceNode.sequence_identifier
-        ProcessSequenceNode.sequence_identifier += 1
+        self.sequence_identifier = _sequence_identifiers.get().allocate()
 
     def assign_identifier(self):
-        # ProcessSequenceNode.sequence_identifier += 1
-        self.sequence_identifier = ProcessSequenceNode.sequence_identifier
-        ProcessSequenceNode.sequence_identifier += 1
+        self.sequence_identifier = _sequence_identifiers.get().allocate()
 
 
 class Source(Commentable, ProcessSequenceNode):
@@ -2666,6 +3116,7 @@ class Source(Commentable, ProcessSequenceNode):
                 .format(val, type(val)))
         else:
             self.__name = val
+            self._hash_cache = None
 
     @property
     def characteristics(self):
@@ -2710,8 +3161,10 @@ class Source(Commentable, ProcessSequenceNode):
 )""".format(source=self, num_characteristics=len(self.characteristics),
             num_comments=len(self.comments))
 
-    def __hash__(self):
-        return hash(repr(self))
+    def _hash_key(self):
+        return self.name,
+
+    __hash__ = _KeyHashable.__hash__
 
     def __eq__(self, other):
         return isinstance(other, Source) \
@@ -2819,7 +3272,7 @@ class Characteristic(Commentable):
            num_comments=len(self.comments))
 
     def __hash__(self):
-        return hash(repr(self))
+        return hash((self.category, self.value, self.unit))
 
     def __eq__(self, other):
         return isinstance(other, Characteristic) \
@@ -2883,6 +3336,7 @@ class Sample(Commentable, ProcessSequenceNode):
                 .format(val, type(val)))
         else:
             self.__name = val
+            self._hash_cache = None
 
     @property
     def factor_values(self):
@@ -2964,8 +3418,10 @@ class Sample(Commentable, ProcessSequenceNode):
             num_derives_from=len(self.derives_from),
             num_comments=len(self.comments))
 
-    def __hash__(self):
-        return hash(repr(self))
+    def _hash_key(self):
+        return self.name,
+
+    __hash__ = _KeyHashable.__hash__
 
     def __eq__(self, other):
         return isinstance(other, Sample) \
@@ -3011,6 +3467,7 @@ class Material(Commentable, ProcessSequenceNode, metaclass=abc.ABCMeta):
                 .format(type(self).__name__, val, type(val)))
         else:
             self.__name = val
+            self._hash_cache = None
 
     @property
     def type(self):
@@ -3044,6 +3501,9 @@ class Material(Commentable, ProcessSequenceNode, metaclass=abc.ABCMeta):
                 '{}.characteristics must be iterable containing '
                 'Characteristics'.format(type(self).__name__))
 
+    def _hash_key(self):
+        return self.name,
+
 
 class Extract(Material):
     """Represents a extract material in an experimental graph."""
@@ -3069,8 +3529,7 @@ class Extract(Material):
 )""".format(extract=self, num_characteristics=len(self.characteristics),
             num_comments=len(self.comments))
 
-    def __hash__(self):
-        return hash(repr(self))
+    __hash__ = _KeyHashable.__hash__
 
     def __eq__(self, other):
         return isinstance(other, Extract) \
@@ -3109,8 +3568,7 @@ class LabeledExtract(Material):
             num_characteristics=len(self.characteristics),
             num_comments=len(self.comments))
 
-    def __hash__(self):
-        return hash(repr(self))
+    __hash__ = _KeyHashable.__hash__
 
     def __eq__(self, other):
         return isinstance(other, LabeledExtract) \
@@ -3206,7 +3664,7 @@ class FactorValue(Commentable):
             unit=self.unit.term if self.unit else '')
 
     def __hash__(self):
-        return hash(repr(self))
+        return hash((self.factor_name, self.value, self.unit))
 
     def __eq__(self, other):
         return isinstance(other, FactorValue) \
@@ -3240,6 +3698,7 @@ class Process(Commentable, ProcessSequenceNode):
         comments: Comments associated with instances of this class.
     """
     # TODO: replace with above but need to debug where behaviour starts varying
+    _graph_caches = None
 
     def __init__(self, id_='', name='', executes_protocol=None, date_=None,
                  performer=None, parameter_values=None, inputs=None,
@@ -3266,14 +3725,14 @@ class Process(Commentable, ProcessSequenceNode):
             self.__parameter_values = parameter_values
 
         if inputs is None:
-            self.__inputs = []
+            self.__inputs = _ObservedList(observer=self)
         else:
-            self.__inputs = inputs
+            self.__inputs = _ObservedList(inputs, observer=self)
 
         if outputs is None:
-            self.__outputs = []
+            self.__outputs = _ObservedList(observer=self)
         else:
-            self.__outputs = outputs
+            self.__outputs = _ObservedList(outputs, observer=self)
 
         self.__prev_process = None
         self.__next_process = None
@@ -3287,6 +3746,7 @@ class Process(Commentable, ProcessSequenceNode):
     def name(self, val):
         if val is not None and isinstance(val, str):
             self.__name = val
+            self._hash_cache = None
         else:
             raise AttributeError('Process.name must be a string')
 
@@ -3314,6 +3774,7 @@ class Process(Commentable, ProcessSequenceNode):
     def date(self, val):
         if val is not None and isinstance(val, str):
             self.__date = val
+            self._hash_cache = None
         else:
             raise AttributeError('Process.date must be a string')
 
@@ -3326,6 +3787,7 @@ class Process(Commentable, ProcessSequenceNode):
     def performer(self, val):
         if val is not None and isinstance(val, str):
             self.__performer = val
+            self._hash_cache = None
         else:
             raise AttributeError('Process.performer must be a string')
 
@@ -3358,7 +3820,8 @@ class Process(Commentable, ProcessSequenceNode):
                     isinstance(x, (Material, Source, Sample, DataFile)) for
                     x in
                     val):
-                self.__inputs = list(val)
+                self.__inputs = _ObservedList(val, observer=self)
+                self._graph_changed()
         else:
             raise AttributeError(
                 'Process.inputs must be iterable containing objects of types '
@@ -3376,7 +3839,8 @@ class Process(Commentable, ProcessSequenceNode):
             if val == [] or all(
                     isinstance(x, (Material, Source, Sample, DataFile)) for
                     x in val):
-                self.__outputs = list(val)
+                self.__outputs = _ObservedList(val, observer=self)
+                self._graph_changed()
         else:
             raise AttributeError(
                 'Process.outputs must be iterable containing objects of types '
@@ -3396,6 +3860,7 @@ class Process(Commentable, ProcessSequenceNode):
                 'or None; got {0}:{1}'.format(val, type(val)))
         else:
             self.__prev_process = val
+            self._graph_changed()
 
     @property
     def next_process(self):
@@ -3412,6 +3877,7 @@ class Process(Commentable, ProcessSequenceNode):
             )
         else:
             self.__next_process = val
+            self._graph_changed()
 
     def __repr__(self):
         return '{0}.{1}(id="{2.id}". name="{2.name}", executes_protocol={2.executes_protocol}, ' \
@@ -3421,8 +3887,44 @@ class Process(Commentable, ProcessSequenceNode):
     def __str__(self):
         return """{0}(name={1.name})""".format(self.__class__.__name__, self)
 
+    def _watch_graph(self, cache):
+        """Registers an assay graph cache to be told when the links of this
+        process change"""
+        if self._graph_caches is None:
+            self._graph_caches = []
+        elif any(ref() is cache for ref in self._graph_caches):
+            return
+        self._graph_caches.append(weakref.ref(cache))
+
+    def _unwatch_graph(self, cache):
+        if self._graph_caches is not None:
+            self._graph_caches = [ref for ref in self._graph_caches
+                                  if ref() not in (cache, None)] or None
+
+    def _graph_changed(self):
+        if self._graph_caches is not None:
+            for ref in self._graph_caches:
+                cache = ref()
+                if cache is not None:
+                    cache.mark_dirty(self)
+
+    def _list_changed(self, lst, added, removed):
+        self._graph_changed()
+
+    def __getstate__(self):
+        state = super().__getstate__()
+        state.pop('_graph_caches', None)
+        return state
+
+    def _hash_key(self):
+        return self.name, self.date, self.performer
+
     def __hash__(self):
-        return hash(repr(self))
+        # unnamed processes, as the loaders and StudyDesign create them,
+        # all share the key above, so their id, inputs and outputs, which
+        # hash on their own keys, have to tell them apart
+        return hash((_KeyHashable.__hash__(self), self.id,
+                     tuple(self.inputs), tuple(self.outputs)))
 
     def __eq__(self, other):
         return isinstance(other, Process) \
@@ -3476,6 +3978,7 @@ class DataFile(Commentable, ProcessSequenceNode):
                 .format(type(self).__name__, val, type(val)))
         else:
             self.__filename = val
+            self._hash_cache = None
 
     @property
     def label(self):
@@ -3523,8 +4026,10 @@ class DataFile(Commentable, ProcessSequenceNode):
 )""".format(data_file=self, num_generated_from=len(self.generated_from),
             num_comments=len(self.comments))
 
-    def __hash__(self):
-        return hash(repr(self))
+    def _hash_key(self):
+        return self.filename,
+
+    __hash__ = _KeyHashable.__hash__
 
     def __eq__(self, other):
         return isinstance(other, DataFile) \
@@ -3560,8 +4065,7 @@ class RawDataFile(DataFile):
 )""".format(data_file=self, num_generated_from=len(self.generated_from),
             num_comments=len(self.comments))
 
-    def __hash__(self):
-        return hash(repr(self))
+    __hash__ = _KeyHashable.__hash__
 
     def __eq__(self, other):
         return isinstance(other, RawDataFile) \
@@ -3597,8 +4101,7 @@ class DerivedDataFile(DataFile):
 )""".format(data_file=self, num_generated_from=len(self.generated_from),
             num_comments=len(self.comments))
 
-    def __hash__(self):
-        return hash(repr(self))
+    __hash__ = _KeyHashable.__hash__
 
     def __eq__(self, other):
         return isinstance(other, DerivedDataFile) \
@@ -3633,8 +4136,7 @@ class RawSpectralDataFile(DataFile):
 )""".format(data_file=self, num_generated_from=len(self.generated_from),
             num_comments=len(self.comments))
 
-    def __hash__(self):
-        return hash(repr(self))
+    __hash__ = _KeyHashable.__hash__
 
     def __eq__(self, other):
         return isinstance(other, RawSpectralDataFile) \
@@ -3670,8 +4172,7 @@ class DerivedArrayDataFile(DataFile):
 )""".format(data_file=self, num_generated_from=len(self.generated_from),
             num_comments=len(self.comments))
 
-    def __hash__(self):
-        return hash(repr(self))
+    __hash__ = _KeyHashable.__hash__
 
     def __eq__(self, other):
         return isinstance(other, DerivedArrayDataFile) \
@@ -3707,8 +4208,7 @@ class ArrayDataFile(DataFile):
 )""".format(data_file=self, num_generated_from=len(self.generated_from),
             num_comments=len(self.comments))
 
-    def __hash__(self):
-        return hash(repr(self))
+    __hash__ = _KeyHashable.__hash__
 
     def __eq__(self, other):
         return isinstance(other, ArrayDataFile) \
@@ -3744,8 +4244,7 @@ class DerivedSpectralDataFile(DataFile):
 )""".format(data_file=self, num_generated_from=len(self.generated_from),
             num_comments=len(self.comments))
 
-    def __hash__(self):
-        return hash(repr(self))
+    __hash__ = _KeyHashable.__hash__
 
     def __eq__(self, other):
         return isinstance(other, DerivedSpectralDataFile) \
@@ -3781,8 +4280,7 @@ class ProteinAssignmentFile(DataFile):
 )""".format(data_file=self, num_generated_from=len(self.generated_from),
             num_comments=len(self.comments))
 
-    def __hash__(self):
-        return hash(repr(self))
+    __hash__ = _KeyHashable.__hash__
 
     def __eq__(self, other):
         return isinstance(other, ProteinAssignmentFile) \
@@ -3818,8 +4316,7 @@ class PeptideAssignmentFile(DataFile):
 )""".format(data_file=self, num_generated_from=len(self.generated_from),
             num_comments=len(self.comments))
 
-    def __hash__(self):
-        return hash(repr(self))
+    __hash__ = _KeyHashable.__hash__
 
     def __eq__(self, other):
         return isinstance(other, PeptideAssignmentFile) \
@@ -3855,8 +4352,7 @@ class DerivedArrayDataMatrixFile(DataFile):
 )""".format(data_file=self, num_generated_from=len(self.generated_from),
             num_comments=len(self.comments))
 
-    def __hash__(self):
-        return hash(repr(self))
+    __hash__ = _KeyHashable.__hash__
 
     def __eq__(self, other):
         return isinstance(other, DerivedArrayDataMatrixFile) \
@@ -3893,8 +4389,7 @@ class PostTranslationalModificationAssignmentFile(DataFile):
 )""".format(data_file=self, num_generated_from=len(self.generated_from),
             num_comments=len(self.comments))
 
-    def __hash__(self):
-        return hash(repr(self))
+    __hash__ = _KeyHashable.__hash__
 
     def __eq__(self, other):
         return isinstance(other, PostTranslationalModificationAssignmentFile) \
@@ -3931,8 +4426,7 @@ class AcquisitionParameterDataFile(DataFile):
 )""".format(data_file=self, num_generated_from=len(self.generated_from),
             num_comments=len(self.comments))
 
-    def __hash__(self):
-        return hash(repr(self))
+    __hash__ = _KeyHashable.__hash__
 
     def __eq__(self, other):
         return isinstance(other, AcquisitionParameterDataFile) \
@@ -3968,8 +4462,7 @@ class FreeInductionDecayDataFile(DataFile):
 )""".format(data_file=self, num_generated_from=len(self.generated_from),
             num_comments=len(self.comments))
 
-    def __hash__(self):
-        return hash(repr(self))
+    __hash__ = _KeyHashable.__hash__
 
     def __eq__(self, other):
         return isinstance(other, FreeInductionDecayDataFile) \
@@ -162,13 +162,14 @@ def get_data_files(mtbls_study_id, factor_selection=None):
             .format(study_id=mtbls_study_id))
 
     else:
-        result = slice_data_files(tmp_dir, factor_selection=factor_selection)
+        result = slice_data_files(tmp_dir, factor_selection=factor_selection,
+                                  index=isatab.SliceIndex(tmp_dir))
 
     shutil.rmtree(tmp_dir)
     return result
 
 
-def slice_data_files(dir, factor_selection=None):
+def slice_data_files(dir, factor_selection=None, index=None):
     """
     This function gets a list of samples and related data file URLs for a given
     MetaboLights study, optionally filtered by factor value (currently by
@@ -178,6 +179,8 @@ def slice_data_files(dir, factor_selection=None):
     a str (e.g. MTBLS1)
     :param factor_selection: A list of selected factor values to filter on
     samples
+    :param index: An isatab.SliceIndex of the study, or None to use the one
+    returned by isatab.get_slice_index
     :return: A list of dicts {sample_name, list of data_files} containing
     sample names with associated data filenames
 
@@ -199,64 +202,60 @@ def slice_data_files(dir, factor_selection=None):
             }
         }
     """
+    if index is None:
+        index = isatab.get_slice_index(dir)
     results = []
     # first collect matching samples
     for table_file in glob.iglob(os.path.join(dir, '[a|s]_*')):
         log.info('Loading {table_file}'.format(table_file=table_file))
 
-        with open(table_file, encoding='utf-8') as fp:
-            df = isatab.load_table(fp)
-            df = df[[x for x in df.columns if
-                     'Factor Value' in x or 'Sample Name' in x]]
-            df.columns = ['sample' if 'Sample Name' in x else x for x in
-                          df.columns]
-            df.columns = [x[13:-1] if 'Factor Value' in x else x for x in
-                          df.columns]
-            df.columns = [x.replace(' ', '_') for x in df.columns]
-            # build query
-            sample_names_series = df['sample'].drop_duplicates()
-            if factor_selection is None:
-                results = sample_names_series.apply(lambda x: {
-                                'sample': x,
-                                'data_files': [],
-                                'query_used': ''
-                            }).tolist()
-            else:
-                factor_query = ''
-                for factor_name, factor_value in factor_selection.items():
-                    factor_name = factor_name.replace(' ', '_')
-                    factor_query += '{factor_name}=="{factor_value}" and '\
-                        .format(factor_name=factor_name,
-                                factor_value=factor_value)
-                factor_query = factor_query[:-5]
-                try:
-                    query_results = df.query(factor_query)[
-                        'sample'].drop_duplicates()
-                    results = query_results.apply(lambda x: {
-                        'sample': x,
-                        'data_files': [],
-                        'query_used': factor_selection
-                    }).tolist()
-                except pd.core.computation.ops.UndefinedVariableError:
-                    pass
+        df = index.table(table_file).df
+        df = df[[x for x in df.columns if
+                 'Factor Value' in x or 'Sample Name' in x]]
+        df.columns = ['sample' if 'Sample Name' in x else x for x in
+                      df.columns]
+        df.columns = [x[13:-1] if 'Factor Value' in x else x for x in
+                      df.columns]
+        df.columns = [x.replace(' ', '_') for x in df.columns]
+        # build query
+        sample_names_series = df['sample'].drop_duplicates()
+        if factor_selection is None:
+            results = sample_names_series.apply(lambda x: {
+                'sample': x,
+                'data_files': [],
+                'query_used': ''
+            }).tolist()
+        else:
+            factor_query = ''
+            for factor_name, factor_value in factor_selection.items():
+                factor_name = factor_name.replace(' ', '_')
+                factor_query += '{factor_name}=="{factor_value}" and '\
+                    .format(factor_name=factor_name,
+                            factor_value=factor_value)
+            factor_query = factor_query[:-5]
+            try:
+                query_results = df.query(factor_query)[
+                    'sample'].drop_duplicates()
+                results = query_results.apply(lambda x: {
+                    'sample': x,
+                    'data_files': [],
+                    'query_used': factor_selection
+                }).tolist()
+            except pd.core.computation.ops.UndefinedVariableError:
+                pass
 
     # now collect the data files relating to the samples
     for table_file in glob.iglob(os.path.join(dir, 'a_*.txt')):
-        with open(table_file, encoding='utf-8') as fp:
-            df = isatab.load_table(fp)
-            df = df[[x for x in df.columns if
-                     'File' in x or 'Sample Name' in x]]
-            df.columns = ['sample' if 'Sample Name' in x else x for x in
-                          df.columns]
-            for result in results:
-                sample_name = result['sample']
-                sample_rows = df.loc[df['sample'] == sample_name]
-
-                for data_col in [x for x in sample_rows.columns
-                                 if 'File' in x]:
-                    data_files = sample_rows[data_col]
-                    result['data_files'] = [i for i in data_files if
-                                            str(i) != 'nan']
+        table = index.table(table_file)
+        data_cols = [x for x in table.df.columns if
+                     'File' in x and 'Sample Name' not in x]
+        for result in results:
+            sample_rows = table.sample_rows.get(result['sample'], [])
+
+            for data_col in data_cols:
+                data_files = table.column(data_col)
+                result['data_files'] = [data_files[i] for i in sample_rows
+                                        if str(data_files[i]) != 'nan']
     return results
 
 
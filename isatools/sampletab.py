@@ -15,6 +15,7 @@ import pandas as pd
 from progressbar import ETA, Bar, ProgressBar, SimpleProgress
 
 from isatools import logging as isa_logging
+from isatools.isatab import strip_comments
 from isatools.model import (
     Characteristic,
     Comment,
@@ -639,9 +640,12 @@ def dumps(investigation):
         index_label="Submission Title")
     msi_memf.seek(0)
 
-    scd_DF = pd.DataFrame(columns=(
+    # gather the rows as plain records and build the frame once, keeping
+    # the columns in the order they are first seen in the samples
+    scd_columns = dict.fromkeys((
         "Sample Name", "Sample Accession", "Sample Description",
         "Derived From", "Group Name", "Group Accession"))
+    scd_records = []
 
     all_samples = []
     for study in investigation.studies:
@@ -656,7 +660,7 @@ def dumps(investigation):
             Bar(left=" |", right="| "), ETA()]).start()
     else:
         def pbar(x): return x
-    for i, s in pbar(enumerate(all_samples)):
+    for s in pbar(all_samples):
         derived_from = ""
         if isinstance(s, Sample) and s.derives_from is not None:
             if len(s.derives_from) == 1:
@@ -713,12 +717,15 @@ def dumps(investigation):
             else:
                 group_accession = ""
 
-        scd_DF.loc[i, "Sample Name"] = s.name
-        scd_DF.loc[i, "Sample Accession"] = sample_accession
-        scd_DF.loc[i, "Sample Description"] = sample_description
-        scd_DF.loc[i, "Derived From"] = derived_from
-        scd_DF.loc[i, "Group Name"] = group_name
-        scd_DF.loc[i, "Group Accession"] = group_accession
+        record = {
+            "Sample Name": s.name,
+            "Sample Accession": sample_accession,
+            "Sample Description": sample_description,
+            "Derived From": derived_from,
+            "Group Name": group_name,
+            "Group Accession": group_accession
+        }
+        scd_records.append(record)
 
         characteristics = [
             x for x in s.characteristics if x.category.term not in [
@@ -728,38 +735,46 @@ def dumps(investigation):
         for characteristic in characteristics:
             characteristic_label = "Characteristic[{}]".format(
                 characteristic.category.term)
-            if characteristic_label not in scd_DF.columns:
-                scd_DF[characteristic_label] = ""
-                for val_col in get_value_columns(
-                        characteristic_label, characteristic):
-                    scd_DF[val_col] = ""
+            if characteristic_label not in scd_columns:
+                scd_columns[characteristic_label] = None
+                scd_columns.update(dict.fromkeys(get_value_columns(
+                    characteristic_label, characteristic)))
             if isinstance(characteristic.value, (int, float)
                           ) and characteristic.unit:
                 if isinstance(characteristic.unit, OntologyAnnotation):
-                    scd_DF.loc[i, characteristic_label] = characteristic.value
-                    scd_DF.loc[i, characteristic_label +
-                               ".Unit"] = characteristic.unit.term
-                    scd_DF.loc[i, characteristic_label +
-                               ".Unit.Term Source REF"]\
-                        = characteristic.unit.term_source.name \
-                        if characteristic.unit.term_source else ""
-                    scd_DF.loc[i, characteristic_label +
-                               ".Unit.Term Accession Number"] = \
-                        characteristic.unit.term_accession
+                    values = {
+                        characteristic_label: characteristic.value,
+                        characteristic_label + ".Unit":
+                            characteristic.unit.term,
+                        characteristic_label + ".Unit.Term Source REF":
+                            characteristic.unit.term_source.name
+                            if characteristic.unit.term_source else "",
+                        characteristic_label + ".Unit.Term Accession Number":
+                            characteristic.unit.term_accession
+                    }
                 else:
-                    scd_DF.loc[i, characteristic_label] = characteristic.value
-                    scd_DF.loc[i, characteristic_label +
-                               ".Unit"] = characteristic.unit
+                    values = {
+                        characteristic_label: characteristic.value,
+                        characteristic_label + ".Unit": characteristic.unit
+                    }
             elif isinstance(characteristic.value, OntologyAnnotation):
-                scd_DF.loc[i, characteristic_label] = characteristic.value.term
-                scd_DF.loc[i, characteristic_label + ".Term Source REF"] = \
-                    characteristic.value.term_source.name \
-                    if characteristic.value.term_source else ""
-                scd_DF.loc[i, characteristic_label
-                           + ".Term Accession Number"] = \
-                    characteristic.value.term_accession
+                values = {
+                    characteristic_label: characteristic.value.term,
+                    characteristic_label + ".Term Source REF":
+                        characteristic.value.term_source.name
+                        if characteristic.value.term_source else "",
+                    characteristic_label + ".Term Accession Number":
+                        characteristic.value.term_accession
+                }
             else:
-                scd_DF.loc[i, characteristic_label] = characteristic.value
+                values = {characteristic_label: characteristic.value}
+            # a later value may need columns the first one of its category
+            # did not, e.g. an OntologyAnnotation after a plain value
+            scd_columns.update(dict.fromkeys(values))
+            record.update(values)
+
+    scd_DF = pd.DataFrame(scd_records, columns=list(scd_columns),
+                          dtype=object)
 
     scd_DF = scd_DF.replace('', np.nan)
     columns = list(scd_DF.columns)
@@ -825,22 +840,3 @@ def get_value_columns(label, x):
                    "Term Source REF", "Term Accession Number"])
     else:
         return []
-
-
-def strip_comments(in_fp):
-    """Strip out comment lines indicated by a # at start of line from a given
-    file
-
-    :param in_fp: A file-like buffer object
-    :return: A memory file buffer object with comments stripped out
-    """
-    out_fp = StringIO()
-    if not isinstance(in_fp, StringIO):
-        out_fp.name = in_fp.name
-    for line in in_fp.readlines():
-        if line.lstrip().startswith('#'):
-            pass
-        else:
-            out_fp.write(line)
-    out_fp.seek(0)
-    return out_fp
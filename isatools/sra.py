@@ -8,9 +8,11 @@ isatools.model package.
 import datetime
 import hashlib
 import html
+import json
 import logging
 import os
 import xml.dom.minidom
+from concurrent.futures import ThreadPoolExecutor
 from functools import partial
 
 import iso8601
@@ -35,8 +37,14 @@ sra_lab_name = sra_center_name
 sra_submission_action = 'ADD'
 sra_center_prj_name = None
 
+# sidecar file, in the directory of the data files, caching their checksums
+DATAFILE_HASHES_MANIFEST = '.isatools-md5.json'
+# bytes read from a data file per update of its checksum
+DATAFILE_HASH_BUFFER_SIZE = 2 ** 20
 
-def export(investigation, export_path, sra_settings=None, datafilehashes=None):
+
+def export(investigation, export_path, sra_settings=None, datafilehashes=None,
+           datafiles_path=None):
     """Exports ISA Data model objects to SRA-XML files
 
     The exporter uses the jinja2 templating engine. The SRA templates can be
@@ -47,6 +55,8 @@ def export(investigation, export_path, sra_settings=None, datafilehashes=None):
     :param sra_settings: Some universal settings to apply to the SRA export
     :param datafilehashes: A list of data file hashes to apply to the exported
     files
+    :param datafiles_path: Path to the data files, to compute the data file
+    hashes with create_datafile_hashes if datafilehashes is not given
     :return: None
     """
 
@@ -69,10 +79,20 @@ def export(investigation, export_path, sra_settings=None, datafilehashes=None):
                 break
         return sample
 
+    # the parameter values of each process by normalised parameter name,
+    # as looked up by get_pv
+    parameter_values_by_name = dict()
+
     def get_pv(process, name):
-        hits = [pv for pv in process.parameter_values if
-                pv.category.parameter_name.term.lower().replace('_', ' ')
-                == name.lower().replace('_', ' ')]
+        try:
+            pvs_by_name = parameter_values_by_name[id(process)]
+        except KeyError:
+            pvs_by_name = parameter_values_by_name[id(process)] = dict()
+            for pv in process.parameter_values:
+                pvs_by_name.setdefault(
+                    pv.category.parameter_name.term.lower().replace('_', ' '),
+                    []).append(pv)
+        hits = pvs_by_name.get(name.lower().replace('_', ' '), [])
         if len(hits) > 1:
             raise AttributeError(
                 "Multiple parameter values of category '{}' found".format(
@@ -96,6 +116,24 @@ def export(investigation, export_path, sra_settings=None, datafilehashes=None):
         # sra_center_prj_name = sra_settings['sra_center_prj_name']
 
     log.info('isatools.sra.export()')
+    env = jinja2.Environment()
+    env.loader = jinja2.FileSystemLoader(
+        os.path.join(
+            os.path.dirname(__file__), 'resources', 'sra_templates'))
+    if datafilehashes is None and datafiles_path is not None:
+        datafilenames = list()
+        for istudy in investigation.studies:
+            for iassay in istudy.assays:
+                if (iassay.measurement_type.term,
+                        iassay.technology_type.term) not in \
+                        supported_sra_assays:
+                    continue
+                for process in iassay.process_sequence:
+                    datafilenames.extend(
+                        output.filename for output in process.outputs
+                        if isinstance(output, DataFile) and output.filename)
+        datafilehashes = create_datafile_hashes(
+            datafiles_path, list(dict.fromkeys(datafilenames)))
     for istudy in investigation.studies:
         is_sra = False
         for iassay in istudy.assays:
@@ -139,10 +177,6 @@ def export(investigation, export_path, sra_settings=None, datafilehashes=None):
         # ideally make it a requirement in the model or JSON to have html
         # escaped content
 
-        env = jinja2.Environment()
-        env.loader = jinja2.FileSystemLoader(
-            os.path.join(
-                os.path.dirname(__file__), 'resources', 'sra_templates'))
         xsub_template = env.get_template('submission_add.xml')
         sra_contact = None
         if sra_settings is not None:
@@ -154,16 +188,22 @@ def export(investigation, export_path, sra_settings=None, datafilehashes=None):
                 'inform_on_error': inform_on_error,
                 'contact_name': contact_name
             }
-        xsub = xsub_template.render(accession=study_acc,
+        xsub = xsub_template.stream(accession=study_acc,
                                     contacts=istudy.contacts,
                                     submission_date=istudy.submission_date,
                                     sra_center_name=sra_center_name,
                                     sra_broker_name=sra_broker_name,
                                     sra_contact=sra_contact)
         xproj_template = env.get_template('project_set.xml')
-        xproj = xproj_template.render(
+        xproj = xproj_template.stream(
             study=istudy, sra_center_name=sra_center_name)
 
+        # the inputs of the first study process outputting each sample
+        sample_sources = dict()
+        for process in istudy.process_sequence:
+            for output in process.outputs:
+                sample_sources.setdefault(output, process.inputs)
+
         assays_to_export = list()
         for iassay in istudy.assays:
             if (iassay.measurement_type.term, iassay.technology_type.term) in \
@@ -174,20 +214,25 @@ def export(investigation, export_path, sra_settings=None, datafilehashes=None):
                     'nucleic acid sequencing']
                 for assay_seq_process in assay_seq_processes:
                     do_export = True
-                    if get_comment(assay_seq_process, 'export') is not None:
+                    export_comment = get_comment(assay_seq_process, 'export')
+                    if export_comment is not None:
                         log.debug('HAS EXPORT COMMENT IN ASSAY')
-                        export = get_comment(assay_seq_process, 'export').value
+                        export = export_comment.value
                         log.debug('export is {}'.format(export))
                         do_export = export.lower() != 'no'
                     else:
                         log.debug('NO EXPORT COMMENT FOUND')
                     log.debug('Perform export? '.format(str(do_export)))
                     if do_export:
+                        process_chain = [assay_seq_process]
+                        while process_chain[-1].prev_process is not None:
+                            process_chain.append(
+                                process_chain[-1].prev_process)
                         sample = None
-                        curr_process = assay_seq_process
-                        while sample is None:
+                        for curr_process in process_chain:
                             sample = get_sample(curr_process)
-                            curr_process = curr_process.prev_process
+                            if sample is not None:
+                                break
                         assay_to_export = \
                             {
                                 'sample': sample,
@@ -237,11 +282,9 @@ def export(investigation, export_path, sra_settings=None, datafilehashes=None):
                                 }
                             )
                         source = None
-                        matching_sources = [
-                            p.inputs for p in istudy.process_sequence
-                            if sample in p.outputs]
-                        if len(matching_sources[0]) == 1:
-                            source = matching_sources[0][0]
+                        matching_sources = sample_sources[sample]
+                        if len(matching_sources) == 1:
+                            source = matching_sources[0]
                         assay_to_export['source'] = {
                             'name': source.name,
                             'characteristics': source.characteristics,
@@ -255,15 +298,10 @@ def export(investigation, export_path, sra_settings=None, datafilehashes=None):
                                 '_') + 1:]
                         assay_to_export['source']['scientific_name'] = \
                             organism_charac.value.term
-                        curr_process = assay_seq_process
-                        while curr_process.prev_process is not None:
+                        for curr_process in process_chain[:-1]:
                             assay_to_export[
                                 curr_process.executes_protocol.protocol_type
                                 .term] = curr_process
-                            try:
-                                curr_process = curr_process.prev_process
-                            except AttributeError:
-                                pass
                         target_taxon = get_pv(
                             assay_to_export['library construction'],
                             'target_taxon')
@@ -533,32 +571,33 @@ def export(investigation, export_path, sra_settings=None, datafilehashes=None):
                         iassay.technology_type.term))
 
         xexp_set_template = env.get_template('experiment_set.xml')
-        xexp_set = xexp_set_template.render(assays_to_export=assays_to_export,
-                                            study=istudy,
-                                            sra_center_name=sra_center_name,
-                                            sra_broker_name=sra_broker_name)
+        xexp_set = xexp_set_template.stream(
+            assays_to_export=assays_to_export, study=istudy,
+            sra_center_name=sra_center_name, sra_broker_name=sra_broker_name)
         xrun_set_template = env.get_template('run_set.xml')
-        xrun_set = xrun_set_template.render(assays_to_export=assays_to_export,
-                                            study=istudy,
-                                            sra_center_name=sra_center_name,
-                                            sra_broker_name=sra_broker_name)
+        xrun_set = xrun_set_template.stream(
+            assays_to_export=assays_to_export, study=istudy,
+            sra_center_name=sra_center_name, sra_broker_name=sra_broker_name)
         samples_to_export = list()
+        sample_aliases = set()
         for assay_to_export in assays_to_export:
-            if len([s for s in samples_to_export if
-                    s['sample_alias'] == assay_to_export['sample_alias']]) > 0:
-                pass
-            else:
+            if assay_to_export['sample_alias'] not in sample_aliases:
+                sample_aliases.add(assay_to_export['sample_alias'])
                 samples_to_export.append(assay_to_export)
         xsample_set_template = env.get_template('sample_set.xml')
-        xsample_set = xsample_set_template.render(
+        xsample_set = xsample_set_template.stream(
             assays_to_export=samples_to_export, study=istudy,
             sra_center_name=sra_center_name, sra_broker_name=sra_broker_name)
         log.debug("SRA exporter: writing SRA XML files for study " + study_acc)
 
-        # blitz out whitespaces with etree and format nicely with minidom
-        def prettify(xmlstr):
+        # blitz out whitespaces with etree and format nicely with minidom,
+        # parsing the rendered template as it streams
+        def prettify(xmlstream):
             p = etree.XMLParser(remove_blank_text=True)
-            exsub = etree.XML(xmlstr, parser=p)
+            xmlstream.enable_buffering(size=1000)
+            for xmlchunk in xmlstream:
+                p.feed(xmlchunk)
+            exsub = p.close()
             x = xml.dom.minidom.parseString(etree.tostring(exsub))
             return x.toprettyxml()
 
@@ -611,13 +650,90 @@ def export(investigation, export_path, sra_settings=None, datafilehashes=None):
                 "export path '{}' is not a directory".format(export_path))
 
 
-def create_datafile_hashes(fileroot, filenames):
+def md5sum(filename):
+    """Computes the md5 of a file, reading it in large chunks
+
+    :param filename: Path to the file
+    :return: The md5 of the file as a hex string
+    """
+    d = hashlib.md5()
+    buf = memoryview(bytearray(DATAFILE_HASH_BUFFER_SIZE))
+    with open(filename, mode='rb', buffering=0) as f:
+        for n in iter(partial(f.readinto, buf), 0):
+            d.update(buf[:n])
+    return d.hexdigest()
+
+
+def load_datafile_hashes_manifest(manifest_path):
+    """Loads a manifest of data file hashes, as written by
+    create_datafile_hashes
+
+    :param manifest_path: Path to the manifest
+    :return: dict of the size, mtime_ns and md5 of each filename, empty if
+    the manifest does not exist or cannot be read
+    """
+    try:
+        with open(manifest_path, encoding='utf-8') as fp:
+            manifest = json.load(fp)
+    except FileNotFoundError:
+        return dict()
+    except (OSError, ValueError) as e:
+        log.warning('Ignoring unreadable data file hashes manifest {}: {}'
+                    .format(manifest_path, e))
+        return dict()
+    return manifest if isinstance(manifest, dict) else dict()
+
+
+def save_datafile_hashes_manifest(manifest_path, manifest):
+    """Writes a manifest of data file hashes, replacing any previous one
+    only once it is complete
+
+    :param manifest_path: Path to the manifest
+    :param manifest: dict of the size, mtime_ns and md5 of each filename
+    :return: None
+    """
+    tmp_path = '{}.{}.tmp'.format(manifest_path, os.getpid())
+    try:
+        with open(tmp_path, 'w', encoding='utf-8') as fp:
+            json.dump(manifest, fp, indent=4, sort_keys=True)
+        os.replace(tmp_path, manifest_path)
+    except OSError as e:
+        log.warning('Could not write data file hashes manifest {}: {}'
+                    .format(manifest_path, e))
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+
+
+def _hash_datafile(filename):
+    """Computes the md5 of a file along with its stat taken once it is
+    hashed
+
+    :param filename: Path to the file
+    :return: tuple of the md5 of the file and its os.stat_result
+    """
+    md5 = md5sum(filename)
+    return md5, os.stat(filename)
+
+
+def create_datafile_hashes(fileroot, filenames, workers=None,
+                           manifest_path=None):
     """
     Create md5 file dict for files in a directory with a particular extension
 
+    The files are hashed concurrently in a pool of threads. Their md5s are
+    cached in a manifest keyed on filename, size and modification time, so
+    that files left unchanged since are not hashed again. A file that
+    changes while it is hashed is not cached.
+
     :param fileroot: Root to directory containing files (assumes all in
     same dir)
     :param filenames: List of filenames of files to md5, assumed in fileroot
+    :param workers: Number of threads hashing files, or None for the default
+    of ThreadPoolExecutor
+    :param manifest_path: Path to the manifest of md5s, by default
+    DATAFILE_HASHES_MANIFEST in fileroot
     :return: dict containing filenames and md5s
 
     Usage:
@@ -628,19 +744,42 @@ def create_datafile_hashes(fileroot, filenames):
         'myfile2.gz': 'd41d8cd98f00b204e9800998ecf8427e'
     }
     """
-    def md5sum(filename):
-        with open(filename, mode='rb') as f:
-            d = hashlib.md5()
-            for buf in iter(partial(f.read, 128), b''):
-                d.update(buf)
-        return d.hexdigest()
-
     from os.path import isfile, join
+    if manifest_path is None:
+        manifest_path = join(fileroot, DATAFILE_HASHES_MANIFEST)
+    manifest = load_datafile_hashes_manifest(manifest_path)
     datafilehashes = dict()
+    stats = dict()
     for file in filenames:
-        if isfile(join(fileroot, file)):
-            datafilehashes[file] = md5sum(filename=join(fileroot, file))
-        else:
+        if not isfile(join(fileroot, file)):
             raise FileNotFoundError(
                 '{} is not a file'.format(join(fileroot, file)))
-    return datafilehashes
+        stat = os.stat(join(fileroot, file))
+        entry = manifest.get(file)
+        md5 = entry.get('md5') if isinstance(entry, dict) else None
+        if isinstance(md5, str) and entry.get('size') == stat.st_size \
+                and entry.get('mtime_ns') == stat.st_mtime_ns:
+            datafilehashes[file] = md5
+        else:
+            stats[file] = stat
+    if stats:
+        log.info('Hashing {} data files in {}'.format(len(stats), fileroot))
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            hashes = executor.map(
+                _hash_datafile, [join(fileroot, file) for file in stats])
+            for (file, stat), (md5, hashed_stat) in zip(
+                    stats.items(), hashes):
+                datafilehashes[file] = md5
+                if (hashed_stat.st_size, hashed_stat.st_mtime_ns) != \
+                        (stat.st_size, stat.st_mtime_ns):
+                    log.warning('{} changed while it was hashed, not caching '
+                                'its md5'.format(join(fileroot, file)))
+                    manifest.pop(file, None)
+                    continue
+                manifest[file] = {
+                    'size': hashed_stat.st_size,
+                    'mtime_ns': hashed_stat.st_mtime_ns,
+                    'md5': md5
+                }
+        save_datafile_hashes_manifest(manifest_path, manifest)
+    return {file: datafilehashes[file] for file in filenames}
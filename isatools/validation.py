@@ -0,0 +1,139 @@
+# -*- coding: utf-8 -*-
+"""Utilities shared by the ISA-Tab and ISA-JSON validators."""
+from __future__ import absolute_import
+import contextvars
+import logging
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+
+log = logging.getLogger('isatools')
+
+
+class ValidationMessages(object):
+    """The validation messages of one level, e.g. errors or warnings, of the
+    validation currently running
+
+    The checks append messages to it as they would to a list. Each call of
+    reset starts a new list in the current context only, so that validations
+    running in different threads keep their messages apart. A context that
+    was never reset, e.g. a new thread, gets a list of its own on first use.
+    """
+
+    def __init__(self, level):
+        self._messages = contextvars.ContextVar(
+            'validator_{}'.format(level), default=None)
+
+    def get(self):
+        """Get the list of messages of the current context
+
+        :return: The list of messages
+        """
+        messages = self._messages.get()
+        if messages is None:
+            messages = self.reset()
+        return messages
+
+    def reset(self):
+        """Start a new, empty list of messages in the current context
+
+        :return: The new list of messages
+        """
+        messages = []
+        self._messages.set(messages)
+        return messages
+
+    def __getattr__(self, name):
+        return getattr(self.get(), name)
+
+    def __len__(self):
+        return len(self.get())
+
+    def __iter__(self):
+        return iter(self.get())
+
+    def __getitem__(self, index):
+        return self.get()[index]
+
+    def __contains__(self, message):
+        return message in self.get()
+
+    def __eq__(self, other):
+        if isinstance(other, ValidationMessages):
+            other = other.get()
+        return self.get() == other
+
+    def __repr__(self):
+        return repr(self.get())
+
+
+def failed_validation_report(e):
+    """Build the validation report of a file whose validation crashed
+
+    :param e: The exception raised by the validation
+    :return: A validation report with a single Unknown/System Error
+    """
+    return {
+        "errors": [{
+            "message": "Unknown/System Error",
+            "supplemental":
+                "The validator could not identify what the error is: {}"
+            .format(str(e)),
+            "code": 0
+        }],
+        "warnings": [],
+        "info": [],
+        "validation_finished": False
+    }
+
+
+def map_validate(validate_file, file_list, workers=None):
+    """Validate a batch of files, in parallel processes if there are more
+    than one workers
+
+    A validation that raises an exception, or that takes down its worker
+    process, gets a report with an Unknown/System Error instead of
+    stopping the rest of the batch.
+
+    :param validate_file: A module-level function validating a single file,
+    and returning a (filename, report) tuple or None to skip the file
+    :param file_list: List of the files to validate
+    :param workers: Number of worker processes to validate the files with.
+    The files are validated one after another if it is None or 1
+    :return: List of (filename, report) tuples in the order of file_list
+    """
+    results = [None] * len(file_list)
+    if workers is None or workers <= 1:
+        for i, file_name in enumerate(file_list):
+            try:
+                results[i] = validate_file(file_name)
+            except Exception as e:
+                log.fatal("(F) Validation of {} failed: {}".format(
+                    file_name, e))
+                results[i] = (file_name, failed_validation_report(e))
+        return [x for x in results if x is not None]
+
+    broken = []
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = [executor.submit(validate_file, x) for x in file_list]
+        for i, future in enumerate(futures):
+            try:
+                results[i] = future.result()
+            except BrokenProcessPool:
+                broken.append(i)
+            except Exception as e:
+                log.fatal("(F) Validation of {} failed: {}".format(
+                    file_list[i], e))
+                results[i] = (file_list[i], failed_validation_report(e))
+    # a worker that dies breaks every validation still pending in the pool,
+    # so validate those again each in a pool of its own to find the culprit
+    for i in broken:
+        with ProcessPoolExecutor(max_workers=1) as executor:
+            try:
+                results[i] = executor.submit(
+                    validate_file, file_list[i]).result()
+            except Exception as e:
+                log.fatal("(F) Validation of {} failed: {}".format(
+                    file_list[i], e))
+                results[i] = (file_list[i], failed_validation_report(e))
+    return [x for x in results if x is not None]
@@ -0,0 +1,785 @@
+"""Benchmarks of the ISA-API on generated content
+
+The benchmarks only run when SLOW_TESTS is set. The correctness of what
+they time is tested along with each module. Timings are logged so that
+they can be compared between runs, e.g. with
+SLOW_TESTS=1 python -m pytest --log-cli-level=INFO tests/test_benchmarks.py
+"""
+import hashlib
+import io
+import json
+import logging
+import os
+import pickle
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+import unittest
+from collections import OrderedDict
+from unittest.mock import patch
+
+from isatools import isajson, isatab, sra
+from isatools.convert import isatab2json, json2sampletab
+from isatools.create.constants import SAMPLE
+from isatools.create.model import (
+    AssayGraph, ProductNode, ProtocolNode, QualityControl, QualityControlService, SampleAndAssayPlan, StudyArm,
+    StudyCell, StudyDesign, Treatment
+)
+from isatools.tests.create_sample_assay_plan_odicts import ms_assay_dict, nmr_assay_dict
+from isatools.model import (
+    Assay, Characteristic, Investigation, Extract, FactorValue, OntologyAnnotation, OntologyAnnotationTable,
+    OntologySource, ParameterValue, Person, Process, Protocol, ProtocolParameter, RawDataFile, Sample, Source, Study,
+    StudyFactor, plink
+)
+
+log = logging.getLogger('isatools')
+
+SLOW_TESTS = int(os.getenv('SLOW_TESTS', '0'))
+# seconds that a bare import isatools may take
+IMPORT_TIME_BUDGET = 0.5
+
+
+def build_study(n_samples, samples_per_source=100):
+    """Build a study where each source is split into samples_per_source
+    samples, each of which is extracted and sequenced in a single assay
+
+    :param n_samples: The number of samples in the study
+    :param samples_per_source: The number of samples collected per source
+    :return: A Study object
+    """
+    study = Study(filename='s_benchmark.txt')
+    collection = Protocol(name='sample collection', protocol_type=OntologyAnnotation(term='sample collection'))
+    extraction = Protocol(name='extraction', protocol_type=OntologyAnnotation(term='nucleic acid extraction'))
+    sequencing = Protocol(name='sequencing', protocol_type=OntologyAnnotation(term='nucleic acid sequencing'))
+    study.protocols = [collection, extraction, sequencing]
+    assay = Assay(filename='a_benchmark.txt')
+    for i in range(max(n_samples // samples_per_source, 1)):
+        source = Source(name='source{}'.format(i))
+        samples = [Sample(name='sample{}-{}'.format(i, j), derives_from=[source])
+                   for j in range(samples_per_source)]
+        study.sources.append(source)
+        study.samples.extend(samples)
+        study.process_sequence.append(Process(executes_protocol=collection, inputs=[source], outputs=samples))
+        for sample in samples:
+            extract = Extract(name='extract-' + sample.name)
+            data_file = RawDataFile(filename=sample.name + '.fastq')
+            extraction_process = Process(executes_protocol=extraction, inputs=[sample], outputs=[extract])
+            sequencing_process = Process(executes_protocol=sequencing, inputs=[extract], outputs=[data_file])
+            plink(extraction_process, sequencing_process)
+            assay.samples.append(sample)
+            assay.other_material.append(extract)
+            assay.data_files.append(data_file)
+            assay.process_sequence.extend([extraction_process, sequencing_process])
+    study.assays.append(assay)
+    return study
+
+
+def build_sra_study(n_runs, samples_per_source=100):
+    """Build a metagenome sequencing study that can be exported to SRA, with
+    a sequencing run per sample
+
+    :param n_runs: The number of runs and samples in the study
+    :param samples_per_source: The number of samples collected per source
+    :return: A Study object
+    """
+    study = Study(identifier='BENCHMARK', title='benchmark', description='benchmark', filename='s_benchmark.txt')
+    study.contacts.append(Person(last_name='Doe', email='doe@example.org', roles=[
+        OntologyAnnotation(term='SRA Inform On Status'), OntologyAnnotation(term='SRA Inform On Error')]))
+    collection = Protocol(name='collection', protocol_type=OntologyAnnotation(term='sample collection'))
+    extraction = Protocol(name='extraction', protocol_type=OntologyAnnotation(term='nucleic acid extraction'))
+    library = Protocol(name='library', protocol_type=OntologyAnnotation(term='library construction'),
+                       parameters=[ProtocolParameter(parameter_name=OntologyAnnotation(term=name)) for name in
+                                   ('library strategy', 'library selection', 'library layout')])
+    sequencing = Protocol(name='sequencing', protocol_type=OntologyAnnotation(term='nucleic acid sequencing'),
+                          parameters=[ProtocolParameter(parameter_name=OntologyAnnotation(
+                              term='sequencing instrument'))])
+    study.protocols = [collection, extraction, library, sequencing]
+    organism = OntologyAnnotation(term='marine metagenome',
+                                  term_accession='http://purl.obolibrary.org/obo/NCBITaxon_408172')
+    assay = Assay(filename='a_benchmark.txt', measurement_type=OntologyAnnotation(term='metagenome sequencing'),
+                  technology_type=OntologyAnnotation(term='nucleotide sequencing'))
+    for i in range(max(n_runs // samples_per_source, 1)):
+        source = Source(name='source{}'.format(i), characteristics=[
+            Characteristic(category=OntologyAnnotation(term='organism'), value=organism)])
+        samples = [Sample(name='sample{}-{}'.format(i, j), derives_from=[source]) for j in range(samples_per_source)]
+        study.sources.append(source)
+        study.samples.extend(samples)
+        study.process_sequence.append(Process(executes_protocol=collection, inputs=[source], outputs=samples))
+        for sample in samples:
+            extract = Extract(name='extract-' + sample.name)
+            data_file = RawDataFile(filename=sample.name + '.sff')
+            processes = [
+                Process(executes_protocol=extraction, inputs=[sample], outputs=[extract]),
+                Process(executes_protocol=library, inputs=[extract], parameter_values=[
+                    ParameterValue(category=parameter, value=value) for parameter, value in
+                    zip(library.parameters, ('WGS', 'RANDOM', 'SINGLE'))]),
+                Process(name='run-' + sample.name, executes_protocol=sequencing, outputs=[data_file],
+                        parameter_values=[ParameterValue(category=sequencing.parameters[0], value='454 GS FLX')])
+            ]
+            plink(processes[0], processes[1])
+            plink(processes[1], processes[2])
+            assay.samples.append(sample)
+            assay.other_material.append(extract)
+            assay.data_files.append(data_file)
+            assay.process_sequence.extend(processes)
+    study.assays.append(assay)
+    return study
+
+
+def timed(func, *args, **kwargs):
+    """Call a function and time it
+
+    :return: A tuple of the elapsed seconds and the result of the call
+    """
+    start = time.perf_counter()
+    result = func(*args, **kwargs)
+    return time.perf_counter() - start, result
+
+
+def traced(func, *args, **kwargs):
+    """Call a function and trace its memory allocations
+
+    :return: A tuple of the elapsed seconds and the peak of allocated bytes
+    """
+    tracemalloc.start()
+    try:
+        elapsed, _ = timed(func, *args, **kwargs)
+        return elapsed, tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def report(benchmark, size, **timings):
+    log.info('{} [{}]: {}'.format(benchmark, size, ', '.join(
+        '{}={:.3f}s'.format(name, elapsed) for name, elapsed in timings.items())))
+
+
+def report_memory(benchmark, size, **allocations):
+    log.info('{} [{}]: {}'.format(benchmark, size, ', '.join(
+        '{}={:.1f}MB'.format(name, allocated / 2 ** 20) for name, allocated in allocations.items())))
+
+
+class BenchmarkEndToEndPaths(unittest.TestCase):
+
+    def run_benchmark(self, n_samples):
+        study = build_study(n_samples)
+        for G, start_type in ((study.graph, Source), (study.assays[0].graph, Sample)):
+            start_nodes = [x for x in G.nodes() if isinstance(G.indexes[x], start_type)]
+            networkx_time, _ = timed(isatab._all_end_to_end_paths_nx, G, start_nodes)
+            memoized_time, _ = timed(isatab._all_end_to_end_paths, G, start_nodes)
+            report('end-to-end paths from {}'.format(start_type.__name__), n_samples,
+                   networkx=networkx_time, memoized=memoized_time)
+
+    @unittest.skipIf(not SLOW_TESTS, "slow")
+    def test_1k_samples(self):
+        self.run_benchmark(1000)
+
+    @unittest.skipIf(not SLOW_TESTS, "slow")
+    def test_10k_samples(self):
+        self.run_benchmark(10000)
+
+    @unittest.skipIf(not SLOW_TESTS, "slow")
+    def test_100k_samples(self):
+        self.run_benchmark(100000)
+
+
+class BenchmarkWriteTableFiles(unittest.TestCase):
+
+    def setUp(self):
+        self._tmp_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self._tmp_dir)
+
+    def run_benchmark(self, n_samples):
+        investigation = Investigation(studies=[build_study(n_samples)])
+        for writer in (isatab.write_study_table_files, isatab.write_assay_table_files):
+            dataframe_time, dataframe_peak = traced(writer, investigation, self._tmp_dir)
+            stream_time, stream_peak = traced(writer, investigation, self._tmp_dir, stream=True)
+            report(writer.__name__, n_samples, dataframe=dataframe_time, stream=stream_time)
+            report_memory(writer.__name__ + ' peak memory', n_samples, dataframe=dataframe_peak, stream=stream_peak)
+
+    @unittest.skipIf(not SLOW_TESTS, "slow")
+    def test_1k_samples(self):
+        self.run_benchmark(1000)
+
+    @unittest.skipIf(not SLOW_TESTS, "slow")
+    def test_10k_samples(self):
+        self.run_benchmark(10000)
+
+    @unittest.skipIf(not SLOW_TESTS, "slow")
+    def test_100k_samples(self):
+        self.run_benchmark(100000)
+
+
+def rescan_data_files(dir, sample_names):
+    """Collect the data files of each sample by parsing the assay tables
+    again for it, as slice_data_files used to
+    """
+    results = []
+    for sample_name in sample_names:
+        data_files = []
+        for table_file in sorted(os.listdir(dir)):
+            if table_file.startswith('a_'):
+                with open(os.path.join(dir, table_file)) as fp:
+                    df = isatab.load_table(fp)
+                data_files = list(df.loc[df['Sample Name'] == sample_name]['Raw Data File'])
+        results.append({'sample': sample_name, 'data_files': data_files})
+    return results
+
+
+class BenchmarkSliceDataFiles(unittest.TestCase):
+
+    def setUp(self):
+        self._tmp_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self._tmp_dir)
+
+    def run_benchmark(self, n_samples):
+        investigation = Investigation(studies=[build_study(n_samples)])
+        isatab.write_study_table_files(investigation, self._tmp_dir)
+        isatab.write_assay_table_files(investigation, self._tmp_dir)
+        index = isatab.SliceIndex(self._tmp_dir)
+        timings = {}
+        timings['cold'], results = timed(isatab.slice_data_files, self._tmp_dir, index=index)
+        timings['warm'], _ = timed(isatab.slice_data_files, self._tmp_dir, index=index)
+        if n_samples <= 1000:
+            timings['rescan'], _ = timed(rescan_data_files, self._tmp_dir, [x['sample'] for x in results])
+        report('slice_data_files', n_samples, **timings)
+
+    @unittest.skipIf(not SLOW_TESTS, "slow")
+    def test_1k_samples(self):
+        self.run_benchmark(1000)
+
+    @unittest.skipIf(not SLOW_TESTS, "slow")
+    def test_10k_samples(self):
+        self.run_benchmark(10000)
+
+    @unittest.skipIf(not SLOW_TESTS, "slow")
+    def test_100k_samples(self):
+        self.run_benchmark(100000)
+
+
+def md5sum_128(filename):
+    """Compute the md5 of a file 128 bytes at a time, as
+    sra.create_datafile_hashes used to
+    """
+    d = hashlib.md5()
+    with open(filename, mode='rb') as f:
+        for buf in iter(lambda: f.read(128), b''):
+            d.update(buf)
+    return d.hexdigest()
+
+
+class BenchmarkDatafileHashes(unittest.TestCase):
+
+    def setUp(self):
+        self._tmp_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self._tmp_dir)
+
+    def run_benchmark(self, n_files, size):
+        filenames = ['run{}.fastq.gz'.format(i) for i in range(n_files)]
+        chunk = os.urandom(2 ** 20)
+        for filename in filenames:
+            with open(os.path.join(self._tmp_dir, filename), 'wb') as fp:
+                for _ in range(size // len(chunk)):
+                    fp.write(chunk)
+        timings = {}
+        timings['128b'], _ = timed(lambda: {x: md5sum_128(os.path.join(self._tmp_dir, x)) for x in filenames})
+        timings['threaded'], _ = timed(sra.create_datafile_hashes, self._tmp_dir, filenames)
+        timings['manifest'], _ = timed(sra.create_datafile_hashes, self._tmp_dir, filenames)
+        report('create_datafile_hashes of {}MB'.format(size // 2 ** 20), n_files, **timings)
+
+    @unittest.skipIf(not SLOW_TESTS, "slow")
+    def test_8_files_of_16mb(self):
+        self.run_benchmark(8, 16 * 2 ** 20)
+
+    @unittest.skipIf(not SLOW_TESTS, "slow")
+    def test_8_files_of_256mb(self):
+        self.run_benchmark(8, 256 * 2 ** 20)
+
+
+class BenchmarkSRAExport(unittest.TestCase):
+
+    def setUp(self):
+        self._tmp_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self._tmp_dir)
+
+    def run_benchmark(self, n_runs):
+        investigation = Investigation(studies=[build_sra_study(n_runs)])
+        export_time, _ = timed(sra.export, investigation, self._tmp_dir)
+        report('sra.export', n_runs, export=export_time)
+
+    @unittest.skipIf(not SLOW_TESTS, "slow")
+    def test_1k_runs(self):
+        self.run_benchmark(1000)
+
+    @unittest.skipIf(not SLOW_TESTS, "slow")
+    def test_10k_runs(self):
+        self.run_benchmark(10000)
+
+    @unittest.skipIf(not SLOW_TESTS, "slow")
+    def test_50k_runs(self):
+        self.run_benchmark(50000)
+
+
+class BenchmarkJSON2SampleTab(unittest.TestCase):
+
+    def setUp(self):
+        self._tmp_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self._tmp_dir)
+
+    def run_benchmark(self, n_samples):
+        study = build_study(n_samples)
+        organism = OntologyAnnotation(term='organism')
+        age = OntologyAnnotation(term='age')
+        day = OntologyAnnotation(term='day', term_accession='http://purl.obolibrary.org/obo/UO_0000033')
+        homo_sapiens = OntologyAnnotation(term='Homo sapiens',
+                                          term_accession='http://purl.obolibrary.org/obo/NCBITaxon_9606')
+        study.characteristic_categories = [organism, age]
+        study.units = [day]
+        # isajson.load expects the names prefixed as isatab2json writes them
+        for i, source in enumerate(study.sources):
+            source.name = 'source-{}'.format(i)
+            source.characteristics.append(Characteristic(category=organism, value=homo_sapiens))
+        for i, sample in enumerate(study.samples):
+            sample.name = 'sample-{}'.format(i)
+            sample.characteristics.append(Characteristic(category=age, value=i % 90, unit=day))
+        json_path = os.path.join(self._tmp_dir, 'benchmark.json')
+        with open(json_path, 'w') as fp:
+            json.dump(Investigation(identifier='benchmark', studies=[study]), fp, cls=isajson.ISAJSONEncoder)
+        sampletab_path = os.path.join(self._tmp_dir, 'benchmark.sampletab.txt')
+        with open(json_path) as json_fp, open(sampletab_path, 'w') as sampletab_fp:
+            convert_time, _ = timed(json2sampletab.convert, json_fp, sampletab_fp)
+        report('json2sampletab.convert', n_samples, convert=convert_time)
+
+    @unittest.skipIf(not SLOW_TESTS, "slow")
+    def test_10k_samples(self):
+        self.run_benchmark(10000)
+
+    @unittest.skipIf(not SLOW_TESTS, "slow")
+    def test_100k_samples(self):
+        self.run_benchmark(100000)
+
+
+class ScanningISATab2ISAjson(isatab2json.ISATab2ISAjson_v1):
+    """An ISA-Tab to ISA-JSON converter that scans a list of its
+    identifiers on every lookup, as it used to
+    """
+
+    def __init__(self, identifier_type):
+        super(ScanningISATab2ISAjson, self).__init__(identifier_type)
+        self.identifiers = list()
+
+    def setIdentifier(self, type, name, identifier):
+        self.identifiers.append(dict([("type", type), ("name", name), ("identifier", identifier)]))
+
+    def getIdentifier(self, type, name):
+        for subVal in self.identifiers:
+            if subVal["type"] == type and subVal["name"] == name:
+                return subVal["identifier"]
+
+
+class BenchmarkISATab2JSON(unittest.TestCase):
+
+    def setUp(self):
+        self._tmp_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self._tmp_dir)
+
+    def run_benchmark(self, n_samples):
+        study = build_study(n_samples)
+        # the ISA-Tab parser of the converter skips a study without identifier
+        study.identifier = study.title = 'benchmark'
+        isatab.dump(Investigation(identifier='benchmark', title='benchmark', studies=[study]), self._tmp_dir)
+        identifier_type = isatab2json.IdentifierType.counter
+        scan_time, _ = timed(ScanningISATab2ISAjson(identifier_type).convert, self._tmp_dir)
+        keyed_time, _ = timed(isatab2json.ISATab2ISAjson_v1(identifier_type).convert, self._tmp_dir)
+        report('isatab2json.convert', n_samples, scan=scan_time, keyed=keyed_time)
+
+    @unittest.skipIf(not SLOW_TESTS, "slow")
+    def test_1k_samples(self):
+        self.run_benchmark(1000)
+
+    @unittest.skipIf(not SLOW_TESTS, "slow")
+    def test_10k_samples(self):
+        self.run_benchmark(10000)
+
+    @unittest.skipIf(not SLOW_TESTS, "slow")
+    def test_100k_samples(self):
+        self.run_benchmark(100000)
+
+
+class ScanningAssayGraph(AssayGraph):
+    """An assay graph that scans all its nodes for the previous nodes of a
+    node, and does not cache them, as it used to
+    """
+
+    def previous_nodes(self, node):
+        graph_dict = self._AssayGraph__graph_dict
+        return {n for n in graph_dict if node in graph_dict[n]}
+
+    def previous_protocol_nodes(self, protocol_node):
+        return self._AssayGraph__find_previous_protocol_nodes(protocol_node)
+
+
+def walk_generate_assay(assay_graph, assay_samples):
+    """Generate the processes, materials and data files of an assay by
+    walking the assay graph again for each sample, as StudyDesign.generate_assay
+    used to
+    """
+    processes, other_materials, data_files = [], [], []
+    for i, node in enumerate(assay_graph.start_nodes):
+        size = node.size if isinstance(node, ProductNode) else node.replicates if isinstance(node, ProtocolNode) else 1
+        for j, sample in enumerate(assay_samples):
+            for k in range(size):
+                ix = i * len(assay_samples) * size + j * size + k
+                sample_processes, sample_other_materials, sample_data_files, _, __ = \
+                    StudyDesign._generate_isa_elements_from_node(
+                        node, assay_graph, assay_graph.id, start_node_index=ix + 1, counter=None, processes=[],
+                        other_materials=[], data_files=[], previous_items=[sample])
+                processes.extend(sample_processes)
+                other_materials.extend(sample_other_materials)
+                data_files.extend(sample_data_files)
+    return processes, other_materials, data_files
+
+
+class BenchmarkGenerateAssay(unittest.TestCase):
+
+    def run_benchmark(self, n_samples):
+        # a wider mass spectrometry assay, with 24 runs of each extract
+        assay_dict = OrderedDict(ms_assay_dict)
+        assay_dict['mass spectrometry'] = {
+            **ms_assay_dict['mass spectrometry'],
+            OntologyAnnotation(term='chromatography column'): ['C18', 'HILIC', 'C8']
+        }
+        samples = [Sample(name='sample{}'.format(i)) for i in range(n_samples)]
+        timings = {}
+        for name, graph_class in (('scan', ScanningAssayGraph), ('walk', AssayGraph)):
+            assay_graph = graph_class.generate_assay_plan_from_dict(assay_dict, id_='benchmark')
+            timings[name], _ = timed(walk_generate_assay, assay_graph, samples)
+        timings['template'], _ = timed(StudyDesign.generate_assay, assay_graph, samples)
+        report('StudyDesign.generate_assay', n_samples, **timings)
+
+    @unittest.skipIf(not SLOW_TESTS, "slow")
+    def test_10_samples(self):
+        self.run_benchmark(10)
+
+    @unittest.skipIf(not SLOW_TESTS, "slow")
+    def test_100_samples(self):
+        self.run_benchmark(100)
+
+    @unittest.skipIf(not SLOW_TESTS, "slow")
+    def test_1k_samples(self):
+        self.run_benchmark(1000)
+
+
+class BenchmarkGenerateStudy(unittest.TestCase):
+
+    def run_benchmark(self, n_subjects):
+        sample_and_assay_plan = SampleAndAssayPlan.from_sample_and_assay_plan_dict('MS and NMR plan', [{
+            'node_type': SAMPLE,
+            'characteristics_category': OntologyAnnotation(term='organism part'),
+            'characteristics_value': 'blood',
+            'size': 1,
+            'technical_replicates': None,
+            'is_input_to_next_protocols': True
+        }], ms_assay_dict, nmr_assay_dict)
+        agent = StudyFactor(name='AGENT', factor_type=OntologyAnnotation(term='perturbation agent'))
+        cell = StudyCell('TREATMENT', elements=[Treatment(factor_values=(
+            FactorValue(factor_name=agent, value='nitroglycerin'),
+        ))])
+        arm = StudyArm(name='ARM', group_size=n_subjects, arm_map=OrderedDict([(cell, sample_and_assay_plan)]))
+        generate_time, study = timed(StudyDesign(study_arms=[arm]).generate_isa_study)
+        # what a process pool would pay to send the generated assays back to the parent
+        dumps_time, pickled = timed(pickle.dumps, study.assays, pickle.HIGHEST_PROTOCOL)
+        loads_time, _ = timed(pickle.loads, pickled)
+        report('StudyDesign.generate_isa_study', n_subjects, generate=generate_time,
+               pickle_dumps=dumps_time, pickle_loads=loads_time)
+
+    @unittest.skipIf(not SLOW_TESTS, "slow")
+    def test_1k_subjects(self):
+        self.run_benchmark(1000)
+
+    @unittest.skipIf(not SLOW_TESTS, "slow")
+    def test_10k_subjects(self):
+        self.run_benchmark(10000)
+
+
+class BenchmarkAugmentStudy(unittest.TestCase):
+
+    def run_benchmark(self, n_subjects):
+        dilution = (Characteristic(category='dilution', value=10, unit='mg/L'),)
+        quality_control = QualityControl(
+            interspersed_sample_type=[(ProductNode(id_='dummy/01', node_type=SAMPLE, name='dummy'), 20)],
+            pre_run_sample_type=ProductNode(
+                id_='pre/00', node_type=SAMPLE, name='water', size=5, characteristics=dilution),
+            post_run_sample_type=ProductNode(
+                id_='post/00', node_type=SAMPLE, name='ethanol', size=5, characteristics=dilution)
+        )
+        sample_list = [{
+            'node_type': SAMPLE,
+            'characteristics_category': OntologyAnnotation(term='organism part'),
+            'characteristics_value': 'blood',
+            'size': 1,
+            'technical_replicates': None,
+            'is_input_to_next_protocols': True
+        }]
+        agent = StudyFactor(name='AGENT', factor_type=OntologyAnnotation(term='perturbation agent'))
+        # only the MS assay has quality controls, the NMR assay is left as it is
+        arm = StudyArm(name='ARM', group_size=n_subjects, arm_map=OrderedDict([
+            (StudyCell('TREATMENT', elements=[Treatment(factor_values=(
+                FactorValue(factor_name=agent, value='nitroglycerin'),
+            ))]), SampleAndAssayPlan.from_sample_and_assay_plan_dict(
+                'MS plan', sample_list, ms_assay_dict, quality_controls=[quality_control])),
+            (StudyCell('FOLLOW-UP', elements=[Treatment(factor_values=(
+                FactorValue(factor_name=agent, value='none'),
+            ))]), SampleAndAssayPlan.from_sample_and_assay_plan_dict('NMR plan', sample_list, nmr_assay_dict))
+        ]))
+        study_design = StudyDesign(study_arms=[arm])
+        study = study_design.generate_isa_study()
+        deepcopy_time, _ = timed(QualityControlService.augment_study, study, study_design)
+        shared_time, _ = timed(QualityControlService.augment_study, study, study_design, share=True)
+        report('QualityControlService.augment_study', n_subjects, deepcopy=deepcopy_time, shared=shared_time)
+        _, deepcopy_bytes = retained(QualityControlService.augment_study, study, study_design)
+        _, shared_bytes = retained(QualityControlService.augment_study, study, study_design, share=True)
+        report_memory('QualityControlService.augment_study retained memory', n_subjects,
+                      deepcopy=deepcopy_bytes, shared=shared_bytes)
+
+    @unittest.skipIf(not SLOW_TESTS, "slow")
+    def test_200_subjects(self):
+        self.run_benchmark(200)
+
+    @unittest.skipIf(not SLOW_TESTS, "slow")
+    def test_1k_subjects(self):
+        self.run_benchmark(1000)
+
+
+class BenchmarkLoadISAJSON(unittest.TestCase):
+
+    def run_benchmark(self, n_samples):
+        investigation = Investigation(identifier='benchmark', studies=[build_study(n_samples)])
+        isa_json = json.dumps(investigation, cls=isajson.ISAJSONEncoder)
+        load_time, _ = timed(isajson.load, io.StringIO(isa_json))
+        report('isajson.load of {:.1f}MB'.format(len(isa_json) / 2 ** 20), n_samples, load=load_time)
+
+    @unittest.skipIf(not SLOW_TESTS, "slow")
+    def test_1k_samples(self):
+        self.run_benchmark(1000)
+
+    @unittest.skipIf(not SLOW_TESTS, "slow")
+    def test_10k_samples(self):
+        self.run_benchmark(10000)
+
+    @unittest.skipIf(not SLOW_TESTS, "slow")
+    def test_50mb(self):
+        self.run_benchmark(44000)
+
+
+class BenchmarkValidateISAJSONRules(unittest.TestCase):
+
+    def run_rules(self, isa_json, index=None):
+        """Run the rules comparing declared and used @ids of validate, each
+        indexing the document again unless an ISAJSONIndex is given
+        """
+        isajson.errors.reset()
+        isajson.warnings.reset()
+        studies = zip(isa_json['studies'], index.studies if index is not None else [None] * len(isa_json['studies']))
+        for study_json, study_index in studies:
+            isajson.check_material_ids_not_declared_used(study_json, index=study_index)
+            for get_ids in (isajson.get_source_ids, isajson.get_sample_ids, isajson.get_material_ids,
+                            isajson.get_data_file_ids):
+                isajson.check_material_ids_declared_used(study_json, get_ids, index=study_index)
+            isajson.check_study_factor_usage(study_json, index=study_index)
+            isajson.check_protocol_parameter_ids_usage(study_json, index=study_index)
+            isajson.check_unit_category_ids_usage(study_json, index=study_index)
+            isajson.check_process_protocol_ids_usage(study_json, index=study_index)
+            for assay_json in study_json['assays']:
+                isajson.check_process_sequence_links(assay_json['processSequence'])
+        isajson.check_characteristic_category_ids_usage(isa_json['studies'], index=index)
+        isajson.check_term_source_refs(isa_json, index=index)
+        isajson.check_term_accession_used_no_source_ref(isa_json, index=index)
+        return list(isajson.errors) + list(isajson.warnings)
+
+    def run_benchmark(self, n_samples):
+        investigation = Investigation(identifier='benchmark', studies=[build_study(n_samples)])
+        isa_json = json.loads(json.dumps(investigation, cls=isajson.ISAJSONEncoder))
+        standalone_time, _ = timed(self.run_rules, isa_json)
+        indexed_time, _ = timed(lambda: self.run_rules(isa_json, isajson.ISAJSONIndex(isa_json)))
+        report('ISA-JSON validation rules', n_samples, standalone=standalone_time, indexed=indexed_time)
+
+    @unittest.skipIf(not SLOW_TESTS, "slow")
+    def test_1k_samples(self):
+        self.run_benchmark(1000)
+
+    @unittest.skipIf(not SLOW_TESTS, "slow")
+    def test_10k_samples(self):
+        self.run_benchmark(10000)
+
+    @unittest.skipIf(not SLOW_TESTS, "slow")
+    def test_100k_samples(self):
+        self.run_benchmark(100000)
+
+
+class ReprHashedSample(Sample):
+    """A sample hashed on its repr, as all the ISA objects used to be"""
+
+    def __hash__(self):
+        return hash(repr(self))
+
+
+class BenchmarkModelHashing(unittest.TestCase):
+
+    def build_samples(self, sample_class, n_samples):
+        organism = OntologyAnnotation(term='Homo sapiens')
+        dose = StudyFactor(name='dose', factor_type=OntologyAnnotation(term='dose'))
+        return [sample_class(name='sample{}'.format(i), characteristics=[
+            Characteristic(category=OntologyAnnotation(term='organism'), value=organism)
+        ], factor_values=[FactorValue(factor_name=dose, value=i % 10)]) for i in range(n_samples)]
+
+    def run_workloads(self, samples):
+        sample_set = set(samples)
+        sample_index = {sample: i for i, sample in enumerate(samples)}
+        return sum(1 for sample in samples if sample in sample_set and sample_index[sample] >= 0)
+
+    def run_benchmark(self, n_samples):
+        timings = {}
+        for name, sample_class in (('repr', ReprHashedSample), ('structural', Sample)):
+            samples = self.build_samples(sample_class, n_samples)
+            timings[name], _ = timed(self.run_workloads, samples)
+        report('set and dict of samples', n_samples, **timings)
+
+    @unittest.skipIf(not SLOW_TESTS, "slow")
+    def test_10k_samples(self):
+        self.run_benchmark(10000)
+
+    @unittest.skipIf(not SLOW_TESTS, "slow")
+    def test_100k_samples(self):
+        self.run_benchmark(100000)
+
+
+class UnsharedOntologyAnnotationTable(OntologyAnnotationTable):
+    """An annotation table that shares nothing, as the loaders used to"""
+
+    def get(self, term, term_source=None, term_accession=''):
+        return OntologyAnnotation(term=term, term_source=term_source, term_accession=term_accession)
+
+
+def retained(func, *args, **kwargs):
+    """Call a function and trace the memory held by its result
+
+    :return: A tuple of the result and the bytes still allocated once the
+    function returned
+    """
+    tracemalloc.start()
+    try:
+        result = func(*args, **kwargs)
+        return result, tracemalloc.get_traced_memory()[0]
+    finally:
+        tracemalloc.stop()
+
+
+class BenchmarkSharedOntologyAnnotations(unittest.TestCase):
+
+    def setUp(self):
+        self._tmp_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self._tmp_dir)
+
+    def build_investigation(self, n_samples):
+        """Build a metabolomics-like investigation, where every material
+        and process is annotated with the same handful of ontology terms
+        """
+        ncbitaxon = OntologySource(name='NCBITAXON')
+        uberon = OntologySource(name='UBERON')
+        chmo = OntologySource(name='CHMO')
+        study = build_study(n_samples)
+        organism = OntologyAnnotation(term='organism')
+        organism_part = OntologyAnnotation(term='organism part')
+        study.characteristic_categories = [organism, organism_part]
+        column_type = ProtocolParameter(parameter_name=OntologyAnnotation(term='chromatography column'))
+        extraction = study.protocols[1]
+        extraction.parameters = [column_type]
+        for source in study.sources:
+            source.characteristics.append(Characteristic(category=organism, value=OntologyAnnotation(
+                term='Homo sapiens', term_source=ncbitaxon,
+                term_accession='http://purl.obolibrary.org/obo/NCBITaxon_9606')))
+        for sample in study.samples:
+            sample.characteristics.append(Characteristic(category=organism_part, value=OntologyAnnotation(
+                term='blood plasma', term_source=uberon,
+                term_accession='http://purl.obolibrary.org/obo/UBERON_0001969')))
+        for process in study.assays[0].process_sequence:
+            if process.executes_protocol is extraction:
+                process.parameter_values.append(ParameterValue(category=column_type, value=OntologyAnnotation(
+                    term='reverse phase', term_source=chmo,
+                    term_accession='http://purl.obolibrary.org/obo/CHMO_0000701')))
+        return Investigation(identifier='benchmark', filename='i_investigation.txt',
+                             ontology_source_references=[ncbitaxon, uberon, chmo], studies=[study])
+
+    def load_isatab(self):
+        with open(os.path.join(self._tmp_dir, 'i_investigation.txt')) as fp:
+            return isatab.load(fp)
+
+    def load_isajson(self):
+        with open(os.path.join(self._tmp_dir, 'benchmark.json')) as fp:
+            return isajson.load(fp)
+
+    def run_benchmark(self, n_samples):
+        investigation = self.build_investigation(n_samples)
+        isatab.dump(investigation, self._tmp_dir)
+        with open(os.path.join(self._tmp_dir, 'benchmark.json'), 'w') as fp:
+            json.dump(investigation, fp, cls=isajson.ISAJSONEncoder)
+        for module, load in ((isatab, self.load_isatab), (isajson, self.load_isajson)):
+            with patch.object(module, 'OntologyAnnotationTable', UnsharedOntologyAnnotationTable):
+                _, unshared_bytes = retained(load)
+            _, shared_bytes = retained(load)
+            report_memory('{}.load retained memory'.format(module.__name__), n_samples,
+                          unshared=unshared_bytes, shared=shared_bytes)
+
+    @unittest.skipIf(not SLOW_TESTS, "slow")
+    def test_1k_samples(self):
+        self.run_benchmark(1000)
+
+    @unittest.skipIf(not SLOW_TESTS, "slow")
+    def test_10k_samples(self):
+        self.run_benchmark(10000)
+
+    @unittest.skipIf(not SLOW_TESTS, "slow")
+    def test_50k_samples(self):
+        self.run_benchmark(50000)
+
+
+class BenchmarkImportTime(unittest.TestCase):
+
+    def time_import(self, statement):
+        """Time an import statement in a fresh interpreter
+
+        :return: A tuple of the elapsed seconds and whether pandas got imported
+        """
+        code = ('import sys, time\n'
+                'start = time.perf_counter()\n'
+                '{}\n'
+                'print(time.perf_counter() - start, "pandas" in sys.modules)').format(statement)
+        output = subprocess.check_output([sys.executable, '-c', code], universal_newlines=True,
+                                         cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+        elapsed, pandas_imported = output.split()
+        return float(elapsed), pandas_imported == 'True'
+
+    @unittest.skipIf(not SLOW_TESTS, "slow")
+    def test_import_isatools(self):
+        elapsed, _ = self.time_import('import isatools')
+        converter_elapsed, _ = self.time_import('from isatools import isatab2json')
+        report('import', 'isatools', isatools=elapsed, isatab2json=converter_elapsed)
+        self.assertLess(elapsed, IMPORT_TIME_BUDGET)
@@ -7,6 +7,7 @@ import networkx as nx
 import uuid
 import logging
 from collections import OrderedDict, Counter
+from unittest.mock import patch
 
 from isatools.create import errors
 from isatools.model import (
@@ -29,6 +30,7 @@ from isatools.create.model import (
     ProductNode,
     ProtocolNode,
     AssayGraph,
+    AssayTemplate,
     SampleAndAssayPlan,
     StudyArm,
     StudyDesign,
@@ -965,6 +967,42 @@ class AssayGraphTest(unittest.TestCase):
         self.assertRaises(TypeError, assay_graph.previous_nodes, 'this is not a node')
         self.assertRaises(ValueError, assay_graph.previous_nodes, ProductNode(node_type=SAMPLE, size=10))
 
+    def test_start_and_end_nodes_after_adding_links(self):
+        assay_graph = AssayGraph(measurement_type='genomic extraction', technology_type='nucleic acid extraction',
+                                 nodes=self.nodes, links=self.links)
+        self.assertEqual(assay_graph.end_nodes, {self.dna_node, self.mrna_node, self.mirna_node})
+        assay_graph.add_node(self.sample_node)
+        self.assertEqual(assay_graph.start_nodes, {self.sample_node, self.protocol_node_dna, self.protocol_node_rna})
+        assay_graph.add_links([(self.sample_node, self.protocol_node_dna), (self.sample_node, self.protocol_node_rna)])
+        self.assertEqual(assay_graph.start_nodes, {self.sample_node})
+        self.assertEqual(assay_graph.previous_nodes(self.protocol_node_rna), {self.sample_node})
+        self.assertEqual(assay_graph.end_nodes, {self.dna_node, self.mrna_node, self.mirna_node})
+
+    def test_topological_order(self):
+        assay_graph = AssayGraph(measurement_type='genomic extraction', technology_type='nucleic acid extraction',
+                                 nodes=[self.sample_node] + self.nodes, links=self.links)
+        assay_graph.add_links([(self.sample_node, self.protocol_node_dna), (self.sample_node, self.protocol_node_rna)])
+        self.assertEqual(assay_graph.topological_order, [
+            self.sample_node, self.protocol_node_dna, self.protocol_node_rna,
+            self.dna_node, self.mrna_node, self.mirna_node
+        ])
+
+    def test_find_paths(self):
+        assay_graph = AssayGraph(measurement_type='genomic extraction', technology_type='nucleic acid extraction',
+                                 nodes=[self.sample_node] + self.nodes, links=self.links)
+        assay_graph.add_links([(self.sample_node, self.protocol_node_dna), (self.sample_node, self.protocol_node_rna)])
+        self.assertEqual(assay_graph.find_paths(self.sample_node, self.mirna_node),
+                         [[self.sample_node, self.protocol_node_rna, self.mirna_node]])
+        self.assertEqual(assay_graph.find_paths(self.sample_node, self.mirna_node),
+                         [[self.sample_node, self.protocol_node_rna, self.mirna_node]])
+        self.assertEqual(assay_graph.find_paths(self.protocol_node_dna, self.mirna_node), [])
+        self.assertCountEqual(assay_graph.find_all_paths(), [
+            [self.sample_node, self.protocol_node_dna, self.dna_node],
+            [self.sample_node, self.protocol_node_rna, self.mrna_node],
+            [self.sample_node, self.protocol_node_rna, self.mirna_node]
+        ])
+        self.assertRaises(ValueError, assay_graph.find_paths, self.sample_node, ProductNode(node_type=SAMPLE, size=10))
+
     def test_previous_protocol_nodes(self):
         nmr_assay_graph = AssayGraph.generate_assay_plan_from_dict(nmr_assay_dict)
         extraction_node = next(node for node in nmr_assay_graph.nodes if node.name.endswith('extraction'))
@@ -1772,6 +1810,62 @@ class StudyDesignTest(BaseStudyDesignTest):
         self.assertEqual(extraction_processes[0].next_process, nmr_processes[-1])
         # self.assertIsInstance(next_item, DataFile)
 
+    def test_assay_template_instantiate(self):
+        assay_graph = AssayGraph.generate_assay_plan_from_dict(nmr_assay_dict)
+        node = next(iter(assay_graph.start_nodes))
+        sample = Sample(name='sample')
+        expected_processes, expected_other_materials, expected_data_files, _, __ = \
+            StudyDesign._generate_isa_elements_from_node(node, assay_graph, assay_graph.id, start_node_index=3,
+                                                         previous_items=[sample])
+        template = AssayTemplate(assay_graph, node)
+        self.assertEqual(len(template), 1 + 2 + 8 * 2 + 8 * 2)
+        processes, other_materials, data_files = template.instantiate(sample, 3)
+        self.assertEqual([process.name for process in processes], [process.name for process in expected_processes])
+        self.assertEqual([material.name for material in other_materials],
+                         [material.name for material in expected_other_materials])
+        self.assertEqual([data_file.filename for data_file in data_files],
+                         [data_file.filename for data_file in expected_data_files])
+        extraction_process = processes[0]
+        self.assertEqual(extraction_process.inputs, [sample])
+        self.assertEqual(extraction_process.outputs, other_materials)
+        self.assertIs(extraction_process.next_process, processes[-1])
+        for process in processes[1:]:
+            self.assertIs(process.prev_process, extraction_process)
+            self.assertEqual(len(process.inputs), 1)
+            self.assertIn(process.inputs[0], other_materials)
+            self.assertEqual(len(process.outputs), 1)
+            self.assertIn(process.outputs[0], data_files)
+        # a new instantiation generates new elements
+        self.assertIsNot(template.instantiate(sample, 3)[0][0], extraction_process)
+
+    def test_generate_assay_matches_node_walk(self):
+        assay_graph = AssayGraph.generate_assay_plan_from_dict(ms_assay_dict)
+        samples = [Sample(name='sample{}'.format(i)) for i in range(3)]
+        expected_processes, expected_other_materials, expected_data_files = [], [], []
+        for i, node in enumerate(assay_graph.start_nodes):
+            size = node.size if isinstance(node, ProductNode) else node.replicates
+            for j, sample in enumerate(samples):
+                for k in range(size):
+                    processes, other_materials, data_files, _, __ = StudyDesign._generate_isa_elements_from_node(
+                        node, assay_graph, assay_graph.id, start_node_index=(i * len(samples) + j) * size + k + 1,
+                        counter=None, processes=[], other_materials=[], data_files=[], previous_items=[sample])
+                    expected_processes.extend(processes)
+                    expected_other_materials.extend(other_materials)
+                    expected_data_files.extend(data_files)
+        assay = StudyDesign.generate_assay(assay_graph, samples)
+        self.assertTrue(expected_data_files)
+        self.assertEqual([process.name for process in assay.process_sequence],
+                         [process.name for process in expected_processes])
+        self.assertEqual([material.name for material in assay.other_material],
+                         [material.name for material in expected_other_materials])
+        self.assertEqual([data_file.filename for data_file in assay.data_files],
+                         [data_file.filename for data_file in expected_data_files])
+        self.assertEqual([process.executes_protocol.name for process in assay.process_sequence],
+                         [process.executes_protocol.name for process in expected_processes])
+        for process in assay.process_sequence:
+            if process.executes_protocol.name.endswith('mass spectrometry'):
+                self.assertIsNotNone(process.prev_process)
+
     def test_generate_isa_study_single_arm_single_cell_elements(self):
         with open(os.path.join(os.path.dirname(__file__), '..', 'isatools', 'resources', 'config', 'yaml',
                                'study-creator-config.yml')) as yaml_file:
@@ -1878,6 +1972,28 @@ class StudyDesignTest(BaseStudyDesignTest):
         ]
         self.assertEqual(len(ms_processes), 2 * 2 * 2 * 2 * expected_num_of_samples_ms_plan_first_arm)
 
+    def test_generate_isa_study_two_arms_single_cell_elements_assay_order(self):
+        first_arm = StudyArm(name=TEST_STUDY_ARM_NAME_00, group_size=20, arm_map=OrderedDict([
+            (self.cell_screen, None), (self.cell_run_in, None),
+            (self.cell_single_treatment_00, self.ms_sample_assay_plan),
+            (self.cell_follow_up, self.nmr_sample_assay_plan)
+        ]))
+        second_arm = StudyArm(name=TEST_STUDY_ARM_NAME_01, group_size=10, arm_map=OrderedDict([
+            (self.cell_screen, None), (self.cell_run_in, None),
+            (self.cell_single_treatment_01, self.nmr_sample_assay_plan),
+            (self.cell_follow_up_01, self.nmr_sample_assay_plan)
+        ]))
+        study_design = StudyDesign(study_arms=(first_arm, second_arm))
+        # the study creator configuration is only read once, when the module is imported
+        with patch('yaml.load', side_effect=AssertionError('configuration read again')):
+            study = study_design.generate_isa_study()
+        # the assays come in the order their assay graphs first appear in the arms, which are sorted by name
+        self.assertEqual([assay.technology_type for assay in study.assays],
+                         [nmr_assay_dict['technology_type'], ms_assay_dict['technology_type']])
+        other_study = study_design.generate_isa_study()
+        self.assertEqual([assay.filename for assay in other_study.assays],
+                         [assay.filename for assay in study.assays])
+
     def test_generate_isa_study_two_arms_single_cell_elements_check_source_characteristics(self):
         control_source_type = Characteristic(
             category=OntologyAnnotation(
@@ -2003,6 +2119,45 @@ class QualityControlServiceTest(BaseStudyDesignTest):
         self.assertEqual(len(ms_processes), 2 * 2 * 2 * 2 *
                          (expected_num_of_samples_ms_plan_first_arm + qc_samples_size))
 
+    def test_expansion_of_single_mass_spectrometry_assay_shared(self):
+        ms_sample_assay_plan = SampleAndAssayPlan.from_sample_and_assay_plan_dict(
+            'mass spectrometry sample and assay plan', sample_list, ms_assay_dict, quality_controls=[self.qc]
+        )
+        first_arm = StudyArm(name=TEST_STUDY_ARM_NAME_00, group_size=20, arm_map=OrderedDict([
+            (self.cell_screen, None), (self.cell_run_in, None),
+            (self.cell_single_treatment_00, ms_sample_assay_plan),
+            (self.cell_follow_up, self.nmr_sample_assay_plan)
+        ]))
+        second_arm = StudyArm(name=TEST_STUDY_ARM_NAME_01, group_size=10, arm_map=OrderedDict([
+            (self.cell_screen, None), (self.cell_run_in, None),
+            (self.cell_single_treatment_01, self.nmr_sample_assay_plan),
+            (self.cell_follow_up_01, self.nmr_sample_assay_plan)
+        ]))
+        study_design = StudyDesign(study_arms=(first_arm, second_arm))
+        study_no_qc = study_design.generate_isa_study()
+        samples_no_qc, assays_no_qc = list(study_no_qc.samples), list(study_no_qc.assays)
+        study_with_qc = QualityControlService.augment_study(study_no_qc, study_design)
+        shared_study_with_qc = QualityControlService.augment_study(study_no_qc, study_design, share=True)
+        self.assertIsInstance(shared_study_with_qc, Study)
+        self.assertIsNot(shared_study_with_qc, study_no_qc)
+        # the original study is left as it was
+        self.assertEqual(study_no_qc.samples, samples_no_qc)
+        self.assertEqual(study_no_qc.assays, assays_no_qc)
+        self.assertEqual([sample.name for sample in shared_study_with_qc.samples],
+                         [sample.name for sample in study_with_qc.samples])
+        self.assertEqual(len(shared_study_with_qc.sources), len(study_with_qc.sources))
+        self.assertEqual(len(shared_study_with_qc.process_sequence), len(study_with_qc.process_sequence))
+        for sample, shared_sample in zip(samples_no_qc, shared_study_with_qc.samples):
+            self.assertIs(shared_sample, sample)
+        for assay_no_qc, assay, shared_assay in zip(assays_no_qc, study_with_qc.assays,
+                                                    shared_study_with_qc.assays):
+            self.assertEqual(shared_assay.filename, assay.filename)
+            self.assertEqual(len(shared_assay.process_sequence), len(assay.process_sequence))
+            if assay_no_qc.technology_type == ms_assay_dict['technology_type']:
+                self.assertIsNot(shared_assay, assay_no_qc)
+            else:
+                self.assertIs(shared_assay, assay_no_qc)
+
 
 class TreatmentFactoryTest(unittest.TestCase):
 
@@ -8,6 +8,7 @@ from isatools.tests import utils
 import unittest
 import json
 import os
+from io import StringIO
 
 
 def setUpModule():
@@ -457,3 +458,34 @@ class TestIsaJson(unittest.TestCase):
         with open(os.path.join(utils.JSON_DATA_DIR, 'ISA-1', 'isa-test2.json')) as in_fp:
             reverse_test_isa_investigation = isajson.load(in_fp)
             self.assertIsInstance(reverse_test_isa_investigation, Investigation)
+
+    def test_load_links_processes(self):
+        isa_j = json.loads(json.dumps(create_descriptor(), cls=isajson.ISAJSONEncoder))
+        investigation = isajson.load(StringIO(json.dumps(isa_j)))
+        assay_j = isa_j['studies'][0]['assays'][0]
+        assay = investigation.studies[0].assays[0]
+        self.assertEqual(len(assay.process_sequence), len(assay_j['processSequence']))
+        for process_j, process in zip(assay_j['processSequence'], assay.process_sequence):
+            self.assertEqual(process.id, process_j['@id'])
+            self.assertListEqual([x.id for x in process.inputs], [x['@id'] for x in process_j['inputs']])
+            self.assertListEqual([x.id for x in process.outputs], [x['@id'] for x in process_j['outputs']])
+            for key, linked_process in (('previousProcess', process.prev_process),
+                                        ('nextProcess', process.next_process)):
+                if key in process_j:
+                    self.assertEqual(linked_process.id, process_j[key]['@id'])
+                else:
+                    self.assertIsNone(linked_process)
+        self.assertTrue(any(process.next_process is not None for process in assay.process_sequence))
+
+    def test_load_unknown_process_input(self):
+        isa_j = json.loads(json.dumps(create_descriptor(), cls=isajson.ISAJSONEncoder))
+        isa_j['studies'][0]['assays'][0]['processSequence'][0]['inputs'][0]['@id'] = '#sample/unknown'
+        with self.assertRaises(IOError):
+            isajson.load(StringIO(json.dumps(isa_j)))
+
+    def test_load_shares_ontology_annotations(self):
+        isa_j = json.dumps(create_descriptor(), cls=isajson.ISAJSONEncoder)
+        investigation = isajson.load(StringIO(isa_j))
+        values = [c.value for sample in investigation.studies[0].samples for c in sample.characteristics]
+        self.assertEqual(len(values), 3)
+        self.assertEqual(len({id(value) for value in values}), 1)
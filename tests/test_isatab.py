@@ -1,14 +1,17 @@
 """Tests on isatab.py package"""
 from __future__ import absolute_import
+import json
 import unittest
 import os
 import pandas as pd
 import shutil
 import tempfile
 from io import StringIO
+from unittest.mock import patch
 
 from isatools import isatab
 from isatools.io import isatab_parser
+from isatools.isajson import ISAJSONEncoder
 from isatools.isatab import ProcessSequenceFactory
 from isatools.model import *
 from isatools.tests.utils import assert_tab_content_equal
@@ -1622,6 +1625,24 @@ sample1\textraction\te2\tscanning\td2"""
             expected_chained_protocol_snippet = """Sample Name\tProtocol REF\tProtocol REF\tExtract Name"""
             self.assertIn(expected_chained_protocol_snippet, dumps_out)
 
+    def test_shared_ontology_annotations(self):
+        ncbitaxon = OntologySource(name='NCBITAXON')
+        factory = ProcessSequenceFactory(ontology_sources=[ncbitaxon],
+                                         study_protocols=[Protocol(name="sample collection")])
+        table_to_load = """Source Name\tProtocol REF\tSample Name\tCharacteristics[organism]\tTerm Source REF\t\
+Term Accession Number
+source1\tsample collection\tsample1\tHomo sapiens\tNCBITAXON\t9606
+source1\tsample collection\tsample2\tHomo sapiens\tNCBITAXON\t9606
+source2\tsample collection\tsample3\tMus musculus\tNCBITAXON\t10090"""
+        DF = IsaTabDataFrame(pd.read_csv(StringIO(table_to_load), sep='\t', dtype=str))
+        so, sa, om, d, pr, _, __ = factory.create_from_df(DF)
+        values = {name: sample.characteristics[0].value for name, sample in sa.items()}
+        self.assertEqual(values['Sample Name:sample1'],
+                         OntologyAnnotation(term='Homo sapiens', term_source=ncbitaxon, term_accession='9606'))
+        self.assertIs(values['Sample Name:sample1'], values['Sample Name:sample2'])
+        self.assertIsNot(values['Sample Name:sample1'], values['Sample Name:sample3'])
+        self.assertEqual(len(factory.ontology_annotations), 2)
+
     def test_isatab_load_and_dump_missing_technology_type(self):
         with open(os.path.join(self._tab_data_dir, 'BII-S-3-missing-technology-type', 'i_gilbert.txt'),
                   encoding='utf-8') as fp:
@@ -1659,3 +1680,903 @@ label2\trow2_value1\trow2_value2\n"""
             'header': ['label1', 'label2']
         }
         self.assertEqual(ttable_dict, expected_ttable)
+
+
+class UnitTestTableCache(unittest.TestCase):
+
+    def setUp(self):
+        self._tmp_dir = tempfile.mkdtemp()
+        self.s_path = os.path.join(self._tmp_dir, 's_test.txt')
+        with open(self.s_path, 'w') as fp:
+            fp.write('Source Name\tProtocol REF\tSample Name\n'
+                     'source1\tsample collection\tsample1\n')
+
+    def tearDown(self):
+        shutil.rmtree(self._tmp_dir)
+
+    def test_load_parses_once(self):
+        table_cache = isatab.TableCache()
+        df1 = table_cache.load(self.s_path)
+        df2 = table_cache.load(self.s_path)
+        self.assertIs(df1, df2)
+        self.assertEqual(table_cache.parses, 1)
+        self.assertEqual(table_cache.hits, 1)
+        self.assertEqual(list(df1['Sample Name']), ['sample1'])
+
+    def test_load_reparses_modified_file(self):
+        table_cache = isatab.TableCache()
+        df1 = table_cache.load(self.s_path)
+        with open(self.s_path, 'a') as fp:
+            fp.write('source2\tsample collection\tsample2\n')
+        stat = os.stat(self.s_path)
+        os.utime(self.s_path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10 ** 9))
+        df2 = table_cache.load(self.s_path)
+        self.assertIsNot(df1, df2)
+        self.assertEqual(table_cache.parses, 2)
+        self.assertEqual(list(df2['Sample Name']), ['sample1', 'sample2'])
+        # the earlier version of the table is not kept
+        self.assertEqual(len(table_cache._tables), 1)
+        self.assertIs(table_cache.load(self.s_path), df2)
+
+    def test_load_missing_file(self):
+        table_cache = isatab.TableCache()
+        with self.assertRaises(FileNotFoundError):
+            table_cache.load(os.path.join(self._tmp_dir, 'a_missing.txt'))
+
+    def test_validate_leaves_cached_tables_unchanged(self):
+        investigation = Investigation(identifier='i1', filename='i_investigation.txt')
+        study = Study(identifier='s1', filename='s_study.txt')
+        source = Source(name='source1')
+        sample = Sample(name='sample1', derives_from=[source])
+        extract = Extract(name='extract1')
+        sample_collection = Protocol(name='sample collection',
+                                     protocol_type=OntologyAnnotation(term='sample collection'))
+        extraction = Protocol(name='extraction', protocol_type=OntologyAnnotation(term='extraction'))
+        study.protocols = [sample_collection, extraction]
+        study.sources.append(source)
+        study.samples.append(sample)
+        study.process_sequence.append(Process(executes_protocol=sample_collection, inputs=[source], outputs=[sample]))
+        assay = Assay(filename='a_assay.txt',
+                      measurement_type=OntologyAnnotation(term='metabolite profiling'),
+                      technology_type=OntologyAnnotation(term='mass spectrometry'))
+        assay.samples.append(sample)
+        assay.other_material.append(extract)
+        assay.process_sequence.append(Process(executes_protocol=extraction, inputs=[sample], outputs=[extract]))
+        study.assays.append(assay)
+        investigation.studies.append(study)
+        isatab.dump(investigation, self._tmp_dir)
+
+        cached_tables = []
+        load = isatab.TableCache.load
+
+        def record_load(table_cache, path):
+            df = load(table_cache, path)
+            cached_tables.append(df)
+            return df
+
+        with patch.object(isatab.TableCache, 'load', record_load):
+            with open(os.path.join(self._tmp_dir, 'i_investigation.txt')) as fp:
+                isatab.validate(fp)
+        self.assertTrue(cached_tables)
+        for df in cached_tables:
+            self.assertFalse(hasattr(df, 'filename'))
+
+
+class UnitTestSliceIndex(unittest.TestCase):
+
+    def setUp(self):
+        self._tmp_dir = tempfile.mkdtemp()
+        with open(os.path.join(self._tmp_dir, 's_test.txt'), 'w') as fp:
+            fp.write('Source Name\tProtocol REF\tSample Name\tFactor Value[dose]\n'
+                     'source1\tsample collection\tsample1\thigh\n'
+                     'source1\tsample collection\tsample2\tlow\n'
+                     'source2\tsample collection\tsample3\thigh\n')
+        self.a_path = os.path.join(self._tmp_dir, 'a_test.txt')
+        with open(self.a_path, 'w') as fp:
+            fp.write('Sample Name\tProtocol REF\tExtract Name\tRaw Data File\n'
+                     'sample1\textraction\textract1\tsample1.raw\n'
+                     'sample2\textraction\textract2\tsample2.raw\n'
+                     'sample3\textraction\textract3\tsample3.raw\n'
+                     'sample1\textraction\textract4\tsample1b.raw\n')
+
+    def tearDown(self):
+        shutil.rmtree(self._tmp_dir)
+
+    def test_slice_data_files(self):
+        index = isatab.SliceIndex(self._tmp_dir)
+        results = isatab.slice_data_files(self._tmp_dir, factor_selection={'dose': 'high'}, index=index)
+        self.assertEqual(results, [
+            {'sample': 'sample1', 'data_files': ['sample1.raw', 'sample1b.raw'], 'query_used': {'dose': 'high'}},
+            {'sample': 'sample3', 'data_files': ['sample3.raw'], 'query_used': {'dose': 'high'}}
+        ])
+        results = isatab.slice_data_files(self._tmp_dir, index=index)
+        self.assertEqual([x['sample'] for x in results], ['sample1', 'sample2', 'sample3'])
+        self.assertEqual(index.table_cache.parses, 2)
+
+    def test_slice_data_files_unknown_factor(self):
+        results = isatab.slice_data_files(self._tmp_dir, factor_selection={'time': 'high'},
+                                          index=isatab.SliceIndex(self._tmp_dir))
+        self.assertEqual(results, [])
+
+    def test_reindexes_modified_table(self):
+        index = isatab.SliceIndex(self._tmp_dir)
+        self.assertEqual(index.table(self.a_path).data_files(index.table(self.a_path).sample_rows['sample2']),
+                         ['sample2.raw'])
+        with open(self.a_path, 'a') as fp:
+            fp.write('sample2\textraction\textract5\tsample2b.raw\n')
+        stat = os.stat(self.a_path)
+        os.utime(self.a_path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10 ** 9))
+        results = isatab.slice_data_files(self._tmp_dir, factor_selection={'dose': 'low'}, index=index)
+        self.assertEqual(results[0]['data_files'], ['sample2.raw', 'sample2b.raw'])
+
+    def test_get_slice_index(self):
+        index = isatab.get_slice_index(self._tmp_dir)
+        self.assertIs(isatab.get_slice_index(self._tmp_dir + os.sep), index)
+        other_tmp_dir = tempfile.mkdtemp()
+        try:
+            self.assertIsNot(isatab.get_slice_index(other_tmp_dir), index)
+            # only the index of the most recently queried ISA-Tab is kept
+            self.assertIsNot(isatab.get_slice_index(self._tmp_dir), index)
+        finally:
+            shutil.rmtree(other_tmp_dir)
+
+
+class UnitTestEndToEndPaths(unittest.TestCase):
+
+    def setUp(self):
+        self.study = Study(filename='s_test.txt')
+        collection = Protocol(name='sample collection')
+        extraction = Protocol(name='extraction')
+        sequencing = Protocol(name='sequencing')
+        sources = [Source(name='source1'), Source(name='source2')]
+        samples = [Sample(name='sample{}'.format(i)) for i in range(1, 4)]
+        # the two sources are pooled into the same samples
+        self.study.process_sequence = [
+            Process(executes_protocol=collection, inputs=sources, outputs=samples)]
+        self.assay = Assay(filename='a_test.txt')
+        for sample in samples:
+            extract = Extract(name='extract-' + sample.name)
+            extraction_process = Process(executes_protocol=extraction, inputs=[sample], outputs=[extract])
+            self.assay.process_sequence.append(extraction_process)
+            for i in range(2):
+                data_file = RawDataFile(filename='{}-{}.fastq'.format(sample.name, i))
+                self.assay.process_sequence.append(
+                    Process(executes_protocol=sequencing, inputs=[extract], outputs=[data_file]))
+
+    def assertPathsMatchNetworkx(self, G, start_type):
+        start_nodes = [x for x in G.nodes() if isinstance(G.indexes[x], start_type)]
+        paths = isatab._all_end_to_end_paths(G, start_nodes)
+        self.assertTrue(paths)
+        self.assertEqual(paths, isatab._all_end_to_end_paths_nx(G, start_nodes))
+        return paths
+
+    def test_study_paths(self):
+        paths = self.assertPathsMatchNetworkx(self.study.graph, Source)
+        self.assertEqual(len(paths), 6)
+
+    def test_assay_paths(self):
+        paths = self.assertPathsMatchNetworkx(self.assay.graph, Sample)
+        # every process ends a path as none of them are linked with plink
+        self.assertEqual(len(paths), 9)
+
+    def test_cyclic_graph_falls_back_to_networkx(self):
+        G = self.assay.graph.copy()
+        G.indexes = self.assay.graph.indexes
+        extract = next(x for x in G.nodes() if isinstance(G.indexes[x], Extract))
+        sequencing_process = next(G.successors(extract))
+        G.add_edge(sequencing_process, extract)
+        self.assertPathsMatchNetworkx(G, Sample)
+
+
+class RowByRowProcessSequenceFactory(ProcessSequenceFactory):
+    """ProcessSequenceFactory as it was before create_from_df worked on whole
+    columns at a time, kept to check that both build the same ISA content"""
+
+    def create_from_df(self, DF):
+        DF = isatab.preprocess(DF=DF)
+
+        if self.ontology_sources is not None:
+            ontology_source_map = dict(
+                map(lambda x: (x.name, x), self.ontology_sources))
+        else:
+            ontology_source_map = {}
+
+        if self.protocols is not None:
+            protocol_map = dict(
+                map(lambda x: (x.name, x), self.protocols))
+        else:
+            protocol_map = {}
+
+        sources = {}
+        other_material = {}
+        data = {}
+        processes = {}
+        characteristic_categories = {}
+        unit_categories = {}
+
+        try:
+            sources = dict(map(lambda x: ('Source Name:' + x, Source(name=x)),
+                               [x for x in DF['Source Name'].drop_duplicates()
+                                if x != '']))
+        except KeyError:
+            pass
+
+        samples = {}
+        try:
+            if self.samples is not None:
+                sample_map = dict(
+                    map(lambda x: ('Sample Name:' + x.name, x), self.samples))
+                sample_keys = list(
+                    map(lambda x: 'Sample Name:' + x,
+                        [str(x) for x in DF['Sample Name'].drop_duplicates()
+                         if x != '']))
+                for k in sample_keys:
+                    try:
+                        samples[k] = sample_map[k]
+                    except KeyError:
+                        isatab.log.warning(
+                            'warning! Did not find sample referenced at assay '
+                            'level in study samples')
+            else:
+                samples = dict(
+                    map(lambda x: ('Sample Name:' + x, Sample(name=x)),
+                        [str(x) for x in DF['Sample Name'].drop_duplicates()
+                         if x != '']))
+        except KeyError:
+            pass
+
+        try:
+            extracts = dict(
+                map(lambda x: ('Extract Name:' + x, Material(
+                    name=x, type_='Extract Name')),
+                    [x for x in DF['Extract Name'].drop_duplicates() if
+                     x != '']))
+            other_material.update(extracts)
+        except KeyError:
+            pass
+
+        try:
+            if 'Labeled Extract Name' in DF.columns:
+                try:
+                    category = characteristic_categories['Label']
+                except KeyError:
+                    category = OntologyAnnotation(term='Label')
+                    characteristic_categories['Label'] = category
+                for _, lextract_name in DF[
+                        'Labeled Extract Name'].drop_duplicates().iteritems():
+                    if lextract_name != '':
+                        lextract = Material(
+                            name=lextract_name, type_='Labeled Extract Name')
+                        lextract.characteristics = [
+                            Characteristic(
+                                category=category,
+                                value=OntologyAnnotation(
+                                    term=DF.loc[_, 'Label'])
+                            )
+                        ]
+                        other_material[
+                            'Labeled Extract Name:' + lextract_name] = lextract
+        except KeyError:
+            pass
+
+        for data_col in [x for x in DF.columns if x.endswith(" File")]:
+            filenames = [x for x in DF[data_col].drop_duplicates() if x != '']
+            data.update(
+                dict(map(lambda x: (':'.join([data_col, x]),
+                                    DataFile(filename=x, label=data_col)),
+                         filenames)))
+
+        node_cols = [
+            i for i, c in enumerate(
+                DF.columns) if c in isatab._LABELS_MATERIAL_NODES
+            + isatab._LABELS_DATA_NODES]
+        proc_cols = [
+            i for i, c in enumerate(
+                DF.columns) if c.startswith("Protocol REF")]
+
+        try:
+            object_column_map = isatab.get_object_column_map(
+                DF.isatab_header, DF.columns)
+        except AttributeError:
+            object_column_map = isatab.get_object_column_map(
+                DF.columns, DF.columns)
+
+        def get_node_by_label_and_key(labl, k):
+            n = None
+            lk = labl + ':' + k
+            if labl == 'Source Name':
+                n = sources[lk]
+            if labl == 'Sample Name':
+                n = samples[lk]
+            elif labl in ('Extract Name', 'Labeled Extract Name'):
+                n = other_material[lk]
+            elif labl.endswith(' File'):
+                n = data[lk]
+            return n
+
+        for _cg, column_group in enumerate(object_column_map):
+            # for each object, parse column group
+
+            object_label = column_group[0]
+
+            if object_label in isatab._LABELS_MATERIAL_NODES:
+
+
+                for _, object_series in DF[column_group].drop_duplicates().iterrows():
+                    node_name = str(object_series[object_label])
+                    node_key = ":".join([object_label, node_name])
+                    material = None
+                    if object_label == "Source Name":
+                        try:
+                            material = sources[node_key]
+                        except KeyError:
+                            pass  # skip if object not found
+                    elif object_label == "Sample Name":
+                        try:
+                            material = samples[node_key]
+                        except KeyError:
+                            pass  # skip if object not found
+                    else:
+                        try:
+                            material = other_material[node_key]
+                        except KeyError:
+                            pass  # skip if object not found
+
+                    if material is not None:
+
+                        for charac_column in [
+                            c for c in column_group if c.startswith(
+                                'Characteristics[')]:
+
+                            category_key = next(iter(
+                                isatab._RX_CHARACTERISTICS.findall(charac_column)))
+
+                            try:
+                                category = characteristic_categories[
+                                    category_key]
+                            except KeyError:
+                                category = OntologyAnnotation(
+                                    term=category_key)
+                                characteristic_categories[
+                                    category_key] = category
+
+                            characteristic = Characteristic(category=category)
+
+                            v, u = isatab.get_value(
+                                charac_column, column_group, object_series,
+                                ontology_source_map, unit_categories)
+
+                            characteristic.value = v
+                            characteristic.unit = u
+
+                            if characteristic.category.term in [
+                                x.category.term
+                                    for x in material.characteristics]:
+                                isatab.log.warning(
+                                    'Duplicate characteristic found for '
+                                    'material, skipping adding to material '
+                                    'object')
+                            else:
+                                material.characteristics.append(characteristic)
+
+                        for comment_column in [
+                            c for c in column_group if c.startswith(
+                                'Comment[')]:
+                            comment_key = next(iter(
+                                isatab._RX_COMMENT.findall(comment_column)))
+                            if comment_key not in [
+                                    x.name for x in material.comments]:
+                                material.comments.append(
+                                    Comment(
+                                        name=comment_key,
+                                        value=str(
+                                            object_series[comment_column])))
+
+                for _, object_series in DF.drop_duplicates().iterrows():
+                    node_name = str(object_series['Sample Name'])
+                    node_key = ":".join(['Sample Name', node_name])
+                    material = None
+                    try:
+                        material = samples[node_key]
+                    except KeyError:
+                        pass  # skip if object not found
+                    if isinstance(
+                            material, Sample) and self.factors is not None:
+
+                        for fv_column in [
+                            c for c in DF.columns if c.startswith(
+                                'Factor Value[')]:
+
+                            category_key = next(iter(
+                                isatab._RX_FACTOR_VALUE.findall(fv_column)))
+
+                            factor_hits = [
+                                f for f in self.factors if
+                                f.name == category_key]
+
+                            if len(factor_hits) == 1:
+                                factor = factor_hits[0]
+                            else:
+                                raise ValueError(
+                                    'Could not resolve Study Factor from '
+                                    'Factor Value ', category_key)
+                            fv = FactorValue(factor_name=factor)
+
+                            v, u = isatab.get_value(
+                                fv_column, DF.columns, object_series,
+                                ontology_source_map, unit_categories)
+
+                            fv.value = v
+                            fv.unit = u
+                            fv_set = set(material.factor_values)
+                            fv_set.add(fv)
+                            material.factor_values = list(fv_set)
+
+            elif object_label in isatab._LABELS_DATA_NODES:
+                for _, object_series in DF[column_group].drop_duplicates().iterrows():
+                    try:
+                        data_file = get_node_by_label_and_key(
+                            object_label, str(object_series[object_label]))
+                        for comment_column in [
+                            c for c in column_group if c.startswith(
+                                'Comment[')]:
+                            comment_key = next(iter(
+                                isatab._RX_COMMENT.findall(comment_column)))
+                            if comment_key not in [
+                                    x.name for x in data_file.comments]:
+                                data_file.comments.append(
+                                    Comment(
+                                        name=comment_key,
+                                        value=str(
+                                            object_series[comment_column])))
+                    except KeyError:
+                        pass  # skip if object not found
+
+            elif object_label.startswith('Protocol REF'):
+                object_label_index = list(DF.columns).index(object_label)
+
+                # don't drop duplicates
+                for _, object_series in DF.iterrows():
+                    # if _ == 0:
+                    protocol_ref = str(object_series[object_label])
+                    process_key = isatab.process_keygen(
+                        protocol_ref, column_group, _cg, DF.columns,
+                        object_series, _, DF)
+
+                    # TODO: Keep process key sequence here to reduce number of
+                    # passes on Protocol REF columns?
+
+                    try:
+                        process = processes[process_key]
+                    except KeyError:
+                        process = Process(executes_protocol=protocol_ref)
+                        processes.update(dict([(process_key, process)]))
+
+                    output_node_index = isatab.find_gt(node_cols, object_label_index)
+                    output_proc_index = isatab.find_gt(proc_cols, object_label_index)
+
+                    post_chained_protocol = any(
+                        col_name for col_name in DF.columns[(object_label_index + 1): output_node_index].values
+                        if col_name.startswith('Protocol REF')
+                    )
+
+                    if (output_proc_index < output_node_index > -1 and not post_chained_protocol) or \
+                            (output_proc_index > output_node_index):
+
+                        output_node_label = DF.columns[output_node_index]
+                        output_node_value = str(
+                            object_series[output_node_label])
+
+                        node_key = output_node_value
+
+                        output_node = None
+
+                        try:
+                            output_node = get_node_by_label_and_key(
+                                output_node_label, node_key)
+                        except KeyError:
+                            pass  # skip if object not found
+
+                        if output_node is not None and \
+                                output_node not in process.outputs:
+
+                            process.outputs.append(output_node)
+
+                    input_node_index = isatab.find_lt(node_cols, object_label_index)
+                    input_proc_index = isatab.find_lt(proc_cols, object_label_index)
+
+                    previous_chained_protocol = any(
+                        col_name for col_name in DF.columns[input_node_index: (object_label_index - 1)].values
+                        if col_name.startswith('Protocol REF')
+                    )
+
+                    if input_proc_index < input_node_index > -1 and not previous_chained_protocol:
+
+                        input_node_label = DF.columns[input_node_index]
+                        input_node_value = str(object_series[input_node_label])
+
+                        node_key = input_node_value
+
+                        input_node = None
+
+                        try:
+                            input_node = get_node_by_label_and_key(
+                                input_node_label, node_key)
+                        except KeyError:
+                            pass  # skip if object not found
+
+                        if input_node is not None and \
+                                input_node not in process.inputs:
+
+                            process.inputs.append(input_node)
+
+                    name_column_hits = [n for n in column_group
+                                        if n in isatab._LABELS_ASSAY_NODES]
+
+                    if len(name_column_hits) == 1:
+                        process.name = str(object_series[name_column_hits[0]])
+
+                    for pv_column in [c for c in column_group if c.startswith(
+                            'Parameter Value[')]:
+
+                        category_key = next(iter(
+                            isatab._RX_PARAMETER_VALUE.findall(pv_column)))
+
+                        if category_key in [x.category.parameter_name.term
+                                            for x in process.parameter_values]:
+                            pass
+                        else:
+                            try:
+                                protocol = protocol_map[protocol_ref]
+                            except KeyError:
+                                raise ValueError(
+                                    'Could not find protocol matching ',
+                                    protocol_ref)
+
+                            param_hits = [
+                                p for p in protocol.parameters
+                                if p.parameter_name.term == category_key]
+
+                            if len(param_hits) == 1:
+                                category = param_hits[0]
+                            else:
+                                raise ValueError(
+                                    'Could not resolve Protocol parameter '
+                                    'from Parameter Value ', category_key)
+
+                            parameter_value = ParameterValue(category=category)
+                            v, u = isatab.get_value(
+                                pv_column, column_group, object_series,
+                                ontology_source_map, unit_categories)
+
+                            parameter_value.value = v
+                            parameter_value.unit = u
+
+                            process.parameter_values.append(parameter_value)
+
+                    for comment_column in \
+                            [c for c in column_group
+                             if c.startswith('Comment[')]:
+                        comment_key = next(iter(
+                            isatab._RX_COMMENT.findall(comment_column)))
+                        if comment_key not in \
+                                [x.name for x in process.comments]:
+                            process.comments.append(
+                                Comment(name=comment_key,
+                                        value=str(
+                                            object_series[comment_column])))
+
+        # now go row by row pulling out processes and linking them accordingly
+        for _, object_series in DF.iterrows():  # don't drop duplicates
+            process_key_sequence = list()
+            source_node_context = None
+            sample_node_context = None
+            for _cg, column_group in enumerate(object_column_map):
+                # for each object, parse column group
+                object_label = column_group[0]
+
+                if object_label.startswith('Source Name'):
+                    try:
+                        source_node_context = get_node_by_label_and_key(
+                            object_label, str(object_series[object_label]))
+                    except KeyError:
+                        pass  # skip if object not found
+
+                if object_label.startswith('Sample Name'):
+                    try:
+                        sample_node_context = get_node_by_label_and_key(
+                            object_label, str(object_series[object_label]))
+                    except KeyError:
+                        pass  # skip if object not found
+                    if source_node_context is not None:
+                        if source_node_context not in \
+                                sample_node_context.derives_from:
+                            sample_node_context.derives_from.append(
+                                source_node_context)
+
+                if object_label.startswith('Protocol REF'):
+                    protocol_ref = str(object_series[object_label])
+                    process_key = isatab.process_keygen(
+                        protocol_ref, column_group, _cg, DF.columns,
+                        object_series, _, DF)
+                    process_key_sequence.append(process_key)
+
+                if object_label.endswith(' File'):
+                    data_node = None
+                    try:
+                        data_node = get_node_by_label_and_key(
+                            object_label, str(object_series[object_label]))
+                    except KeyError:
+                        pass  # skip if object not found
+                    if sample_node_context is not None and \
+                            data_node is not None:
+                        if sample_node_context not in data_node.generated_from:
+                            data_node.generated_from.append(
+                                sample_node_context)
+
+            # Link the processes in each sequence
+            for pair in isatab.pairwise(process_key_sequence):
+                left = processes[pair[0]]  # get process on left of pair
+                r = processes[pair[1]]  # get process on right of pair
+                plink(left, r)
+
+        return sources, samples, other_material, data, processes, \
+            characteristic_categories, unit_categories
+
+
+def canonical_isa_json(investigation):
+    """Serializes an Investigation to ISA-JSON that can be compared between
+    two loads of the same content. The @ids, which are made from object ids,
+    are numbered in order of appearance, and the Factor Values of each sample,
+    whose order comes from a set, are replaced by a sorted list of their
+    contents with the objects they refer to spelled out"""
+    isa_json = json.loads(json.dumps(investigation, cls=ISAJSONEncoder))
+    definitions = {}
+
+    def collect(o):
+        if isinstance(o, dict):
+            if '@id' in o and len(o) > 1:
+                definitions[o['@id']] = o
+            for v in o.values():
+                collect(v)
+        elif isinstance(o, list):
+            for x in o:
+                collect(x)
+    collect(isa_json)
+
+    def contents(o, depth=0):
+        if isinstance(o, dict):
+            if list(o) == ['@id'] and depth < 3:
+                return contents(definitions.get(o['@id'], {}), depth + 1)
+            return {k: contents(v, depth) for k, v in o.items() if k != '@id'}
+        if isinstance(o, list):
+            return [contents(x, depth) for x in o]
+        return o
+
+    ids = {}
+
+    def canonical(o):
+        if isinstance(o, dict):
+            o = {k: sorted(json.dumps(contents(x), sort_keys=True) for x in v)
+                 if k == 'factorValues' else canonical(v) for k, v in o.items()}
+            if '@id' in o:
+                o['@id'] = ids.setdefault(o['@id'], '#{}'.format(len(ids)))
+            return o
+        if isinstance(o, list):
+            return [canonical(x) for x in o]
+        return o
+    return canonical(isa_json)
+
+
+class UnitTestProcessSequenceFactoryRegression(unittest.TestCase):
+
+    def setUp(self):
+        self._tab_data_dir = utils.TAB_DATA_DIR
+
+    def assertLoadsLikeRowByRow(self, dataset, i_file='i_Investigation.txt'):
+        with open(os.path.join(self._tab_data_dir, dataset, i_file), encoding='utf-8') as fp:
+            ISA = isatab.load(fp)
+        with patch('isatools.isatab.ProcessSequenceFactory', RowByRowProcessSequenceFactory):
+            with open(os.path.join(self._tab_data_dir, dataset, i_file), encoding='utf-8') as fp:
+                expected_ISA = isatab.load(fp)
+        self.assertEqual(canonical_isa_json(ISA), canonical_isa_json(expected_ISA))
+
+    def test_load_bii_i_1(self):
+        self.assertLoadsLikeRowByRow('BII-I-1', 'i_investigation.txt')
+
+    def test_load_bii_s_3(self):
+        self.assertLoadsLikeRowByRow('BII-S-3', 'i_gilbert.txt')
+
+    def test_load_bii_s_7(self):
+        self.assertLoadsLikeRowByRow('BII-S-7', 'i_matteo.txt')
+
+    def test_load_mtbls1(self):
+        self.assertLoadsLikeRowByRow('MTBLS1')
+
+    def test_create_from_df_with_qualified_processes(self):
+        protocols = [
+            Protocol(name='extraction', parameters=[ProtocolParameter(parameter_name=OntologyAnnotation(
+                term='volume'))]),
+            Protocol(name='scanning')]
+        table_to_load = """Sample Name\tProtocol REF\tParameter Value[volume]\tUnit\tTerm Source REF\t\
+Term Accession Number\tPerformer\tDate\tExtract Name\tProtocol REF\tAssay Name\tComment[run]\tRaw Data File
+sample1\textraction\t1\tmL\tUO\t\tme\t2020-01-01\te1\tscanning\tassay1\trun1\td1
+sample1\textraction\t1\tmL\tUO\t\tme\t2020-01-01\te1\tscanning\tassay1\trun1\td2
+sample1\textraction\t2\tmL\tUO\t\tme\t2020-01-02\te2\tscanning\tassay2\trun2\td3
+sample2\textraction\t1\tmL\tUO\t\tyou\t2020-01-01\te3\tscanning\tassay2\trun2\td4
+sample2\textraction\t1\tmL\tUO\t\tyou\t2020-01-01\te3\tscanning\tassay3\trun3\td4"""
+        for factory_class in (ProcessSequenceFactory, RowByRowProcessSequenceFactory):
+            factory = factory_class(
+                study_samples=[Sample(name='sample1'), Sample(name='sample2')], study_protocols=protocols)
+            DF = IsaTabDataFrame(pd.read_csv(StringIO(table_to_load), dtype=str, sep='\t').fillna(''))
+            if factory_class is ProcessSequenceFactory:
+                so, sa, om, d, pr, _, __ = factory.create_from_df(DF)
+            else:
+                expected_so, expected_sa, expected_om, expected_d, expected_pr, _, __ = factory.create_from_df(DF)
+        self.assertEqual(list(pr), list(expected_pr))
+        for process_key, process in pr.items():
+            expected_process = expected_pr[process_key]
+            self.assertEqual(process.name, expected_process.name)
+            self.assertEqual([x.name for x in process.inputs], [x.name for x in expected_process.inputs])
+            self.assertEqual([getattr(x, 'name', None) or x.filename for x in process.outputs],
+                             [getattr(x, 'name', None) or x.filename for x in expected_process.outputs])
+            self.assertEqual(repr(process.parameter_values), repr(expected_process.parameter_values))
+            self.assertEqual(repr(process.comments), repr(expected_process.comments))
+            self.assertEqual(getattr(process.next_process, 'name', None),
+                             getattr(expected_process.next_process, 'name', None))
+        self.assertEqual([(x.filename, repr(x.comments), [s.name for s in x.generated_from]) for x in d.values()],
+                         [(x.filename, repr(x.comments), [s.name for s in x.generated_from])
+                          for x in expected_d.values()])
+
+    def test_process_keys_match_process_keygen(self):
+        table_to_load = """Source Name\tProtocol REF\tParameter Value[time]\tParameter Value[place]\tPerformer\t\
+Date\tSample Name\tProtocol REF\tExtract Name
+source1\tsample collection\t1\there\tme\t2020-01-01\tsample1\textraction\te1
+source1\tsample collection\t1\there\tme\t2020-01-01\tsample2\textraction\te2
+source2\tsample collection\t2\tthere\tyou\t2020-01-02\tsample3\textraction\te3"""
+        DF = isatab.preprocess(IsaTabDataFrame(pd.read_csv(StringIO(table_to_load), dtype=str, sep='\t').fillna('')))
+        object_column_map = isatab.get_object_column_map(DF.isatab_header, DF.columns)
+        for _cg, column_group in enumerate(object_column_map):
+            if column_group[0].startswith('Protocol REF'):
+                expected_keys = [
+                    isatab.process_keygen(str(object_series[column_group[0]]), column_group, _cg, DF.columns,
+                                          object_series, _, DF)
+                    for _, object_series in DF.iterrows()]
+                self.assertEqual(isatab.process_keys(column_group, _cg, DF.columns, DF), expected_keys)
+
+
+class UnitTestStreamTableFiles(unittest.TestCase):
+
+    def setUp(self):
+        self._tab_data_dir = utils.TAB_DATA_DIR
+        self._tmp_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self._tmp_dir)
+
+    def read_table(self, *path):
+        with open(os.path.join(self._tmp_dir, *path)) as fp:
+            table = pd.read_csv(fp, dtype=str, sep='\t').fillna('')
+        return list(table.columns), sorted(map(tuple, table.values.tolist()))
+
+    def assertStreamsLikeDataFrame(self, dataset, i_file):
+        with open(os.path.join(self._tab_data_dir, dataset, i_file), encoding='utf-8') as fp:
+            ISA = isatab.load(fp)
+        os.mkdir(os.path.join(self._tmp_dir, 'df'))
+        os.mkdir(os.path.join(self._tmp_dir, 'stream'))
+        isatab.dump(ISA, os.path.join(self._tmp_dir, 'df'))
+        isatab.dump(ISA, os.path.join(self._tmp_dir, 'stream'), stream_tables=True)
+        table_files = [x for x in os.listdir(os.path.join(self._tmp_dir, 'df')) if x[:2] in ('s_', 'a_')]
+        self.assertTrue(table_files)
+        for table_file in table_files:
+            self.assertEqual(self.read_table('stream', table_file), self.read_table('df', table_file))
+
+    def test_dump_bii_i_1(self):
+        self.assertStreamsLikeDataFrame('BII-I-1', 'i_investigation.txt')
+
+    def test_dump_bii_s_3(self):
+        self.assertStreamsLikeDataFrame('BII-S-3', 'i_gilbert.txt')
+
+    def test_dump_bii_s_7(self):
+        self.assertStreamsLikeDataFrame('BII-S-7', 'i_matteo.txt')
+
+    def test_write_table_file_rows_drops_duplicates_and_empty_columns(self):
+        paths = [['b'], ['a'], ['b'], ['c']]
+        values = {'a': ('a', ''), 'b': ('b', 1.0), 'c': ('c', float('nan'))}
+
+        def write_path(df_dict, path):
+            df_dict['Sample Name'][-1], df_dict['Sample Name.Comment[x]'][-1] = values[path[0]]
+            df_dict['Sample Name.Comment[y]'][-1] = ''
+
+        columns = ['Sample Name', 'Sample Name.Comment[x]', 'Sample Name.Comment[y]']
+        num_rows = isatab._write_table_file_rows(
+            os.path.join(self._tmp_dir, 's_test.txt'), lambda: iter(paths), columns, columns,
+            ['Sample Name', 'Comment[x]', 'Comment[y]'], write_path)
+        self.assertEqual(num_rows, 3)
+        with open(os.path.join(self._tmp_dir, 's_test.txt')) as fp:
+            self.assertEqual(fp.read(), 'Sample Name\tComment[x]\nb\t1.0\na\t\nc\t\n')
+
+
+class UnitTestStripComments(unittest.TestCase):
+
+    def setUp(self):
+        self._table = '# a comment\nSample Name\tComment[a]\n\n  # an indented comment\ns1\t#1\ns2\t2\n'
+
+    def test_strip_comments_lines(self):
+        fp = isatab.strip_comments(StringIO(self._table))
+        self.assertEqual(list(fp), ['Sample Name\tComment[a]\n', 's1\t#1\n', 's2\t2\n'])
+
+    def test_strip_comments_read(self):
+        fp = isatab.strip_comments(StringIO(self._table))
+        self.assertEqual(fp.read(5), 'Sampl')
+        self.assertEqual(fp.readline(), 'e Name\tComment[a]\n')
+        self.assertEqual(fp.read(), 's1\t#1\ns2\t2\n')
+        self.assertEqual(fp.read(), '')
+
+    def test_strip_comments_tell_seek(self):
+        fp = isatab.strip_comments(StringIO(self._table))
+        fp.readline()
+        position = fp.tell()
+        self.assertEqual(fp.readline(), 's1\t#1\n')
+        fp.seek(position)
+        self.assertEqual(fp.readline(), 's1\t#1\n')
+
+    def test_strip_comments_keeps_name(self):
+        with tempfile.NamedTemporaryFile('w', suffix='.txt') as tmp_fp:
+            tmp_fp.write(self._table)
+            tmp_fp.flush()
+            with open(tmp_fp.name) as fp:
+                self.assertEqual(isatab.strip_comments(fp).name, tmp_fp.name)
+
+    def test_load_table_with_comments(self):
+        df = isatab.load_table(StringIO(self._table))
+        self.assertEqual(list(df.columns), ['Sample Name', 'Comment[a]'])
+        self.assertEqual(df.values.tolist(), [['s1', '#1'], ['s2', '2']])
+
+
+class UnitTestReadInvestigationFile(unittest.TestCase):
+
+    def setUp(self):
+        self._investigation = Investigation(identifier='I1', title='Many contacts')
+        self._investigation.contacts = [Person(last_name='Person{}'.format(i)) for i in range(200)]
+        study = Study(identifier='S1', filename='s_study.txt')
+        study.publications = [Publication(title='Publication {}'.format(i)) for i in range(150)]
+        self._investigation.studies.append(study)
+        self._tmp_dir = tempfile.mkdtemp()
+        isatab.dump(self._investigation, self._tmp_dir, skip_dump_tables=True)
+        self._i_file_path = os.path.join(self._tmp_dir, 'i_investigation.txt')
+
+    def tearDown(self):
+        shutil.rmtree(self._tmp_dir)
+
+    def test_read_investigation_file_without_column_cap(self):
+        with open(self._i_file_path) as fp:
+            df_dict = isatab.read_investigation_file(fp)
+        self.assertEqual(df_dict['i_contacts']['Investigation Person Last Name'].tolist(),
+                         ['Person{}'.format(i) for i in range(200)])
+        self.assertEqual(len(df_dict['s_publications'][0].index), 150)
+
+    def test_load_investigation_without_column_cap(self):
+        with open(self._i_file_path) as fp:
+            investigation = isatab.load(fp, skip_load_tables=True)
+        self.assertEqual([x.last_name for x in investigation.contacts], ['Person{}'.format(i) for i in range(200)])
+        self.assertEqual(len(investigation.studies[0].publications), 150)
+
+    def test_read_investigation_file_values(self):
+        i_file = ('# a comment\n'
+                  'ONTOLOGY SOURCE REFERENCE\nTerm Source Name\t"OBI"\t"NCBITAXON"\nTerm Source Version\t22\tNA\n'
+                  'INVESTIGATION\nInvestigation Identifier\t1\n"Investigation Title"\t"a\ttitle"\n\n'
+                  'INVESTIGATION PUBLICATIONS\nINVESTIGATION CONTACTS\nInvestigation Person Last Name\n')
+        with self.assertRaises(IndexError):
+            # an empty section has no labels
+            isatab.read_investigation_file(StringIO(i_file))
+        i_file = i_file.replace('INVESTIGATION CONTACTS\n', 'Investigation PubMed ID\t\nINVESTIGATION CONTACTS\n')
+        i_file = i_file.replace('Person Last Name\n', 'Person Last Name\tDoe\n')
+        df_dict = isatab.read_investigation_file(StringIO(i_file))
+        self.assertEqual(df_dict['ontology_sources'][['Term Source Name', 'Term Source Version']].values.tolist(),
+                         [['OBI', '22'], ['NCBITAXON', '']])
+        self.assertEqual(df_dict['investigation'][['Investigation Identifier', 'Investigation Title']].values.tolist(),
+                         [['1', 'a\ttitle']])
+        self.assertEqual(len(df_dict['i_publications'].index), 0)
+        self.assertEqual(df_dict['i_contacts']['Investigation Person Last Name'].tolist(), ['Doe'])
+        self.assertEqual(df_dict['studies'], [])
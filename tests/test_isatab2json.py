@@ -3,7 +3,8 @@ import unittest
 from isatools.convert import isatab2json
 import json
 from isatools.tests import utils
-from isatools import isajson
+from isatools import isajson, isatab
+from isatools.model import Assay, Extract, Investigation, OntologyAnnotation, Process, Protocol, Sample, Source, Study
 import tempfile
 import shutil
 
@@ -157,3 +158,50 @@ class TestIsaTab2Json(unittest.TestCase):
         with open(os.path.join(self._tmp_dir, 'isa.json')) as actual_json:
             report = isajson.validate(actual_json)
             self.assertEqual(len(report['errors']), 0)
+
+
+class UnitTestIdentifiers(unittest.TestCase):
+
+    def test_generate_and_get_identifier(self):
+        converter = isatab2json.ISATab2ISAjson_v1(isatab2json.IdentifierType.counter)
+        first_identifier = converter.generateIdentifier('sample', 'sample1')
+        self.assertEqual(first_identifier, 'http://data.isa-tools.org/sample/1')
+        self.assertEqual(converter.generateIdentifier('sample', 'sample1'), 'http://data.isa-tools.org/sample/2')
+        self.assertEqual(converter.getIdentifier('sample', 'sample1'), first_identifier)
+        self.assertIsNone(converter.getIdentifier('source', 'sample1'))
+
+    def test_convert_links_identifiers(self):
+        study = Study(identifier='S1', title='study', filename='s_study.txt')
+        collection = Protocol(name='sample collection', protocol_type=OntologyAnnotation(term='sample collection'))
+        extraction = Protocol(name='extraction', protocol_type=OntologyAnnotation(term='extraction'))
+        study.protocols = [collection, extraction]
+        assay = Assay(filename='a_assay.txt')
+        for i in range(2):
+            source = Source(name='source{}'.format(i))
+            samples = [Sample(name='sample{}-{}'.format(i, j), derives_from=[source]) for j in range(2)]
+            study.sources.append(source)
+            study.samples.extend(samples)
+            study.process_sequence.append(Process(executes_protocol=collection, inputs=[source], outputs=samples))
+            for sample in samples:
+                extract = Extract(name='extract-' + sample.name)
+                assay.samples.append(sample)
+                assay.other_material.append(extract)
+                assay.process_sequence.append(Process(executes_protocol=extraction, inputs=[sample], outputs=[extract]))
+        study.assays.append(assay)
+        tmp_dir = tempfile.mkdtemp()
+        try:
+            isatab.dump(Investigation(identifier='I1', title='investigation', studies=[study]), tmp_dir)
+            isa_json = isatab2json.ISATab2ISAjson_v1(isatab2json.IdentifierType.counter).convert(tmp_dir)
+        finally:
+            shutil.rmtree(tmp_dir)
+        study_json = isa_json['studies'][0]
+        names = {material['@id']: material['name'] for materials in study_json['materials'].values()
+                 for material in materials}
+        self.assertEqual(len(names), 6)
+        self.assertEqual([([names[x['@id']] for x in process['inputs']], [names[x['@id']] for x in process['outputs']])
+                          for process in study_json['processSequence']], [
+            (['source-source0'], ['sample-sample0-0', 'sample-sample0-1']),
+            (['source-source1'], ['sample-sample1-0', 'sample-sample1-1'])
+        ])
+        self.assertEqual([names[x['@id']] for x in study_json['assays'][0]['materials']['samples']],
+                         ['sample-sample0-0', 'sample-sample0-1', 'sample-sample1-0', 'sample-sample1-1'])
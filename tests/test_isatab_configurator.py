@@ -1,5 +1,11 @@
 import unittest
+import json
 import os
+import shutil
+import tempfile
+from unittest.mock import patch
+
+from isatools.io import isatab_configurator as configurator
 from isatools.tests import utils
 
 
@@ -53,3 +59,72 @@ class TestIsaTabConfigurator(unittest.TestCase):
                          .table_name,'metagenome_seq')
         self.assertEqual(configurator.get_config(
             config_dict, 'metagenome sequencing', 'nucleotide sequencing')[0].header, 'Sample Name')
+
+
+class TestCompiledConfigs(unittest.TestCase):
+
+    def setUp(self):
+        from isatools import isatab
+        self._config_dir = os.path.join(tempfile.mkdtemp(), 'xml')
+        shutil.copytree(isatab.default_config_dir, self._config_dir)
+        self._cache_dir = tempfile.mkdtemp()
+        cache_dir_patcher = patch('isatools.io.isatab_configurator.CACHE_DIR', self._cache_dir)
+        cache_dir_patcher.start()
+        self.addCleanup(cache_dir_patcher.stop)
+        configurator._compiled_configs.clear()
+
+    def tearDown(self):
+        shutil.rmtree(os.path.dirname(self._config_dir))
+        shutil.rmtree(self._cache_dir)
+
+    def load_without_parsing(self):
+        with patch('isatools.io.isatab_configurator._parse_configs', side_effect=AssertionError('parsed')):
+            return configurator.load(self._config_dir)
+
+    def test_load_compiles_configs(self):
+        config_files = sorted(os.listdir(self._config_dir))
+        config_dict = configurator.load(self._config_dir)
+        # the configuration directory is left as it is
+        self.assertEqual(sorted(os.listdir(self._config_dir)), config_files)
+        self.assertEqual(len(os.listdir(self._cache_dir)), 1)
+        uncached_config_dict = configurator.load(self._config_dir, use_cache=False)
+        self.assertEqual(sorted(config_dict), sorted(uncached_config_dict))
+        for key in config_dict:
+            self.assertEqual([(type(x).__name__, x.pos) for x in configurator.get_config(config_dict, *key)],
+                             [(type(x).__name__, x.pos) for x in configurator.get_config(uncached_config_dict, *key)])
+        self.assertEqual(sorted(self.load_without_parsing()), sorted(config_dict))
+        configurator._compiled_configs.clear()
+        compiled_config_dict = self.load_without_parsing()
+        self.assertEqual(sorted(compiled_config_dict), sorted(config_dict))
+        for key in config_dict:
+            self.assertEqual(configurator._config_to_data(compiled_config_dict[key]),
+                             configurator._config_to_data(uncached_config_dict[key]))
+            self.assertEqual([(type(x).__name__, x.pos) for x in configurator.get_config(compiled_config_dict, *key)],
+                             [(type(x).__name__, x.pos) for x in configurator.get_config(uncached_config_dict, *key)])
+
+    def test_load_rejects_unknown_types(self):
+        configurator.load(self._config_dir)
+        configurator._compiled_configs.clear()
+        compiled_file = os.path.join(self._cache_dir, os.listdir(self._cache_dir)[0])
+        with open(compiled_file) as compiled_fp:
+            compiled = json.load(compiled_fp)
+        compiled['configs'][0][2]['type'] = 'GDSParseError'
+        with open(compiled_file, 'w') as compiled_fp:
+            json.dump(compiled, compiled_fp)
+        with patch('isatools.io.isatab_configurator._parse_configs', return_value={}) as parse_configs:
+            configurator.load(self._config_dir)
+        parse_configs.assert_called_once()
+
+    def test_load_with_touched_configs(self):
+        configurator.load(self._config_dir)
+        configurator._compiled_configs.clear()
+        config_file = os.path.join(self._config_dir, 'genome_seq.xml')
+        os.utime(config_file, (0, 0))
+        self.load_without_parsing()
+
+    def test_load_with_changed_configs(self):
+        config_dict = configurator.load(self._config_dir)
+        os.remove(os.path.join(self._config_dir, 'genome_seq.xml'))
+        changed_config_dict = configurator.load(self._config_dir)
+        self.assertEqual(len(changed_config_dict), len(config_dict) - 1)
+        self.assertNotIn(('genome sequencing', 'nucleotide sequencing'), changed_config_dict)
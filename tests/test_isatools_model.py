@@ -1,7 +1,10 @@
 """Tests on isatools.model classes"""
 from __future__ import absolute_import
 import datetime
+import pickle
+import threading
 import unittest
+from copy import deepcopy
 from unittest.mock import patch
 
 from isatools.model import (
@@ -10,7 +13,8 @@ from isatools.model import (
     FactorValue, DataFile, RawDataFile, DerivedDataFile, RawSpectralDataFile, ArrayDataFile, DerivedSpectralDataFile,
     ProteinAssignmentFile, PeptideAssignmentFile, DerivedArrayDataMatrixFile,
     PostTranslationalModificationAssignmentFile, AcquisitionParameterDataFile, FreeInductionDecayDataFile,
-    load_protocol_types_info
+    Process, plink, load_protocol_types_info, _build_assay_graph, SequenceIdentifierAllocator,
+    sequence_identifier_scope, OntologyAnnotationTable
 )
 
 
@@ -230,6 +234,27 @@ class OntologyAnnotationTest(unittest.TestCase):
             hash(expected_other_ontology_annotation), hash(self.ontology_annotation))
 
 
+class OntologyAnnotationTableTest(unittest.TestCase):
+
+    def test_get(self):
+        table = OntologyAnnotationTable()
+        obi = OntologySource(name='OBI')
+        annotation = table.get('T', obi, 'A')
+        self.assertEqual(annotation, OntologyAnnotation(term='T', term_source=obi, term_accession='A'))
+        self.assertIs(table.get('T', OntologySource(name='OBI'), 'A'), annotation)
+        self.assertIsNot(table.get('T', obi), annotation)
+        self.assertIsNot(table.get('T', OntologySource(name='EFO'), 'A'), annotation)
+        self.assertIs(table.get('T'), table.get('T'))
+        self.assertEqual(len(table), 4)
+
+    def test_get_unhashable(self):
+        table = OntologyAnnotationTable()
+        annotation = table.get(['T'])
+        self.assertEqual(annotation.term, ['T'])
+        self.assertIsNot(table.get(['T']), annotation)
+        self.assertEqual(len(table), 0)
+
+
 class PublicationTest(unittest.TestCase):
 
     def setUp(self):
@@ -455,6 +480,85 @@ class StudyTest(unittest.TestCase):
         self.assertNotEqual(hash(expected_other_study), hash(self.study))
 
 
+class StudyGraphTest(unittest.TestCase):
+
+    def setUp(self):
+        self.source = Source(name='source1')
+        self.sample = Sample(name='sample1')
+        self.extract = Extract(name='extract1')
+        self.collection = Process(inputs=[self.source], outputs=[self.sample])
+        self.extraction = Process(inputs=[self.sample])
+        self.study = Study(process_sequence=[self.collection])
+
+    def assertGraphIsFresh(self, study):
+        graph = study.graph
+        expected_graph = _build_assay_graph(study.process_sequence)
+        self.assertEqual(set(graph.nodes()), set(expected_graph.nodes()))
+        self.assertEqual(set(graph.edges()), set(expected_graph.edges()))
+        self.assertEqual(graph.indexes, expected_graph.indexes)
+
+    def test_graph_empty(self):
+        self.assertIsNone(Study().graph)
+
+    def test_graph_is_cached(self):
+        self.assertIs(self.study.graph, self.study.graph)
+        self.assertGraphIsFresh(self.study)
+
+    def test_graph_process_sequence_append(self):
+        graph = self.study.graph
+        self.study.process_sequence.append(self.extraction)
+        self.assertIs(self.study.graph, graph)
+        self.assertIn((self.sample.sequence_identifier, self.extraction.sequence_identifier), graph.edges())
+        self.assertGraphIsFresh(self.study)
+
+    def test_graph_process_sequence_remove(self):
+        self.study.process_sequence.append(self.extraction)
+        self.assertEqual(len(self.study.graph.edges()), 3)
+        self.study.process_sequence.remove(self.collection)
+        self.assertEqual(len(self.study.graph.edges()), 1)
+        self.assertGraphIsFresh(self.study)
+
+    def test_graph_process_sequence_set(self):
+        graph = self.study.graph
+        self.study.process_sequence = [self.extraction]
+        self.assertIsNot(self.study.graph, graph)
+        self.assertGraphIsFresh(self.study)
+
+    def test_graph_process_inputs_outputs_change(self):
+        self.study.process_sequence.append(self.extraction)
+        self.assertGraphIsFresh(self.study)
+        self.extraction.outputs.append(self.extract)
+        self.assertGraphIsFresh(self.study)
+        self.collection.inputs = []
+        self.assertGraphIsFresh(self.study)
+        self.assertNotIn(self.source.sequence_identifier, self.study.graph.nodes())
+        del self.extraction.outputs[0]
+        self.assertGraphIsFresh(self.study)
+
+    def test_graph_plink(self):
+        first_process = Process()
+        second_process = Process()
+        study = Study(process_sequence=[first_process, second_process])
+        self.assertEqual(len(study.graph.edges()), 0)
+        plink(first_process, second_process)
+        self.assertEqual(list(study.graph.edges()),
+                         [(first_process.sequence_identifier, second_process.sequence_identifier)])
+        self.assertGraphIsFresh(study)
+        first_process.next_process = None
+        second_process.prev_process = None
+        self.assertEqual(len(study.graph.edges()), 0)
+        self.assertGraphIsFresh(study)
+
+    def test_graph_deepcopy(self):
+        self.study.graph
+        study_copy = deepcopy(self.study)
+        self.assertGraphIsFresh(study_copy)
+        study_copy.process_sequence[0].outputs.append(self.extract)
+        self.assertGraphIsFresh(study_copy)
+        self.assertGraphIsFresh(self.study)
+        self.assertEqual(len(self.study.graph.edges()), 2)
+
+
 class StudyFactorTest(unittest.TestCase):
 
     def setUp(self):
@@ -1518,4 +1622,98 @@ class FreeInductionDecayDataFileTest(unittest.TestCase):
         expected_other_data_file = FreeInductionDecayDataFile(filename='file2')
         self.assertNotEqual(expected_other_data_file, self.data_file)
         self.assertNotEqual(hash(expected_other_data_file),
-                            hash(self.data_file))
\ No newline at end of file
+                            hash(self.data_file))
+
+
+class StructuralHashTest(unittest.TestCase):
+
+    def test_setter_resets_cached_hash(self):
+        sample = Sample(name='sample1')
+        hash(sample)
+        sample.name = 'sample2'
+        self.assertEqual(hash(sample), hash(Sample(name='sample2')))
+        study = Study(filename='s_1.txt')
+        hash(study)
+        study.title = 'title'
+        self.assertEqual(hash(study), hash(Study(filename='s_1.txt', title='title')))
+
+    def test_nested_changes_keep_hash_of_equal_objects(self):
+        sample = Sample(name='sample1')
+        hash(sample)
+        sample.characteristics.append(Characteristic(category=OntologyAnnotation(term='organism')))
+        other_sample = Sample(name='sample1', characteristics=list(sample.characteristics))
+        self.assertEqual(sample, other_sample)
+        self.assertEqual(hash(sample), hash(other_sample))
+        self.assertEqual(len({sample, other_sample}), 1)
+
+    def test_copies_do_not_keep_cached_hash(self):
+        protocol = Protocol(name='extraction')
+        hash(protocol)
+        self.assertNotIn('_hash_cache', protocol.__getstate__())
+        process = Process(executes_protocol=protocol, name='process1')
+        hash(process)
+        for copied_process in (pickle.loads(pickle.dumps(process)), deepcopy(process)):
+            self.assertIsNone(copied_process._hash_cache)
+            self.assertEqual(hash(copied_process), hash(process))
+
+    def test_unnamed_processes_hash_apart(self):
+        protocol = Protocol(name='sample collection')
+        processes = [
+            Process(executes_protocol=protocol, inputs=[Source(name='source{}'.format(i))],
+                    outputs=[Sample(name='sample{}'.format(i))])
+            for i in range(5000)
+        ]
+        self.assertEqual(len({hash(process) for process in processes}), len(processes))
+        self.assertEqual(len(set(processes)), len(processes))
+        equal_process = Process(executes_protocol=protocol, inputs=[Source(name='source0')],
+                                outputs=[Sample(name='sample0')])
+        self.assertEqual(equal_process, processes[0])
+        self.assertEqual(hash(equal_process), hash(processes[0]))
+        self.assertIn(equal_process, set(processes))
+
+
+class SequenceIdentifierTest(unittest.TestCase):
+
+    def build_study(self, name, n_samples=100):
+        source = Source(name=name)
+        samples = [Sample(name='{}-{}'.format(name, i)) for i in range(n_samples)]
+        study = Study(filename='s_{}.txt'.format(name))
+        study.process_sequence.append(
+            Process(executes_protocol=Protocol(name='sample collection'), inputs=[source], outputs=samples))
+        return study
+
+    def test_allocate(self):
+        allocator = SequenceIdentifierAllocator(block_size=2)
+        identifiers = [allocator.allocate() for _ in range(5)]
+        self.assertEqual(len(set(identifiers)), 5)
+        self.assertEqual(identifiers[1], identifiers[0] + 1)
+
+    def test_scope(self):
+        with sequence_identifier_scope(SequenceIdentifierAllocator(block_size=10)) as allocator:
+            sample = Sample(name='sample')
+            self.assertEqual(allocator._next, sample.sequence_identifier + 1)
+            source = Source(name='source')
+        self.assertEqual(source.sequence_identifier, sample.sequence_identifier + 1)
+        self.assertNotEqual(allocator._next, Source(name='other').sequence_identifier + 1)
+
+    def test_concurrent_builds_merge(self):
+        studies = {}
+
+        def build(name, scoped):
+            if scoped:
+                with sequence_identifier_scope():
+                    studies[name] = self.build_study(name)
+            else:
+                studies[name] = self.build_study(name)
+
+        threads = [threading.Thread(target=build, args=('study{}'.format(i), i % 2 == 0)) for i in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        merged_study = Study(filename='s_merged.txt')
+        for study in studies.values():
+            merged_study.process_sequence.extend(study.process_sequence)
+        # a source, 100 samples and a process in each study
+        self.assertEqual(len(merged_study.graph.nodes()), 8 * 102)
+        self.assertEqual(len(merged_study.graph.indexes), 8 * 102)
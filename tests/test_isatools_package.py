@@ -0,0 +1,38 @@
+"""Tests on the isatools package itself"""
+from __future__ import absolute_import
+
+import os
+import subprocess
+import sys
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+
+import isatools
+
+
+class TestSubmoduleImports(unittest.TestCase):
+
+    def import_standalone(self, module_name):
+        """Import a module on its own in a fresh interpreter
+
+        :return: A tuple of the exit status and the standard error output
+        """
+        process = subprocess.run(
+            [sys.executable, '-c', 'import {}'.format(module_name)],
+            stdout=subprocess.PIPE, stderr=subprocess.PIPE, universal_newlines=True,
+            cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+        return process.returncode, process.stderr
+
+    def test_import_each_submodule_standalone(self):
+        module_names = sorted(set(isatools._LAZY_SUBMODULES.values()))
+        with ThreadPoolExecutor(max_workers=os.cpu_count()) as executor:
+            results = list(executor.map(self.import_standalone, module_names))
+        for module_name, (returncode, stderr) in zip(module_names, results):
+            with self.subTest(module=module_name):
+                self.assertEqual(returncode, 0, stderr)
+
+    def test_import_isatools_does_not_import_pandas(self):
+        output = subprocess.check_output(
+            [sys.executable, '-c', 'import sys, isatools; print("pandas" in sys.modules)'],
+            universal_newlines=True, cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+        self.assertEqual(output.strip(), 'False')
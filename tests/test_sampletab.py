@@ -249,3 +249,37 @@ Sample Name	Sample Accession	Sample Description	Derived From	Group Name	Group Ac
         self.assertIn("""sample1	S1	A sample""", sampletab_dump)
         self.assertIn("""sample2	S2	Another sample	S1""", sampletab_dump)
         self.assertIn("""sample3	S3	Another sample	S1""", sampletab_dump)
+
+    def test_sampletab_dump_characteristics_of_each_row(self):
+        organism = OntologyAnnotation(term='organism')
+        age = OntologyAnnotation(term='age')
+        day = OntologyAnnotation(term='day', term_accession='http://purl.obolibrary.org/obo/UO_0000033')
+        homo_sapiens = OntologyAnnotation(term='Homo sapiens',
+                                          term_accession='http://purl.obolibrary.org/obo/NCBITaxon_9606')
+        study = Study(filename='s_test.txt', characteristic_categories=[organism, age], units=[day])
+        collection = Protocol(name='sample collection', protocol_type=OntologyAnnotation(term='sample collection'))
+        study.protocols = [collection]
+        for i in range(2):
+            source = Source(name='source{}'.format(i), characteristics=[
+                Characteristic(category=organism, value=homo_sapiens)])
+            samples = [Sample(name='sample{}-{}'.format(i, j), derives_from=[source], characteristics=[
+                Characteristic(category=age, value=10 * i + j, unit=day)]) for j in range(2)]
+            study.sources.append(source)
+            study.samples.extend(samples)
+            study.process_sequence.append(Process(executes_protocol=collection, inputs=[source], outputs=samples))
+        sampletab_dump = sampletab.dumps(Investigation(identifier='TEST', studies=[study]))
+        header, *rows = [line.split('\t') for line in sampletab_dump.split('[SCD]\n')[1].splitlines()]
+        # the order of the rows and of the characteristic columns is not set
+        cells = {row[0]: sorted((label, value) for label, value in zip(header[1:], row[1:]) if value)
+                 for row in rows}
+        expected_cells = dict()
+        for i in range(2):
+            expected_cells['source{}'.format(i)] = [
+                ('Characteristic[organism]', 'Homo sapiens'),
+                ('Term Source ID', 'http://purl.obolibrary.org/obo/NCBITaxon_9606')]
+            for j in range(2):
+                expected_cells['sample{}-{}'.format(i, j)] = [
+                    ('Characteristic[age]', '{}.0'.format(10 * i + j)), ('Derived From', 'source{}'.format(i)),
+                    ('Term Source ID', 'http://purl.obolibrary.org/obo/UO_0000033'), ('Unit', 'day')]
+        self.assertEqual(len(rows), len(expected_cells))
+        self.assertEqual(cells, expected_cells)
@@ -1,14 +1,21 @@
 """Tests for exporting from ISA to SRA XML 1.5"""
+import hashlib
+import json
 import unittest
 import os
 import shutil
 import tempfile
+from unittest.mock import patch
 from lxml import etree
 
 from isatools.tests import utils
 
 from isatools import isajson
 from isatools import sra
+from isatools.model import (
+    Assay, Characteristic, Extract, Investigation, OntologyAnnotation, ParameterValue, Person, Process, Protocol,
+    ProtocolParameter, RawDataFile, Sample, Source, Study, plink
+)
 
 
 def setUpModule():
@@ -212,4 +219,183 @@ class TestSraExport(unittest.TestCase):
             actual_project_set_xml_obj = etree.fromstring(out_fp.read())
             self.assertTrue(
                 utils.assert_xml_equal(self._expected_project_set_xml_obj,
-                                       actual_project_set_xml_obj))
\ No newline at end of file
+                                       actual_project_set_xml_obj))
+
+
+class TestSraExportIndexes(unittest.TestCase):
+
+    def setUp(self):
+        self._tmp_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self._tmp_dir)
+
+    def build_study(self):
+        """Build a metagenome sequencing study with two sources, each split
+        into two samples sequenced in a run of their own
+        """
+        study = Study(identifier='S1', title='study', description='study', filename='s_study.txt')
+        study.contacts.append(Person(last_name='Doe', email='doe@example.org', roles=[
+            OntologyAnnotation(term='SRA Inform On Status'), OntologyAnnotation(term='SRA Inform On Error')]))
+        collection = Protocol(name='collection', protocol_type=OntologyAnnotation(term='sample collection'))
+        extraction = Protocol(name='extraction', protocol_type=OntologyAnnotation(term='nucleic acid extraction'))
+        library = Protocol(name='library', protocol_type=OntologyAnnotation(term='library construction'),
+                           parameters=[ProtocolParameter(parameter_name=OntologyAnnotation(term=name)) for name in
+                                       ('library strategy', 'library selection', 'library layout')])
+        sequencing = Protocol(name='sequencing', protocol_type=OntologyAnnotation(term='nucleic acid sequencing'),
+                              parameters=[ProtocolParameter(parameter_name=OntologyAnnotation(
+                                  term='sequencing instrument'))])
+        study.protocols = [collection, extraction, library, sequencing]
+        organism = OntologyAnnotation(term='marine metagenome',
+                                      term_accession='http://purl.obolibrary.org/obo/NCBITaxon_408172')
+        assay = Assay(filename='a_assay.txt', measurement_type=OntologyAnnotation(term='metagenome sequencing'),
+                      technology_type=OntologyAnnotation(term='nucleotide sequencing'))
+        for i, strategy in enumerate(('WGS', 'OTHER')):
+            source = Source(name='source{}'.format(i), characteristics=[
+                Characteristic(category=OntologyAnnotation(term='organism'), value=organism)])
+            samples = [Sample(name='sample{}-{}'.format(i, j), derives_from=[source]) for j in range(2)]
+            study.sources.append(source)
+            study.samples.extend(samples)
+            study.process_sequence.append(Process(executes_protocol=collection, inputs=[source], outputs=samples))
+            for sample in samples:
+                extract = Extract(name='extract-' + sample.name)
+                data_file = RawDataFile(filename=sample.name + '.sff')
+                processes = [
+                    Process(executes_protocol=extraction, inputs=[sample], outputs=[extract]),
+                    Process(executes_protocol=library, inputs=[extract], parameter_values=[
+                        ParameterValue(category=parameter, value=value) for parameter, value in
+                        zip(library.parameters, (strategy, 'RANDOM', 'SINGLE'))]),
+                    Process(name='run-' + sample.name, executes_protocol=sequencing, outputs=[data_file],
+                            parameter_values=[ParameterValue(category=sequencing.parameters[0], value='454 GS FLX')])
+                ]
+                plink(processes[0], processes[1])
+                plink(processes[1], processes[2])
+                assay.samples.append(sample)
+                assay.other_material.append(extract)
+                assay.data_files.append(data_file)
+                assay.process_sequence.extend(processes)
+        study.assays.append(assay)
+        return study
+
+    def test_sra_export_runs_of_each_sample(self):
+        sra.export(Investigation(studies=[self.build_study()]), self._tmp_dir)
+        with open(os.path.join(self._tmp_dir, 'run_set.xml'), 'rb') as fp:
+            run_set = etree.fromstring(fp.read())
+        with open(os.path.join(self._tmp_dir, 'experiment_set.xml'), 'rb') as fp:
+            experiment_set = etree.fromstring(fp.read())
+        with open(os.path.join(self._tmp_dir, 'sample_set.xml'), 'rb') as fp:
+            sample_set = etree.fromstring(fp.read())
+        sample_names = ['sample0-0', 'sample0-1', 'sample1-0', 'sample1-1']
+        self.assertEqual([run.find('DATA_BLOCK/FILES/FILE').get('filename') for run in run_set],
+                         [name + '.sff' for name in sample_names])
+        experiments = {experiment.get('alias'): experiment for experiment in experiment_set}
+        self.assertEqual(len(experiments), 4)
+        for run, sample_name in zip(run_set, sample_names):
+            experiment = experiments[run.find('EXPERIMENT_REF').get('refname')]
+            self.assertEqual(experiment.find('DESIGN/SAMPLE_DESCRIPTOR').get('refname'), 'S1:sample:' + sample_name)
+            self.assertEqual(experiment.findtext('DESIGN/LIBRARY_DESCRIPTOR/LIBRARY_STRATEGY'),
+                             'WGS' if sample_name.startswith('sample0') else 'OTHER')
+            self.assertEqual(experiment.findtext('PLATFORM/LS454/INSTRUMENT_MODEL'), '454 GS FLX')
+        self.assertEqual([(sample.get('alias'), sample.findtext('SAMPLE_ATTRIBUTES/SAMPLE_ATTRIBUTE/VALUE'))
+                          for sample in sample_set],
+                         [('S1:sample:' + name, 'source' + name[6]) for name in sample_names])
+
+
+class TestCreateDatafileHashes(unittest.TestCase):
+
+    def setUp(self):
+        self._tmp_dir = tempfile.mkdtemp()
+        self._contents = {
+            'run1.fastq.gz': b'',
+            'run2.fastq.gz': b'ACGT' * 300000,
+            'run3.fastq.gz': os.urandom(sra.DATAFILE_HASH_BUFFER_SIZE * 2 + 7)
+        }
+        for filename, content in self._contents.items():
+            with open(os.path.join(self._tmp_dir, filename), 'wb') as fp:
+                fp.write(content)
+
+    def tearDown(self):
+        shutil.rmtree(self._tmp_dir)
+
+    def test_create_datafile_hashes(self):
+        filenames = sorted(self._contents)
+        datafilehashes = sra.create_datafile_hashes(
+            self._tmp_dir, filenames, workers=2)
+        self.assertEqual(list(datafilehashes), filenames)
+        for filename, content in self._contents.items():
+            self.assertEqual(datafilehashes[filename],
+                             hashlib.md5(content).hexdigest())
+
+    def test_create_datafile_hashes_uses_manifest(self):
+        filenames = sorted(self._contents)
+        datafilehashes = sra.create_datafile_hashes(self._tmp_dir, filenames)
+        self.assertTrue(os.path.isfile(os.path.join(
+            self._tmp_dir, sra.DATAFILE_HASHES_MANIFEST)))
+        with patch('isatools.sra.md5sum') as mock_md5sum:
+            self.assertEqual(
+                sra.create_datafile_hashes(self._tmp_dir, filenames),
+                datafilehashes)
+            mock_md5sum.assert_not_called()
+
+    def test_create_datafile_hashes_rehashes_modified_file(self):
+        manifest_path = os.path.join(self._tmp_dir, 'md5.json')
+        sra.create_datafile_hashes(
+            self._tmp_dir, ['run1.fastq.gz', 'run2.fastq.gz'],
+            manifest_path=manifest_path)
+        with open(os.path.join(self._tmp_dir, 'run1.fastq.gz'), 'wb') as fp:
+            fp.write(b'ACGT')
+        with patch('isatools.sra.md5sum', wraps=sra.md5sum) as mock_md5sum:
+            datafilehashes = sra.create_datafile_hashes(
+                self._tmp_dir, ['run1.fastq.gz', 'run2.fastq.gz'],
+                manifest_path=manifest_path)
+            mock_md5sum.assert_called_once_with(
+                os.path.join(self._tmp_dir, 'run1.fastq.gz'))
+        self.assertEqual(datafilehashes['run1.fastq.gz'],
+                         hashlib.md5(b'ACGT').hexdigest())
+
+    def test_create_datafile_hashes_ignores_broken_manifest(self):
+        manifest_path = os.path.join(self._tmp_dir, 'md5.json')
+        with open(manifest_path, 'w') as fp:
+            fp.write('{"run1.fastq.gz": ')
+        datafilehashes = sra.create_datafile_hashes(
+            self._tmp_dir, ['run1.fastq.gz'], manifest_path=manifest_path)
+        self.assertEqual(datafilehashes['run1.fastq.gz'],
+                         'd41d8cd98f00b204e9800998ecf8427e')
+
+    def test_create_datafile_hashes_rehashes_entry_without_md5(self):
+        manifest_path = os.path.join(self._tmp_dir, 'md5.json')
+        stat = os.stat(os.path.join(self._tmp_dir, 'run2.fastq.gz'))
+        with open(manifest_path, 'w') as fp:
+            json.dump({'run2.fastq.gz': {'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns}}, fp)
+        datafilehashes = sra.create_datafile_hashes(
+            self._tmp_dir, ['run2.fastq.gz'], manifest_path=manifest_path)
+        self.assertEqual(datafilehashes['run2.fastq.gz'],
+                         hashlib.md5(self._contents['run2.fastq.gz']).hexdigest())
+        with open(manifest_path) as fp:
+            self.assertEqual(json.load(fp)['run2.fastq.gz']['md5'], datafilehashes['run2.fastq.gz'])
+
+    def test_create_datafile_hashes_skips_file_modified_while_hashed(self):
+        manifest_path = os.path.join(self._tmp_dir, 'md5.json')
+        path = os.path.join(self._tmp_dir, 'run1.fastq.gz')
+        md5sum = sra.md5sum
+
+        def md5sum_and_modify(filename):
+            md5 = md5sum(filename)
+            with open(filename, 'ab') as fp:
+                fp.write(b'ACGT')
+            return md5
+
+        with patch('isatools.sra.md5sum', side_effect=md5sum_and_modify):
+            sra.create_datafile_hashes(
+                self._tmp_dir, ['run1.fastq.gz'], manifest_path=manifest_path)
+        self.assertNotIn('run1.fastq.gz', sra.load_datafile_hashes_manifest(manifest_path))
+        datafilehashes = sra.create_datafile_hashes(
+            self._tmp_dir, ['run1.fastq.gz'], manifest_path=manifest_path)
+        with open(path, 'rb') as fp:
+            self.assertEqual(datafilehashes['run1.fastq.gz'], hashlib.md5(fp.read()).hexdigest())
+
+    def test_save_datafile_hashes_manifest_removes_tmp_file(self):
+        manifest_path = os.path.join(self._tmp_dir, 'md5.json')
+        with patch('isatools.sra.os.replace', side_effect=OSError('disk full')):
+            sra.save_datafile_hashes_manifest(manifest_path, {'run1.fastq.gz': {}})
+        self.assertEqual(sorted(os.listdir(self._tmp_dir)), sorted(self._contents))
@@ -0,0 +1,85 @@
+"""Tests on validation.py package"""
+import os
+import threading
+import unittest
+
+from isatools.validation import ValidationMessages, failed_validation_report, map_validate
+
+
+def validate_number(number):
+    if number == 'skip':
+        return None
+    if number == 'raise':
+        raise ValueError('not a number')
+    if number == 'exit':
+        os._exit(1)
+    return number, {"errors": [], "warnings": [number], "info": [], "validation_finished": True}
+
+
+class TestValidationMessages(unittest.TestCase):
+
+    def test_reset_per_thread(self):
+        messages = ValidationMessages('errors')
+        collected = {}
+
+        def validate(name):
+            messages.reset()
+            for i in range(1000):
+                messages.append({"message": name, "code": i})
+            collected[name] = messages.get()
+
+        threads = [threading.Thread(target=validate, args=(name,)) for name in ('a', 'b')]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        for name in ('a', 'b'):
+            self.assertEqual(len(collected[name]), 1000)
+            self.assertEqual(set(x['message'] for x in collected[name]), {name})
+
+    def test_no_shared_default(self):
+        messages = ValidationMessages('errors')
+        collected = []
+
+        def check(name):
+            messages.append({"message": name})
+            collected.append(messages.get())
+
+        for name in ('a', 'b'):
+            thread = threading.Thread(target=check, args=(name,))
+            thread.start()
+            thread.join()
+        self.assertEqual(collected, [[{"message": "a"}], [{"message": "b"}]])
+        self.assertEqual(messages.get(), [])
+
+    def test_behaves_as_list(self):
+        messages = ValidationMessages('warnings')
+        self.assertEqual(messages.reset(), [])
+        messages.append({"code": 1})
+        self.assertEqual(len(messages), 1)
+        self.assertEqual(messages[0], {"code": 1})
+        self.assertIn({"code": 1}, messages)
+        self.assertEqual(messages, [{"code": 1}])
+        self.assertEqual(list(messages), [{"code": 1}])
+
+
+class TestMapValidate(unittest.TestCase):
+
+    def test_map_validate_keeps_order(self):
+        numbers = ['1', '2', 'skip', '3', '4']
+        expected = [validate_number(x) for x in ('1', '2', '3', '4')]
+        self.assertEqual(map_validate(validate_number, numbers), expected)
+        self.assertEqual(map_validate(validate_number, numbers, workers=2), expected)
+
+    def test_map_validate_isolates_exceptions(self):
+        for workers in (None, 2):
+            results = map_validate(validate_number, ['1', 'raise', '2'], workers=workers)
+            self.assertEqual([x[0] for x in results], ['1', 'raise', '2'])
+            self.assertEqual(results[1][1], failed_validation_report(ValueError('not a number')))
+
+    def test_map_validate_isolates_crashed_workers(self):
+        results = map_validate(validate_number, ['1', 'exit', '2', '3'], workers=2)
+        self.assertEqual([x[0] for x in results], ['1', 'exit', '2', '3'])
+        self.assertEqual(results[1][1]['errors'][0]['code'], 0)
+        self.assertFalse(results[1][1]['validation_finished'])
+        self.assertEqual(results[3][1]['warnings'], ['3'])
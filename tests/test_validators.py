@@ -1,5 +1,10 @@
+import json
 import unittest
 from isatools import isajson, isatab
+from isatools.model import (
+    Assay, Characteristic, Extract, Investigation, OntologyAnnotation, Process, Protocol, ProtocolParameter, Sample,
+    Source, Study, plink
+)
 import os
 from isatools.tests import utils
 import tempfile
@@ -35,6 +40,119 @@ class TestValidateIsaJson(unittest.TestCase):
             if 2 not in [e['code'] for e in report['errors']]:
                 self.fail("NO error raised when trying to parse invalid formed JSON!")
 
+    def test_validate_isajson_isajson_schemas_all_errors(self):
+        """Tests against 0003, reporting every schema error"""
+        schema_path = os.path.join(isajson.default_isa_json_schemas_dir, 'investigation_schema.json')
+        isajson.errors.reset()
+        with self.assertRaises(SystemError):
+            isajson.check_isa_schemas({'studies': {}, 'publications': {}}, schema_path)
+        self.assertListEqual([e['code'] for e in isajson.errors], [3, 3])
+
+    def test_validate_isajson_compiled_schemas(self):
+        schema_path = os.path.join(isajson.default_isa_json_schemas_dir, 'investigation_schema.json')
+        isajson.get_schema_validator(schema_path)
+        cache_info = isajson._compile_schema.cache_info()
+        validator = isajson.get_schema_validator(schema_path)
+        self.assertEqual(isajson._compile_schema.cache_info().hits, cache_info.hits + 1)
+        self.assertEqual(isajson._compile_schema.cache_info().misses, cache_info.misses)
+        self.assertIn('file://' + os.path.join(os.path.abspath(isajson.default_isa_json_schemas_dir),
+                                               'study_schema.json'), validator.resolver.store)
+        self.assertTrue(validator.is_valid({'studies': [{'filename': 's_study.txt'}]}))
+        self.assertFalse(validator.is_valid({'studies': [{'filename': 1}]}))
+
+    def build_indexed_study_json(self):
+        study = Study(filename='s_study.txt')
+        study.characteristic_categories.append(OntologyAnnotation(term='organism'))
+        extraction = Protocol(name='extraction', protocol_type=OntologyAnnotation(term='extraction'),
+                              parameters=[ProtocolParameter(parameter_name=OntologyAnnotation(term='kit'))])
+        study.protocols.append(extraction)
+        source = Source(name='source1', characteristics=[
+            Characteristic(category=study.characteristic_categories[0], value=OntologyAnnotation(term='mouse'))])
+        samples = [Sample(name='sample{}'.format(i), derives_from=[source]) for i in range(3)]
+        study.sources.append(source)
+        study.samples.extend(samples)
+        study.process_sequence.append(Process(executes_protocol=extraction, inputs=[source], outputs=samples))
+        assay = Assay(filename='a_assay.txt')
+        for sample in samples:
+            extract = Extract(name='extract-' + sample.name)
+            first = Process(executes_protocol=extraction, inputs=[sample], outputs=[extract])
+            second = Process(executes_protocol=extraction, inputs=[extract], outputs=[sample])
+            plink(first, second)
+            assay.samples.append(sample)
+            assay.other_material.append(extract)
+            assay.process_sequence.extend([first, second])
+        study.assays.append(assay)
+        return json.loads(json.dumps(Investigation(studies=[study]), cls=isajson.ISAJSONEncoder))
+
+    def test_validate_isajson_study_index(self):
+        isa_json = self.build_indexed_study_json()
+        study_json = isa_json['studies'][0]
+        index = isajson.ISAJSONIndex(isa_json)
+        study_index = index.studies[0]
+        for get_ids in (isajson.get_source_ids, isajson.get_sample_ids, isajson.get_material_ids,
+                        isajson.get_data_file_ids):
+            self.assertEqual(study_index.declared_ids(get_ids), get_ids(study_json))
+        self.assertEqual(study_index.io_ids, isajson.get_io_ids_in_process_sequence(study_json))
+        self.assertEqual(study_index.protocol_ids, isajson.get_study_protocol_ids(study_json))
+        self.assertEqual(study_index.parameter_ids, isajson.get_study_protocols_parameter_ids(study_json))
+        self.assertEqual(study_index.parameter_ids_used, isajson.get_parameter_value_parameter_ids(study_json))
+        self.assertEqual(study_index.factor_ids_used, isajson.get_study_factor_ids_in_sample_factor_values(study_json))
+        self.assertEqual(study_index.characteristic_category_ids_used,
+                         isajson.get_characteristic_category_ids_in_study_materials(study_json) +
+                         isajson.get_characteristic_category_ids_in_assay_materials(study_json['assays'][0]))
+        self.assertEqual(len(study_index.assay_processes[0]), 6)
+        collector = list()
+        isajson.walk_and_get_annotations(isa_json, collector)
+        self.assertEqual(index.annotations, collector)
+
+    def test_validate_isajson_study_index_process_links(self):
+        """Tests against 1006 with the processes indexed"""
+        isa_json = self.build_indexed_study_json()
+        study_json = isa_json['studies'][0]
+        study_index = isajson.ISAJSONStudyIndex(study_json)
+        process_sequence_json = study_json['assays'][0]['processSequence']
+        isajson.errors.reset()
+        isajson.check_process_sequence_links(process_sequence_json, study_index.assay_processes[0])
+        self.assertEqual(len(isajson.errors), 0)
+        process_sequence_json[1]['previousProcess']['@id'] = '#process/missing'
+        isajson.check_process_sequence_links(process_sequence_json, study_index.assay_processes[0])
+        self.assertEqual([e['code'] for e in isajson.errors], [1006])
+
+    def run_graph_rules(self, isa_json, index=None):
+        """Run the rules comparing declared and used @ids of validate, with
+        or without an ISAJSONIndex
+
+        :return: The list of errors and warnings reported by the rules
+        """
+        isajson.errors.reset()
+        isajson.warnings.reset()
+        study_indexes = index.studies if index is not None else [None] * len(isa_json['studies'])
+        for study_json, study_index in zip(isa_json['studies'], study_indexes):
+            isajson.check_material_ids_not_declared_used(study_json, index=study_index)
+            for get_ids in (isajson.get_source_ids, isajson.get_sample_ids, isajson.get_material_ids,
+                            isajson.get_data_file_ids):
+                isajson.check_material_ids_declared_used(study_json, get_ids, index=study_index)
+            isajson.check_study_factor_usage(study_json, index=study_index)
+            isajson.check_protocol_parameter_ids_usage(study_json, index=study_index)
+            isajson.check_unit_category_ids_usage(study_json, index=study_index)
+            isajson.check_process_protocol_ids_usage(study_json, index=study_index)
+        isajson.check_characteristic_category_ids_usage(isa_json['studies'], index=index)
+        isajson.check_term_source_refs(isa_json, index=index)
+        isajson.check_term_accession_used_no_source_ref(isa_json, index=index)
+        return list(isajson.errors) + list(isajson.warnings)
+
+    def test_validate_isajson_indexed_rules_match_unindexed(self):
+        isa_json = self.build_indexed_study_json()
+        study_json = isa_json['studies'][0]
+        study_json['protocols'][0]['parameters'].append({'@id': '#parameter/unused', 'parameterName': {}})
+        process_json = study_json['assays'][0]['processSequence'][0]
+        process_json['executesProtocol']['@id'] = '#protocol/missing'
+        process_json['inputs'][0]['@id'] = '#sample/missing'
+        study_json['materials']['sources'][0]['characteristics'][0]['category']['@id'] = '#characteristic/missing'
+        messages = self.run_graph_rules(isa_json)
+        self.assertEqual(sorted(message['code'] for message in messages), [1005, 1007, 1013, 1020])
+        self.assertEqual(self.run_graph_rules(isa_json, isajson.ISAJSONIndex(isa_json)), messages)
+
     def test_validate_isajson_isajson_schemas(self):
         """Tests against 0003"""
         with open(os.path.join(self._unit_json_data_dir, 'minimal_syntax.json')) as fp:
@@ -458,6 +576,15 @@ class TestBatchValidateIsaTab(unittest.TestCase):
         batch_report = isatab.batch_validate(self._bii_tab_dir_list)
         self.assertTrue(len([f['filename'] for f in batch_report['batch_report']]) == len(self._bii_tab_dir_list))
 
+    def test_batch_validate_bii_with_workers(self):
+        batch_report = isatab.batch_validate(self._bii_tab_dir_list)
+        parallel_batch_report = isatab.batch_validate(self._bii_tab_dir_list, workers=2)
+        self.assertListEqual([f['filename'] for f in parallel_batch_report['batch_report']],
+                             [f['filename'] for f in batch_report['batch_report']])
+        for report, parallel_report in zip(batch_report['batch_report'], parallel_batch_report['batch_report']):
+            self.assertEqual(parallel_report['report']['errors'], report['report']['errors'])
+            self.assertEqual(parallel_report['report']['warnings'], report['report']['warnings'])
+
 
 class TestBatchValidateIsaJson(unittest.TestCase):
 
@@ -476,3 +603,11 @@ class TestBatchValidateIsaJson(unittest.TestCase):
     def test_batch_validate_bii(self):
         batch_report = isajson.batch_validate(self._bii_json_files)
         self.assertListEqual([f['filename'] for f in batch_report['batch_report']], self._bii_json_files)
+
+    def test_batch_validate_bii_with_workers(self):
+        batch_report = isajson.batch_validate(self._bii_json_files)
+        parallel_batch_report = isajson.batch_validate(self._bii_json_files, workers=2)
+        self.assertListEqual([f['filename'] for f in parallel_batch_report['batch_report']], self._bii_json_files)
+        for report, parallel_report in zip(batch_report['batch_report'], parallel_batch_report['batch_report']):
+            self.assertEqual(parallel_report['report']['errors'], report['report']['errors'])
+            self.assertEqual(parallel_report['report']['warnings'], report['report']['warnings'])